@@ -2,9 +2,11 @@
 PlantPal AI Agent Configuration
 Sets up LangChain agent with conversation memory and tools
 """
+import asyncio
 import enum
 import os
-from typing import List, Optional, Any, Dict
+import threading
+from typing import List, Optional, Any, Coroutine, Dict, Iterator, Tuple, TypeVar
 from dotenv import load_dotenv
 
 from langchain.tools import BaseTool
@@ -12,17 +14,58 @@ from langchain_tavily import TavilySearch
 from langchain.agents import create_agent
 from langchain.agents.middleware import SummarizationMiddleware
 from langchain.chat_models import init_chat_model, BaseChatModel
-from langgraph.checkpoint.memory import InMemorySaver
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from langchain_core.messages import (
+    BaseMessage, HumanMessage, AIMessage, AIMessageChunk, ToolMessage
+)
 from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langsmith import Client, traceable
 import langsmith as ls
 
+from checkpointers.lru_saver import LRUSaver
+from config import (
+    CHECKPOINT_MAX_THREADS,
+    CHECKPOINT_IDLE_TTL_SECONDS,
+    CHECKPOINTER_BACKEND,
+    CHECKPOINT_COLLECTION,
+    CHECKPOINT_SQLITE_PATH,
+    SEARCH_CACHE_MAX_ENTRIES,
+    SEARCH_CACHE_TTL_SECONDS,
+    SEARCH_CACHE_SHARED,
+    SUMMARY_TRIGGER_TOKENS,
+    SUMMARY_KEEP_TOKENS,
+    HISTORY_TOKEN_BUDGET,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_EMBEDDER,
+    RESPONSE_CACHE_THRESHOLD,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_MAX_ENTRIES,
+)
+from tools.search_cache import CachedSearchTool, SearchCache
+from utils.model_tracing import ModelTracingCallbackHandler
+from utils.response_cache import ResponseCache, create_embedder
+from utils.thread_locks import ThreadLocks
+from utils.token_budget import (
+    MessageTokenCounter,
+    TokenBudgetSummarizationMiddleware,
+)
+from utils.tracing import tracer
+
 
 # For tracking of Agent calls and langsmith client
 load_dotenv()
 os.environ["LANGSMITH_TRACING"] = "true"
-langsmith_client = Client()
+
+# Only needed to rebuild history from traces, so created on first use
+_langsmith_client: Optional[Client] = None
+
+
+def get_langsmith_client() -> Client:
+    """Get or create the LangSmith client"""
+    global _langsmith_client
+    if _langsmith_client is None:
+        _langsmith_client = Client()
+    return _langsmith_client
 
 _system_prompt = """You are PlantPal, an expert AI assistant specialized in plant care and gardening.
 
@@ -38,8 +81,9 @@ You help users care for their plants by providing accurate information, actionab
 
 ## Tool Usage Guidelines
 1. **Tavily Search**: Always use this FIRST for plant-specific questions requiring current information (care guides, pest identification, disease treatment, etc.)
-2. **Sensor Tools**: Use `get_moisture_data` and `get_sensor_id` to check real-time soil conditions
+2. **Sensor Tools**: Use `get_moisture_data` and `get_system_status` to check real-time soil conditions and device connectivity. Use `get_moisture_trend` for questions about how moisture changes over time (drying rate, when to water next)
 3. **Irrigation Control**: Use `control_irrigation` when users need to water their plants or adjust watering
+4. **Devices**: IoT tools take an optional `device` (device ID or group name). Leave it empty to cover all of the user's plants
 
 ## Interaction Style
 - Be warm, friendly, and enthusiastic about plants
@@ -62,6 +106,22 @@ Remember: Your goal is to help users become confident, successful plant parents!
 """
 
 
+# Progress text streamed to the client while a tool runs
+TOOL_STATUS: Dict[str, str] = {
+    "tavily_search": "Searching the web…",
+    "get_moisture_data": "Checking sensor…",
+    "get_moisture_trend": "Analyzing moisture history…",
+    "get_system_status": "Checking device status…",
+    "control_irrigation": "Starting irrigation…",
+}
+
+# Tools whose results depend on live device state; a turn that called any of
+# them is never answered from the response cache
+IOT_TOOL_NAMES = frozenset({
+    "get_moisture_data", "get_moisture_trend", "get_system_status", "control_irrigation"
+})
+
+
 class MaxOutputTokens(enum.Enum):
     """Enum for maximum token settings which will
     be used in constructing BaseChatModel instance if
@@ -95,7 +155,7 @@ def get_thread_history(thread_id: str, project_name: str) -> List[BaseMessage]:
 
     # Get all runs for this thread (llm type for model calls)
     runs = [
-        r for r in langsmith_client.list_runs(
+        r for r in get_langsmith_client().list_runs(
             project_name=project_name,
             filter=filter_string,
             run_type="llm"
@@ -136,10 +196,12 @@ def get_thread_history(thread_id: str, project_name: str) -> List[BaseMessage]:
             if ai_content:
                 messages.append(AIMessage(content=ai_content))
 
-    # Limit to most recent 25 messages to prevent excessive context
-    if len(messages) > 25:
-        messages = messages[-25:]
-        print("Truncated history to most recent 25 messages")
+    # Keep the most recent messages that fit in the history token budget
+    recent = MessageTokenCounter().select_recent(messages, HISTORY_TOKEN_BUDGET)
+    if len(recent) < len(messages):
+        print(f"Truncated history to the most recent {len(recent)} messages "
+              f"({HISTORY_TOKEN_BUDGET} token budget)")
+        messages = recent
 
     print(f"Reconstructed {len(messages)} messages from history")
     return messages
@@ -150,8 +212,9 @@ def get_thread_history(thread_id: str, project_name: str) -> List[BaseMessage]:
 # when token count exceeds the trigger threshold
 def create_summarization_middleware(
     summary_model: str = "gpt-4o-mini",
-    token_trigger: int = 4000,
-    keep_messages: int = 20
+    token_trigger: int = SUMMARY_TRIGGER_TOKENS,
+    keep_tokens: int = SUMMARY_KEEP_TOKENS,
+    model: str = "gpt-4o"
 ) -> SummarizationMiddleware:
     """
     Create middleware that summarizes conversation history
@@ -160,21 +223,190 @@ def create_summarization_middleware(
     Args:
         summary_model: Model to use for summarization (cheaper/faster)
         token_trigger: Token count that triggers summarization
-        keep_messages: Number of recent messages to keep unsummarized
+        keep_tokens: Tokens of recent messages to keep unsummarized
+        model: Agent model, selects the tiktoken encoding
 
     Returns:
         Configured SummarizationMiddleware instance
     """
-    return SummarizationMiddleware(
+    return TokenBudgetSummarizationMiddleware(
         model=summary_model,
         max_tokens_before_summary=token_trigger,
-        messages_to_keep={"messages": keep_messages},
+        tokens_to_keep=keep_tokens,
+        token_counter=MessageTokenCounter(model=model),
+    )
+
+
+# Process-wide shared state. The compiled graph is stateless with respect to
+# conversations; the thread is selected only through RunnableConfig and its
+# state lives in the shared checkpointer.
+_checkpointer: Optional[BaseCheckpointSaver] = None
+_compiled_agents: Dict[Tuple[str, int], Any] = {}
+_search_cache: Optional[SearchCache] = None
+_response_cache: Optional[ResponseCache] = None
+_shared_lock = threading.Lock()
+# Stateless apart from in-flight spans, shared by every agent
+_model_tracing = ModelTracingCallbackHandler()
+# One turn at a time per conversation thread, across all handles
+_thread_locks = ThreadLocks()
+
+
+def create_checkpointer(backend: str = CHECKPOINTER_BACKEND) -> BaseCheckpointSaver:
+    """
+    Create the checkpointer that stores per-thread conversation state.
+
+    Args:
+        backend: "firestore", "sqlite" or "memory"
+
+    Returns:
+        Checkpointer instance for the backend
+    """
+    if backend == "firestore":
+        from checkpointers.firestore_saver import FirestoreSaver
+        return FirestoreSaver(collection=CHECKPOINT_COLLECTION)
+    if backend == "sqlite":
+        from checkpointers.sqlite_saver import SQLiteSaver
+        return SQLiteSaver(path=CHECKPOINT_SQLITE_PATH)
+    if backend == "memory":
+        return LRUSaver(
+            max_threads=CHECKPOINT_MAX_THREADS,
+            idle_ttl_seconds=CHECKPOINT_IDLE_TTL_SECONDS
+        )
+    raise ValueError(f"Unknown checkpointer backend: {backend}")
+
+
+def get_checkpointer() -> BaseCheckpointSaver:
+    """Get or create the checkpointer shared by every thread on this instance"""
+    global _checkpointer
+    with _shared_lock:
+        if _checkpointer is None:
+            _checkpointer = create_checkpointer()
+        return _checkpointer
+
+
+def get_search_cache() -> SearchCache:
+    """Get or create the web search cache shared by every thread"""
+    global _search_cache
+    with _shared_lock:
+        if _search_cache is None:
+            db = None
+            if SEARCH_CACHE_SHARED:
+                from firebase_admin import firestore
+                db = firestore.client()
+            _search_cache = SearchCache(
+                max_entries=SEARCH_CACHE_MAX_ENTRIES,
+                ttl_seconds=SEARCH_CACHE_TTL_SECONDS,
+                db=db
+            )
+        return _search_cache
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Get or create the response cache shared by every thread, None if disabled"""
+    global _response_cache
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    with _shared_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                embedder=create_embedder(RESPONSE_CACHE_EMBEDDER),
+                threshold=RESPONSE_CACHE_THRESHOLD,
+                ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+                max_entries=RESPONSE_CACHE_MAX_ENTRIES
+            )
+        return _response_cache
+
+
+def _setup_tools(search_cache: SearchCache) -> List[BaseTool]:
+    """Setup and return list of available tools"""
+    tools: List[BaseTool] = []
+
+    # 3rd party tools
+    # Add Tavily Search tool for web search capabilities, answering repeated
+    # questions from the shared search cache
+    tavily_tool = TavilySearch(max_results=3)
+    tools.append(CachedSearchTool(tavily_tool, search_cache))
+
+    iot_tools_module = __import__(
+        'tools.iot_tools',
+        fromlist=['get_moisture_data', 'get_moisture_trend',
+                  'get_system_status', 'control_irrigation']
     )
+    tools.append(iot_tools_module.get_moisture_data)
+    tools.append(iot_tools_module.get_moisture_trend)
+    tools.append(iot_tools_module.get_system_status)
+    tools.append(iot_tools_module.control_irrigation)
+
+    return tools
+
+
+def get_compiled_agent(
+    model: str = "gpt-4o",
+    max_tokens: MaxOutputTokens = MaxOutputTokens.LARGE
+) -> Any:
+    """
+    Get or compile the agent graph for a model configuration.
+    The graph is compiled once per process and shared by all threads.
+
+    Args:
+        model: LLM model to use
+        max_tokens: Maximum tokens for model output
+
+    Returns:
+        Compiled agent graph bound to the shared checkpointer
+    """
+    key = (model, max_tokens.value)
+    compiled = _compiled_agents.get(key)
+    if compiled is not None:
+        return compiled
+
+    checkpointer = get_checkpointer()
+    search_cache = get_search_cache()
+    with _shared_lock:
+        if key not in _compiled_agents:
+            print(f"Compiling PlantPal agent graph for {model}...")
+            llm_model: BaseChatModel = init_chat_model(
+                                model=model,
+                                max_tokens=max_tokens.value
+                                )
+            # Create summarization middleware to manage long conversations
+            summarization_middleware = create_summarization_middleware(
+                summary_model="gpt-4o-mini",
+                model=model
+            )
+            _compiled_agents[key] = create_agent(
+                                model=llm_model,
+                                system_prompt=_system_prompt,
+                                tools=_setup_tools(search_cache),
+                                middleware=[summarization_middleware],
+                                checkpointer=checkpointer
+                                )
+        return _compiled_agents[key]
+
+
+_ERROR_REPLY = ("I'm sorry, I encountered an error processing your "
+                "request. Please try again.")
+
+
+def _used_iot_tool(messages: List[BaseMessage]) -> bool:
+    """True if the last turn (messages after the last human message) called an IoT tool"""
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return False
+        if isinstance(message, ToolMessage) and message.name in IOT_TOOL_NAMES:
+            return True
+        if isinstance(message, AIMessage) and any(
+                call["name"] in IOT_TOOL_NAMES for call in message.tool_calls):
+            return True
+    return False
 
 
 class PlantPalAgent:
     """
-    PlantPal AI Agent with conversation memory, IoT tools, and Tavily Search
+    PlantPal AI Agent with conversation memory, IoT tools, and Tavily Search.
+    A lightweight per-thread handle over the shared compiled graph.
+    Safe to use from concurrent requests: turns on the same thread run one at
+    a time, across all handles, and turns on different threads in parallel.
     """
     def __init__(
             self,
@@ -182,34 +414,35 @@ class PlantPalAgent:
             max_tokens: MaxOutputTokens = MaxOutputTokens.LARGE,
             model: str = "gpt-4o",
             existing_thread: bool = False,
+            user_id: Optional[str] = None,
             ):
 
-        """Initialize the agent with tools and memory
+        """Initialize the agent handle for a conversation thread
 
         Args:
             thread_id: Unique identifier for conversation thread
             max_tokens: Maximum tokens for model output
             model: LLM model to use
-            use_langsmith_history: If True, load conversation history
-                                  from LangSmith traces
-            langsmith_project: LangSmith project name for history retrieval
+            existing_thread: Only used by the in-memory backend. If True and
+                             this instance holds no state for the thread,
+                             load conversation history from LangSmith traces.
+                             Durable backends resume from the checkpointer.
+            user_id: Firebase Auth UID, lets IoT tools resolve the user's
+                     registered devices
         """
 
-        print("Initializing PlantPal Agent...")
-
         self.thread_id = thread_id
         self.existing_thread = existing_thread
 
-        self.tools = self._setup_tools()
-        self.llm_model: BaseChatModel = init_chat_model(
-                            model=model,
-                            max_tokens=max_tokens.value
-                            )
-
-        self.memory = InMemorySaver()
+        self.agent = get_compiled_agent(model=model, max_tokens=max_tokens)
+        self.memory = get_checkpointer()
+        self.response_cache = get_response_cache()
         self.config: RunnableConfig = {
+            # OpenTelemetry spans for model calls, next to the LangSmith runs
+            "callbacks": [_model_tracing],
             "configurable": {
                 "thread_id": thread_id,
+                "user_id": user_id,
                 "metadata": {
                     "session_id": thread_id,
                     "thread_id": thread_id
@@ -217,49 +450,9 @@ class PlantPalAgent:
             }
         }
 
-        # Load existing conversation history from LangSmith if enabled
-        if self.existing_thread:
-            print(f"Loading conversation history for thread: {thread_id}")
-            self.chat_history = get_thread_history(
-                thread_id=thread_id,
-                project_name=os.getenv("LANGSMITH_PROJECT")
-            )
-        else:
-            self.chat_history = []
-        # Create summarization middleware to manage long conversations
-        summarization_middleware = create_summarization_middleware(
-            summary_model="gpt-4o-mini",
-            token_trigger=4000,
-            keep_messages=20
-        )
-
-        self.agent = create_agent(
-                            model=self.llm_model,
-                            system_prompt=_system_prompt,
-                            tools=self.tools,
-                            middleware=[summarization_middleware],
-                            checkpointer=self.memory
-                            )
-
-    def _setup_tools(self) -> List[BaseTool]:
-        """Setup and return list of available tools"""
-        tools: List[BaseTool] = []
-
-        # 3rd party tools
-        # Add Tavily Search tool for web search capabilities
-        tavily_tool = TavilySearch(max_results=3)
-        tools.append(tavily_tool)
-
-        iot_tools_module = __import__(
-            'tools.iot_tools',
-            fromlist=['get_moisture_data', 'get_system_status',
-                      'control_irrigation']
-        )
-        tools.append(iot_tools_module.get_moisture_data)
-        tools.append(iot_tools_module.get_system_status)
-        tools.append(iot_tools_module.control_irrigation)
-
-        return tools
+        # History from LangSmith is loaded by the first turn, under the
+        # thread's lock (see _input_messages)
+        self._load_history = existing_thread and isinstance(self.memory, LRUSaver)
 
     def chat(self, message: str) -> str:
         """
@@ -272,74 +465,246 @@ class PlantPalAgent:
             Agent's response as string
         """
         try:
-            # On first call with existing thread, prepend chat history
-            if self.chat_history:
-                messages = self.chat_history + [HumanMessage(content=message)]
-                # Clear history so we don't prepend it again
-                self.chat_history = []
-            else:
-                messages = [HumanMessage(content=message)]
+            with _thread_locks.hold(self.thread_id), self._span("agent.chat") as span:
+                messages, vector, cached = self._prepare_turn(message)
+                span.set_attribute("plantpal.response_cache_hit", cached is not None)
+                if cached is not None:
+                    self.agent.update_state(self.config, self._cached_turn(messages, cached),
+                                            as_node="model")
+                    return cached
 
-            response = self.agent.invoke({
-                "messages": messages
-            }, config=self.config)
+                response = self.agent.invoke({"messages": messages}, config=self.config)
 
-            return response["messages"][-1].content
+            answer = response["messages"][-1].content
+            if not _used_iot_tool(response["messages"]):
+                self._cache_store(vector, answer)
+            return answer
 
         except Exception as e:
             print(f"Error in agent chat: {e}")
-            return ("I'm sorry, I encountered an error processing your "
-                    "request. Please try again.")
+            return _ERROR_REPLY
+
+    async def achat(self, message: str) -> str:
+        """
+        Async version of chat. Tool calls the model makes in one step run
+        concurrently on the event loop, so a turn that checks status,
+        moisture and the web takes as long as the slowest of them.
+
+        Args:
+            message: User's input message
+
+        Returns:
+            Agent's response as string
+        """
+        try:
+            async with _thread_locks.ahold(self.thread_id):
+                with self._span("agent.achat") as span:
+                    messages, vector, cached = await asyncio.to_thread(
+                        self._prepare_turn, message)
+                    span.set_attribute("plantpal.response_cache_hit", cached is not None)
+                    if cached is not None:
+                        await self.agent.aupdate_state(
+                            self.config, self._cached_turn(messages, cached), as_node="model")
+                        return cached
+
+                    response = await self.agent.ainvoke(
+                        {"messages": messages}, config=self.config)
+
+            answer = response["messages"][-1].content
+            if not _used_iot_tool(response["messages"]):
+                self._cache_store(vector, answer)
+            return answer
+
+        except Exception as e:
+            print(f"Error in agent chat: {e}")
+            return _ERROR_REPLY
+
+    def stream_chat(self, message: str) -> Iterator[Dict[str, Any]]:
+        """
+        Process a chat message and stream the response as it is generated
+
+        Args:
+            message: User's input message
+
+        Yields:
+            Event dicts, in order:
+            - {"type": "tool_start", "tool": name, "status": text} when the
+              model calls a tool
+            - {"type": "tool_end", "tool": name} when the tool returns
+            - {"type": "token", "text": text} for each chunk of the reply
+            - {"type": "done", "response": text} with the full final reply,
+              or {"type": "error", "message": text} if the run failed
+        """
+        # Tokens of the current model turn. A turn that ends in tool calls is
+        # followed by another, so only the last turn is the final reply.
+        reply: List[str] = []
+        used_iot_tool = False
+        try:
+            # Held until the stream ends or the client disconnects
+            with _thread_locks.hold(self.thread_id), \
+                    self._span("agent.stream_chat") as span:
+                messages, vector, cached = self._prepare_turn(message)
+                span.set_attribute("plantpal.response_cache_hit", cached is not None)
+                if cached is not None:
+                    self.agent.update_state(self.config, self._cached_turn(messages, cached),
+                                            as_node="model")
+                    yield {"type": "token", "text": cached}
+                    yield {"type": "done", "response": cached}
+                    return
+
+                for chunk, metadata in self.agent.stream(
+                    {"messages": messages},
+                    config=self.config,
+                    stream_mode="messages"
+                ):
+                    node = metadata.get("langgraph_node")
+                    if node == "tools" and isinstance(chunk, ToolMessage):
+                        yield {"type": "tool_end", "tool": chunk.name}
+                        continue
+
+                    # Skip other model calls, e.g. the summarization middleware
+                    if node != "model" or not isinstance(chunk, AIMessageChunk):
+                        continue
+
+                    for tool_call in chunk.tool_call_chunks:
+                        if tool_call.get("name"):
+                            reply = []
+                            used_iot_tool |= tool_call["name"] in IOT_TOOL_NAMES
+                            yield {
+                                "type": "tool_start",
+                                "tool": tool_call["name"],
+                                "status": TOOL_STATUS.get(tool_call["name"], "Working…")
+                            }
+
+                    if chunk.text:
+                        reply.append(chunk.text)
+                        yield {"type": "token", "text": chunk.text}
+
+            answer = "".join(reply)
+            if not used_iot_tool:
+                self._cache_store(vector, answer)
+            yield {"type": "done", "response": answer}
+
+        except Exception as e:
+            print(f"Error in agent stream: {e}")
+            yield {"type": "error", "message": _ERROR_REPLY}
+
+    def _span(self, name: str):
+        """Span around one agent run"""
+        return tracer.start_as_current_span(
+            name, attributes={"plantpal.thread_id": self.thread_id})
+
+    def _prepare_turn(
+        self, message: str
+    ) -> Tuple[List[BaseMessage], Optional[Any], Optional[str]]:
+        """
+        Input messages, message embedding and cached answer for this turn.
+        Runs under the thread's lock.
+
+        The cache is shared by every thread on the instance and keyed on the
+        message alone, so only a thread's first turn uses it: later turns
+        can refer to earlier ones ("how often should I water it?"). The
+        embedding is None when the turn is not cacheable.
+        """
+        messages = self._input_messages(message)
+        if self.response_cache is None or not self._is_first_turn(messages):
+            return messages, None, None
+        vector = self.response_cache.embed(message)
+        return messages, vector, self.response_cache.get(vector)
+
+    def _is_first_turn(self, messages: List[BaseMessage]) -> bool:
+        """True when the turn has no earlier messages to depend on"""
+        return len(messages) == 1 and self.memory.get_tuple(
+            {"configurable": {"thread_id": self.thread_id}}) is None
+
+    def _cache_store(self, vector: Optional[Any], answer: str) -> None:
+        """Remember a generic answer, never an error reply"""
+        if self.response_cache is not None and answer and answer != _ERROR_REPLY:
+            self.response_cache.put(vector, answer)
+
+    def _cached_turn(self, messages: List[BaseMessage], answer: str) -> Dict[str, Any]:
+        """State update recording a cached answer in the thread's history"""
+        return {"messages": [*messages, AIMessage(content=answer)]}
+
+    def _input_messages(self, message: str) -> List[BaseMessage]:
+        """Messages to send for this turn"""
+        # On the first turn of an existing thread, prepend its history. Only
+        # rebuilt from LangSmith when the in-memory backend has no checkpoint
+        # for the thread, otherwise it would be prepended twice; checked under
+        # the thread's lock so concurrent first turns cannot both prepend it.
+        if self._load_history:
+            self._load_history = False
+            if self.thread_id not in self.memory:
+                print(f"Loading conversation history for thread: {self.thread_id}")
+                history = get_thread_history(
+                    thread_id=self.thread_id,
+                    project_name=os.getenv("LANGSMITH_PROJECT")
+                )
+                return history + [HumanMessage(content=message)]
+        return [HumanMessage(content=message)]
 
     def get_conversation_history(self) -> List[BaseMessage]:
         """Get the current conversation history"""
-        return self.memory.chat_memory.messages
+        state = self.agent.get_state(self.config)
+        return list(state.values.get("messages", []))
 
     def clear_memory(self):
         """Clear the conversation memory"""
-        self.memory.clear()
+        self.memory.delete_thread(self.thread_id)
         print("Conversation memory cleared")
 
 
-# Global agent instance - will be initialized when needed
-_agent_instance: Optional[PlantPalAgent] = None
-_current_thread_id: Optional[str] = None
-
-
 def get_agent(
     thread_id: Optional[str] = None,
-    existing_thread: bool = False
+    existing_thread: bool = False,
+    user_id: Optional[str] = None
 ) -> PlantPalAgent:
     """
-    Get or create the global agent instance
-    Recreates agent if thread_id changes to ensure proper isolation
+    Get an agent handle for a thread.
+    All threads share one compiled graph and checkpointer, so switching
+    threads does not rebuild anything or drop other threads' memory.
 
     Args:
         thread_id: Unique identifier for conversation thread
-        existing_thread: If True, load conversation history from
-                        LangSmith traces for long-running chats
+        existing_thread: If True and using the in-memory backend, load
+                        conversation history from LangSmith traces
+        user_id: Firebase Auth UID of the chatting user
     """
-    global _agent_instance, _current_thread_id
-
-    # Recreate agent if thread_id changed or doesn't exist
-    if _agent_instance is None or _current_thread_id != thread_id:
-        print(f"Creating new agent for thread: {thread_id}")
-        _agent_instance = PlantPalAgent(
-            thread_id=thread_id,
-            existing_thread=existing_thread
-        )
-        _current_thread_id = thread_id
-    else:
-        print(f"Reusing existing agent for thread: {thread_id}")
+    return PlantPalAgent(
+        thread_id=thread_id,
+        existing_thread=existing_thread,
+        user_id=user_id
+    )
 
-    return _agent_instance
+
+_T = TypeVar("_T")
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def run_async(coroutine: Coroutine[Any, Any, _T]) -> _T:
+    """
+    Run a coroutine on the agent's event loop and wait for the result.
+    The loop lives in a background thread for the life of the instance, so
+    async clients bound to it (e.g. async Firestore) are reused across
+    requests from synchronous function handlers.
+    """
+    global _loop
+    with _shared_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, daemon=True,
+                             name="plantpal-agent-loop").start()
+    return asyncio.run_coroutine_threadsafe(coroutine, _loop).result()
 
 
 def reset_agent():
-    """Reset the global agent instance and thread tracking"""
-    global _agent_instance, _current_thread_id
-    _agent_instance = None
-    _current_thread_id = None
+    """Reset the shared compiled graphs and conversation state"""
+    global _checkpointer, _search_cache, _response_cache
+    with _shared_lock:
+        _compiled_agents.clear()
+        _checkpointer = None
+        _search_cache = None
+        _response_cache = None
     print("Agent instance reset")
 
 
@@ -0,0 +1 @@
+"""Benchmarks package for PlantPal Firebase Functions"""
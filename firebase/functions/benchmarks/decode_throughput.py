@@ -0,0 +1,128 @@
+"""
+Telemetry Decode Benchmark
+Messages per second decoded from Pub/Sub event data by the previous path
+(firebase_functions Message.json: base64 + stdlib json, no validation) and by
+telemetry/decode.py (base64 + orjson + schema validation). A stdlib json +
+validation run separates the parser's share from the validation cost.
+
+Run (from firebase/functions):
+    python -m benchmarks.decode_throughput --messages 100000
+"""
+import argparse
+import base64
+import json
+import random
+import time
+from typing import Callable, Dict, List
+
+from firebase_functions.pubsub_fn import Message
+
+from telemetry.decode import (
+    TelemetryDecodeError, decode_base64, moisture_decoder
+)
+
+
+def _messages(count: int, reject_every: int, seed: int = 7) -> List[str]:
+    """Base64 event data as the handler receives it, with some bad readings"""
+    rng = random.Random(seed)
+    bad = [b"not json", b"[]", b'{"timestamp": 1}',
+           b'{"percentage": "42", "timestamp": 1}',
+           b'{"percentage": 140.0, "timestamp": 1}']
+    messages = []
+    for i in range(count):
+        if reject_every and i % reject_every == 0:
+            raw = rng.choice(bad)
+        else:
+            raw = json.dumps({
+                "percentage": round(rng.uniform(0, 100), 1),
+                "timestamp": rng.randrange(10 ** 9),
+                "request_id": f"{rng.getrandbits(128):032x}",
+                "device_id": f"esp32-{rng.randrange(1000)}",
+                "traceparent": "",
+            }).encode("utf-8")
+        messages.append(base64.b64encode(raw).decode("ascii"))
+    return messages
+
+
+def _previous(data: str) -> bool:
+    """main.handle_moisture_data before the decode layer"""
+    try:
+        payload = Message(message_id="", publish_time="", attributes={},
+                          data=data, ordering_key="").json
+    except ValueError:
+        return False
+    payload = payload if payload else {"percentage": None, "timestamp": None}
+    payload.get("percentage")  # Stored whatever it was
+    return True
+
+
+def _stdlib_validated(data: str) -> bool:
+    try:
+        payload = json.loads(base64.b64decode(data))
+        if not isinstance(payload, dict):
+            return False
+        moisture_decoder.validate(payload)
+    except (ValueError, TelemetryDecodeError):
+        return False
+    return True
+
+
+def _orjson_validated(data: str) -> bool:
+    try:
+        moisture_decoder.decode(decode_base64(data))
+    except TelemetryDecodeError:
+        return False
+    return True
+
+
+PATHS: Dict[str, Callable[[str], bool]] = {
+    "previous_json_unvalidated": _previous,
+    "stdlib_json_validated": _stdlib_validated,
+    "orjson_validated": _orjson_validated,
+}
+
+
+def bench_path(decode: Callable[[str], bool], messages: List[str], repeat: int) -> dict:
+    """Best of `repeat` passes over the messages"""
+    best = float("inf")
+    accepted = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        accepted = sum(1 for data in messages if decode(data))
+        best = min(best, time.perf_counter() - start)
+    return {
+        "accepted": accepted,
+        "rejected": len(messages) - accepted,
+        "seconds": round(best, 4),
+        "messages_per_second": round(len(messages) / best),
+    }
+
+
+def run_benchmark(count: int, reject_every: int, repeat: int) -> dict:
+    messages = _messages(count, reject_every)
+    results = {name: bench_path(decode, messages, repeat)
+               for name, decode in PATHS.items()}
+    baseline = results["previous_json_unvalidated"]["messages_per_second"]
+    for result in results.values():
+        result["vs_previous"] = round(result["messages_per_second"] / baseline, 2)
+    return {"messages": count, "reject_every": reject_every, "paths": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telemetry decode throughput")
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--reject-every", type=int, default=100,
+                        help="Make every Nth message invalid (0 for none)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the result JSON to this file")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.messages, args.reject_every, args.repeat)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+"""
+Device Load Generator
+Emulates a fleet of PlantPal devices against the local emulators and
+measures the telemetry and command pipeline end to end:
+
+  - every device publishes moisture readings (iot/schemas/moisture-data.json)
+    and system status at a configurable rate, which the functions emulator
+    hands to handle_moisture_data / handle_system_status
+  - every device answers request-soil and request-water commands like the
+    ESP32 firmware, talking to its own simulated FPGA over the UART protocol
+  - the get_moisture_data tool is called against random devices to time the
+    full request -> device -> handler -> Firestore -> tool round trip
+
+Reports throughput, p50/p99 latency and Firestore writes per reading.
+
+Run (from firebase/, with `firebase emulators:start` running):
+    export PUBSUB_EMULATOR_HOST=localhost:8085
+    export FIRESTORE_EMULATOR_HOST=localhost:8080
+    cd functions && python -m benchmarks.device_load --devices 1000 --interval 10
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from uart import protocol
+from uart.protocol import Frame, FrameDecoder
+from uart.simulator import FpgaSimulator
+
+# Emulator project, see firebase/.firebaserc (singleProjectMode)
+PROJECT_ID = "plantpal-f1bfa"
+
+# Collections written per moisture reading and per status message
+READING_COLLECTIONS = ("sensor_data", "hourly", "sensor_requests")
+STATUS_COLLECTIONS = ("system_status", "device_presence")
+
+
+def _require_emulators() -> None:
+    missing = [var for var in ("PUBSUB_EMULATOR_HOST", "FIRESTORE_EMULATOR_HOST")
+               if not os.getenv(var)]
+    if missing:
+        print(f"❌ Set {', '.join(missing)} to point at the local emulators")
+        sys.exit(1)
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0-100), None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, Any]:
+    """Count and p50/p99/max of latencies, in milliseconds"""
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 1) if value is not None else None
+    return {
+        "count": len(seconds),
+        "p50_ms": ms(percentile(seconds, 50)),
+        "p99_ms": ms(percentile(seconds, 99)),
+        "max_ms": ms(max(seconds) if seconds else None),
+    }
+
+
+class EmulatedDevice:
+    """
+    One ESP32 bridge with its FPGA: builds the same MQTT payloads as the
+    firmware (esp32_plantpal.ino, io_helpers.cpp) from UART exchanges with
+    an FpgaSimulator
+    """
+
+    def __init__(self, device_id: str, simulator: FpgaSimulator,
+                 clock=time.monotonic):
+        self.device_id = device_id
+        self.simulator = simulator
+        self._clock = clock
+        self._boot = clock()
+        self._last_timestamp = -1
+        self._last_acked_command_id = ""
+
+    def _millis(self) -> int:
+        """Time since boot, unique per message like the keys we match on"""
+        self._last_timestamp = max(self._last_timestamp + 1,
+                                   int((self._clock() - self._boot) * 1000))
+        return self._last_timestamp
+
+    def _uart(self, frame_bytes: bytes) -> Optional[Frame]:
+        """One command/response exchange with the FPGA"""
+        command = next(FrameDecoder().feed(frame_bytes))
+        response = self.simulator.handle(command)
+        if response is None:
+            return None
+        return next(FrameDecoder().feed(response), None)
+
+    def moisture(self, request_id: str = "", traceparent: str = "") -> Optional[bytes]:
+        """data-moisture payload, None if the FPGA answered with an error"""
+        response = self._uart(protocol.read_moisture())
+        if response is None or response.command != protocol.RESP_MOISTURE_DATA:
+            return None
+        return json.dumps({
+            "percentage": float(response.payload[0]),
+            "timestamp": self._millis(),
+            "request_id": request_id,
+            "device_id": self.device_id,
+            "traceparent": traceparent,
+        }).encode("utf-8")
+
+    def status(self) -> bytes:
+        """system-status payload"""
+        response = self._uart(protocol.status_request())
+        online = response is not None and response.command == protocol.RESP_STATUS_OK
+        return json.dumps({
+            "status": "online" if online else "offline",
+            "device_id": self.device_id,
+            "timestamp": self._millis(),
+        }).encode("utf-8")
+
+    def water(self, request: Dict[str, Any]) -> bytes:
+        """water-ack payload for a request-water message"""
+        command_id = request.get("command_id", "")
+        if command_id and command_id == self._last_acked_command_id:
+            status = "acked"  # Redelivery, do not water twice
+        else:
+            duration = int(request.get("duration_seconds", request.get("duration", 10)))
+            response = self._uart(protocol.water_on(duration))
+            if response is None:
+                status = "timeout"
+            elif response.command == protocol.RESP_WATER_ACK:
+                status = "acked"
+                self._last_acked_command_id = command_id
+            elif response.command == protocol.RESP_ERROR:
+                status = "error"
+            else:
+                status = "unexpected"
+        return json.dumps({
+            "command_id": command_id,
+            "device_id": self.device_id,
+            "status": status,
+            "timestamp": self._millis(),
+        }).encode("utf-8")
+
+
+class LoadGenerator:
+    """Drives a fleet of emulated devices and collects measurements"""
+
+    def __init__(self, devices: int, interval: float, status_interval: float,
+                 error_rate: float = 0.0, seed: int = 7):
+        from google.cloud import firestore as gcloud_firestore
+        from google.cloud import pubsub_v1
+
+        from config import TOPICS
+
+        self.topics = TOPICS
+        self.interval = interval
+        self.status_interval = status_interval
+        self.run_id = uuid.uuid4().hex[:6]
+        self.user_id = f"load-{self.run_id}"
+        rng = random.Random(seed)
+        self.devices: Dict[str, EmulatedDevice] = {}
+        for i in range(devices):
+            device_id = f"load-{self.run_id}-{i:05d}"
+            self.devices[device_id] = EmulatedDevice(device_id, FpgaSimulator(
+                moisture_percent=rng.uniform(20, 80), error_rate=error_rate,
+                seed=rng.randrange(1 << 30)))
+
+        self.publisher = pubsub_v1.PublisherClient(
+            batch_settings=pubsub_v1.types.BatchSettings(
+                max_messages=500, max_latency=0.01))
+        self.subscriber = pubsub_v1.SubscriberClient()
+        self.db = gcloud_firestore.Client(project=PROJECT_ID)
+
+        self._lock = threading.Lock()
+        self._sent: Dict[Tuple[str, int], float] = {}
+        self._answered_requests = set()
+        self.ingest_latencies: List[float] = []
+        self.round_trip_latencies: List[float] = []
+        self.counts = {
+            "readings_published": 0, "status_published": 0,
+            "soil_requests_answered": 0, "water_requests_answered": 0,
+            "readings_stored": 0, "round_trips": 0, "round_trip_timeouts": 0,
+            "publish_errors": 0,
+        }
+        self.writes = {collection: 0 for collection in READING_COLLECTIONS + STATUS_COLLECTIONS}
+        self._subscriptions: List[str] = []
+        self._watches: List[Any] = []
+        self._streams: List[Any] = []
+
+    # ---------- Setup ----------
+
+    def _ensure_topic(self, topic: str) -> None:
+        from google.api_core.exceptions import AlreadyExists
+        try:
+            self.publisher.create_topic(name=topic)
+        except AlreadyExists:
+            pass
+
+    def start(self) -> None:
+        """Subscribe to device commands and watch the handler writes"""
+        from devices.registry import USER_DEVICES_COLLECTION
+
+        # Round trips go through the tool, which only addresses devices in
+        # the user's index
+        self.db.collection(USER_DEVICES_COLLECTION).document(self.user_id).set(
+            {"device_ids": list(self.devices)})
+
+        for name in ("data-moisture", "system-status", "water-ack",
+                     "request-soil", "request-water"):
+            self._ensure_topic(self.topics[name])
+
+        for name, callback in (("request-soil", self._on_soil_request),
+                               ("request-water", self._on_water_request)):
+            subscription = self.subscriber.subscription_path(
+                PROJECT_ID, f"{name}-load-{self.run_id}")
+            self.subscriber.create_subscription(name=subscription,
+                                                topic=self.topics[name])
+            self._subscriptions.append(subscription)
+            self._streams.append(self.subscriber.subscribe(subscription, callback))
+
+        # Every handler write shows up as a listener change. Changes to one
+        # document in quick succession can be merged, so the counts are a
+        # lower bound.
+        self._watches = [
+            self.db.collection("sensor_data").on_snapshot(self._on_sensor_data),
+            self.db.collection_group("hourly").on_snapshot(self._on_hourly),
+            self.db.collection("sensor_requests").on_snapshot(self._on_sensor_request),
+            self.db.collection("system_status").on_snapshot(self._on_system_status),
+            self.db.collection("device_presence").on_snapshot(self._on_presence),
+        ]
+
+    def stop(self) -> None:
+        for stream in self._streams:
+            stream.cancel()
+        for watch in self._watches:
+            watch.unsubscribe()
+        for subscription in self._subscriptions:
+            self.subscriber.delete_subscription(subscription=subscription)
+
+    # ---------- Device side ----------
+
+    def _publish(self, topic: str, data: bytes, device_id: str) -> None:
+        future = self.publisher.publish(self.topics[topic], data, device_id=device_id)
+        future.add_done_callback(self._on_published)
+
+    def _on_published(self, future) -> None:
+        if future.exception() is not None:
+            with self._lock:
+                self.counts["publish_errors"] += 1
+
+    def publish_reading(self, device: EmulatedDevice) -> None:
+        payload = device.moisture()
+        if payload is None:
+            return
+        timestamp = json.loads(payload)["timestamp"]
+        with self._lock:
+            self._sent[(device.device_id, timestamp)] = time.monotonic()
+            self.counts["readings_published"] += 1
+        self._publish("data-moisture", payload, device.device_id)
+
+    def publish_status(self, device: EmulatedDevice) -> None:
+        with self._lock:
+            self.counts["status_published"] += 1
+        self._publish("system-status", device.status(), device.device_id)
+
+    def _device_for(self, message) -> Optional[EmulatedDevice]:
+        device = self.devices.get(message.attributes.get("device_id", ""))
+        if device is None:
+            message.ack()  # Another fleet's command
+        return device
+
+    def _on_soil_request(self, message) -> None:
+        device = self._device_for(message)
+        if device is None:
+            return
+        request = json.loads(message.data)
+        request_id = request.get("request_id", "")
+        payload = device.moisture(request_id, request.get("traceparent", ""))
+        if payload is not None:
+            with self._lock:
+                self._answered_requests.add(request_id)
+                self.counts["soil_requests_answered"] += 1
+            self._publish("data-moisture", payload, device.device_id)
+        message.ack()
+
+    def _on_water_request(self, message) -> None:
+        device = self._device_for(message)
+        if device is None:
+            return
+        self._publish("water-ack", device.water(json.loads(message.data)), device.device_id)
+        with self._lock:
+            self.counts["water_requests_answered"] += 1
+        message.ack()
+
+    # ---------- Backend side ----------
+
+    @staticmethod
+    def _written(changes) -> list:
+        return [change.document for change in changes
+                if change.type.name in ("ADDED", "MODIFIED")]
+
+    def _on_sensor_data(self, snapshots, changes, read_time) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for document in self._written(changes):
+                if document.id not in self.devices:
+                    continue
+                self.writes["sensor_data"] += 1
+                sent = self._sent.pop((document.id, document.get("timestamp")), None)
+                if sent is not None:
+                    self.counts["readings_stored"] += 1
+                    self.ingest_latencies.append(now - sent)
+
+    def _on_hourly(self, snapshots, changes, read_time) -> None:
+        with self._lock:
+            self.writes["hourly"] += sum(
+                1 for document in self._written(changes)
+                if (document.to_dict() or {}).get("device_id") in self.devices)
+
+    def _on_sensor_request(self, snapshots, changes, read_time) -> None:
+        with self._lock:
+            self.writes["sensor_requests"] += sum(
+                1 for document in self._written(changes)
+                if document.id in self._answered_requests)
+
+    def _on_system_status(self, snapshots, changes, read_time) -> None:
+        with self._lock:
+            self.writes["system_status"] += sum(
+                1 for document in self._written(changes)
+                if document.id in self.devices)
+
+    def _on_presence(self, snapshots, changes, read_time) -> None:
+        # Index shards hold every device, including those of other runs
+        with self._lock:
+            self.writes["device_presence"] += len(self._written(changes))
+
+    def round_trip(self, device_id: str) -> None:
+        """Time one get_moisture_data call through the real tool"""
+        from tools.iot_tools import get_moisture_data
+
+        start = time.monotonic()
+        result = get_moisture_data.invoke(
+            {"device": device_id}, {"configurable": {"user_id": self.user_id}})
+        elapsed = time.monotonic() - start
+        with self._lock:
+            if "Soil moisture" in result:
+                self.counts["round_trips"] += 1
+                self.round_trip_latencies.append(elapsed)
+            else:
+                self.counts["round_trip_timeouts"] += 1
+
+    # ---------- Run ----------
+
+    def run(self, seconds: float, round_trip_workers: int) -> dict:
+        """Generate load for `seconds`, then wait for stragglers"""
+        self.start()
+        stop = threading.Event()
+
+        def telemetry():
+            # Spread devices evenly over each interval
+            order = list(self.devices.values())
+            next_status = time.monotonic()
+            gap = self.interval / max(1, len(order))
+            while not stop.is_set():
+                cycle_start = time.monotonic()
+                send_status = cycle_start >= next_status
+                if send_status:
+                    next_status = cycle_start + self.status_interval
+                for i, device in enumerate(order):
+                    if stop.is_set():
+                        return
+                    delay = cycle_start + i * gap - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    self.publish_reading(device)
+                    if send_status:
+                        self.publish_status(device)
+                stop.wait(max(0.0, cycle_start + self.interval - time.monotonic()))
+
+        def round_trips():
+            rng = random.Random()
+            device_ids = list(self.devices)
+            while not stop.is_set():
+                self.round_trip(rng.choice(device_ids))
+
+        threads = [threading.Thread(target=telemetry, daemon=True)]
+        threads += [threading.Thread(target=round_trips, daemon=True)
+                    for _ in range(round_trip_workers)]
+
+        print(f"🌱 {len(self.devices)} devices, reading every {self.interval}s, "
+              f"status every {self.status_interval}s, for {seconds}s...")
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        stop.wait(seconds)
+        stop.set()
+        elapsed = time.monotonic() - start
+        for thread in threads:
+            thread.join(timeout=15)
+
+        # Let in-flight readings land before counting
+        deadline = time.monotonic() + 10
+        while self._sent and time.monotonic() < deadline:
+            time.sleep(0.1)
+        self.stop()
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+            writes = dict(self.writes)
+            readings = counts["readings_stored"] + counts["soil_requests_answered"]
+            reading_writes = sum(writes[c] for c in READING_COLLECTIONS)
+            status_writes = sum(writes[c] for c in STATUS_COLLECTIONS)
+            calls = counts["round_trips"] + counts["round_trip_timeouts"]
+            return {
+                "benchmark": "device_load",
+                "devices": len(self.devices),
+                "interval_seconds": self.interval,
+                "seconds": round(elapsed, 3),
+                "offered_readings_per_second": round(len(self.devices) / self.interval, 1),
+                "stored_readings_per_second": round(counts["readings_stored"] / elapsed, 1),
+                "readings_lost_or_late": len(self._sent),
+                "ingest_latency": latency_summary(self.ingest_latencies),
+                "get_moisture_data_latency": latency_summary(self.round_trip_latencies),
+                # Device wake-ups per tool call, below 1 when fresh readings
+                # and coalesced requests spare the device
+                "soil_requests_per_call": (round(counts["soil_requests_answered"] / calls, 3)
+                                           if calls else None),
+                "writes_per_reading": round(reading_writes / readings, 3) if readings else None,
+                "writes_per_status": (round(status_writes / counts["status_published"], 3)
+                                      if counts["status_published"] else None),
+                "firestore_writes": writes,
+                "counts": counts,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PlantPal device fleet load generator")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--interval", type=float, default=10.0,
+                        help="Seconds between moisture readings per device")
+    parser.add_argument("--status-interval", type=float, default=60.0,
+                        help="Seconds between status messages per device")
+    parser.add_argument("--seconds", type=float, default=60.0,
+                        help="How long to generate load")
+    parser.add_argument("--round-trip-workers", type=int, default=2,
+                        help="Concurrent get_moisture_data callers (0 to skip)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of UART commands the FPGAs answer with an error")
+    parser.add_argument("--freshness-seconds", type=int,
+                        help="Override PLANTPAL_MOISTURE_FRESHNESS_SECONDS "
+                             "(0 makes every call wake the device)")
+    parser.add_argument("--output", help="Write the result JSON to this file")
+    args = parser.parse_args()
+    if args.freshness_seconds is not None:
+        # Read by config.py, imported with the tool on the first round trip
+        os.environ["PLANTPAL_MOISTURE_FRESHNESS_SECONDS"] = str(args.freshness_seconds)
+
+    _require_emulators()
+    # The tool talks to the emulators through firebase_admin
+    import firebase_admin
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        firebase_admin.initialize_app(options={"projectId": PROJECT_ID})
+
+    generator = LoadGenerator(args.devices, args.interval, args.status_interval,
+                              args.error_rate)
+    result = generator.run(args.seconds, args.round_trip_workers)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+"""
+Offline Fakes
+In-memory stand-ins for the chat model, Firestore and Pub/Sub, so the
+handlers, tools and agent run with no network, plus a settable clock.
+Used by the offline benchmark suite and the unit tests.
+"""
+import base64
+import copy
+import itertools
+import json
+import os
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from cloudevents.http import CloudEvent
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1.field_path import split_field_path
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+# ============================================
+# Clock
+# ============================================
+
+class FakeClock:
+    """Monotonic-style clock for injected `clock=` arguments, set by the test"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+# ============================================
+# Chat model
+# ============================================
+
+class ScriptedChatModel(BaseChatModel):
+    """Replies with the next scripted message, streamed word by word"""
+
+    responses: List[AIMessage]
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next(self, messages):
+        turn = sum(isinstance(m, AIMessage) for m in messages)
+        # Fresh copy, a reused message ID would replace the earlier reply
+        return self.responses[turn % len(self.responses)].model_copy(
+            update={"id": None})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=self._next(messages))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._next(messages)
+        for index, tool_call in enumerate(message.tool_calls):
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[{"name": tool_call["name"], "args": "{}",
+                                   "id": tool_call["id"], "index": index}]
+            ))
+        words = message.content.split(" ") if message.content else []
+        for i, word in enumerate(words):
+            text = word if i == len(words) - 1 else word + " "
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+
+# ============================================
+# Firestore
+# ============================================
+
+class FakeSnapshot:
+    def __init__(self, reference: "FakeDocument", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data)
+
+    def get(self, field: str) -> Any:
+        return (self._data or {}).get(field)
+
+
+class _Watch:
+    def __init__(self, db: "InMemoryFirestore", path: str, callback: Callable):
+        self._db, self._path, self._callback = db, path, callback
+
+    def unsubscribe(self) -> None:
+        listeners = self._db._listeners.get(self._path, [])
+        if self._callback in listeners:
+            listeners.remove(self._callback)
+
+
+class FakeDocument:
+    def __init__(self, db: "InMemoryFirestore", path: str):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str) -> "FakeCollection":
+        return FakeCollection(self._db, f"{self.path}/{name}")
+
+    def get(self, transaction=None) -> FakeSnapshot:
+        self._db.reads += 1
+        return FakeSnapshot(self, self._db.docs.get(self.path))
+
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        self._db._write(self.path, data, merge)
+
+    def update(self, data: Dict[str, Any]) -> None:
+        if self.path not in self._db.docs:
+            raise KeyError(f"No document to update: {self.path}")
+        self._db._write(self.path, data, merge=True, field_paths=True)
+
+    def delete(self) -> None:
+        self._db._delete(self.path)
+
+    def on_snapshot(self, callback: Callable) -> _Watch:
+        """Listener called now and after every write, like a real watch"""
+        self._db._listeners.setdefault(self.path, []).append(callback)
+        callback([FakeSnapshot(self, self._db.docs.get(self.path))], [], None)
+        return _Watch(self._db, self.path, callback)
+
+
+class FakeQuery:
+    _OPS = {
+        "==": lambda a, b: a == b,
+        "!=": lambda a, b: a != b,
+        "<": lambda a, b: a is not None and a < b,
+        "<=": lambda a, b: a is not None and a <= b,
+        ">": lambda a, b: a is not None and a > b,
+        ">=": lambda a, b: a is not None and a >= b,
+        "in": lambda a, b: a in b,
+        "array_contains": lambda a, b: isinstance(a, list) and b in a,
+    }
+
+    def __init__(self, db: "InMemoryFirestore", path: str, group: bool = False,
+                 filters: Tuple = (), orders: Tuple = (), limit_to: Optional[int] = None,
+                 projection: Optional[Tuple[str, ...]] = None):
+        self._db = db
+        self._path = path
+        self._group = group
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit_to
+        self._projection = projection
+
+    def _copy(self, **changes) -> "FakeQuery":
+        fields = dict(filters=self._filters, orders=self._orders, limit_to=self._limit,
+                      projection=self._projection)
+        fields.update(changes)
+        return FakeQuery(self._db, self._path, self._group, **fields)
+
+    def where(self, field_path: str = None, op_string: str = None,
+              value: Any = None, filter: Any = None) -> "FakeQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = "ASCENDING") -> "FakeQuery":
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._copy(limit_to=count)
+
+    def select(self, field_paths) -> "FakeQuery":
+        return self._copy(projection=tuple(field_paths))
+
+    def _matches(self, path: str) -> bool:
+        parent = path.rsplit("/", 1)[0]
+        if self._group:
+            return parent.rsplit("/", 1)[-1] == self._path
+        return parent == self._path
+
+    def stream(self, transaction=None) -> Iterator[FakeSnapshot]:
+        matches = [
+            (path, data) for path, data in list(self._db.docs.items())
+            if self._matches(path) and all(
+                self._OPS[op](data.get(field), value)
+                for field, op, value in self._filters)
+        ]
+        for field, direction in reversed(self._orders):
+            matches.sort(key=lambda item: item[1].get(field),
+                         reverse=direction == "DESCENDING")
+        if self._limit is not None:
+            matches = matches[:self._limit]
+        for path, data in matches:
+            self._db.reads += 1
+            if self._projection is not None:
+                data = {field: data[field] for field in self._projection if field in data}
+            yield FakeSnapshot(FakeDocument(self._db, path), copy.deepcopy(data))
+
+    def get(self, transaction=None) -> List[FakeSnapshot]:
+        return list(self.stream())
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db: "InMemoryFirestore", path: str):
+        super().__init__(db, path)
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: Optional[str] = None) -> FakeDocument:
+        document_id = document_id or f"auto{next(self._db._ids):012d}"
+        return FakeDocument(self._db, f"{self._path}/{document_id}")
+
+
+class FakeBatch:
+    """WriteBatch: writes are applied together on commit"""
+
+    def __init__(self, db: "InMemoryFirestore"):
+        self._db = db
+        self._ops: List[Tuple[str, str, Any, bool]] = []
+
+    def set(self, reference: FakeDocument, data: Dict[str, Any], merge: bool = False) -> None:
+        self._ops.append(("set", reference.path, copy.deepcopy(data), merge))
+
+    def update(self, reference: FakeDocument, data: Dict[str, Any]) -> None:
+        self._ops.append(("update", reference.path, copy.deepcopy(data), True))
+
+    def delete(self, reference: FakeDocument) -> None:
+        self._ops.append(("delete", reference.path, None, False))
+
+    def __len__(self) -> int:
+        return len(self._ops)
+
+    def commit(self) -> list:
+        self._db.commits += 1
+        for op, path, data, merge in self._ops:
+            if op == "delete":
+                self._db._delete(path)
+            else:
+                self._db._write(path, data, merge, field_paths=op == "update")
+        results, self._ops = self._ops, []
+        return results
+
+
+class FakeTransaction(FakeBatch):
+    """
+    Transaction for `firestore.transactional`: writes are buffered like a
+    batch and transactions run one at a time, so reads inside one are
+    serializable
+    """
+
+    _read_only = False
+    _max_attempts = 1
+
+    def __init__(self, db: "InMemoryFirestore"):
+        super().__init__(db)
+        self._id = None
+
+    def _clean_up(self) -> None:
+        self._ops = []
+        self._id = None
+
+    def _begin(self, retry_id=None) -> None:
+        self._db._transaction_lock.acquire()
+        self._id = b"fake-transaction"
+
+    def _rollback(self) -> None:
+        if self._id is not None:
+            self._clean_up()
+            self._db._transaction_lock.release()
+
+    def _commit(self) -> list:
+        results = self.commit()
+        self._clean_up()
+        self._db._transaction_lock.release()
+        return results
+
+
+class InMemoryFirestore:
+    """
+    Firestore client for the calls PlantPal makes: documents, batches,
+    transactions, get_all, simple queries, snapshot listeners on documents
+    and the ArrayUnion / Increment / DELETE_FIELD transforms. Counts reads,
+    document writes and commits.
+    """
+
+    # Shared by every instance so a copied client still serializes
+    _transaction_lock = threading.RLock()
+
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+        self._listeners: Dict[str, List[Callable]] = {}
+        self._ids = itertools.count()
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+    def collection_group(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name, group=True)
+
+    def document(self, path: str) -> FakeDocument:
+        return FakeDocument(self, path)
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def transaction(self) -> FakeTransaction:
+        return FakeTransaction(self)
+
+    def recursive_delete(self, reference: FakeDocument) -> int:
+        paths = [path for path in list(self.docs)
+                 if path == reference.path or path.startswith(reference.path + "/")]
+        for path in paths:
+            self._delete(path)
+        return len(paths)
+
+    def get_all(self, references, transaction=None) -> Iterator[FakeSnapshot]:
+        for reference in references:
+            yield reference.get()
+
+    def _write(self, path: str, data: Dict[str, Any], merge: bool,
+               field_paths: bool = False) -> None:
+        """Apply a set (merge or not), or an update when keys are field paths"""
+        self.writes += 1
+        document = copy.deepcopy(self.docs.get(path, {})) if merge else {}
+        if isinstance(merge, list):
+            # Merge fields: each listed path is replaced, the rest is kept
+            for field in merge:
+                parts = [part.strip("`") for part in split_field_path(field)]
+                value = data
+                for part in parts:
+                    value = value[part]
+                target = document
+                for part in parts[:-1]:
+                    target = target.setdefault(part, {})
+                _apply(target, parts[-1], value, merge=False)
+            data = {}
+        for key, value in data.items():
+            parts = key.split(".") if field_paths else [key]
+            target = document
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            _apply(target, parts[-1], value, merge)
+        self.docs[path] = document
+        snapshot = FakeSnapshot(FakeDocument(self, path), document)
+        for callback in list(self._listeners.get(path, [])):
+            callback([snapshot], [], None)
+
+    def _delete(self, path: str) -> None:
+        self.writes += 1
+        self.docs.pop(path, None)
+
+
+def _apply(target: Dict[str, Any], key: str, value: Any, merge: bool) -> None:
+    """Set one field, resolving Firestore transforms against the old value"""
+    if isinstance(value, transforms.ArrayUnion):
+        current = list(target.get(key) or [])
+        current += [v for v in value.values if v not in current]
+        target[key] = current
+    elif isinstance(value, transforms.ArrayRemove):
+        target[key] = [v for v in target.get(key) or [] if v not in value.values]
+    elif isinstance(value, transforms.Increment):
+        target[key] = (target.get(key) or 0) + value.value
+    elif value is transforms.DELETE_FIELD:
+        target.pop(key, None)
+    elif isinstance(value, dict) and merge and isinstance(target.get(key), dict):
+        for sub_key, sub_value in value.items():
+            _apply(target[key], sub_key, sub_value, merge)
+    elif isinstance(value, dict):
+        target[key] = {}
+        for sub_key, sub_value in value.items():
+            _apply(target[key], sub_key, sub_value, merge)
+    else:
+        target[key] = copy.deepcopy(value)
+
+
+# ============================================
+# Pub/Sub
+# ============================================
+
+class InMemoryPublisher:
+    """
+    PublisherClient that records messages and hands each one to the
+    responder registered for its topic, standing in for the device (or the
+    function) on the other side. Publishes complete immediately.
+    """
+
+    def __init__(self):
+        self.messages: List[Tuple[str, bytes, Dict[str, str]]] = []
+        self.responders: Dict[str, Callable[[bytes, Dict[str, str]], None]] = {}
+        self._ids = itertools.count(1)
+
+    def publish(self, topic: str, data: bytes, **attributes: str) -> Future:
+        self.messages.append((topic, data, attributes))
+        future: Future = Future()
+        responder = self.responders.get(topic)
+        try:
+            if responder is not None:
+                responder(data, attributes)
+            future.set_result(str(next(self._ids)))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+@contextmanager
+def offline_backend(db: InMemoryFirestore, publisher: InMemoryPublisher):
+    """
+    Route firebase_admin's Firestore client and the IoT tools' publisher to
+    the fakes, and keep LangSmith tracing off
+    """
+    from unittest.mock import patch
+
+    from firebase_admin import firestore
+
+    import tools.iot_tools as iot_tools
+
+    tracing = os.environ.get("LANGSMITH_TRACING")
+    os.environ["LANGSMITH_TRACING"] = "false"
+    try:
+        with patch.object(firestore, "client", return_value=db), \
+                patch.object(iot_tools, "_publisher", publisher):
+            yield
+    finally:
+        if tracing is None:
+            os.environ.pop("LANGSMITH_TRACING", None)
+        else:
+            os.environ["LANGSMITH_TRACING"] = tracing
+
+
+_event_ids = itertools.count(1)
+
+
+def pubsub_event(payload: Dict[str, Any], attributes: Optional[Dict[str, str]] = None,
+                 topic: str = "data-moisture") -> CloudEvent:
+    """
+    Raw CloudEvent as Cloud Functions delivers a Pub/Sub message, for
+    calling the @on_message_published handlers in main.py directly,
+    published now
+    """
+    message_id = str(next(_event_ids))
+    published = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    return CloudEvent({
+        "id": message_id,
+        "source": f"//pubsub.googleapis.com/projects/demo/topics/{topic}",
+        "specversion": "1.0",
+        "type": "google.cloud.pubsub.topic.v1.messagePublished",
+        "time": published,
+    }, {
+        "message": {
+            "data": base64.b64encode(json.dumps(payload).encode("utf-8")).decode("ascii"),
+            "attributes": attributes or {},
+            "message_id": message_id,
+            "publish_time": published,
+        },
+        "subscription": f"projects/demo/subscriptions/{topic}",
+    })
@@ -0,0 +1,114 @@
+"""
+Ingestion Throughput Benchmark
+Publishes synthetic moisture telemetry to the local Pub/Sub emulator and
+measures how fast the streaming-pull bulk worker drains it into the
+Firestore emulator
+
+Run (from firebase/, with `firebase emulators:start` running):
+    export PUBSUB_EMULATOR_HOST=localhost:8085
+    export FIRESTORE_EMULATOR_HOST=localhost:8080
+    cd functions && python -m benchmarks.ingest_throughput --messages 20000
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+from google.cloud import firestore as gcloud_firestore
+from google.cloud import pubsub_v1
+
+from telemetry.ingest_worker import IngestWorker
+
+PROJECT_ID = "demo-plantpal"
+
+
+def _require_emulators() -> None:
+    missing = [var for var in ("PUBSUB_EMULATOR_HOST", "FIRESTORE_EMULATOR_HOST")
+               if not os.getenv(var)]
+    if missing:
+        print(f"❌ Set {', '.join(missing)} to point at the local emulators")
+        sys.exit(1)
+
+
+def run_benchmark(messages: int, batch_size: int,
+                  max_latency: float, timeout: float) -> dict:
+    """Publish `messages` readings and time the worker until all are acked"""
+    publisher = pubsub_v1.PublisherClient(
+        batch_settings=pubsub_v1.types.BatchSettings(max_messages=1000)
+    )
+    subscriber = pubsub_v1.SubscriberClient()
+    suffix = uuid.uuid4().hex[:8]
+    topic = publisher.topic_path(PROJECT_ID, f"data-moisture-bench-{suffix}")
+    subscription = subscriber.subscription_path(
+        PROJECT_ID, f"data-moisture-bench-{suffix}")
+    publisher.create_topic(name=topic)
+    subscriber.create_subscription(name=subscription, topic=topic)
+
+    print(f"📤 Publishing {messages} messages...")
+    futures = [
+        publisher.publish(topic, json.dumps({
+            "percentage": float(i % 100),
+            "timestamp": i,
+            "request_id": "",
+        }).encode("utf-8"))
+        for i in range(messages)
+    ]
+    for future in futures:
+        future.result()
+
+    db = gcloud_firestore.Client(project=PROJECT_ID)
+    worker = IngestWorker(db=db, subscriber=subscriber, batch_size=batch_size,
+                          max_latency_seconds=max_latency)
+    runner = threading.Thread(target=worker.run, daemon=True)
+
+    print(f"📥 Draining with batch_size={batch_size}...")
+    start = time.perf_counter()
+    worker.start({"data-moisture": subscription})
+    runner.start()
+    deadline = start + timeout
+    while worker.stats['acked'] < messages and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    worker.stop()
+    runner.join(timeout=max_latency * 2)
+
+    subscriber.delete_subscription(subscription=subscription)
+    publisher.delete_topic(topic=topic)
+
+    acked = worker.stats['acked']
+    return {
+        "benchmark": "ingest_throughput",
+        "messages": messages,
+        "batch_size": batch_size,
+        "seconds": round(elapsed, 3),
+        "messages_per_second": round(acked / elapsed, 1) if elapsed else None,
+        "firestore_writes": worker.stats['writes'],
+        "writes_per_message": (round(worker.stats['writes'] / acked, 4)
+                               if acked else None),
+        "stats": worker.stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk ingestion throughput")
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-latency", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="Write the result JSON to this file")
+    args = parser.parse_args()
+
+    _require_emulators()
+    result = run_benchmark(args.messages, args.batch_size,
+                           args.max_latency, args.timeout)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Offline Micro-benchmarks
+Times agent construction, thread switching, a chat turn with tool calls,
+history reconstruction and the Pub/Sub handlers with no network: the chat
+model is scripted and Firestore / Pub/Sub are in-memory fakes
+(benchmarks/fakes.py). Results are written as JSON so runs can be compared
+across commits.
+
+Run (from firebase/functions):
+    python -m benchmarks.offline --output before.json
+    python -m benchmarks.offline --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+from unittest.mock import patch
+
+from langchain_core.messages import AIMessage
+
+from benchmarks.fakes import (
+    InMemoryFirestore,
+    InMemoryPublisher,
+    ScriptedChatModel,
+    offline_backend,
+    pubsub_event,
+)
+
+HISTORY_TURNS = [10, 100, 1000]
+
+# One turn: check the sensor and the device, then answer
+CHAT_SCRIPT = [
+    AIMessage(content="", tool_calls=[
+        {"name": "get_moisture_data", "args": {"device": "esp32"}, "id": "call_moisture"},
+        {"name": "get_system_status", "args": {"device": "esp32"}, "id": "call_status"},
+    ]),
+    AIMessage(content="Your basil is at 42% moisture and the sensor is online, "
+                      "so it does not need water yet."),
+]
+
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int = 1,
+            setup: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """Run fn `repeat` times after `warmup` runs, handler output silenced"""
+    timings: List[float] = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(warmup + repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            if i >= warmup:
+                timings.append(elapsed)
+    timings.sort()
+    return {
+        "runs": repeat,
+        "median_ms": round(statistics.median(timings) * 1000, 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))] * 1000, 4),
+        "min_ms": round(timings[0] * 1000, 4),
+    }
+
+
+def _synthetic_runs(turns: int) -> List[SimpleNamespace]:
+    """LangSmith LLM runs of a thread, one human message and reply per run"""
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    runs = []
+    for i in range(turns):
+        human = f"Turn {i}: how often should I water my monstera in winter?"
+        reply = (f"Reply {i}: water it when the top 5 cm of soil are dry, "
+                 "usually every 10 to 14 days in winter.")
+        runs.append(SimpleNamespace(
+            start_time=start + timedelta(seconds=i),
+            inputs={"messages": [[
+                {"kwargs": {"type": "system", "content": "You are PlantPal"}},
+                {"kwargs": {"type": "human", "content": human}},
+            ]]},
+            outputs={"generations": [[{"message": {"kwargs": {"content": reply}}}]]},
+        ))
+    runs.reverse()  # LangSmith returns newest first
+    return runs
+
+
+def _answer_soil_requests(publisher: InMemoryPublisher) -> None:
+    """Device side of request-soil: reply through handle_moisture_data"""
+    import main
+    from config import TOPICS
+
+    def reply(data: bytes, attributes: Dict[str, str]) -> None:
+        request = json.loads(data)
+        main.handle_moisture_data(pubsub_event({
+            "percentage": 42.0,
+            "timestamp": request["timestamp"],
+            "request_id": request["request_id"],
+            "device_id": request["device_id"],
+            "traceparent": request.get("traceparent", ""),
+        }, attributes))
+
+    publisher.responders[TOPICS["request-soil"]] = reply
+
+
+def run_benchmark(repeat: int) -> Dict[str, Any]:
+    # Model clients validate their API keys on construction only
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+    os.environ.setdefault("TAVILY_API_KEY", "offline")
+
+    import agent as agent_module
+    import devices.registry as registry
+    import main
+    from agent import PlantPalAgent, create_checkpointer, get_agent, get_thread_history
+    from utils.response_cache import HashingEmbedder
+
+    db = InMemoryFirestore()
+    publisher = InMemoryPublisher()
+    _answer_soil_requests(publisher)
+    results: Dict[str, Any] = {}
+
+    # The scripted turn addresses the default device without a registry
+    with offline_backend(db, publisher), \
+            patch.object(registry, "LEGACY_SINGLE_DEVICE", True), \
+            patch.object(agent_module, "init_chat_model",
+                         lambda **kwargs: ScriptedChatModel(responses=CHAT_SCRIPT)), \
+            patch.object(agent_module, "create_checkpointer",
+                         lambda: create_checkpointer("memory")), \
+            patch.object(agent_module, "create_embedder",
+                         lambda name: HashingEmbedder()):
+        print("🏗️ Agent construction...")
+        results["agent_init_cold"] = measure(
+            lambda: PlantPalAgent(thread_id="bench"), repeat,
+            setup=agent_module.reset_agent)
+        results["agent_init_warm"] = measure(
+            lambda: PlantPalAgent(thread_id="bench"), repeat)
+
+        threads = iter(range(10 ** 9))
+        results["get_agent_switch_thread"] = measure(
+            lambda: get_agent(thread_id=f"thread-{next(threads)}"), repeat)
+
+        print("💬 Chat turn with tool calls...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.handle_system_status(pubsub_event(
+                {"status": "online", "device_id": "esp32"}, topic="system-status"))
+        results["chat_turn_with_tools"] = measure(
+            lambda: get_agent(thread_id=f"chat-{next(threads)}").chat(
+                "How is my basil doing?"), repeat)
+
+        print("📜 Thread history...")
+        for turns in HISTORY_TURNS:
+            client = SimpleNamespace(list_runs=lambda runs=_synthetic_runs(turns), **_: runs)
+            with patch.object(agent_module, "get_langsmith_client", lambda c=client: c):
+                results[f"get_thread_history_{turns}"] = measure(
+                    lambda: get_thread_history("bench", "plantpal"), repeat)
+
+        print("📨 Pub/Sub handlers...")
+        # The functions framework parses events in place, so one per call
+        runs = repeat * 10
+        moisture = iter([pubsub_event({"percentage": 37.5, "timestamp": 1234,
+                                       "request_id": "", "device_id": "esp32"})
+                         for _ in range(runs + 1)])
+        status = iter([pubsub_event({"status": "online", "device_id": "esp32",
+                                     "timestamp": 1234}, topic="system-status")
+                       for _ in range(runs + 1)])
+        results["handle_moisture_data"] = measure(
+            lambda: main.handle_moisture_data(next(moisture)), runs)
+        results["handle_system_status"] = measure(
+            lambda: main.handle_system_status(next(status)), runs)
+
+        agent_module.reset_agent()
+
+    return {
+        "benchmark": "offline",
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, float]:
+    """Median time of each case relative to a baseline run (< 1 is faster)"""
+    return {
+        name: round(case["median_ms"] / baseline["results"][name]["median_ms"], 3)
+        for name, case in result["results"].items()
+        if name in baseline.get("results", {})
+        and baseline["results"][name]["median_ms"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline micro-benchmarks")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="Timed runs per case (handlers run 10x as many)")
+    parser.add_argument("--output", help="Write the result JSON to this file")
+    parser.add_argument("--compare", help="Baseline result JSON to compare against")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.repeat)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        result["relative_to"] = {"commit": baseline.get("commit"),
+                                 "median_ratio": compare(result, baseline)}
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
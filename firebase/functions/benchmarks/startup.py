@@ -0,0 +1,99 @@
+"""
+Startup Benchmark
+Measures import time and peak RSS of each function entry point in a fresh
+interpreter, and flags agent-stack modules leaking into the telemetry path
+
+Run (from firebase/functions):
+    python -m benchmarks.startup --runs 5 --output startup.json
+    python -m benchmarks.startup --check   # exit 1 on a regression
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+# What a cold instance imports before serving each entry point. plantpal_chat
+# imports the agent on its first call, so that cost is part of its start.
+ENTRY_POINTS: Dict[str, List[str]] = {
+    "handle_moisture_data": ["main"],
+    "handle_system_status": ["main"],
+    "handle_water_ack": ["main"],
+    "plantpal_chat": ["main", "agent"],
+}
+
+# Modules that must never be loaded by the telemetry handlers
+AGENT_STACK = ("langchain", "langchain_core", "langchain_tavily", "langgraph",
+               "langsmith", "openai", "tiktoken", "google.cloud.pubsub_v1")
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "import_seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules_loaded": len(sys.modules),
+    "agent_stack_loaded": sorted(
+        name for name in {agent_stack!r} if name in sys.modules),
+}}))
+"""
+
+
+def measure(modules: List[str]) -> dict:
+    """Import modules in a fresh interpreter and report the probe result"""
+    functions_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c",
+         _PROBE.format(modules=modules, agent_stack=AGENT_STACK)],
+        cwd=functions_dir, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(runs: int) -> dict:
+    """Median import time and RSS over `runs` cold starts per entry point"""
+    results = {}
+    for entry_point, modules in ENTRY_POINTS.items():
+        samples = [measure(modules) for _ in range(runs)]
+        results[entry_point] = {
+            "import_seconds": round(statistics.median(
+                s["import_seconds"] for s in samples), 4),
+            "max_rss_mb": round(statistics.median(
+                s["max_rss_mb"] for s in samples), 1),
+            "modules_loaded": samples[-1]["modules_loaded"],
+            "agent_stack_loaded": samples[-1]["agent_stack_loaded"],
+        }
+    return {"benchmark": "startup", "runs": runs, "entry_points": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entry point startup cost")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="Write the result JSON to this file")
+    parser.add_argument("--check", action="store_true",
+                        help="Fail if a telemetry handler loads the agent stack")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.runs)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.check:
+        leaks = {name: entry["agent_stack_loaded"]
+                 for name, entry in result["entry_points"].items()
+                 if name.startswith("handle_") and entry["agent_stack_loaded"]}
+        if leaks:
+            print(f"❌ Agent stack loaded by telemetry handlers: {leaks}")
+            sys.exit(1)
+        print("✅ Telemetry handlers start without the agent stack")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+UART Throughput Benchmark
+Measures the Python UART protocol: raw decoder speed on a noisy stream, and
+request/response frames per second against the FPGA simulator at several
+baud rates (115200 is the hardware link)
+
+Run (from firebase/functions):
+    python -m benchmarks.uart_throughput --frames 200000 --seconds 2
+"""
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from typing import List, Optional
+
+from uart import protocol
+from uart.client import UartClient
+from uart.protocol import FrameDecoder
+from uart.simulator import FpgaSimulator
+
+BAUD_RATES = [115200, 460800, 921600, 3000000, None]
+
+# Moisture request + response, the most common exchange
+_ROUND_TRIP_BYTES = len(protocol.read_moisture()) + len(protocol.moisture_data(0))
+
+
+def _noisy_stream(frames: int, noise_every: int, seed: int = 7) -> bytes:
+    """Mixed command/response frames with a garbage byte every `noise_every`"""
+    rng = random.Random(seed)
+    makers = [
+        protocol.read_moisture, protocol.status_request, protocol.water_ack,
+        protocol.status_ok, lambda: protocol.water_on(rng.randint(1, 30)),
+        lambda: protocol.moisture_data(rng.randint(0, 100)),
+    ]
+    stream = bytearray()
+    for i in range(frames):
+        stream += rng.choice(makers)()
+        if noise_every and i % noise_every == 0:
+            stream.append(0xAA)  # Not a valid code, forces a resync
+    return bytes(stream)
+
+
+def bench_decoder(frames: int, chunk_size: int, noise_every: int) -> dict:
+    """Decode a prebuilt stream in chunks, as it would arrive from a UART"""
+    stream = memoryview(_noisy_stream(frames, noise_every))
+    decoder = FrameDecoder()
+    start = time.perf_counter()
+    decoded = 0
+    for offset in range(0, len(stream), chunk_size):
+        for _ in decoder.feed(stream[offset:offset + chunk_size]):
+            decoded += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "frames": decoded,
+        "bytes": len(stream),
+        "bytes_discarded": decoder.bytes_discarded,
+        "seconds": round(elapsed, 4),
+        "frames_per_second": round(decoded / elapsed),
+        "megabytes_per_second": round(len(stream) / elapsed / 1e6, 2),
+    }
+
+
+def bench_link(baud: Optional[int], seconds: float) -> dict:
+    """Moisture request/response round trips per second over a socket pair"""
+    simulator = FpgaSimulator(seed=1)
+    ours, theirs = socket.socketpair()
+    threading.Thread(target=simulator.serve_connection, args=(theirs, baud),
+                     daemon=True).start()
+    client = UartClient(ours, baud=baud)
+
+    round_trips = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        client.read_moisture()
+        round_trips += 1
+    elapsed = time.perf_counter() - start
+    client.close()
+
+    result = {
+        "baud": baud or "unpaced",
+        "round_trips_per_second": round(round_trips / elapsed),
+        # Both frames of a round trip count
+        "frames_per_second": round(2 * round_trips / elapsed),
+    }
+    if baud:
+        line_limit = baud / 10 / _ROUND_TRIP_BYTES
+        result["line_limit_round_trips_per_second"] = round(line_limit)
+        result["line_utilization"] = round(round_trips / elapsed / line_limit, 3)
+    return result
+
+
+def run_benchmark(frames: int, chunk_size: int, noise_every: int,
+                  seconds: float, baud_rates: List[Optional[int]]) -> dict:
+    print(f"🔁 Decoding {frames} frames...")
+    decoder = bench_decoder(frames, chunk_size, noise_every)
+    links = []
+    for baud in baud_rates:
+        print(f"🔌 Simulator round trips at {baud or 'unpaced'} baud...")
+        links.append(bench_link(baud, seconds))
+    return {"benchmark": "uart_throughput", "decoder": decoder, "link": links}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UART protocol throughput")
+    parser.add_argument("--frames", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=256,
+                        help="Bytes per read, as delivered by the serial driver")
+    parser.add_argument("--noise-every", type=int, default=100,
+                        help="Insert a garbage byte every N frames (0 for none)")
+    parser.add_argument("--seconds", type=float, default=2.0,
+                        help="Duration of each link measurement")
+    parser.add_argument("--output", help="Write the result JSON to this file")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.frames, args.chunk_size, args.noise_every,
+                           args.seconds, BAUD_RATES)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
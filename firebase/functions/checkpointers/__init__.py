@@ -0,0 +1 @@
+"""Checkpointers package for PlantPal AI Agent"""
@@ -0,0 +1,171 @@
+"""
+Durable Checkpointer Base
+Shared serialization and async plumbing for checkpointers that persist
+LangGraph state outside the function instance (Firestore, SQLite)
+"""
+import asyncio
+import random
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+
+# (serde type, serialized bytes) as produced by SerializerProtocol.dumps_typed
+TypedBlob = Tuple[str, bytes]
+
+
+class DurableSaver(BaseCheckpointSaver[str]):
+    """
+    Base class for durable checkpointers.
+
+    Checkpoints are stored without their channel values. Channel values are
+    stored once per (channel, version), so each `put` only persists the
+    channels that changed in that step rather than the whole thread state.
+    """
+
+    def _dump_checkpoint(
+        self,
+        checkpoint: Checkpoint,
+        new_versions: ChannelVersions,
+    ) -> Tuple[TypedBlob, Dict[str, Tuple[str, TypedBlob]]]:
+        """Split a checkpoint into its body and the changed channel blobs
+
+        Returns:
+            Serialized checkpoint without values, and a mapping of
+            channel -> (version, serialized value) for new versions only
+        """
+        body = checkpoint.copy()
+        values: Dict[str, Any] = body.pop("channel_values")  # type: ignore[misc]
+        blobs: Dict[str, Tuple[str, TypedBlob]] = {}
+        for channel, version in new_versions.items():
+            blob = (self.serde.dumps_typed(values[channel])
+                    if channel in values else ("empty", b""))
+            blobs[channel] = (str(version), blob)
+        return self.serde.dumps_typed(body), blobs
+
+    def _write_idx(self, channel: str, idx: int) -> int:
+        """Index under which a pending write is stored"""
+        return WRITES_IDX_MAP.get(channel, idx)
+
+    def _build_tuple(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        parent_checkpoint_id: Optional[str],
+        checkpoint: TypedBlob,
+        metadata: TypedBlob,
+        channel_blobs: Dict[str, TypedBlob],
+        writes: Iterable[Tuple[str, str, TypedBlob]],
+    ) -> CheckpointTuple:
+        """Assemble a CheckpointTuple from stored parts
+
+        Args:
+            channel_blobs: channel -> serialized value at the checkpoint's
+                           version ("empty" blobs are skipped)
+            writes: (task_id, channel, serialized value) pending writes
+        """
+        checkpoint_: Checkpoint = self.serde.loads_typed(checkpoint)
+        channel_values = {
+            channel: self.serde.loads_typed(blob)
+            for channel, blob in channel_blobs.items()
+            if blob[0] != "empty"
+        }
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={**checkpoint_, "channel_values": channel_values},
+            metadata=self.serde.loads_typed(metadata),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed(value))
+                for task_id, channel, value in writes
+            ],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    @staticmethod
+    def _matches_filter(
+        metadata: CheckpointMetadata,
+        filter: Optional[Dict[str, Any]],
+    ) -> bool:
+        """True if every filter key matches the checkpoint metadata"""
+        if not filter:
+            return True
+        return all(metadata.get(k) == v for k, v in filter.items())
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        """Zero-padded versions so they sort lexicographically in storage"""
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # Async variants run the blocking client calls off the event loop
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items: List[CheckpointTuple] = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter,
+                                   before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(
+            self.put_writes, config, writes, task_id, task_path
+        )
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
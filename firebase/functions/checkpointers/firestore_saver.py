@@ -0,0 +1,350 @@
+"""
+Firestore Checkpointer
+Durable LangGraph checkpointer so a cold function instance can resume any
+conversation thread from Firestore
+
+Layout (per thread, under `{collection}/{thread_id}`):
+    heads/{ns}          Latest checkpoint with every channel version, the
+                        values under HEAD_INLINE_MAX_BYTES and its pending
+                        writes. Resuming a short thread is a single document
+                        read; larger values (a long message list) are read
+                        from their blobs in one batched get.
+    checkpoints/{ns|id} Checkpoint history (body, metadata, pending writes)
+    blobs/{ns|ch|ver}   One document per channel version, written only when
+                        the channel changes
+"""
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from checkpointers.durable_saver import DurableSaver, TypedBlob
+from utils.tracing import firestore_span
+
+# Largest serialized channel value copied into the head document. Larger ones
+# are only stored as blobs, so the head stays far below Firestore's 1 MiB
+# document limit and a turn does not rewrite the whole conversation twice.
+HEAD_INLINE_MAX_BYTES = 16 * 1024
+
+
+def _ns_key(checkpoint_ns: str) -> str:
+    """Document ID prefix for a namespace (root namespace is empty)"""
+    return f"ns:{checkpoint_ns}"
+
+
+def _checkpoint_doc_id(checkpoint_ns: str, checkpoint_id: str) -> str:
+    return f"{_ns_key(checkpoint_ns)}|{checkpoint_id}"
+
+
+def _blob_doc_id(checkpoint_ns: str, channel: str, version: str) -> str:
+    return f"{_ns_key(checkpoint_ns)}|{channel}|{version}"
+
+
+class FirestoreSaver(DurableSaver):
+    """
+    Durable checkpointer backed by Cloud Firestore.
+
+    Each `put` commits one batch containing the checkpoint history document,
+    a blob document per changed channel and a merge into the head document
+    that only touches the changed channel fields. The head holds a changed
+    channel's value only when it is small, otherwise just its version.
+    """
+
+    def __init__(
+            self,
+            collection: str = "agent_threads",
+            client: Any = None,
+            serde: Any = None,
+            head_inline_max_bytes: int = HEAD_INLINE_MAX_BYTES,
+            ):
+        """Initialize the checkpointer
+
+        Args:
+            collection: Top-level collection holding one document per thread
+            client: Firestore client, defaults to the firebase_admin client
+            serde: Optional LangGraph serializer
+            head_inline_max_bytes: Largest channel value kept in the head
+        """
+        super().__init__(serde=serde)
+        self.collection = collection
+        self._client = client
+        self.head_inline_max_bytes = head_inline_max_bytes
+
+    @property
+    def db(self) -> Any:
+        """Firestore client, created on first use"""
+        if self._client is None:
+            self._client = firestore.client()
+        return self._client
+
+    def _thread_ref(self, thread_id: str) -> Any:
+        return self.db.collection(self.collection).document(thread_id)
+
+    def _head_ref(self, thread_id: str, checkpoint_ns: str) -> Any:
+        return (self._thread_ref(thread_id)
+                .collection("heads").document(_ns_key(checkpoint_ns)))
+
+    def _checkpoint_ref(
+            self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> Any:
+        return (self._thread_ref(thread_id).collection("checkpoints")
+                .document(_checkpoint_doc_id(checkpoint_ns, checkpoint_id)))
+
+    def _blob_ref(
+            self, thread_id: str, checkpoint_ns: str,
+            channel: str, version: str) -> Any:
+        return (self._thread_ref(thread_id).collection("blobs")
+                .document(_blob_doc_id(checkpoint_ns, channel, version)))
+
+    @staticmethod
+    def _writes_from(entries: Dict[str, Dict[str, Any]],
+                     checkpoint_id: str) -> List[Tuple[str, str, TypedBlob]]:
+        """Pending writes stored in a document that belong to a checkpoint"""
+        writes = [
+            entry for entry in (entries or {}).values()
+            if entry.get("checkpoint_id") == checkpoint_id
+        ]
+        writes.sort(key=lambda entry: (entry["task_id"], entry["idx"]))
+        return [(entry["task_id"], entry["channel"],
+                 (entry["type"], entry["value"])) for entry in writes]
+
+    def _get_blobs(self, thread_id: str, checkpoint_ns: str,
+                   versions: Dict[str, Any]) -> Dict[str, TypedBlob]:
+        """Read the blobs of channel versions with one batched get"""
+        refs = {
+            channel: self._blob_ref(thread_id, checkpoint_ns, channel, str(version))
+            for channel, version in versions.items()
+        }
+        channel_by_path = {ref.path: channel for channel, ref in refs.items()}
+        channel_blobs: Dict[str, TypedBlob] = {}
+        if refs:
+            with firestore_span("get_all", "blobs", documents=len(refs)):
+                for snapshot in self.db.get_all(list(refs.values())):
+                    if snapshot.exists:
+                        blob = snapshot.to_dict()
+                        channel = channel_by_path[snapshot.reference.path]
+                        channel_blobs[channel] = (blob["type"], blob["value"])
+        return channel_blobs
+
+    def _load_history(self, thread_id: str, data: Dict[str, Any]) -> CheckpointTuple:
+        """Build a tuple from a history document with one batched blob read"""
+        checkpoint_ns = data["checkpoint_ns"]
+        checkpoint_blob: TypedBlob = (data["checkpoint_type"], data["checkpoint"])
+        versions = self.serde.loads_typed(checkpoint_blob)["channel_versions"]
+        channel_blobs = self._get_blobs(thread_id, checkpoint_ns, versions)
+
+        return self._build_tuple(
+            thread_id, checkpoint_ns, data["checkpoint_id"],
+            data.get("parent_checkpoint_id"), checkpoint_blob,
+            (data["metadata_type"], data["metadata"]), channel_blobs,
+            self._writes_from(data.get("writes"), data["checkpoint_id"]),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+
+        if checkpoint_id := get_checkpoint_id(config):
+            with firestore_span("get", "checkpoints"):
+                snapshot = self._checkpoint_ref(
+                    thread_id, checkpoint_ns, checkpoint_id).get()
+            if not snapshot.exists:
+                return None
+            return self._load_history(thread_id, snapshot.to_dict())
+
+        # Latest checkpoint: one read of the head document, plus one batched
+        # read for the values too large to be kept in it
+        with firestore_span("get", "heads"):
+            snapshot = self._head_ref(thread_id, checkpoint_ns).get()
+        if not snapshot.exists:
+            return None
+        head = snapshot.to_dict()
+        checkpoint_blob: TypedBlob = (head["checkpoint_type"], head["checkpoint"])
+        versions = self.serde.loads_typed(checkpoint_blob)["channel_versions"]
+
+        channels = head.get("channels", {})
+        channel_blobs: Dict[str, TypedBlob] = {}
+        not_inline: Dict[str, Any] = {}
+        for channel, version in versions.items():
+            stored = channels.get(channel)
+            if stored and stored["version"] == str(version):
+                if "value" in stored:
+                    channel_blobs[channel] = (stored["type"], stored["value"])
+                else:
+                    not_inline[channel] = version
+            else:
+                # Head is out of step with the checkpoint, fall back to history
+                return self._load_history(thread_id, {
+                    **head, "checkpoint_ns": checkpoint_ns,
+                    "writes": head.get("pending_writes"),
+                })
+        channel_blobs.update(self._get_blobs(thread_id, checkpoint_ns, not_inline))
+
+        return self._build_tuple(
+            thread_id, checkpoint_ns, head["checkpoint_id"],
+            head.get("parent_checkpoint_id"), checkpoint_blob,
+            (head["metadata_type"], head["metadata"]), channel_blobs,
+            self._writes_from(head.get("pending_writes"), head["checkpoint_id"]),
+        )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config:
+            thread_id = config["configurable"]["thread_id"]
+            query = self._thread_ref(thread_id).collection("checkpoints")
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                query = query.where(filter=firestore.FieldFilter(
+                    "checkpoint_ns", "==", checkpoint_ns))
+            if checkpoint_id := get_checkpoint_id(config):
+                query = query.where(filter=firestore.FieldFilter(
+                    "checkpoint_id", "==", checkpoint_id))
+        else:
+            query = self.db.collection_group("checkpoints")
+        if before and (before_id := get_checkpoint_id(before)):
+            query = query.where(filter=firestore.FieldFilter(
+                "checkpoint_id", "<", before_id))
+        query = query.order_by("checkpoint_id",
+                               direction=firestore.Query.DESCENDING)
+        if limit is not None and not filter:
+            query = query.limit(limit)
+
+        count = 0
+        for snapshot in query.stream():
+            data = snapshot.to_dict()
+            metadata = self.serde.loads_typed(
+                (data["metadata_type"], data["metadata"]))
+            if not self._matches_filter(metadata, filter):
+                continue
+            yield self._load_history(data["thread_id"], data)
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        checkpoint_blob, blobs = self._dump_checkpoint(checkpoint, new_versions)
+        metadata_blob = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+        record = {
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+            "checkpoint_type": checkpoint_blob[0],
+            "checkpoint": checkpoint_blob[1],
+            "metadata_type": metadata_blob[0],
+            "metadata": metadata_blob[1],
+        }
+
+        batch = self.db.batch()
+        batch.set(
+            self._checkpoint_ref(thread_id, checkpoint_ns, checkpoint["id"]),
+            {**record, "thread_id": thread_id, "checkpoint_ns": checkpoint_ns},
+            merge=True,
+        )
+        for channel, (version, blob) in blobs.items():
+            batch.set(
+                self._blob_ref(thread_id, checkpoint_ns, channel, version),
+                {"type": blob[0], "value": blob[1]},
+            )
+
+        # Only the changed channels are sent; the rest of the head is kept.
+        # Large values are left out and read from their blob.
+        head = {
+            **record,
+            "pending_writes": {},
+            "channels": {
+                channel: ({"version": version, "type": blob[0], "value": blob[1]}
+                          if len(blob[1]) <= self.head_inline_max_bytes
+                          else {"version": version})
+                for channel, (version, blob) in blobs.items()
+            },
+        }
+        merge_fields = [*record.keys(), "pending_writes"] + [
+            FieldPath("channels", channel).to_api_repr() for channel in blobs
+        ]
+        batch.set(self._head_ref(thread_id, checkpoint_ns), head,
+                  merge=merge_fields)
+        with firestore_span("commit", "checkpoints", writes=len(blobs) + 2):
+            batch.commit()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        entries: Dict[str, Dict[str, Any]] = {}
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = self._write_idx(channel, idx)
+            type_, blob = self.serde.dumps_typed(value)
+            entries[f"{task_id}|{write_idx}"] = {
+                "checkpoint_id": checkpoint_id,
+                "task_id": task_id,
+                "idx": write_idx,
+                "channel": channel,
+                "type": type_,
+                "value": blob,
+                "task_path": task_path,
+            }
+        if not entries:
+            return
+
+        checkpoint_ref = self._checkpoint_ref(thread_id, checkpoint_ns, checkpoint_id)
+        head_ref = self._head_ref(thread_id, checkpoint_ns)
+
+        @firestore.transactional
+        def _put(transaction: Any) -> None:
+            # A retried task keeps its first regular writes, as in the SQLite
+            # saver; special channels (errors, interrupts) are overwritten
+            with firestore_span("get", "checkpoints"):
+                snapshot = checkpoint_ref.get(transaction=transaction)
+            stored = (snapshot.to_dict() or {}).get("writes") or {}
+            new = {key: entry for key, entry in entries.items()
+                   if entry["idx"] < 0 or key not in stored}
+            if not new:
+                return
+            # Head entries are tagged with their checkpoint so writes for an
+            # older checkpoint are ignored when the head is read
+            transaction.set(checkpoint_ref, {"writes": new}, merge=True)
+            transaction.set(head_ref, {"pending_writes": new}, merge=True)
+
+        with firestore_span("commit", "checkpoints", writes=2):
+            _put(self.db.transaction())
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.db.recursive_delete(self._thread_ref(thread_id))
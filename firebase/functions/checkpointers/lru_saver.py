@@ -0,0 +1,148 @@
+"""
+Bounded In-Memory Checkpointer
+Keeps per-thread LangGraph checkpoint state in an LRU with a size and
+idle-time budget so one warm instance can serve many conversations
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+
+class LRUSaver(InMemorySaver):
+    """
+    InMemorySaver that evicts whole threads once the instance holds more than
+    `max_threads` conversations or a thread has been idle for longer than
+    `idle_ttl_seconds`. Every checkpoint read or write for a thread counts as
+    a use, so the active conversations stay resident and switching between
+    them costs nothing.
+    """
+
+    def __init__(
+            self,
+            max_threads: int = 256,
+            idle_ttl_seconds: float = 1800.0,
+            clock: Callable[[], float] = time.monotonic,
+            ):
+        """Initialize the saver with its eviction budget
+
+        Args:
+            max_threads: Maximum number of threads kept in memory
+            idle_ttl_seconds: Threads unused for this long are evicted
+            clock: Monotonic time source (overridable for tests)
+        """
+        super().__init__()
+        self.max_threads = max_threads
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._clock = clock
+        self._lock = threading.RLock()
+        # thread_id -> last use, least recently used first
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+        # thread_id -> blob keys, so eviction does not scan every thread
+        self._thread_blobs: Dict[str, Set[Tuple[Any, ...]]] = {}
+
+    @property
+    def thread_count(self) -> int:
+        """Number of threads currently resident"""
+        return len(self._last_used)
+
+    def __contains__(self, thread_id: object) -> bool:
+        return thread_id in self._last_used
+
+    def _touch(self, thread_id: str) -> None:
+        """Mark a thread as most recently used and enforce the budget"""
+        with self._lock:
+            now = self._clock()
+            self._last_used[thread_id] = now
+            self._last_used.move_to_end(thread_id)
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Drop idle threads, then the least recently used over budget"""
+        while self._last_used:
+            oldest_id, last_used = next(iter(self._last_used.items()))
+            idle = now - last_used > self.idle_ttl_seconds
+            if not idle and len(self._last_used) <= self.max_threads:
+                break
+            self.delete_thread(oldest_id)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            # Avoid the defaultdict in InMemorySaver allocating empty entries
+            # for threads this instance has never seen
+            if thread_id not in self.storage:
+                return None
+            self._touch(thread_id)
+            return super().get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            if config:
+                thread_id = config["configurable"]["thread_id"]
+                if thread_id not in self.storage:
+                    return iter(())
+                self._touch(thread_id)
+            # Materialize under the lock so eviction cannot mutate the
+            # storage dicts while the caller iterates
+            return iter(list(super().list(
+                config, filter=filter, before=before, limit=limit
+            )))
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            self._touch(thread_id)
+            blob_keys = self._thread_blobs.setdefault(thread_id, set())
+            for channel, version in new_versions.items():
+                blob_keys.add((thread_id, checkpoint_ns, channel, version))
+            return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with self._lock:
+            self._touch(config["configurable"]["thread_id"])
+            super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete a thread in O(size of that thread)
+
+        Args:
+            thread_id: The thread ID to delete
+        """
+        with self._lock:
+            self._last_used.pop(thread_id, None)
+            namespaces = self.storage.pop(thread_id, {})
+            for checkpoint_ns, checkpoints in namespaces.items():
+                for checkpoint_id in checkpoints:
+                    self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            for blob_key in self._thread_blobs.pop(thread_id, ()):
+                self.blobs.pop(blob_key, None)
@@ -0,0 +1,246 @@
+"""
+SQLite Checkpointer
+Local durable checkpointer for tests and development, same storage layout
+as the Firestore checkpointer without needing the emulator
+"""
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from checkpointers.durable_saver import DurableSaver, TypedBlob
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    checkpoint_type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class SQLiteSaver(DurableSaver):
+    """
+    Durable checkpointer backed by a local SQLite database.
+    The latest checkpoint of a thread is a single primary-key range read.
+    """
+
+    def __init__(self, path: str = ":memory:", serde: Any = None):
+        """Open (or create) the checkpoint database
+
+        Args:
+            path: SQLite database file, ":memory:" for a throwaway store
+            serde: Optional LangGraph serializer
+        """
+        super().__init__(serde=serde)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the underlying connection"""
+        with self._lock:
+            self._conn.close()
+
+    def _load_tuple(self, thread_id: str, row: Tuple[Any, ...]) -> CheckpointTuple:
+        """Build a CheckpointTuple from a checkpoints row (lock held)"""
+        (checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+         checkpoint_type, checkpoint, metadata_type, metadata) = row
+        checkpoint_blob: TypedBlob = (checkpoint_type, checkpoint)
+        versions = self.serde.loads_typed(checkpoint_blob)["channel_versions"]
+
+        channel_blobs: Dict[str, TypedBlob] = {}
+        for channel, version in versions.items():
+            blob = self._conn.execute(
+                "SELECT type, value FROM blobs WHERE thread_id = ? AND "
+                "checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if blob:
+                channel_blobs[channel] = (blob[0], blob[1])
+
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes WHERE "
+            "thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+
+        return self._build_tuple(
+            thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+            checkpoint_blob, (metadata_type, metadata), channel_blobs,
+            [(task_id, channel, (type_, value))
+             for task_id, channel, type_, value in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = ("SELECT checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+                   "checkpoint_type, checkpoint, metadata_type, metadata "
+                   "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?")
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    columns + " AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    columns + " ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._load_tuple(thread_id, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, "
+                 "parent_checkpoint_id, checkpoint_type, checkpoint, "
+                 "metadata_type, metadata FROM checkpoints")
+        clauses: List[str] = []
+        params: List[Any] = []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        results: List[CheckpointTuple] = []
+        with self._lock:
+            for row in self._conn.execute(query, params).fetchall():
+                metadata = self.serde.loads_typed((row[6], row[7]))
+                if not self._matches_filter(metadata, filter):
+                    continue
+                results.append(self._load_tuple(row[0], row[1:]))
+                if limit is not None and len(results) >= limit:
+                    break
+        return iter(results)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        checkpoint_blob, blobs = self._dump_checkpoint(checkpoint, new_versions)
+        metadata_blob = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+                [(thread_id, checkpoint_ns, channel, version, blob[0], blob[1])
+                 for channel, (version, blob) in blobs.items()],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"],
+                 config["configurable"].get("checkpoint_id"),
+                 checkpoint_blob[0], checkpoint_blob[1],
+                 metadata_blob[0], metadata_blob[1]),
+            )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self.serde.dumps_typed(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id,
+                         self._write_idx(channel, idx), channel, type_, blob,
+                         task_path))
+        # Special channels (errors, interrupts...) overwrite, regular writes
+        # keep the first value recorded for a task
+        special = [row for row in rows if row[4] < 0]
+        regular = [row for row in rows if row[4] >= 0]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO writes VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                special,
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO writes VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                regular,
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self._conn:
+            for table in ("checkpoints", "blobs", "writes"):
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,)
+                )
@@ -1,6 +1,134 @@
+import os
+
 TOPICS = {
     "data-moisture": "projects/plantpal-f1bfa/topics/data-moisture",    # Agent subscribes to this topic to get moisture data
     "request-soil": "projects/plantpal-f1bfa/topics/request-soil",      # Agent publishes to this topic to request soil data
     "request-water": "projects/plantpal-f1bfa/topics/request-water",    # Agent publishes to this topic to request watering
-    "system-status": "projects/plantpal-f1bfa/topics/system-status"     # Agent subscribes to system status updates from Ioto devices
+    "system-status": "projects/plantpal-f1bfa/topics/system-status",    # Agent subscribes to system status updates from Ioto devices
+    "water-ack": "projects/plantpal-f1bfa/topics/water-ack"             # Devices confirm irrigation commands on this topic
 }
+
+# Per-thread conversation state kept in memory by each function instance.
+# Threads beyond the size budget or idle longer than the TTL are evicted.
+CHECKPOINT_MAX_THREADS = 256
+CHECKPOINT_IDLE_TTL_SECONDS = 30 * 60
+
+# Where conversation checkpoints live: "firestore" (durable, default),
+# "sqlite" (local durable store for tests) or "memory" (bounded LRU only)
+CHECKPOINTER_BACKEND = os.getenv("PLANTPAL_CHECKPOINTER", "firestore")
+CHECKPOINT_COLLECTION = "agent_threads"
+CHECKPOINT_SQLITE_PATH = os.getenv("PLANTPAL_CHECKPOINT_DB", "checkpoints.sqlite")
+
+# Streaming-pull subscriptions drained by the bulk ingestion worker
+# (telemetry/ingest_worker.py), an alternative to the per-message functions
+SUBSCRIPTIONS = {
+    "data-moisture": "projects/plantpal-f1bfa/subscriptions/data-moisture-bulk",
+    "system-status": "projects/plantpal-f1bfa/subscriptions/system-status-bulk"
+}
+
+# Web search results cached per instance, optionally shared through Firestore
+# (search_cache collection) so all instances benefit from each search
+SEARCH_CACHE_MAX_ENTRIES = 512
+SEARCH_CACHE_TTL_SECONDS = 24 * 60 * 60
+SEARCH_CACHE_SHARED = os.getenv("PLANTPAL_SEARCH_CACHE_SHARED", "false").lower() == "true"
+
+# Answers to generic plant-care questions reused for near-duplicate messages
+# (cosine similarity of the message embeddings). Per instance; turns that
+# used an IoT tool are never cached. Embedder: "openai" or "hashing" (offline)
+RESPONSE_CACHE_ENABLED = os.getenv("PLANTPAL_RESPONSE_CACHE", "true").lower() == "true"
+RESPONSE_CACHE_EMBEDDER = os.getenv("PLANTPAL_RESPONSE_CACHE_EMBEDDER", "openai")
+RESPONSE_CACHE_THRESHOLD = 0.92
+RESPONSE_CACHE_TTL_SECONDS = 24 * 60 * 60
+RESPONSE_CACHE_MAX_ENTRIES = 2048
+
+# Chat requests one instance serves at once. Turns on the same thread are
+# serialized by the agent, different threads run in parallel.
+CHAT_CONCURRENCY = 16
+
+# Conversation size, counted in tiktoken tokens. Past the trigger, older
+# messages are summarized and the most recent tokens are kept verbatim.
+# History rebuilt from LangSmith traces is cut to the history budget.
+SUMMARY_TRIGGER_TOKENS = 8000
+SUMMARY_KEEP_TOKENS = 4000
+HISTORY_TOKEN_BUDGET = 4000
+
+# get_moisture_data answers from the latest stored reading when it was
+# received within this window instead of waking the device (0 disables).
+# Concurrent reads of one device share a single device round trip.
+MOISTURE_FRESHNESS_SECONDS = int(os.getenv("PLANTPAL_MOISTURE_FRESHNESS_SECONDS", "60"))
+
+# Device registry (devices/registry.py). Tools only address devices in the
+# user's index. Users without registered devices reach the one device
+# reporting as "esp32" while this is on. It stays on by default until the
+# app registers devices; set it to false once every user has registered.
+LEGACY_SINGLE_DEVICE = os.getenv("PLANTPAL_LEGACY_SINGLE_DEVICE", "true").lower() == "true"
+
+# Device presence (devices/presence.py). Devices send status every 60 s; one
+# silent for PRESENCE_OFFLINE_AFTER_SECONDS is offline. The sweep records
+# offline/online transitions, and status checks read an index cached per
+# instance for PRESENCE_CACHE_SECONDS. The index is split over
+# PRESENCE_SHARDS documents to spread the handlers' writes.
+PRESENCE_OFFLINE_AFTER_SECONDS = 150
+PRESENCE_SWEEP_MINUTES = 1
+PRESENCE_CACHE_SECONDS = 10
+PRESENCE_SHARDS = 16
+
+# Irrigation command ledger (devices/irrigation.py). Repeats of the same
+# command within the window are coalesced, and each device's pump time is
+# capped by a token bucket of pump seconds.
+IRRIGATION_DEDUPE_WINDOW_SECONDS = 120
+IRRIGATION_BUCKET_CAPACITY_SECONDS = 30
+IRRIGATION_REFILL_SECONDS_PER_HOUR = 30
+
+# Moisture trend analytics (telemetry/trends.py, get_moisture_trend tool).
+# A rise of more than WATERING_JUMP_PERCENT between two readings counts as a
+# watering, not as drying. The recent drying rate covers at most the last
+# TREND_RECENT_HOURS; the usual rate is taken from the rest of the lookback.
+TREND_LOOKBACK_DAYS = 7
+TREND_RECENT_HOURS = 6
+TREND_ROLLING_WINDOW_MINUTES = 60
+DRYNESS_THRESHOLD_PERCENT = 30.0
+WATERING_JUMP_PERCENT = 5.0
+
+# Scheduled predictive watering (devices/watering.py). Each run waters the
+# devices projected to fall below DRYNESS_THRESHOLD_PERCENT before the next
+# run, back up to WATERING_TARGET_PERCENT. Devices without a reading in the
+# last WATERING_READING_MAX_AGE_MINUTES are skipped.
+WATERING_SCHEDULE_MINUTES = 30
+WATERING_HISTORY_HOURS = 6
+WATERING_TARGET_PERCENT = 60.0
+WATERING_PERCENT_PER_SECOND = 3.0  # Moisture gained per second of pump time
+WATERING_MAX_SECONDS = 10
+WATERING_READING_MAX_AGE_MINUTES = 90
+
+# Moisture rollups (telemetry/rollups.py). Every ROLLUP_SCHEDULE_MINUTES the
+# compaction job folds raw readings into minute, hour and day rollups (min,
+# max, mean, count). A minute is closed ROLLUP_GRACE_MINUTES after it ends,
+# so late readings still count. A run catching up covers at most
+# ROLLUP_MAX_HOURS_PER_RUN. Compacted raw hour buckets older than
+# RAW_RETENTION_DAYS are purged (0 keeps them); keep it above
+# TREND_LOOKBACK_DAYS. Minute rollups expire after
+# ROLLUP_MINUTE_RETENTION_DAYS, hour and day rollups are kept.
+ROLLUP_SCHEDULE_MINUTES = 15
+ROLLUP_GRACE_MINUTES = 5
+ROLLUP_MAX_HOURS_PER_RUN = 24
+RAW_RETENTION_DAYS = int(os.getenv("PLANTPAL_RAW_RETENTION_DAYS", "14"))
+ROLLUP_MINUTE_RETENTION_DAYS = 30
+ROLLUP_PURGE_LIMIT = 5000  # Raw hour buckets deleted per run
+
+# get_moisture_history (telemetry/history.py). The finest rollup resolution
+# whose point count stays within max_points is returned, HISTORY_PAGE_DOCUMENTS
+# rollup documents per page.
+HISTORY_DEFAULT_POINTS = 500
+HISTORY_MAX_POINTS = 5000
+HISTORY_PAGE_DOCUMENTS = 32
+
+# Avro schema data-moisture messages are validated against (telemetry/decode.py).
+# Unset, it is found next to the functions (copied there on deploy) or in iot/schemas.
+MOISTURE_SCHEMA_PATH = os.getenv("PLANTPAL_MOISTURE_SCHEMA", "")
+
+# OpenTelemetry span exporter (utils/tracing.py): "none" (default), "console",
+# "file" (JSON lines at PLANTPAL_TRACE_FILE), "otlp" (OTEL_EXPORTER_OTLP_*
+# variables) or "gcp" (Cloud Trace). otlp and gcp need their exporter package.
+TRACE_EXPORTER = os.getenv("PLANTPAL_TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("PLANTPAL_TRACE_FILE", "traces.jsonl")
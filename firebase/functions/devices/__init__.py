@@ -0,0 +1 @@
+"""Devices package for PlantPal Firebase Functions"""
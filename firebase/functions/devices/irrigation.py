@@ -0,0 +1,274 @@
+"""
+Irrigation Command Ledger
+Every watering command is recorded before it is published, so duplicates
+can be coalesced, pump time can be rate limited per device, and the
+device's acknowledgement can be matched to the command later
+
+Layout:
+    irrigation_state/{device_id}     bucket_tokens, bucket_updated_at,
+                                     recent: {idempotency_key: {command_id, at}},
+                                     last_command, last_ack
+    irrigation_commands/{command_id} device_id, duration_seconds, status,
+                                     idempotency_key, requested_at, acked_at
+
+Command status: "sent" (published, waiting for the device), "acked" (the
+FPGA answered RESP_WATER_ACK), "failed" (device reported an error or the
+publish failed). A failed publish gives the pump seconds back and frees the
+idempotency key, so a retry is sent instead of joining the lost command.
+"""
+import hashlib
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from firebase_admin import firestore
+
+from utils.tracing import firestore_span
+
+IRRIGATION_STATE_COLLECTION = "irrigation_state"
+IRRIGATION_COMMANDS_COLLECTION = "irrigation_commands"
+
+# How long command records are kept
+COMMAND_TTL = timedelta(days=30)
+
+
+class Dispatch(NamedTuple):
+    """Outcome of a watering request"""
+    status: str                 # "sent", "duplicate" or "rate_limited"
+    command_id: Optional[str]   # New command, or the one a duplicate joined
+    retry_after_seconds: float = 0.0
+
+
+def irrigation_request(device_id: str, duration_seconds: int, command_id: str) -> bytes:
+    """request-water payload for one device"""
+    return json.dumps({
+        'duration_seconds': duration_seconds,
+        'device_id': device_id,
+        'command_id': command_id
+    }).encode('utf-8')
+
+
+def idempotency_key(device_id: str, duration_seconds: int, scope: str = "") -> str:
+    """
+    Key identifying a repeat of the same command: same device, duration and
+    scope (the conversation thread), so repeated tool calls within the
+    window collapse into one watering
+    """
+    raw = f"{device_id}|{duration_seconds}|{scope}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+def plan_command(
+    state: Dict[str, Any],
+    key: str,
+    duration_seconds: int,
+    now_ms: int,
+    bucket_capacity: float,
+    refill_per_second: float,
+    dedupe_window_seconds: float
+) -> Tuple[Dispatch, Dict[str, Any]]:
+    """
+    Decide what to do with a watering request given the device's ledger
+    state. Pure, so the transaction can retry it safely.
+
+    Args:
+        state: irrigation_state document ({} for a new device)
+        key: Idempotency key of the request
+        duration_seconds: Requested pump time
+        now_ms: Current time, epoch milliseconds
+        bucket_capacity: Pump seconds a device can bank
+        refill_per_second: Pump seconds earned per second
+        dedupe_window_seconds: How long a repeated key is coalesced
+
+    Returns:
+        (dispatch, new state). A "sent" dispatch has a new command_id.
+    """
+    window_ms = dedupe_window_seconds * 1000
+    recent = {k: v for k, v in (state.get("recent") or {}).items()
+              if now_ms - v["at"] < window_ms}
+
+    if key in recent:
+        return Dispatch("duplicate", recent[key]["command_id"]), state
+
+    updated_at = state.get("bucket_updated_at", now_ms)
+    tokens = min(bucket_capacity,
+                 state.get("bucket_tokens", bucket_capacity)
+                 + (now_ms - updated_at) / 1000 * refill_per_second)
+
+    if duration_seconds > tokens:
+        retry_after = (duration_seconds - tokens) / refill_per_second \
+            if duration_seconds <= bucket_capacity and refill_per_second > 0 \
+            else float("inf")
+        return Dispatch("rate_limited", None, retry_after), state
+
+    command_id = uuid.uuid4().hex
+    recent[key] = {"command_id": command_id, "at": now_ms}
+    new_state = {
+        **state,
+        "bucket_tokens": min(bucket_capacity, tokens - duration_seconds),
+        "bucket_updated_at": now_ms,
+        "recent": recent,
+        "last_command": {
+            "command_id": command_id,
+            "duration_seconds": duration_seconds,
+            "requested_at": now_ms,
+        },
+    }
+    return Dispatch("sent", command_id), new_state
+
+
+def reserve_command(
+    db: Any,
+    device_id: str,
+    duration_seconds: int,
+    key: str,
+    bucket_capacity: float,
+    refill_per_second: float,
+    dedupe_window_seconds: float,
+    user_id: Optional[str] = None
+) -> Dispatch:
+    """
+    Run plan_command in a transaction on the device's ledger and record the
+    new command, so concurrent instances see each other's commands.
+    """
+    state_ref = db.collection(IRRIGATION_STATE_COLLECTION).document(device_id)
+
+    @firestore.transactional
+    def _reserve(transaction) -> Dispatch:
+        snapshot = state_ref.get(transaction=transaction)
+        state = (snapshot.to_dict() or {}) if snapshot.exists else {}
+        now_ms = int(time.time() * 1000)
+        dispatch, new_state = plan_command(
+            state, key, duration_seconds, now_ms,
+            bucket_capacity, refill_per_second, dedupe_window_seconds
+        )
+        if dispatch.status == "sent":
+            transaction.set(state_ref, new_state)
+            transaction.set(
+                db.collection(IRRIGATION_COMMANDS_COLLECTION).document(dispatch.command_id),
+                {
+                    "device_id": device_id,
+                    "duration_seconds": duration_seconds,
+                    "idempotency_key": key,
+                    "user_id": user_id,
+                    "status": "sent",
+                    "requested_at": now_ms,
+                    "expire_at": datetime.now(timezone.utc) + COMMAND_TTL,
+                })
+        return dispatch
+
+    with firestore_span("transaction", IRRIGATION_STATE_COLLECTION):
+        return _reserve(db.transaction())
+
+
+def mark_publish_failed(
+    db: Any,
+    device_id: str,
+    command_id: str,
+    error: Exception,
+    bucket_capacity: float
+) -> None:
+    """
+    Record that the command never reached Pub/Sub. In the same transaction
+    the device gets the command's pump seconds back and its idempotency key
+    is removed from `recent`, so a retry is sent rather than reported as a
+    duplicate.
+    """
+    command_ref = db.collection(IRRIGATION_COMMANDS_COLLECTION).document(command_id)
+    state_ref = db.collection(IRRIGATION_STATE_COLLECTION).document(device_id)
+
+    @firestore.transactional
+    def _fail(transaction) -> None:
+        command_snapshot = command_ref.get(transaction=transaction)
+        state_snapshot = state_ref.get(transaction=transaction)
+        command = (command_snapshot.to_dict() or {}) if command_snapshot.exists else {}
+        if command.get("status") != "sent":
+            # Unknown, or already failed or acknowledged: nothing to refund
+            return
+        state = (state_snapshot.to_dict() or {}) if state_snapshot.exists else {}
+        now_ms = int(time.time() * 1000)
+
+        update: Dict[str, Any] = {
+            "last_ack": {"command_id": command_id, "status": "failed", "acked_at": now_ms}
+        }
+        if "bucket_tokens" in state:
+            update["bucket_tokens"] = min(
+                bucket_capacity, state["bucket_tokens"] + command.get("duration_seconds", 0))
+        key = command.get("idempotency_key")
+        if ((state.get("recent") or {}).get(key) or {}).get("command_id") == command_id:
+            update["recent"] = {key: firestore.DELETE_FIELD}
+        transaction.set(state_ref, update, merge=True)
+        _queue_status(transaction, db, None, command_id, "failed", now_ms,
+                      {"error": f"publish failed: {error}"})
+
+    with firestore_span("transaction", IRRIGATION_STATE_COLLECTION):
+        _fail(db.transaction())
+
+
+def record_ack(db: Any, payload: Dict[str, Any], received_at: int) -> Optional[str]:
+    """
+    Apply a device acknowledgement to its command and the device ledger.
+    The ack is only applied when the command was sent to the device that
+    acknowledges it.
+
+    Args:
+        db: Firestore client
+        payload: Validated water-ack message (command_id, device_id, status)
+        received_at: Server receive time, epoch milliseconds
+
+    Returns:
+        The acknowledged command ID, None if the message has none or no
+        such command was sent to the device
+    """
+    command_id = payload.get("command_id")
+    device_id = payload.get("device_id")
+    if not command_id or not device_id:
+        return None
+    status = "acked" if payload.get("status") == "acked" else "failed"
+    command_ref = db.collection(IRRIGATION_COMMANDS_COLLECTION).document(command_id)
+
+    @firestore.transactional
+    def _ack(transaction) -> bool:
+        snapshot = command_ref.get(transaction=transaction)
+        if not snapshot.exists or (snapshot.to_dict() or {}).get("device_id") != device_id:
+            return False
+        _queue_status(transaction, db, device_id, command_id, status, received_at,
+                      {"device_status": payload.get("status")})
+        return True
+
+    with firestore_span("transaction", IRRIGATION_COMMANDS_COLLECTION):
+        return command_id if _ack(db.transaction()) else None
+
+
+def _queue_status(
+    writer: Any,
+    db: Any,
+    device_id: Optional[str],
+    command_id: str,
+    status: str,
+    at: int,
+    details: Dict[str, Any]
+) -> None:
+    """Queue the command update and the device's last_ack on a transaction"""
+    writer.set(db.collection(IRRIGATION_COMMANDS_COLLECTION).document(command_id),
+               {"status": status, "acked_at": at, **details}, merge=True)
+    if device_id:
+        writer.set(db.collection(IRRIGATION_STATE_COLLECTION).document(device_id), {
+            "last_ack": {"command_id": command_id, "status": status, "acked_at": at}
+        }, merge=True)
+
+
+def describe_last_command(state: Optional[Dict[str, Any]], now_ms: int) -> Optional[str]:
+    """One-line delivery status of a device's latest command, if any"""
+    last = (state or {}).get("last_command")
+    if not last:
+        return None
+    ack = (state or {}).get("last_ack") or {}
+    seconds_ago = (now_ms - last["requested_at"]) / 1000
+    text = f"Last irrigation: {last['duration_seconds']}s, {seconds_ago:.0f}s ago"
+    if ack.get("command_id") == last["command_id"]:
+        return text + (" (confirmed by device)" if ack["status"] == "acked"
+                       else " (device reported an error)")
+    return text + " (awaiting device confirmation)"
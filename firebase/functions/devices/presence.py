@@ -0,0 +1,213 @@
+"""
+Device Presence
+Which devices are online, kept up to date without anyone asking:
+  - every status message records the device's last-seen time in a compact
+    index, a few shard documents holding all devices (IngestBatch)
+  - a scheduled sweep compares last-seen times with the offline threshold,
+    stores each device's state and logs every offline/online transition
+  - the whole fleet's presence is one query over the shards, cached per
+    instance, so a status check is a dictionary lookup
+
+Layout:
+    device_presence/{shard}         devices: {device_id: {last_seen, status,
+                                              state, since}}
+    device_presence_events/{auto}   device_id, state, at, last_seen, expire_at
+
+last_seen and status are written by the handlers, state and since by the
+sweep; merge writes keep the two from overwriting each other.
+"""
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import PRESENCE_CACHE_SECONDS, PRESENCE_OFFLINE_AFTER_SECONDS, PRESENCE_SHARDS
+from utils.tracing import firestore_span
+
+PRESENCE_COLLECTION = "device_presence"
+PRESENCE_EVENTS_COLLECTION = "device_presence_events"
+
+# How long transition events are kept
+PRESENCE_EVENT_TTL = timedelta(days=30)
+
+# Writes per WriteBatch
+_BATCH_LIMIT = 500
+
+ONLINE = "online"
+OFFLINE = "offline"
+
+
+@dataclass
+class Presence:
+    """Presence of one device"""
+    device_id: str
+    online: bool
+    last_seen: Optional[int]    # Epoch ms of the last status message
+    since: Optional[int]        # Epoch ms the device entered its current state
+    status: Optional[str]       # Last status the device reported
+
+
+def presence_shard(device_id: str, shards: int = PRESENCE_SHARDS) -> str:
+    """Index shard of a device, spreads the handlers' writes over documents"""
+    return f"shard-{zlib.crc32(device_id.encode('utf-8')) % shards:02d}"
+
+
+def last_seen_update(device_id: str, received_at: int,
+                     status: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    """(shard ID, merge data) recording a status message in the index"""
+    entry: Dict[str, Any] = {'last_seen': received_at}
+    if status is not None:
+        entry['status'] = status
+    return presence_shard(device_id), {'devices': {device_id: entry}}
+
+
+def load_index(db: Any) -> Dict[str, Dict[str, Any]]:
+    """Every device's index entry, from one query over the shards"""
+    index: Dict[str, Dict[str, Any]] = {}
+    with firestore_span("query", PRESENCE_COLLECTION):
+        for snapshot in db.collection(PRESENCE_COLLECTION).stream():
+            index.update((snapshot.to_dict() or {}).get('devices') or {})
+    return index
+
+
+def current_state(
+    entry: Optional[Dict[str, Any]],
+    now_ms: int,
+    offline_after_seconds: float = PRESENCE_OFFLINE_AFTER_SECONDS
+) -> Tuple[bool, Optional[int]]:
+    """
+    (online, since) of an index entry at now_ms. Between sweeps the state
+    follows last_seen; the sweep's since is kept while it still applies.
+    """
+    last_seen = (entry or {}).get('last_seen')
+    if last_seen is None:
+        return False, None
+    online = now_ms - last_seen <= offline_after_seconds * 1000
+    if entry.get('state') == (ONLINE if online else OFFLINE) and entry.get('since'):
+        return online, entry['since']
+    # Changed since the last sweep
+    return online, last_seen if online else last_seen + int(offline_after_seconds * 1000)
+
+
+def presence_of(device_id: str, entry: Optional[Dict[str, Any]], now_ms: int) -> Presence:
+    online, since = current_state(entry, now_ms)
+    return Presence(
+        device_id=device_id,
+        online=online,
+        last_seen=(entry or {}).get('last_seen'),
+        since=since,
+        status=(entry or {}).get('status'),
+    )
+
+
+def fleet_presence(
+    db: Any,
+    device_ids: Optional[Iterable[str]] = None,
+    now_ms: Optional[int] = None
+) -> Dict[str, Presence]:
+    """
+    Presence of the given devices, or of every device in the index
+
+    Args:
+        db: Firestore client
+        device_ids: Devices to report, devices never seen are offline
+        now_ms: Current time, epoch milliseconds
+    """
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    index = load_index(db)
+    device_ids = list(device_ids) if device_ids is not None else sorted(index)
+    return {device_id: presence_of(device_id, index.get(device_id), now_ms)
+            for device_id in device_ids}
+
+
+class PresenceCache:
+    """
+    Per-instance copy of the presence index, reloaded with one query once it
+    is older than the TTL. Lookups in between cost no reads.
+    """
+
+    def __init__(self, ttl_seconds: float = PRESENCE_CACHE_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._loaded_at = 0.0
+
+    def index(self, db: Any) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if self._index is None or self._clock() - self._loaded_at > self.ttl_seconds:
+                self._index = load_index(db)
+                self._loaded_at = self._clock()
+            return self._index
+
+    def lookup(self, db: Any, device_ids: Iterable[str],
+               now_ms: Optional[int] = None) -> Dict[str, Presence]:
+        """Presence per device, from the cached index"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        index = self.index(db)
+        return {device_id: presence_of(device_id, index.get(device_id), now_ms)
+                for device_id in device_ids}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._index = None
+
+
+def sweep(
+    db: Any,
+    now_ms: Optional[int] = None,
+    offline_after_seconds: float = PRESENCE_OFFLINE_AFTER_SECONDS
+) -> Dict[str, int]:
+    """
+    Store every device's state and log the transitions since the last sweep
+
+    Args:
+        db: Firestore client
+        now_ms: Current time, epoch milliseconds
+        offline_after_seconds: Silence after which a device is offline
+
+    Returns:
+        Devices in the index, online now, and transitions to offline/online
+    """
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    index = load_index(db)
+    changes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    events: List[Dict[str, Any]] = []
+    online_count = 0
+    expire_at = datetime.now(timezone.utc) + PRESENCE_EVENT_TTL
+    for device_id, entry in index.items():
+        online, since = current_state(entry, now_ms, offline_after_seconds)
+        online_count += online
+        state = ONLINE if online else OFFLINE
+        if entry.get('state') == state:
+            continue
+        changes.setdefault(presence_shard(device_id), {})[device_id] = {
+            'state': state, 'since': since}
+        # A device's first sweep sets its state without an event
+        if entry.get('state') is not None:
+            events.append({'device_id': device_id, 'state': state, 'at': since,
+                           'last_seen': entry.get('last_seen'), 'expire_at': expire_at})
+
+    writes: List[Tuple[Any, Dict[str, Any], bool]] = [
+        (db.collection(PRESENCE_COLLECTION).document(shard), {'devices': devices}, True)
+        for shard, devices in changes.items()
+    ] + [
+        (db.collection(PRESENCE_EVENTS_COLLECTION).document(), event, False)
+        for event in events
+    ]
+    for start in range(0, len(writes), _BATCH_LIMIT):
+        batch = db.batch()
+        for reference, data, merge in writes[start:start + _BATCH_LIMIT]:
+            batch.set(reference, data, merge=merge)
+        with firestore_span("commit", PRESENCE_COLLECTION, writes=len(batch)):
+            batch.commit()
+
+    return {
+        "devices": len(index),
+        "online": online_count,
+        "went_offline": sum(e['state'] == OFFLINE for e in events),
+        "came_online": sum(e['state'] == ONLINE for e in events),
+    }
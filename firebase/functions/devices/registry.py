@@ -0,0 +1,223 @@
+"""
+PlantPal Device Registry
+Device documents keyed by device ID plus a per-user index of devices and
+device groups, so tools and handlers can address a whole fleet
+
+Layout:
+    devices/{device_id}      owner_uid, name, groups, auto_watering,
+                             registered_at
+    user_devices/{uid}       device_ids: [...], groups: {group: [device_id]}
+"""
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from firebase_admin import firestore
+
+from config import LEGACY_SINGLE_DEVICE
+from utils.tracing import firestore_span
+
+DEVICES_COLLECTION = "devices"
+USER_DEVICES_COLLECTION = "user_devices"
+
+# Single-device installs report without a device ID and have no registry;
+# tools reach this device without registering only with LEGACY_SINGLE_DEVICE
+DEFAULT_DEVICE_ID = "esp32"
+
+# Targets that mean "every device the user owns"
+ALL_DEVICES = {"", "all", "*"}
+
+
+def device_id_from(
+    attributes: Optional[Dict[str, str]],
+    payload: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Device that sent a message: the `device_id` Pub/Sub attribute, then the
+    payload field, then the default device.
+    """
+    device_id = (attributes or {}).get("device_id")
+    if not device_id and isinstance(payload, dict):
+        device_id = payload.get("device_id")
+    return device_id or DEFAULT_DEVICE_ID
+
+
+def register_device(
+    db: Any,
+    device_id: str,
+    owner_uid: str,
+    name: Optional[str] = None,
+    groups: Optional[Iterable[str]] = None,
+    auto_watering: Optional[bool] = None
+) -> None:
+    """
+    Register a device for a user and update the user's index in one
+    transaction. A device already owned by another user is not taken over.
+    Re-registering with other groups removes the device from the groups it
+    left, and drops groups left empty.
+
+    Args:
+        db: Firestore client
+        device_id: Unique device identifier (matches the device firmware)
+        owner_uid: Firebase Auth UID of the owner
+        name: Optional display name, e.g. "Kitchen basil"
+        groups: Group names, e.g. ["living room"]. None keeps a
+                re-registered device's groups
+        auto_watering: Let the scheduler water the device. New devices
+                       default to off; None keeps a re-registered device's
+                       setting
+
+    Raises:
+        PermissionError: If the device is registered to another user
+    """
+    device_ref = db.collection(DEVICES_COLLECTION).document(device_id)
+    index_ref = db.collection(USER_DEVICES_COLLECTION).document(owner_uid)
+
+    @firestore.transactional
+    def _register(transaction) -> None:
+        snapshot = device_ref.get(transaction=transaction)
+        previous = (snapshot.to_dict() or {}) if snapshot.exists else {}
+        current_owner = previous.get('owner_uid')
+        if current_owner and current_owner != owner_uid:
+            raise PermissionError(f"Device '{device_id}' is registered to another user")
+
+        old_groups = previous.get('groups') or []
+        new_groups = old_groups if groups is None else list(groups)
+        left = set(old_groups) - set(new_groups)
+        stored_groups: Dict[str, List[str]] = {}
+        if left:
+            index_snapshot = index_ref.get(transaction=transaction)
+            stored_groups = (index_snapshot.to_dict() or {}).get('groups', {})
+
+        device = {
+            'device_id': device_id,
+            'owner_uid': owner_uid,
+            'name': name or device_id,
+            'groups': new_groups,
+            'registered_at': int(time.time() * 1000),
+        }
+        if auto_watering is not None or not snapshot.exists:
+            device['auto_watering'] = bool(auto_watering)
+        transaction.set(device_ref, device, merge=True)
+
+        index: Dict[str, Any] = {'device_ids': firestore.ArrayUnion([device_id])}
+        index_groups: Dict[str, Any] = {group: firestore.ArrayUnion([device_id])
+                                        for group in new_groups}
+        for group in left:
+            remaining = [d for d in stored_groups.get(group, []) if d != device_id]
+            index_groups[group] = (firestore.ArrayRemove([device_id]) if remaining
+                                   else firestore.DELETE_FIELD)
+        if index_groups:
+            index['groups'] = index_groups
+        transaction.set(index_ref, index, merge=True)
+
+    with firestore_span("transaction", DEVICES_COLLECTION):
+        _register(db.transaction())
+
+
+def resolve_devices(
+    db: Any,
+    user_id: Optional[str],
+    target: str = ""
+) -> List[str]:
+    """
+    Resolve a tool target to device IDs with a single index read.
+
+    Args:
+        db: Firestore client
+        user_id: UID of the chatting user, None if unauthenticated
+        target: Device ID, group name, or "" / "all" for every device
+
+    Returns:
+        Device IDs to address. Users without registered devices get the
+        default single device only when LEGACY_SINGLE_DEVICE is set.
+
+    Raises:
+        ValueError: If the target is not one of the user's devices or groups
+    """
+    index: Dict[str, Any] = {}
+    if user_id:
+        with firestore_span("get", USER_DEVICES_COLLECTION):
+            snapshot = db.collection(USER_DEVICES_COLLECTION).document(user_id).get()
+        if snapshot.exists:
+            index = snapshot.to_dict() or {}
+    return _devices_in_index(index, target)
+
+
+async def aresolve_devices(
+    db: Any,
+    user_id: Optional[str],
+    target: str = ""
+) -> List[str]:
+    """Async version of resolve_devices for a Firestore AsyncClient"""
+    index: Dict[str, Any] = {}
+    if user_id:
+        with firestore_span("get", USER_DEVICES_COLLECTION):
+            snapshot = await db.collection(USER_DEVICES_COLLECTION).document(user_id).get()
+        if snapshot.exists:
+            index = snapshot.to_dict() or {}
+    return _devices_in_index(index, target)
+
+
+def _devices_in_index(index: Dict[str, Any], target: str) -> List[str]:
+    """Resolve a target against a user_devices document"""
+    target = (target or "").strip()
+    device_ids: List[str] = index.get('device_ids', [])
+    if not device_ids:
+        if LEGACY_SINGLE_DEVICE and (target.lower() in ALL_DEVICES
+                                     or target == DEFAULT_DEVICE_ID):
+            return [DEFAULT_DEVICE_ID]
+        raise ValueError(f"Unknown device or group '{target}'. "
+                         "No devices are registered to this account.")
+
+    if target.lower() in ALL_DEVICES:
+        return list(device_ids)
+    groups: Dict[str, List[str]] = index.get('groups', {})
+    if target in groups:
+        return list(groups[target])
+    if target in device_ids:
+        return [target]
+    raise ValueError(f"Unknown device or group '{target}'. "
+                     f"Known devices: {', '.join(device_ids)}; "
+                     f"groups: {', '.join(groups) or 'none'}")
+
+
+def get_latest(
+    db: Any,
+    collection: str,
+    device_ids: List[str]
+) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Read the per-device documents of a collection (e.g. system_status) for
+    many devices in one batched get_all.
+
+    Returns:
+        device_id -> document data, None if the device has not reported
+    """
+    refs = [db.collection(collection).document(device_id)
+            for device_id in device_ids]
+    latest: Dict[str, Optional[Dict[str, Any]]] = {
+        device_id: None for device_id in device_ids
+    }
+    with firestore_span("get_all", collection, documents=len(refs)):
+        for snapshot in db.get_all(refs):
+            if snapshot.exists:
+                latest[snapshot.id] = snapshot.to_dict()
+    return latest
+
+
+async def aget_latest(
+    db: Any,
+    collection: str,
+    device_ids: List[str]
+) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Async version of get_latest for a Firestore AsyncClient"""
+    refs = [db.collection(collection).document(device_id)
+            for device_id in device_ids]
+    latest: Dict[str, Optional[Dict[str, Any]]] = {
+        device_id: None for device_id in device_ids
+    }
+    with firestore_span("get_all", collection, documents=len(refs)):
+        async for snapshot in db.get_all(refs):
+            if snapshot.exists:
+                latest[snapshot.id] = snapshot.to_dict()
+    return latest
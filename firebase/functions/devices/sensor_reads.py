@@ -0,0 +1,96 @@
+"""
+Sensor Read Coalescing
+Keeps get_moisture_data from waking a device more often than needed:
+  - a latest reading (sensor_data/{device_id}) received within the freshness
+    window is answered directly, without a device round trip
+  - concurrent requests for the same device share one in-flight round trip
+    (request-soil publish + wait for the correlated reading) instead of each
+    publishing its own
+
+Coalescing is per function instance; the freshness window also covers
+readings requested by other instances.
+"""
+import threading
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Dict, Optional, Tuple
+
+from config import MOISTURE_FRESHNESS_SECONDS
+
+SENSOR_DATA_COLLECTION = "sensor_data"
+
+
+def fresh_readings(
+    latest: Dict[str, Optional[Dict[str, Any]]],
+    now_ms: int,
+    max_age_seconds: float = MOISTURE_FRESHNESS_SECONDS
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Latest readings recent enough to answer without asking the device
+
+    Args:
+        latest: sensor_data document per device, None if missing
+        now_ms: Current time, epoch milliseconds
+        max_age_seconds: Freshness window, 0 to always ask the device
+
+    Returns:
+        Fresh readings by device ID, devices without one are left out
+    """
+    fresh = {}
+    for device_id, reading in latest.items():
+        if not reading or not isinstance(reading.get('percentage'), (int, float)):
+            continue
+        received_at = reading.get('received_at') or 0
+        if now_ms - received_at <= max_age_seconds * 1000:
+            fresh[device_id] = reading
+    return fresh
+
+
+class SingleFlight:
+    """
+    At most one in-flight device round trip per device. The first caller
+    (the leader) starts it and resolves it; callers that join before it
+    lands wait on the same future. The future's result is the reading, or
+    None if the device did not answer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, Future] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def join(self, device_id: str) -> Tuple[Future, bool]:
+        """
+        The device's in-flight round trip, starting one if there is none
+
+        Returns:
+            (future of the reading, True if the caller is the leader and must
+            request the reading and resolve the future)
+        """
+        with self._lock:
+            flight = self._flights.get(device_id)
+            if flight is not None:
+                return flight, False
+            flight = Future()
+            self._flights[device_id] = flight
+        flight.add_done_callback(lambda done: self._forget(device_id, done))
+        return flight, True
+
+    @staticmethod
+    def resolve(flight: Future, reading: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Land a round trip with its reading, or with None on timeout or
+        failure. No-op once it has landed.
+        """
+        try:
+            flight.set_result(reading)
+        except InvalidStateError:
+            pass  # Already landed
+
+    def _forget(self, device_id: str, flight: Future) -> None:
+        """The next caller starts a new round trip"""
+        with self._lock:
+            if self._flights.get(device_id) is flight:
+                del self._flights[device_id]
@@ -0,0 +1,298 @@
+"""
+Predictive Watering Scheduler
+Routine watering for the whole fleet without the agent. Each run:
+  1. loads the devices that opted in and, in collection group queries over
+     30 devices at a time, the recent moisture history of only those
+  2. computes in one vectorized pass which devices will fall below the
+     dryness threshold before the next run, and how long each must water
+  3. records the commands in the irrigation ledger (shared dedupe window
+     and pump budget with the agent) and publishes them in one batched
+     Pub/Sub flush
+
+Runtime grows with the number of devices, not with the number of chats.
+Devices opt in with `auto_watering: true` on their devices document (set
+through register_device); devices without it are never watered here.
+"""
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from firebase_admin import firestore
+from google.cloud import pubsub_v1
+
+from config import (
+    DRYNESS_THRESHOLD_PERCENT,
+    IRRIGATION_BUCKET_CAPACITY_SECONDS,
+    IRRIGATION_DEDUPE_WINDOW_SECONDS,
+    IRRIGATION_REFILL_SECONDS_PER_HOUR,
+    TOPICS,
+    WATERING_HISTORY_HOURS,
+    WATERING_JUMP_PERCENT,
+    WATERING_MAX_SECONDS,
+    WATERING_PERCENT_PER_SECOND,
+    WATERING_READING_MAX_AGE_MINUTES,
+    WATERING_SCHEDULE_MINUTES,
+    WATERING_TARGET_PERCENT,
+)
+from devices.irrigation import (
+    Dispatch,
+    idempotency_key,
+    irrigation_request,
+    mark_publish_failed,
+    reserve_command,
+)
+from devices.registry import DEVICES_COLLECTION
+from telemetry.storage import HOURLY_SUBCOLLECTION, bucket_start
+from utils.tracing import firestore_span, publish_span
+
+HOUR_MS = 60 * 60 * 1000
+
+# Idempotency scope of scheduled commands (the agent uses the chat thread)
+SCHEDULER_SCOPE = "scheduler"
+
+# Ledger transactions run concurrently, each is one Firestore round trip
+LEDGER_WORKERS = 16
+
+# Firestore accepts at most 30 values in an `in` filter; the history queries
+# for each group of 30 devices run concurrently
+IN_FILTER_LIMIT = 30
+HISTORY_QUERY_WORKERS = 16
+
+# Pub/Sub accepts at most 1000 messages per publish request
+PUBLISH_BATCH_SETTINGS = pubsub_v1.types.BatchSettings(
+    max_messages=1000,
+    max_bytes=9 * 1024 * 1024,
+    max_latency=60,  # Flushed explicitly by stop() once all are queued
+)
+
+
+@dataclass
+class FleetHistory:
+    """Recent readings of every device as flat arrays"""
+    device_ids: List[str]
+    device_index: np.ndarray  # Position in device_ids of each reading
+    t: np.ndarray             # Reading time, epoch ms
+    p: np.ndarray             # Moisture percentage
+
+
+def load_devices(db: Any) -> List[str]:
+    """IDs of registered devices that have opted in to automatic watering"""
+    query = (db.collection(DEVICES_COLLECTION)
+             .where(filter=firestore.FieldFilter('auto_watering', '==', True))
+             .select(['device_id']))
+    with firestore_span("query", DEVICES_COLLECTION):
+        return [snapshot.id for snapshot in query.stream()]
+
+
+def _load_buckets(db: Any, device_ids: List[str], start: int) -> List[Dict[str, Any]]:
+    """Hour buckets from `start` of at most IN_FILTER_LIMIT devices"""
+    query = (db.collection_group(HOURLY_SUBCOLLECTION)
+             .where(filter=firestore.FieldFilter('device_id', 'in', device_ids))
+             .where(filter=firestore.FieldFilter('bucket_start', '>=', start)))
+    return [snapshot.to_dict() or {} for snapshot in query.stream()]
+
+
+def load_fleet_history(db: Any, device_ids: List[str], start_ms: int) -> FleetHistory:
+    """
+    Readings since start_ms of the given devices, from one collection group
+    query per IN_FILTER_LIMIT devices. Other devices' buckets are not read.
+
+    Args:
+        db: Firestore client
+        device_ids: Devices to load
+        start_ms: Oldest reading to load, epoch milliseconds
+    """
+    positions = {device_id: i for i, device_id in enumerate(device_ids)}
+    index: List[int] = []
+    times: List[int] = []
+    values: List[float] = []
+    chunks = [device_ids[i:i + IN_FILTER_LIMIT]
+              for i in range(0, len(device_ids), IN_FILTER_LIMIT)]
+    if chunks:
+        with firestore_span("query", HOURLY_SUBCOLLECTION, devices=len(device_ids)), \
+                ThreadPoolExecutor(max_workers=min(HISTORY_QUERY_WORKERS, len(chunks))) as pool:
+            for buckets in pool.map(
+                    lambda chunk: _load_buckets(db, chunk, bucket_start(start_ms)), chunks):
+                for bucket in buckets:
+                    position = positions[bucket['device_id']]
+                    for sample in bucket.get('samples', []):
+                        if sample['t'] >= start_ms:
+                            index.append(position)
+                            times.append(sample['t'])
+                            values.append(sample['p'])
+    return FleetHistory(
+        device_ids=device_ids,
+        device_index=np.asarray(index, dtype=np.int64),
+        t=np.asarray(times, dtype=np.int64),
+        p=np.asarray(values, dtype=np.float64),
+    )
+
+
+def plan_durations(
+    history: FleetHistory,
+    now_ms: int,
+    horizon_minutes: float = WATERING_SCHEDULE_MINUTES,
+    threshold: float = DRYNESS_THRESHOLD_PERCENT,
+    target: float = WATERING_TARGET_PERCENT,
+    percent_per_second: float = WATERING_PERCENT_PER_SECOND,
+    max_seconds: int = WATERING_MAX_SECONDS,
+    max_age_minutes: float = WATERING_READING_MAX_AGE_MINUTES
+) -> np.ndarray:
+    """
+    Watering duration per device in one vectorized pass over the fleet.
+
+    Each device's readings since its last watering are fitted with a line.
+    A device is watered when the fit, extended to the end of the horizon,
+    falls below `threshold`; it is watered back up to `target`. Without a
+    drying trend the latest reading is used. Devices without a recent
+    reading are skipped, they may be offline.
+
+    Returns:
+        Whole seconds per device, in history.device_ids order, 0 for no
+        watering
+    """
+    n = len(history.device_ids)
+    durations = np.zeros(n, dtype=np.int64)
+    if len(history.t) == 0:
+        return durations
+
+    # Group the readings per device, in time order
+    order = np.lexsort((history.t, history.device_index))
+    idx, t, p = history.device_index[order], history.t[order], history.p[order]
+    counts = np.bincount(idx, minlength=n)
+    group_start = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    has_readings = counts > 0
+    last = np.where(has_readings, group_start + counts - 1, 0)
+    last_t = np.where(has_readings, t[last], 0)
+
+    # Least-squares line per device over the readings since its last
+    # watering (a rise of more than WATERING_JUMP_PERCENT), x in hours from now
+    segment_start = group_start.copy()
+    jumps = np.flatnonzero((np.diff(p) > WATERING_JUMP_PERCENT) & (np.diff(idx) == 0)) + 1
+    np.maximum.at(segment_start, idx[jumps], jumps)
+    in_segment = (np.arange(len(t)) >= segment_start[idx]).astype(np.float64)
+    x = (t - now_ms) / HOUR_MS
+    sn = np.bincount(idx, weights=in_segment, minlength=n)
+    sx = np.bincount(idx, weights=x * in_segment, minlength=n)
+    sy = np.bincount(idx, weights=p * in_segment, minlength=n)
+    sxx = np.bincount(idx, weights=x * x * in_segment, minlength=n)
+    sxy = np.bincount(idx, weights=x * p * in_segment, minlength=n)
+    denominator = sn * sxx - sx * sx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = np.where(denominator > 1e-12, (sn * sxy - sx * sy) / denominator, 0.0)
+        level_now = (sy - rate * sx) / sn
+
+    # Project to the next run while drying, never credit a rising reading
+    drying = rate < 0
+    level = np.where(drying, level_now, p[last])
+    projected = level + np.where(drying, rate, 0.0) * horizon_minutes / 60
+    fresh = has_readings & (now_ms - last_t <= max_age_minutes * 60 * 1000)
+    needs_water = fresh & (projected < threshold)
+
+    seconds = np.ceil((target - projected) / percent_per_second)
+    durations[needs_water] = np.clip(seconds[needs_water], 1, max_seconds)
+    return durations
+
+
+def _reserve(db: Any, device_id: str, duration_seconds: int) -> Dispatch:
+    return reserve_command(
+        db, device_id, duration_seconds,
+        key=idempotency_key(device_id, duration_seconds, SCHEDULER_SCOPE),
+        bucket_capacity=IRRIGATION_BUCKET_CAPACITY_SECONDS,
+        refill_per_second=IRRIGATION_REFILL_SECONDS_PER_HOUR / 3600,
+        dedupe_window_seconds=IRRIGATION_DEDUPE_WINDOW_SECONDS,
+    )
+
+
+def dispatch_commands(
+    db: Any,
+    publisher: Any,
+    commands: List[Tuple[str, int]]
+) -> Tuple[Dict[str, int], List[Tuple[str, str, Future]]]:
+    """
+    Record the commands in the ledger, then queue the accepted ones on the
+    publisher together. The caller flushes the publisher.
+
+    Args:
+        db: Firestore client
+        publisher: Pub/Sub publisher
+        commands: (device ID, duration seconds) pairs
+
+    Returns:
+        (counts of commands the ledger held back per outcome: duplicate,
+        rate_limited; (device ID, command ID, publish future) per queued
+        command)
+    """
+    outcome = {"duplicate": 0, "rate_limited": 0}
+    published: List[Tuple[str, str, Future]] = []
+    if not commands:
+        return outcome, published
+
+    with ThreadPoolExecutor(max_workers=min(LEDGER_WORKERS, len(commands))) as pool:
+        dispatches = list(pool.map(lambda command: _reserve(db, *command), commands))
+
+    with publish_span(TOPICS["request-water"], messages=len(commands)) as carrier:
+        for (device_id, duration_seconds), dispatch in zip(commands, dispatches):
+            if dispatch.status != "sent":
+                outcome[dispatch.status] += 1
+                continue
+            future = publisher.publish(
+                TOPICS["request-water"],
+                irrigation_request(device_id, duration_seconds, dispatch.command_id),
+                device_id=device_id,
+                **carrier
+            )
+            published.append((device_id, dispatch.command_id, future))
+    return outcome, published
+
+
+def run_schedule(db: Any, publisher: Optional[Any] = None,
+                 now_ms: Optional[int] = None) -> Dict[str, Any]:
+    """
+    One scheduler run over the whole fleet
+
+    Args:
+        db: Firestore client
+        publisher: Pub/Sub publisher, defaults to a batching publisher that
+                   is flushed once after all commands are queued
+        now_ms: Current time, epoch milliseconds
+
+    Returns:
+        Summary: devices, devices with recent readings, commands planned and
+        their outcomes
+    """
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    device_ids = load_devices(db)
+    history = load_fleet_history(db, device_ids, now_ms - WATERING_HISTORY_HOURS * HOUR_MS)
+    durations = plan_durations(history, now_ms)
+    commands = [(device_ids[i], int(durations[i])) for i in np.flatnonzero(durations)]
+
+    own_publisher = publisher is None
+    if own_publisher:
+        publisher = pubsub_v1.PublisherClient(batch_settings=PUBLISH_BATCH_SETTINGS)
+    try:
+        held_back, published = dispatch_commands(db, publisher, commands)
+    finally:
+        if own_publisher:
+            publisher.stop()  # Sends everything queued in as few requests as possible
+
+    outcome = {"sent": 0, "failed": 0, **held_back}
+    for device_id, command_id, future in published:
+        try:
+            future.result()
+            outcome["sent"] += 1
+        except Exception as e:
+            print(f"❌ Scheduled command {command_id} was not published: {e}")
+            mark_publish_failed(db, device_id, command_id, e,
+                                IRRIGATION_BUCKET_CAPACITY_SECONDS)
+            outcome["failed"] += 1
+
+    return {
+        "devices": len(device_ids),
+        "with_readings": int(len(np.unique(history.device_index))),
+        "planned": len(commands),
+        "planned_seconds": int(durations.sum()),
+        **outcome,
+    }
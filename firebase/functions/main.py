@@ -1,15 +1,38 @@
-import asyncio
 from firebase_functions import https_fn
 from firebase_functions import options
 from firebase_functions.options import set_global_options
-from firebase_admin import initialize_app, firestore
+from firebase_admin import initialize_app, firestore, auth
 from firebase_functions import pubsub_fn
+from firebase_functions import scheduler_fn
 import json
 import time
 
-# Import our agent and config
-from agent import get_agent
-from config import TOPICS
+# Import our config. The agent (LangChain, LangGraph, OpenAI, Pub/Sub
+# publisher) is imported on the first plantpal_chat call so instances that
+# only serve the telemetry handlers start with just firebase_admin loaded.
+# benchmarks/startup.py measures this.
+from config import (
+    CHAT_CONCURRENCY,
+    HISTORY_DEFAULT_POINTS,
+    HISTORY_MAX_POINTS,
+    PRESENCE_SWEEP_MINUTES,
+    ROLLUP_SCHEDULE_MINUTES,
+    TOPICS,
+    WATERING_SCHEDULE_MINUTES,
+)
+from devices.irrigation import record_ack
+from devices.presence import PresenceCache, sweep as sweep_presence
+from devices.registry import device_id_from, resolve_devices
+from devices.registry import register_device as register_device_for_user
+from telemetry.decode import (
+    TelemetryDecodeError,
+    decode_base64,
+    moisture_decoder,
+    parse_object,
+    water_ack_decoder,
+)
+from telemetry.ingest import IngestBatch
+from utils.tracing import configure_tracing, consumer_span, firestore_span, flush_tracing, tracer
 
 # For cost control, you can set the maximum number of containers that can be
 # running at the same time. This helps mitigate the impact of unexpected
@@ -19,9 +42,11 @@ from config import TOPICS
 set_global_options(max_instances=10)
 
 initialize_app()  # Crucial for Firebase services integration
+configure_tracing()  # No-op unless PLANTPAL_TRACE_EXPORTER is set
 
 
-@https_fn.on_call(memory=options.MemoryOption.MB_512)
+@https_fn.on_call(memory=options.MemoryOption.MB_512, cpu=1,
+                  concurrency=CHAT_CONCURRENCY)
 def plantpal_chat(req: https_fn.CallableRequest) -> any:
     """
     PlantPal AI Chat Function
@@ -30,8 +55,8 @@ def plantpal_chat(req: https_fn.CallableRequest) -> any:
     Request data:
         - message: User's chat message (required)
         - thread_id: Conversation thread identifier (required for persistence)
-        - use_history: Boolean, if True loads conversation history from
-                      LangSmith (default: False)
+        - existing_thread: Boolean, kept for older clients. Threads resume
+                      from the durable checkpointer on any instance
     """
     print("--- PlantPal Chat Function Invoked ---")
     print(f"Request data: {req.data}")
@@ -54,14 +79,21 @@ def plantpal_chat(req: https_fn.CallableRequest) -> any:
         )
 
     try:
-        # Get the agent instance
-        # If existing_thread=True, agent loads past conversation from LangSmith
-        # This enables long-running chats across Firebase function invocations
-        agent = get_agent(
-            thread_id=thread_id,
-            existing_thread=existing_thread
-        )
-        response = agent.chat(message)
+        with tracer.start_as_current_span(
+            "plantpal_chat", attributes={"plantpal.thread_id": thread_id}
+        ):
+            from agent import get_agent, run_async
+
+            # Get the agent instance
+            # Conversation state is resumed from the durable checkpointer
+            # This enables long-running chats across Firebase function invocations
+            agent = get_agent(
+                thread_id=thread_id,
+                existing_thread=existing_thread,
+                user_id=req.auth.uid if req.auth else None
+            )
+            # Async path: tool calls from one model step run concurrently
+            response = run_async(agent.achat(message))
 
         return {
             "response": response,
@@ -75,67 +107,492 @@ def plantpal_chat(req: https_fn.CallableRequest) -> any:
             code=https_fn.FunctionsErrorCode.INTERNAL,
             message=f"Internal error processing your request: {str(e)}"
         )
+    finally:
+        flush_tracing()
 
 
-@pubsub_fn.on_message_published(topic=TOPICS["data-moisture"])
-def handle_moisture_data(event: pubsub_fn.CloudEvent[pubsub_fn.MessagePublishedData]) -> None:
-    """Handle incoming moisture data from IoT devices and store in Firestore."""
+@https_fn.on_call(memory=options.MemoryOption.MB_512)
+def get_moisture_history(req: https_fn.CallableRequest) -> any:
+    """
+    Moisture history of one of the signed-in user's devices for charts, from
+    the minute/hour/day rollups (see telemetry/history.py)
+
+    Request data:
+        - device_id: Device to read (required)
+        - start: Range start, epoch milliseconds (default 24 h before end)
+        - end: Range end, epoch milliseconds (default now)
+        - max_points: Most points for the whole range (default 500), picks
+                      the finest resolution that stays within it
+        - cursor: next_cursor of the previous page (optional)
+
+    Response:
+        - resolution, step_ms: "minute", "hour" or "day" and its length
+        - t, min, max, mean, count: One column per field, t is the bucket
+          start in epoch milliseconds
+        - next_cursor: Pass it back for the next page, None on the last one
+    """
+    if not req.auth:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
+            message="Sign in to see your devices."
+        )
+
+    data = req.data or {}
+    device_id = data.get("device_id")
+    if not device_id:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message="No device_id provided in the data payload."
+        )
+
     try:
-        # Decode the message data
-        data = event.data.message.json
+        # 0 is a valid epoch time, only a missing value takes the default
+        end = int(time.time() * 1000 if data.get("end") is None else data["end"])
+        start = int(end - 24 * 60 * 60 * 1000 if data.get("start") is None
+                    else data["start"])
+        max_points = min(int(data.get("max_points") or HISTORY_DEFAULT_POINTS),
+                         HISTORY_MAX_POINTS)
+    except (TypeError, ValueError):
+        start = end = max_points = 0
+    if max_points < 1 or start >= end:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message="start, end and max_points must be numbers, with start before end."
+        )
+
+    try:
+        with tracer.start_as_current_span(
+            "get_moisture_history", attributes={"plantpal.device_id": device_id}
+        ):
+            # NumPy is only needed here
+            from telemetry.history import query_history
+
+            db = firestore.client()
+            # Every device of the user; raises ValueError if there are none
+            if device_id not in resolve_devices(db, req.auth.uid):
+                raise ValueError(f"Unknown device '{device_id}'")
+            return query_history(db, device_id, start, end, max_points,
+                                 cursor=data.get("cursor"))
+
+    except ValueError as e:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message=str(e)
+        )
+    except Exception as e:
+        print(f"Error in get_moisture_history: {e}")
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INTERNAL,
+            message=f"Internal error reading moisture history: {str(e)}"
+        )
+    finally:
+        flush_tracing()
+
+
+def _sse(event: dict) -> str:
+    """Format an agent stream event as a server-sent event"""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def _http_error(status: int, message: str) -> https_fn.Response:
+    """Reject a streaming request before the stream starts"""
+    return https_fn.Response(
+        json.dumps({"error": message}), status=status,
+        mimetype="application/json"
+    )
+
+
+@https_fn.on_request(
+    memory=options.MemoryOption.MB_512,
+    cpu=1,
+    concurrency=CHAT_CONCURRENCY,
+    cors=options.CorsOptions(cors_origins="*", cors_methods=["post"])
+)
+def plantpal_chat_stream(req: https_fn.Request) -> https_fn.Response:
+    """
+    PlantPal AI Chat Function, streaming variant
+    Same conversation as plantpal_chat, but the reply is sent as
+    server-sent events while it is generated so the client can render the
+    first tokens right away. Callable functions cannot stream, so this is a
+    plain HTTPS endpoint.
+
+    Request:
+        POST with "Authorization: Bearer <Firebase ID token>" and JSON body
+        - message: User's chat message (required)
+        - thread_id: Conversation thread identifier (required)
+        - existing_thread: Boolean, kept for older clients
+
+    Response (text/event-stream), one event per agent stream event:
+        - tool_start: {"tool", "status"} e.g. status "Checking sensor…"
+        - tool_end: {"tool"}
+        - token: {"text"} next chunk of the reply
+        - done: {"response", "thread_id"} full reply, last event
+        - error: {"message"} last event if the run failed
+    """
+    print("--- PlantPal Chat Stream Function Invoked ---")
+
+    # Callable functions verify the ID token for us, here we do it ourselves
+    header = req.headers.get("Authorization", "")
+    if not header.startswith("Bearer "):
+        return _http_error(401, "Missing Firebase ID token.")
+    try:
+        user_id = auth.verify_id_token(header[len("Bearer "):])["uid"]
     except Exception as e:
-        #Message was not json decodable
-        print(f"❌ Error decoding message data: {e}")
-        return
+        print(f"Error verifying ID token: {e}")
+        return _http_error(401, "Invalid Firebase ID token.")
+
+    data = req.get_json(silent=True) or {}
+    message = data.get("message")
+    thread_id = data.get("thread_id")
+    if not message:
+        return _http_error(400, "No message provided in the request body.")
+    if not thread_id:
+        return _http_error(
+            400, "No thread_id provided. Required for conversation tracking.")
+
+    from agent import get_agent
+
+    agent = get_agent(
+        thread_id=thread_id,
+        existing_thread=data.get("existing_thread", False),
+        user_id=user_id
+    )
 
-    payload = data if data else {"percentage": None, "timestamp": None} # Fallback if error
+    def events():
+        try:
+            with tracer.start_as_current_span(
+                "plantpal_chat_stream", attributes={"plantpal.thread_id": thread_id}
+            ):
+                for event in agent.stream_chat(message):
+                    if event["type"] == "done":
+                        event["thread_id"] = thread_id  # Echo back for client tracking
+                    yield _sse(event)
+        finally:
+            flush_tracing()
+
+    return https_fn.Response(
+        events(),
+        mimetype="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@https_fn.on_call()
+def register_device(req: https_fn.CallableRequest) -> any:
+    """
+    Register an IoT device to the signed-in user
+
+    Request data:
+        - device_id: Device identifier configured in the firmware (required)
+        - name: Display name for the plant/device (optional)
+        - groups: List of group names, e.g. ["living room"] (optional,
+          replaces the device's groups; omitted keeps them)
+        - auto_watering: Let the scheduler water the device (optional,
+          off for new devices)
+    """
+    if not req.auth:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
+            message="Sign in to register a device."
+        )
+
+    device_id = req.data.get("device_id")
+    if not device_id:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message="No device_id provided in the data payload."
+        )
+    auto_watering = req.data.get("auto_watering")
+    if auto_watering is not None and not isinstance(auto_watering, bool):
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message="auto_watering must be true or false."
+        )
 
     try:
-        print(f"📊 Received moisture data: {payload}")
+        register_device_for_user(
+            firestore.client(),
+            device_id=device_id,
+            owner_uid=req.auth.uid,
+            name=req.data.get("name"),
+            groups=req.data.get("groups"),
+            auto_watering=auto_watering
+        )
+        return {"success": True, "device_id": device_id}
 
+    except PermissionError as e:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.PERMISSION_DENIED,
+            message=str(e)
+        )
+    except Exception as e:
+        print(f"Error in register_device: {e}")
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INTERNAL,
+            message=f"Internal error registering device: {str(e)}"
+        )
+
+
+# Presence index cached between get_device_presence calls on this instance
+_presence = PresenceCache()
+
+
+@https_fn.on_call()
+def get_device_presence(req: https_fn.CallableRequest) -> any:
+    """
+    Online/offline state of the signed-in user's devices, from the presence
+    index (one cached query for the whole fleet)
+
+    Request data:
+        - device: Device ID or group name (optional, default all devices)
+
+    Response:
+        - devices: {device_id: {online, last_seen, since, status}}, times in
+          epoch milliseconds
+    """
+    if not req.auth:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
+            message="Sign in to see your devices."
+        )
 
-        # Store the data in Firestore
+    try:
         db = firestore.client()
-        doc_ref = db.collection('sensor_data').document("esp32") # Default to unknown for now
+        # Raises ValueError for a device or group the user does not own
+        device_ids = resolve_devices(db, req.auth.uid, (req.data or {}).get("device", ""))
+        presence = _presence.lookup(db, device_ids)
+        return {
+            "devices": {
+                device_id: {
+                    "online": p.online,
+                    "last_seen": p.last_seen,
+                    "since": p.since,
+                    "status": p.status,
+                }
+                for device_id, p in presence.items()
+            }
+        }
 
-        doc_ref.set({
-            'percentage': payload.get('percentage'),
-            'timestamp': payload.get('timestamp'),
-            'received_at': int(time.time() * 1000),
-        })
+    except ValueError as e:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message=str(e)
+        )
+    except Exception as e:
+        print(f"Error in get_device_presence: {e}")
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INTERNAL,
+            message=f"Internal error reading device presence: {str(e)}"
+        )
+
+
+@pubsub_fn.on_message_published(topic=TOPICS["data-moisture"])
+def handle_moisture_data(event: pubsub_fn.CloudEvent[pubsub_fn.MessagePublishedData]) -> None:
+    """
+    Handle incoming moisture data from IoT devices and store in Firestore.
+    Messages that fail the moisture-data schema go to the dead-letter
+    collection instead.
+    """
+    message = event.data.message
+    attributes = message.attributes
+    raw = b""
+    try:
+        # Decode and validate the message data
+        raw = decode_base64(message.data)
+        payload, error = moisture_decoder.decode(raw), None
+    except TelemetryDecodeError as e:
+        payload, error = {}, e
 
-        print(f"✅ Stored moisture data for sensor esp32 in Firestore")
+    # Readings for a request-soil command echo its traceparent, so this span
+    # joins the trace of the tool call that asked for the reading
+    try:
+        with consumer_span("handle_moisture_data", attributes, payload) as span:
+            # Store the data in Firestore: latest reading, hour bucket and the
+            # correlated request (if any) in one batch
+            db = firestore.client()
+            ingest = IngestBatch(db)
+            device_id = device_id_from(attributes, payload)
+            span.set_attribute("plantpal.device_id", device_id)
+            # Publish time is stable across redeliveries, which keeps the
+            # history ArrayUnion idempotent
+            received_at = int(message.publish_time.timestamp() * 1000)
+            if error:
+                print(f"❌ Rejected moisture data from {device_id}: {error}")
+                ingest.add_rejected("data-moisture", raw, error, received_at,
+                                    attributes, message.message_id)
+                ingest.commit_rejected()
+            else:
+                print(f"📊 Received moisture data: {payload}")
+                ingest.add_moisture(payload, received_at=received_at, device_id=device_id)
+                batch = db.batch()
+                writes = ingest.write_to(batch)
+                with firestore_span("commit", "telemetry", writes=writes):
+                    batch.commit()
+                print(f"✅ Stored moisture data for sensor {device_id} in Firestore")
 
     except Exception as e:
         print(f"❌ Error storing moisture data: {e}")
+    finally:
+        flush_tracing()
 
 
 @pubsub_fn.on_message_published(topic=TOPICS["system-status"])
 def handle_system_status(event: pubsub_fn.CloudEvent[pubsub_fn.MessagePublishedData]) -> None:
-    """Handle incoming system status updates from IoT devices and store in Firestore."""
+    """
+    Handle incoming system status updates from IoT devices and store in
+    Firestore. Messages that are not a JSON object go to the dead-letter
+    collection.
+    """
+    message = event.data.message
+    attributes = message.attributes
+    raw = b""
     try:
         # Decode the message data
-        data = event.data.message.json
+        raw = decode_base64(message.data)
+        payload, error = parse_object(raw), None
+    except TelemetryDecodeError as e:
+        payload, error = {}, e
+
+    try:
+        with consumer_span("handle_system_status", attributes, payload) as span:
+            # Store the data in Firestore (overwrites previous status)
+            db = firestore.client()
+            ingest = IngestBatch(db)
+            device_id = device_id_from(attributes, payload)
+            span.set_attribute("plantpal.device_id", device_id)
+            # Publish time is stable across redeliveries, which keeps the
+            # history ArrayUnion idempotent
+            received_at = int(message.publish_time.timestamp() * 1000)
+            if error:
+                print(f"❌ Rejected system status from {device_id}: {error}")
+                ingest.add_rejected("system-status", raw, error, received_at,
+                                    attributes, message.message_id)
+                ingest.commit_rejected()
+            else:
+                print(f"🔧 Received system status: {payload}")
+                ingest.add_system_status(payload, received_at=received_at,
+                                         device_id=device_id)
+                batch = db.batch()
+                writes = ingest.write_to(batch)
+                with firestore_span("commit", "telemetry", writes=writes):
+                    batch.commit()
+                print(f"✅ Stored system status for {device_id} in Firestore")
+
     except Exception as e:
-        # Message was not json decodable
-        print(f"❌ Error decoding system status message: {e}")
-        return
+        print(f"❌ Error storing system status: {e}")
+    finally:
+        flush_tracing()
 
-    payload = data if data else {}
 
+@pubsub_fn.on_message_published(topic=TOPICS["water-ack"])
+def handle_water_ack(event: pubsub_fn.CloudEvent[pubsub_fn.MessagePublishedData]) -> None:
+    """
+    Handle irrigation acknowledgements from IoT devices and update the
+    command ledger. Messages that fail the water-ack schema go to the
+    dead-letter collection instead.
+    """
+    message = event.data.message
+    attributes = message.attributes
+    raw = b""
     try:
-        print(f"🔧 Received system status: {payload}")
+        # Decode and validate the message data
+        raw = decode_base64(message.data)
+        payload, error = water_ack_decoder.decode(raw), None
+    except TelemetryDecodeError as e:
+        payload, error = {}, e
 
-        # Store the data in Firestore (overwrites previous status)
-        db = firestore.client()
-        doc_ref = db.collection('system_status').document('esp32')
+    try:
+        with consumer_span("handle_water_ack", attributes, payload):
+            db = firestore.client()
+            device_id = device_id_from(attributes, payload)
+            received_at = int(message.publish_time.timestamp() * 1000)
+            if error:
+                print(f"❌ Rejected water ack from {device_id}: {error}")
+                ingest = IngestBatch(db)
+                ingest.add_rejected("water-ack", raw, error, received_at,
+                                    attributes, message.message_id)
+                ingest.commit_rejected()
+                return
+
+            print(f"💧 Received water ack: {payload}")
+            command_id = record_ack(db, {**payload, "device_id": device_id},
+                                    received_at=received_at)
+            if command_id:
+                print(f"✅ Recorded {payload['status']} for irrigation command {command_id}")
+            else:
+                print(f"⚠️ Water ack for command {payload['command_id']!r} that was not "
+                      f"sent to {device_id}, ignoring")
+
+    except Exception as e:
+        print(f"❌ Error storing water ack: {e}")
+    finally:
+        flush_tracing()
+
+
+@scheduler_fn.on_schedule(
+    schedule=f"every {WATERING_SCHEDULE_MINUTES} minutes",
+    memory=options.MemoryOption.MB_512
+)
+def scheduled_watering(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    Water every device projected to get too dry before the next run, without
+    the agent. See devices/watering.py.
+    """
+    # NumPy and the Pub/Sub publisher are only needed here
+    from devices.watering import run_schedule
 
-        doc_ref.set({
-            **payload,
-            'received_at': int(time.time() * 1000)
-        })
+    try:
+        with tracer.start_as_current_span("scheduled_watering") as span:
+            summary = run_schedule(firestore.client())
+            span.set_attributes({f"plantpal.{key}": value for key, value in summary.items()})
+        print(f"💧 Scheduled watering: {summary}")
 
-        print(f"✅ Stored system status in Firestore")
+    except Exception as e:
+        print(f"❌ Error in scheduled watering: {e}")
+    finally:
+        flush_tracing()
+
+
+@scheduler_fn.on_schedule(schedule=f"every {PRESENCE_SWEEP_MINUTES} minutes")
+def presence_sweep(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    Mark devices that stopped sending status as offline, and log every
+    offline/online transition. See devices/presence.py.
+    """
+    try:
+        with tracer.start_as_current_span("presence_sweep") as span:
+            summary = sweep_presence(firestore.client())
+            span.set_attributes({f"plantpal.{key}": value for key, value in summary.items()})
+        if summary["went_offline"] or summary["came_online"]:
+            print(f"📶 Presence sweep: {summary}")
 
     except Exception as e:
-        print(f"❌ Error storing system status: {e}")
+        print(f"❌ Error in presence sweep: {e}")
+    finally:
+        flush_tracing()
+
+
+@scheduler_fn.on_schedule(
+    schedule=f"every {ROLLUP_SCHEDULE_MINUTES} minutes",
+    memory=options.MemoryOption.MB_512
+)
+def compact_moisture_history(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    Fold the raw moisture readings of the minutes closed since the last run
+    into minute/hour/day rollups and purge old raw buckets. See
+    telemetry/rollups.py.
+    """
+    # NumPy is only needed here
+    from telemetry.rollups import compact
+
+    try:
+        with tracer.start_as_current_span("compact_moisture_history") as span:
+            summary = compact(firestore.client())
+            span.set_attributes({f"plantpal.{key}": value for key, value in summary.items()})
+        print(f"🗜️ Moisture compaction: {summary}")
+
+    except Exception as e:
+        print(f"❌ Error in moisture compaction: {e}")
+    finally:
+        flush_tracing()
@@ -0,0 +1 @@
+"""Telemetry package for PlantPal Firebase Functions"""
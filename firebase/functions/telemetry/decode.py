@@ -0,0 +1,188 @@
+"""
+Telemetry Decoding
+Parses device messages with orjson and validates moisture readings and
+water acknowledgements against the Avro schemas in iot/schemas
+(moisture-data.json, water-ack.json), compiled once per process. A message
+that fails is rejected with a reason, so the handlers can dead-letter it
+(see IngestBatch.add_rejected) instead of storing a null reading.
+"""
+import base64
+import binascii
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import orjson
+
+from config import MOISTURE_SCHEMA_PATH
+
+_FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _schema_paths(filename: str, override: str = "") -> List[str]:
+    """
+    Where a schema is looked up: the override, the copy the predeploy hook
+    in firebase.json bundles with the functions, then the repo
+    """
+    return [
+        override,
+        os.path.join(_FUNCTIONS_DIR, "telemetry", "schemas", filename),
+        os.path.join(_FUNCTIONS_DIR, "..", "..", "iot", "schemas", filename),
+    ]
+
+
+# PLANTPAL_MOISTURE_SCHEMA overrides the moisture schema
+SCHEMA_PATHS = _schema_paths("moisture-data.json", MOISTURE_SCHEMA_PATH)
+WATER_ACK_SCHEMA_PATHS = _schema_paths("water-ack.json")
+
+# Value ranges the Avro types cannot express
+FIELD_RANGES: Dict[str, Tuple[float, float]] = {
+    "percentage": (0.0, 100.0),
+    "timestamp": (0, 2 ** 63 - 1),
+}
+
+# Longest string field accepted (request IDs are 32 chars, traceparents 55)
+MAX_STRING_LENGTH = 128
+
+# Python types accepted for each Avro primitive
+_AVRO_TYPES: Dict[str, Tuple[type, ...]] = {
+    "double": (float, int),
+    "float": (float, int),
+    "long": (int,),
+    "int": (int,),
+    "string": (str,),
+    "boolean": (bool,),
+    "null": (type(None),),
+}
+
+_MISSING = object()
+
+
+class TelemetryDecodeError(ValueError):
+    """A device message that cannot be stored"""
+
+    def __init__(self, reason: str, detail: str):
+        """
+        Args:
+            reason: Short machine-readable cause, used as the counter key:
+                    not_base64, not_json, not_object, missing_field,
+                    wrong_type or out_of_range (also an unknown enum symbol)
+            detail: Human-readable description
+        """
+        super().__init__(f"{reason}: {detail}")
+        self.reason = reason
+        self.detail = detail
+
+
+@dataclass(frozen=True)
+class _Field:
+    name: str
+    types: Tuple[type, ...]
+    default: Any
+    is_float: bool
+    range: Optional[Tuple[float, float]]
+    symbols: Optional[FrozenSet[str]]
+
+
+def decode_base64(data: Optional[str]) -> bytes:
+    """Message bytes from a CloudEvent's base64 data field"""
+    try:
+        return base64.b64decode(data or "", validate=True)
+    except binascii.Error as e:
+        raise TelemetryDecodeError("not_base64", str(e)) from None
+
+
+def parse_object(raw: bytes) -> Dict[str, Any]:
+    """Parse a message body that must be a JSON object"""
+    try:
+        payload = orjson.loads(raw)
+    except orjson.JSONDecodeError as e:
+        raise TelemetryDecodeError("not_json", str(e)) from None
+    if not isinstance(payload, dict):
+        raise TelemetryDecodeError("not_object", f"got {type(payload).__name__}")
+    return payload
+
+
+class RecordDecoder:
+    """Validates JSON messages against one Avro record schema"""
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.name = schema["name"]
+        self.fields = tuple(self._compile(field) for field in schema["fields"])
+
+    @classmethod
+    def from_file(cls, path: str) -> "RecordDecoder":
+        with open(path, "rb") as f:
+            return cls(orjson.loads(f.read()))
+
+    @staticmethod
+    def _compile(field: Dict[str, Any]) -> _Field:
+        avro_types = field["type"] if isinstance(field["type"], list) else [field["type"]]
+        # Enums are the only named type used: strings from a fixed set
+        enums = [t for t in avro_types if isinstance(t, dict) and t["type"] == "enum"]
+        types = tuple(t for avro_type in avro_types
+                      for t in _AVRO_TYPES["string" if avro_type in enums else avro_type])
+        return _Field(
+            name=field["name"],
+            types=types,
+            default=field.get("default", _MISSING),
+            is_float=float in types,
+            range=FIELD_RANGES.get(field["name"]),
+            symbols=frozenset(symbol for t in enums for symbol in t["symbols"]) if enums else None,
+        )
+
+    def decode(self, raw: bytes) -> Dict[str, Any]:
+        """Parse and validate one message body"""
+        return self.validate(parse_object(raw))
+
+    def validate(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Check a parsed message against the schema.
+
+        Returns:
+            The schema's fields only, with defaults filled in and doubles as
+            float
+
+        Raises:
+            TelemetryDecodeError: Missing field, wrong type or value out of range
+        """
+        record: Dict[str, Any] = {}
+        for field in self.fields:
+            value = payload.get(field.name, _MISSING)
+            if value is _MISSING:
+                if field.default is _MISSING:
+                    raise TelemetryDecodeError("missing_field", field.name)
+                record[field.name] = field.default
+                continue
+            # bool is an int subclass but never a number here
+            if not isinstance(value, field.types) or (
+                    isinstance(value, bool) and bool not in field.types):
+                raise TelemetryDecodeError(
+                    "wrong_type", f"{field.name} is {type(value).__name__}")
+            if field.is_float and value is not None:
+                value = float(value)
+                if not math.isfinite(value):
+                    raise TelemetryDecodeError("out_of_range", f"{field.name} is {value}")
+            if field.range and value is not None and not (
+                    field.range[0] <= value <= field.range[1]):
+                raise TelemetryDecodeError("out_of_range", f"{field.name} is {value}")
+            if field.symbols is not None and isinstance(value, str) and value not in field.symbols:
+                raise TelemetryDecodeError("out_of_range", f"{field.name} is {value!r}")
+            if isinstance(value, str) and len(value) > MAX_STRING_LENGTH:
+                raise TelemetryDecodeError(
+                    "out_of_range", f"{field.name} is longer than {MAX_STRING_LENGTH}")
+            record[field.name] = value
+        return record
+
+
+def _load_decoder(paths: List[str]) -> RecordDecoder:
+    for path in paths:
+        if path and os.path.exists(path):
+            return RecordDecoder.from_file(path)
+    raise FileNotFoundError(f"{os.path.basename(paths[-1])} not found in {paths}")
+
+
+# Compiled once per process, on import
+moisture_decoder = _load_decoder(SCHEMA_PATHS)
+water_ack_decoder = _load_decoder(WATER_ACK_SCHEMA_PATHS)
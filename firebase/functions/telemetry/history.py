@@ -0,0 +1,176 @@
+"""
+Moisture History Queries
+A device's moisture history for charts, read from the rollups
+(telemetry/rollups.py) instead of the raw readings:
+  - the finest resolution whose point count for the range stays within
+    max_points is used, so a 30-day chart reads a month of hour documents
+    or one or two day documents
+  - rollup documents are read in pages in span order; the cursor of the
+    next page holds the resolution and the last span read
+  - readings not compacted yet (after the watermark) are folded from the
+    raw hour buckets and added to the last page
+
+Points are returned as columns: t (bucket start, epoch ms), min, max, mean
+and count.
+"""
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from firebase_admin import firestore
+
+from config import HISTORY_PAGE_DOCUMENTS, ROLLUP_MINUTE_RETENTION_DAYS
+from telemetry.rollups import (
+    DAY,
+    DAY_MS,
+    RESOLUTIONS,
+    ROLLUPS_COLLECTION,
+    Resolution,
+    Rollup,
+    fold,
+    load_watermark,
+)
+from telemetry.storage import load_samples
+from utils.tracing import firestore_span
+
+# Decimals kept in the payload
+_DECIMALS = 2
+
+
+def choose_resolution(
+    start_ms: int,
+    end_ms: int,
+    max_points: int,
+    now_ms: Optional[int] = None
+) -> Resolution:
+    """
+    Finest resolution with at most max_points points in [start_ms, end_ms).
+    Minute points are only used while they are kept; day points always are.
+    """
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    for resolution in RESOLUTIONS:
+        if resolution.name == "minute" and \
+                start_ms < now_ms - ROLLUP_MINUTE_RETENTION_DAYS * DAY_MS:
+            continue
+        if -(-(end_ms - start_ms) // resolution.step_ms) <= max_points:
+            return resolution
+    return DAY
+
+
+def encode_cursor(resolution: Resolution, span_start: int) -> str:
+    return f"{resolution.name}:{span_start}"
+
+
+def decode_cursor(cursor: str) -> Tuple[Resolution, int]:
+    """Resolution and last span read of a page cursor, ValueError if invalid"""
+    name, _, span = str(cursor).partition(":")
+    for resolution in RESOLUTIONS:
+        if resolution.name == name and span.isdigit():
+            return resolution, int(span)
+    raise ValueError(f"Invalid cursor '{cursor}'")
+
+
+def _columns(points: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, List[Any]]:
+    return {
+        "t": [t for t, _ in points],
+        "min": [round(point['min'], _DECIMALS) for _, point in points],
+        "max": [round(point['max'], _DECIMALS) for _, point in points],
+        "mean": [round(point['mean'], _DECIMALS) for _, point in points],
+        "count": [point['count'] for _, point in points],
+    }
+
+
+def _recent_points(
+    db: Any,
+    device_id: str,
+    resolution: Resolution,
+    start_ms: int,
+    end_ms: int
+) -> List[Tuple[int, Dict[str, Any]]]:
+    """Points of the readings in [start_ms, end_ms), folded from the raw buckets"""
+    samples = load_samples(db, device_id, start_ms, end_ms)
+    if not samples:
+        return []
+    t, p = (np.asarray(column) for column in zip(*samples))
+    folded = fold(Rollup.of_readings(np.zeros(len(t), dtype=np.int64), t, p), resolution.step_ms)
+    return [
+        (t, {'min': low, 'max': high, 'mean': mean, 'count': count})
+        for t, low, high, mean, count in zip(
+            folded.t.tolist(), folded.minimum.tolist(), folded.maximum.tolist(),
+            folded.mean.tolist(), folded.count.tolist())
+    ]
+
+
+def query_history(
+    db: Any,
+    device_id: str,
+    start_ms: int,
+    end_ms: int,
+    max_points: int,
+    cursor: Optional[str] = None,
+    page_documents: int = HISTORY_PAGE_DOCUMENTS,
+    now_ms: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    One page of a device's moisture history in [start_ms, end_ms)
+
+    Args:
+        db: Firestore client
+        device_id: Device to read
+        start_ms: Range start, epoch milliseconds (inclusive)
+        end_ms: Range end, epoch milliseconds (exclusive)
+        max_points: Most points for the whole range, picks the resolution
+        cursor: next_cursor of the previous page, None for the first page
+        page_documents: Rollup documents read per page
+        now_ms: Current time, epoch milliseconds
+
+    Returns:
+        device_id, resolution, step_ms, the columns t, min, max, mean and
+        count, and next_cursor (None on the last page)
+    """
+    if cursor:
+        resolution, after = decode_cursor(cursor)
+    else:
+        resolution, after = choose_resolution(start_ms, end_ms, max_points, now_ms), None
+    # Points whose bucket overlaps the range
+    aligned_start = start_ms - start_ms % resolution.step_ms
+
+    query = (db.collection(ROLLUPS_COLLECTION)
+             .where(filter=firestore.FieldFilter('device_id', '==', device_id))
+             .where(filter=firestore.FieldFilter('resolution', '==', resolution.name)))
+    if after is not None:
+        query = query.where(filter=firestore.FieldFilter('span_start', '>', after))
+    else:
+        query = query.where(filter=firestore.FieldFilter(
+            'span_start', '>=', resolution.span_start(aligned_start)))
+    query = (query.where(filter=firestore.FieldFilter('span_start', '<', end_ms))
+             .order_by('span_start').limit(page_documents))
+
+    points: List[Tuple[int, Dict[str, Any]]] = []
+    with firestore_span("query", ROLLUPS_COLLECTION, device_id=device_id,
+                        resolution=resolution.name):
+        documents = [snapshot.to_dict() or {} for snapshot in query.stream()]
+    for document in documents:
+        span = document['span_start']
+        for slot, point in sorted((document.get('points') or {}).items()):
+            t = span + int(slot) * resolution.step_ms
+            if aligned_start <= t < end_ms:
+                points.append((t, point))
+
+    next_cursor = None
+    if len(documents) == page_documents:
+        next_cursor = encode_cursor(resolution, documents[-1]['span_start'])
+    else:
+        # Last page: buckets from the watermark on are not rolled up yet
+        watermark = load_watermark(db) or 0
+        recent_start = max(aligned_start, watermark - watermark % resolution.step_ms)
+        if recent_start < end_ms:
+            points += _recent_points(db, device_id, resolution, recent_start, end_ms)
+
+    return {
+        "device_id": device_id,
+        "resolution": resolution.name,
+        "step_ms": resolution.step_ms,
+        **_columns(points),
+        "next_cursor": next_cursor,
+    }
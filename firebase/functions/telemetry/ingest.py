@@ -0,0 +1,223 @@
+"""
+Telemetry Ingestion
+Turns decoded device messages into Firestore writes, coalescing a batch of
+messages into the minimum set of document writes
+
+Used by the per-message Pub/Sub handlers in main.py (with a WriteBatch) and
+by the streaming-pull bulk worker (with a BulkWriter); both expose `set`.
+Rejected messages are dead-lettered in their own transaction, so their
+counters only move the first time a message is seen.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from firebase_admin import firestore
+
+from devices.presence import PRESENCE_COLLECTION, last_seen_update
+from devices.registry import DEFAULT_DEVICE_ID
+from telemetry.decode import TelemetryDecodeError
+from telemetry.storage import append_samples, bucket_start
+from utils.tracing import firestore_span
+
+# How long per-request sensor readings are kept for the waiting tool
+SENSOR_REQUEST_TTL = timedelta(hours=1)
+
+# Rejected messages, kept for inspection, and per-topic reject counters
+DEAD_LETTER_COLLECTION = "telemetry_dead_letter"
+DEAD_LETTER_STATS_COLLECTION = "telemetry_dead_letter_stats"
+DEAD_LETTER_TTL = timedelta(days=7)
+# Bytes of a rejected message body kept in its dead-letter document
+DEAD_LETTER_MAX_BYTES = 1024
+
+
+class IngestBatch:
+    """
+    Accumulates telemetry and emits coalesced writes:
+      - sensor_data/{device} and system_status/{device} get one set with the
+        newest message per device
+      - each presence index shard gets one merge with the last-seen time of
+        its devices that sent status
+      - each hour bucket gets one ArrayUnion with all of its new samples
+      - each correlated request gets its own sensor_requests document
+    Rejected messages are committed separately by `commit_rejected`.
+    """
+
+    def __init__(self, db: Any):
+        self.db = db
+        self._latest_moisture: Dict[str, Dict[str, Any]] = {}
+        self._latest_status: Dict[str, Dict[str, Any]] = {}
+        self._buckets: Dict[Tuple[str, int], List[Tuple[int, float]]] = {}
+        self._requests: Dict[str, Dict[str, Any]] = {}
+        self._rejected: List[Dict[str, Any]] = []
+
+    def add_moisture(
+        self,
+        payload: Dict[str, Any],
+        received_at: int,
+        device_id: str = DEFAULT_DEVICE_ID
+    ) -> None:
+        """Add one moisture message
+
+        Args:
+            payload: Decoded message body (percentage, timestamp, request_id)
+            received_at: Server receive time, epoch milliseconds
+            device_id: Device that sent the message
+        """
+        reading = {
+            'percentage': payload.get('percentage'),
+            'timestamp': payload.get('timestamp'),
+            'received_at': received_at,
+        }
+        latest = self._latest_moisture.get(device_id)
+        if latest is None or latest['received_at'] <= received_at:
+            self._latest_moisture[device_id] = reading
+
+        # Device timestamps are time since boot, so samples use received_at
+        if reading['percentage'] is not None:
+            self._buckets.setdefault(
+                (device_id, bucket_start(received_at)), []
+            ).append((received_at, reading['percentage']))
+
+        request_id = payload.get('request_id')
+        if request_id:
+            self._requests[request_id] = reading
+
+    def add_system_status(
+        self,
+        payload: Dict[str, Any],
+        received_at: int,
+        device_id: str = DEFAULT_DEVICE_ID
+    ) -> None:
+        """Add one system status message
+
+        Args:
+            payload: Decoded message body
+            received_at: Server receive time, epoch milliseconds
+            device_id: Device that sent the message
+        """
+        latest = self._latest_status.get(device_id)
+        if latest is None or latest['received_at'] <= received_at:
+            self._latest_status[device_id] = {**payload, 'received_at': received_at}
+
+    def add_rejected(
+        self,
+        topic: str,
+        raw: bytes,
+        error: TelemetryDecodeError,
+        received_at: int,
+        attributes: Optional[Mapping[str, str]] = None,
+        message_id: str = ""
+    ) -> None:
+        """Add one message that failed decoding, for the dead-letter collection
+
+        Args:
+            topic: Short topic name, e.g. "data-moisture"
+            raw: Message body as received
+            error: Why the message was rejected
+            received_at: Server receive time, epoch milliseconds
+            attributes: Pub/Sub message attributes
+            message_id: Pub/Sub message ID, names the dead-letter document so
+                        a redelivery is recognized and not counted again
+        """
+        self._rejected.append({
+            'topic': topic,
+            'reason': error.reason,
+            'detail': error.detail,
+            'raw': raw[:DEAD_LETTER_MAX_BYTES].decode('utf-8', errors='replace'),
+            'attributes': dict(attributes or {}),
+            'message_id': message_id,
+            'received_at': received_at,
+        })
+
+    def write_to(self, writer: Any) -> int:
+        """
+        Queue the coalesced writes on a WriteBatch or BulkWriter.
+
+        Returns:
+            Number of document writes queued
+        """
+        writes = 0
+        for device_id, reading in self._latest_moisture.items():
+            writer.set(self.db.collection('sensor_data').document(device_id),
+                       reading)
+            writes += 1
+
+        # One ArrayUnion per bucket, idempotent under redelivery
+        for (device_id, _), samples in self._buckets.items():
+            append_samples(writer, self.db, device_id, samples)
+            writes += 1
+
+        # Hand readings to the requests waiting on their correlation IDs.
+        # Request documents expire through a TTL policy on expire_at.
+        expire_at = datetime.now(timezone.utc) + SENSOR_REQUEST_TTL
+        for request_id, reading in self._requests.items():
+            writer.set(self.db.collection('sensor_requests').document(request_id),
+                       {**reading, 'expire_at': expire_at})
+            writes += 1
+
+        presence: Dict[str, Dict[str, Any]] = {}
+        for device_id, status in self._latest_status.items():
+            writer.set(self.db.collection('system_status').document(device_id),
+                       status)
+            writes += 1
+            reported = status.get('status')
+            shard, update = last_seen_update(
+                device_id, status['received_at'],
+                reported if isinstance(reported, str) else None)
+            presence.setdefault(shard, {}).update(update['devices'])
+
+        for shard, devices in presence.items():
+            writer.set(self.db.collection(PRESENCE_COLLECTION).document(shard),
+                       {'devices': devices}, merge=True)
+            writes += 1
+
+        return writes
+
+    def commit_rejected(self) -> int:
+        """
+        Create the dead-letter documents and bump the per-topic counters in
+        one transaction. A redelivered message finds its document (named by
+        its message ID) already there and is neither rewritten nor counted.
+
+        Returns:
+            Number of messages dead-lettered for the first time
+        """
+        if not self._rejected:
+            return 0
+        collection = self.db.collection(DEAD_LETTER_COLLECTION)
+        rejected_by_ref = {}
+        for rejected in self._rejected:
+            reference = (collection.document(rejected['message_id'])
+                         if rejected['message_id'] else collection.document())
+            rejected_by_ref[reference.path] = (reference, rejected)
+
+        @firestore.transactional
+        def _dead_letter(transaction) -> int:
+            references = [reference for reference, _ in rejected_by_ref.values()]
+            existing = {snapshot.reference.path
+                        for snapshot in self.db.get_all(references, transaction=transaction)
+                        if snapshot.exists}
+            expire_at = datetime.now(timezone.utc) + DEAD_LETTER_TTL
+            counters: Dict[str, Dict[str, Any]] = {}
+            for path, (reference, rejected) in rejected_by_ref.items():
+                if path in existing:
+                    continue
+                transaction.set(reference, {**rejected, 'expire_at': expire_at})
+
+                counter = counters.setdefault(
+                    rejected['topic'], {'total': 0, 'reasons': {}, 'last_rejected_at': 0})
+                counter['total'] += 1
+                counter['reasons'][rejected['reason']] = counter['reasons'].get(rejected['reason'], 0) + 1
+                counter['last_rejected_at'] = max(counter['last_rejected_at'], rejected['received_at'])
+
+            for topic, counter in counters.items():
+                transaction.set(self.db.collection(DEAD_LETTER_STATS_COLLECTION).document(topic), {
+                    'total': firestore.Increment(counter['total']),
+                    'reasons': {reason: firestore.Increment(count)
+                                for reason, count in counter['reasons'].items()},
+                    'last_rejected_at': counter['last_rejected_at'],
+                }, merge=True)
+            return sum(counter['total'] for counter in counters.values())
+
+        with firestore_span("transaction", DEAD_LETTER_COLLECTION):
+            return _dead_letter(self.db.transaction())
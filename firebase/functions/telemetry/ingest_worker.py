@@ -0,0 +1,249 @@
+"""
+Streaming-Pull Bulk Ingestion Worker
+Long-running alternative to the per-message Pub/Sub functions. Drains the
+data-moisture and system-status subscriptions in large batches, coalesces
+each batch with IngestBatch and commits it through a Firestore BulkWriter.
+
+Messages are acked only after their batch is committed and redeliveries are
+dropped by Pub/Sub message ID.
+
+Run:
+    python -m telemetry.ingest_worker
+"""
+import argparse
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.cloud import pubsub_v1
+
+from config import SUBSCRIPTIONS
+from devices.registry import device_id_from
+from telemetry.decode import TelemetryDecodeError, moisture_decoder, parse_object
+from telemetry.ingest import IngestBatch
+from utils.tracing import firestore_span
+
+
+class _SeenMessages:
+    """Bounded LRU of committed Pub/Sub message IDs"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._ids: "OrderedDict[str, None]" = OrderedDict()
+
+    def __contains__(self, message_id: str) -> bool:
+        return message_id in self._ids
+
+    def add(self, message_id: str) -> None:
+        self._ids[message_id] = None
+        self._ids.move_to_end(message_id)
+        while len(self._ids) > self.capacity:
+            self._ids.popitem(last=False)
+
+
+class IngestWorker:
+    """
+    Pulls telemetry with streaming pull and writes it to Firestore in bulk
+    """
+
+    def __init__(
+            self,
+            db: Any,
+            subscriber: Any = None,
+            batch_size: int = 500,
+            max_latency_seconds: float = 1.0,
+            dedupe_capacity: int = 100_000,
+            max_write_attempts: int = 5,
+            ):
+        """Initialize the worker
+
+        Args:
+            db: Firestore client
+            subscriber: Pub/Sub SubscriberClient, created if not given
+            batch_size: Maximum messages committed per batch
+            max_latency_seconds: Maximum time a message waits for its batch
+            dedupe_capacity: Number of recent message IDs remembered
+            max_write_attempts: BulkWriter attempts before a write fails
+        """
+        self.db = db
+        self.subscriber = subscriber or pubsub_v1.SubscriberClient()
+        self.batch_size = batch_size
+        self.max_latency_seconds = max_latency_seconds
+        self.max_write_attempts = max_write_attempts
+        self.stats = {
+            'received': 0, 'acked': 0, 'nacked': 0, 'duplicates': 0,
+            'invalid': 0, 'batches': 0, 'writes': 0,
+        }
+
+        self._seen = _SeenMessages(dedupe_capacity)
+        self._queue: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        self._pulls: List[Any] = []
+        self._stop = threading.Event()
+
+    def start(self, subscriptions: Optional[Dict[str, str]] = None) -> None:
+        """Open a streaming pull per subscription
+
+        Args:
+            subscriptions: topic name ("data-moisture" or "system-status")
+                           -> subscription path, defaults to config
+        """
+        subscriptions = subscriptions or SUBSCRIPTIONS
+        flow_control = pubsub_v1.types.FlowControl(
+            max_messages=self.batch_size * 2
+        )
+        for kind, subscription in subscriptions.items():
+            self._pulls.append(self.subscriber.subscribe(
+                subscription,
+                callback=lambda message, kind=kind: self._queue.put((kind, message)),
+                flow_control=flow_control,
+            ))
+            print(f"📥 Streaming pull started on {subscription}")
+
+    def stop(self) -> None:
+        """Stop pulling and let the run loop exit after its current batch"""
+        self._stop.set()
+        for pull in self._pulls:
+            pull.cancel()
+        self._pulls = []
+
+    def run(self) -> None:
+        """Process batches until stop() is called"""
+        while not self._stop.is_set():
+            items = self._drain()
+            if items:
+                self.process_batch(items)
+
+    def _drain(self) -> List[Tuple[str, Any]]:
+        """Collect up to batch_size messages, waiting at most max_latency"""
+        try:
+            items = [self._queue.get(timeout=self.max_latency_seconds)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_latency_seconds
+        while len(items) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def process_batch(self, items: List[Tuple[str, Any]]) -> None:
+        """
+        Decode, dedupe and commit a batch, then ack or nack its messages.
+
+        Args:
+            items: (topic name, Pub/Sub message) pairs
+        """
+        self.stats['received'] += len(items)
+        ingest = IngestBatch(self.db)
+        pending: List[Any] = []
+        batch_ids = set()
+
+        for kind, message in items:
+            message_id = message.message_id
+            if message_id in self._seen or message_id in batch_ids:
+                # Already committed (or queued in this batch): safe to ack
+                self.stats['duplicates'] += 1
+                pending.append(message)
+                continue
+            # Publish time is stable across redeliveries, which keeps the
+            # history ArrayUnion idempotent
+            received_at = int(message.publish_time.timestamp() * 1000)
+            try:
+                if kind == "data-moisture":
+                    payload = moisture_decoder.decode(message.data)
+                else:
+                    payload = parse_object(message.data)
+            except TelemetryDecodeError as e:
+                # Dead-lettered after the batch commits, acked with it
+                print(f"❌ Rejected message {message_id}: {e}")
+                self.stats['invalid'] += 1
+                ingest.add_rejected(kind, message.data, e, received_at,
+                                    message.attributes, message_id)
+                batch_ids.add(message_id)
+                pending.append(message)
+                continue
+
+            device_id = device_id_from(message.attributes, payload)
+            if kind == "data-moisture":
+                ingest.add_moisture(payload, received_at, device_id)
+            else:
+                ingest.add_system_status(payload, received_at, device_id)
+            batch_ids.add(message_id)
+            pending.append(message)
+
+        if not pending:
+            return
+
+        if self._commit(ingest):
+            for message_id in batch_ids:
+                self._seen.add(message_id)
+            for message in pending:
+                message.ack()
+            self.stats['acked'] += len(pending)
+        else:
+            # Writes are idempotent, so redelivery of the whole batch is safe
+            for message in pending:
+                message.nack()
+            self.stats['nacked'] += len(pending)
+
+    def _commit(self, ingest: IngestBatch) -> bool:
+        """Write a coalesced batch with a BulkWriter, True on success"""
+        failures: List[Any] = []
+
+        def on_write_error(failure, bulk_writer) -> bool:
+            if failure.attempts < self.max_write_attempts:
+                return True
+            failures.append(failure)
+            return False
+
+        writer = self.db.bulk_writer()
+        writer.on_write_error(on_write_error)
+        try:
+            with firestore_span("bulk_write", "telemetry") as span:
+                writes = ingest.write_to(writer)
+                span.set_attribute("plantpal.writes", writes)
+                writer.close()  # flushes and waits for every write
+            ingest.commit_rejected()
+        except Exception as e:
+            print(f"❌ Bulk commit failed: {e}")
+            return False
+
+        self.stats['batches'] += 1
+        self.stats['writes'] += writes
+        if failures:
+            print(f"❌ {len(failures)} writes failed: {failures[0].message}")
+            return False
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-latency", type=float, default=1.0,
+                        help="Seconds a message may wait for its batch")
+    args = parser.parse_args()
+
+    from firebase_admin import initialize_app, firestore
+    initialize_app()
+
+    worker = IngestWorker(
+        db=firestore.client(),
+        batch_size=args.batch_size,
+        max_latency_seconds=args.max_latency,
+    )
+    worker.start()
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+    print(f"Ingestion stats: {worker.stats}")
+
+
+if __name__ == "__main__":
+    main()
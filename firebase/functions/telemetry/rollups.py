@@ -0,0 +1,347 @@
+"""
+Moisture Rollups
+Tiered retention of the moisture history. A scheduled compaction job folds
+the raw readings (telemetry/storage.py hour buckets) into rollups at three
+resolutions, each point holding the min, max, mean and count of a bucket:
+
+    minute   one document per device per hour, expires after a while
+    hour     one document per device per day
+    day      one document per device per month
+
+Layout:
+    moisture_rollups/{device_id}_{resolution}_{span}
+        device_id:   Device the points belong to
+        resolution:  "minute", "hour" or "day"
+        span_start:  Start of the span the document covers, epoch ms (UTC)
+        points:      {slot: {min, max, mean, count}}, slot = steps from span_start
+        expire_at:   Minute rollups only (TTL policy)
+    rollup_state/moisture
+        watermark:   Readings before it are compacted, epoch ms
+
+Each run compacts the readings between the watermark and the last closed
+minute, then moves the watermark. Only closed buckets are written: a minute
+once it ended plus a grace period, an hour or a day once its last minute is
+in. Points are merged in by slot, so a run that fails before moving the
+watermark is repeated as is by the next one.
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from firebase_admin import firestore
+
+from config import (
+    RAW_RETENTION_DAYS,
+    ROLLUP_GRACE_MINUTES,
+    ROLLUP_MAX_HOURS_PER_RUN,
+    ROLLUP_MINUTE_RETENTION_DAYS,
+    ROLLUP_PURGE_LIMIT,
+)
+from telemetry.storage import BUCKET_MS, HOURLY_SUBCOLLECTION, bucket_start
+from utils.tracing import firestore_span
+
+ROLLUPS_COLLECTION = "moisture_rollups"
+ROLLUP_STATE_COLLECTION = "rollup_state"
+ROLLUP_STATE_DOCUMENT = "moisture"
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = BUCKET_MS
+DAY_MS = 24 * HOUR_MS
+
+# Writes per WriteBatch
+_BATCH_LIMIT = 500
+
+
+@dataclass(frozen=True)
+class Resolution:
+    """A rollup resolution and the span each of its documents covers"""
+    name: str
+    step_ms: int
+    span_format: str  # strftime of the span, e.g. one hour for minute points
+
+    def span_start(self, timestamp_ms: int) -> int:
+        """Start of the span containing a timestamp (epoch ms)"""
+        moment = datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+        start = datetime.strptime(moment.strftime(self.span_format), self.span_format)
+        return int(start.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+    def document_id(self, device_id: str, span_start: int) -> str:
+        moment = datetime.fromtimestamp(span_start / 1000, tz=timezone.utc)
+        return f"{device_id}_{self.name}_{moment.strftime(self.span_format)}"
+
+
+MINUTE = Resolution("minute", MINUTE_MS, "%Y%m%d%H")
+HOUR = Resolution("hour", HOUR_MS, "%Y%m%d")
+DAY = Resolution("day", DAY_MS, "%Y%m")
+RESOLUTIONS = (MINUTE, HOUR, DAY)  # Finest first
+
+
+@dataclass
+class Rollup:
+    """Rollup points of many devices as flat arrays"""
+    device_index: np.ndarray  # Position in the device list of each point
+    t: np.ndarray             # Bucket start, epoch ms
+    minimum: np.ndarray
+    maximum: np.ndarray
+    total: np.ndarray         # Sum of the readings
+    count: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self.total / self.count
+
+    @classmethod
+    def of_readings(cls, device_index: np.ndarray, t: np.ndarray, p: np.ndarray) -> "Rollup":
+        """Raw readings as points with a count of one"""
+        return cls(device_index, t, p, p, p, np.ones(len(t), dtype=np.int64))
+
+    def select(self, mask: np.ndarray) -> "Rollup":
+        return Rollup(self.device_index[mask], self.t[mask], self.minimum[mask],
+                      self.maximum[mask], self.total[mask], self.count[mask])
+
+
+def fold(points: Rollup, step_ms: int) -> Rollup:
+    """
+    Combine points into per-device buckets of step_ms, in one vectorized
+    pass. Works on raw readings and on finer rollups alike.
+    """
+    if len(points) == 0:
+        return points
+    buckets = points.t - points.t % step_ms
+    order = np.lexsort((buckets, points.device_index))
+    index, buckets = points.device_index[order], buckets[order]
+    starts = np.flatnonzero(np.concatenate((
+        [True], (np.diff(index) != 0) | (np.diff(buckets) != 0))))
+    return Rollup(
+        device_index=index[starts],
+        t=buckets[starts],
+        minimum=np.minimum.reduceat(points.minimum[order], starts),
+        maximum=np.maximum.reduceat(points.maximum[order], starts),
+        total=np.add.reduceat(points.total[order], starts),
+        count=np.add.reduceat(points.count[order], starts),
+    )
+
+
+def load_readings(db: Any, start_ms: int, end_ms: int) -> Tuple[List[str], Rollup]:
+    """
+    Raw readings in [start_ms, end_ms) of every device, from one collection
+    group query over the hour buckets
+
+    Returns:
+        (device IDs, readings whose device_index points into them)
+    """
+    positions: Dict[str, int] = {}
+    index: List[int] = []
+    times: List[int] = []
+    values: List[float] = []
+    query = (db.collection_group(HOURLY_SUBCOLLECTION)
+             .where(filter=firestore.FieldFilter('bucket_start', '>=', bucket_start(start_ms)))
+             .where(filter=firestore.FieldFilter('bucket_start', '<', end_ms)))
+    with firestore_span("query", HOURLY_SUBCOLLECTION):
+        for snapshot in query.stream():
+            bucket = snapshot.to_dict() or {}
+            position = positions.setdefault(bucket.get('device_id'), len(positions))
+            for sample in bucket.get('samples', []):
+                if start_ms <= sample['t'] < end_ms:
+                    index.append(position)
+                    times.append(sample['t'])
+                    values.append(sample['p'])
+    return list(positions), Rollup.of_readings(
+        np.asarray(index, dtype=np.int64),
+        np.asarray(times, dtype=np.int64),
+        np.asarray(values, dtype=np.float64),
+    )
+
+
+def load_rollups(db: Any, resolution: Resolution, span_start: int) -> Tuple[List[str], Rollup]:
+    """Stored points of every device in one span of a resolution"""
+    positions: Dict[str, int] = {}
+    columns: Dict[str, List[float]] = {key: [] for key in ('i', 't', 'min', 'max', 'mean', 'count')}
+    query = (db.collection(ROLLUPS_COLLECTION)
+             .where(filter=firestore.FieldFilter('resolution', '==', resolution.name))
+             .where(filter=firestore.FieldFilter('span_start', '==', span_start)))
+    with firestore_span("query", ROLLUPS_COLLECTION, resolution=resolution.name):
+        for snapshot in query.stream():
+            document = snapshot.to_dict() or {}
+            position = positions.setdefault(document.get('device_id'), len(positions))
+            for slot, point in (document.get('points') or {}).items():
+                columns['i'].append(position)
+                columns['t'].append(span_start + int(slot) * resolution.step_ms)
+                for key in ('min', 'max', 'mean', 'count'):
+                    columns[key].append(point[key])
+    count = np.asarray(columns['count'], dtype=np.int64)
+    return list(positions), Rollup(
+        device_index=np.asarray(columns['i'], dtype=np.int64),
+        t=np.asarray(columns['t'], dtype=np.int64),
+        minimum=np.asarray(columns['min'], dtype=np.float64),
+        maximum=np.asarray(columns['max'], dtype=np.float64),
+        total=np.asarray(columns['mean'], dtype=np.float64) * count,
+        count=count,
+    )
+
+
+def rollup_documents(
+    device_ids: List[str],
+    points: Rollup,
+    resolution: Resolution,
+    expire_after_ms: Optional[int] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Merge data of the rollup documents holding the points, by document ID
+
+    Args:
+        device_ids: Devices the points' device_index refers to
+        points: Points at the resolution's step
+        resolution: Resolution of the points
+        expire_after_ms: Sets expire_at this long after each span's start
+    """
+    documents: Dict[str, Dict[str, Any]] = {}
+    spans: Dict[int, int] = {}
+    mean = points.mean.tolist()
+    columns = zip(points.device_index.tolist(), points.t.tolist(), points.minimum.tolist(),
+                  points.maximum.tolist(), mean, points.count.tolist())
+    for position, t, low, high, average, count in columns:
+        span = spans.get(t)
+        if span is None:
+            span = spans[t] = resolution.span_start(t)
+        device_id = device_ids[position]
+        document_id = resolution.document_id(device_id, span)
+        document = documents.get(document_id)
+        if document is None:
+            document = documents[document_id] = {
+                'device_id': device_id,
+                'resolution': resolution.name,
+                'span_start': span,
+                'points': {},
+            }
+            if expire_after_ms is not None:
+                document['expire_at'] = datetime.fromtimestamp(
+                    (span + expire_after_ms) / 1000, tz=timezone.utc)
+        document['points'][f"{(t - span) // resolution.step_ms:02d}"] = {
+            'min': low, 'max': high, 'mean': average, 'count': count}
+    return documents
+
+
+def _commit(db: Any, documents: Dict[str, Dict[str, Any]]) -> None:
+    items = list(documents.items())
+    for start in range(0, len(items), _BATCH_LIMIT):
+        batch = db.batch()
+        for document_id, data in items[start:start + _BATCH_LIMIT]:
+            batch.set(db.collection(ROLLUPS_COLLECTION).document(document_id), data, merge=True)
+        with firestore_span("commit", ROLLUPS_COLLECTION, writes=len(batch)):
+            batch.commit()
+
+
+def _state(db: Any) -> Any:
+    return db.collection(ROLLUP_STATE_COLLECTION).document(ROLLUP_STATE_DOCUMENT)
+
+
+def load_watermark(db: Any) -> Optional[int]:
+    """Time before which readings are compacted, None before the first run"""
+    with firestore_span("get", ROLLUP_STATE_COLLECTION):
+        return (_state(db).get().to_dict() or {}).get('watermark')
+
+
+def _oldest_reading(db: Any) -> Optional[int]:
+    """Start of the oldest raw hour bucket, None without any"""
+    query = (db.collection_group(HOURLY_SUBCOLLECTION)
+             .order_by('bucket_start').limit(1).select(['bucket_start']))
+    with firestore_span("query", HOURLY_SUBCOLLECTION):
+        for snapshot in query.stream():
+            return snapshot.to_dict()['bucket_start']
+    return None
+
+
+def purge_raw(db: Any, before_ms: int, limit: int = ROLLUP_PURGE_LIMIT) -> int:
+    """
+    Delete raw hour buckets that start before before_ms
+
+    Returns:
+        Number of buckets deleted, at most limit
+    """
+    query = (db.collection_group(HOURLY_SUBCOLLECTION)
+             .where(filter=firestore.FieldFilter('bucket_start', '<', before_ms))
+             .limit(limit).select(['bucket_start']))
+    with firestore_span("query", HOURLY_SUBCOLLECTION):
+        references = [snapshot.reference for snapshot in query.stream()]
+    for start in range(0, len(references), _BATCH_LIMIT):
+        batch = db.batch()
+        for reference in references[start:start + _BATCH_LIMIT]:
+            batch.delete(reference)
+        with firestore_span("commit", HOURLY_SUBCOLLECTION, writes=len(batch)):
+            batch.commit()
+    return len(references)
+
+
+def compact(
+    db: Any,
+    now_ms: Optional[int] = None,
+    grace_minutes: float = ROLLUP_GRACE_MINUTES,
+    max_hours: int = ROLLUP_MAX_HOURS_PER_RUN,
+    raw_retention_days: float = RAW_RETENTION_DAYS
+) -> Dict[str, int]:
+    """
+    Compact the readings of the minutes closed since the last run
+
+    Args:
+        db: Firestore client
+        now_ms: Current time, epoch milliseconds
+        grace_minutes: Wait for late readings before a minute is closed
+        max_hours: Most hours compacted in one run, the rest in the next
+        raw_retention_days: Age past which compacted raw buckets are purged,
+            0 keeps them
+
+    Returns:
+        Points written per resolution, rollup documents written, raw buckets
+        purged and the new watermark
+    """
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    closed_until = int(now_ms - grace_minutes * MINUTE_MS)
+    closed_until -= closed_until % MINUTE_MS
+
+    watermark = load_watermark(db)
+    if watermark is None:
+        # First run: start from the oldest reading kept
+        oldest = _oldest_reading(db)
+        watermark = oldest if oldest is not None else closed_until
+
+    summary = {"minute": 0, "hour": 0, "day": 0, "documents": 0, "purged": 0}
+    end = min(closed_until, bucket_start(watermark) + max_hours * HOUR_MS)
+    if end > watermark:
+        # Whole hour buckets are loaded so the hours closing now are complete
+        device_ids, readings = load_readings(db, bucket_start(watermark), end)
+        minutes = fold(readings.select(readings.t >= watermark), MINUTE_MS)
+        hours = fold(readings, HOUR_MS)
+        hours = hours.select((hours.t + HOUR_MS > watermark) & (hours.t + HOUR_MS <= end))
+        documents = rollup_documents(device_ids, minutes, MINUTE,
+                                     expire_after_ms=ROLLUP_MINUTE_RETENTION_DAYS * DAY_MS)
+        documents.update(rollup_documents(device_ids, hours, HOUR))
+        _commit(db, documents)
+        summary.update(minute=len(minutes), hour=len(hours), documents=len(documents))
+
+        # Days closing now, from the hour points of each device (just written)
+        for day_end in range(watermark - watermark % DAY_MS + DAY_MS, end + 1, DAY_MS):
+            day_devices, day_hours = load_rollups(db, HOUR, day_end - DAY_MS)
+            days = fold(day_hours, DAY_MS)
+            day_documents = rollup_documents(day_devices, days, DAY)
+            _commit(db, day_documents)
+            summary["day"] += len(days)
+            summary["documents"] += len(day_documents)
+
+        watermark = end
+        with firestore_span("set", ROLLUP_STATE_COLLECTION):
+            _state(db).set({'watermark': watermark, 'updated_at': now_ms}, merge=True)
+
+    if raw_retention_days:
+        # Whole buckets past the retention age, and compacted: ended before
+        # the watermark
+        cutoff = min(bucket_start(now_ms - int(raw_retention_days * DAY_MS)),
+                     bucket_start(watermark))
+        summary["purged"] = purge_raw(db, cutoff)
+    summary["watermark"] = watermark
+    return summary
@@ -0,0 +1,105 @@
+"""
+Moisture Telemetry Storage
+Append-only, hour-bucketed time series of moisture readings in Firestore
+
+Layout:
+    sensor_history/{device_id}/hourly/{YYYYMMDDHH}
+        device_id:    Device that produced the samples
+        bucket_start: Bucket start, epoch milliseconds (UTC hour)
+        samples:      [{"t": epoch ms, "p": percentage}, ...]
+
+One document per device per hour keeps full history without a document per
+reading, and stays far below Firestore's 1 MiB document size and sustained
+one-write-per-second-per-document limits at the device reporting rate.
+"""
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Sequence, Tuple
+
+from firebase_admin import firestore
+
+from utils.tracing import firestore_span
+
+SENSOR_HISTORY_COLLECTION = "sensor_history"
+HOURLY_SUBCOLLECTION = "hourly"
+BUCKET_MS = 60 * 60 * 1000
+
+
+def bucket_start(timestamp_ms: int) -> int:
+    """Start of the hour bucket containing a timestamp (epoch ms)"""
+    return timestamp_ms - (timestamp_ms % BUCKET_MS)
+
+
+def bucket_id(timestamp_ms: int) -> str:
+    """Document ID of the hour bucket containing a timestamp"""
+    start = datetime.fromtimestamp(bucket_start(timestamp_ms) / 1000, tz=timezone.utc)
+    return start.strftime("%Y%m%d%H")
+
+
+def bucket_ref(db: Any, device_id: str, timestamp_ms: int) -> Any:
+    """Firestore reference of the hour bucket for a device and timestamp"""
+    return (db.collection(SENSOR_HISTORY_COLLECTION).document(device_id)
+            .collection(HOURLY_SUBCOLLECTION).document(bucket_id(timestamp_ms)))
+
+
+def append_samples(
+    writer: Any,
+    db: Any,
+    device_id: str,
+    samples: Sequence[Tuple[int, float]]
+) -> None:
+    """
+    Queue an append of readings that share one hour bucket.
+
+    ArrayUnion makes the append idempotent as long as the sample time comes
+    from the message (its publish time), so a redelivered Pub/Sub message
+    does not duplicate the sample.
+
+    Args:
+        writer: Firestore WriteBatch or BulkWriter the write is added to
+        db: Firestore client used to build the bucket reference
+        device_id: Device that produced the readings
+        samples: (timestamp ms, percentage) readings in the same hour
+    """
+    start = bucket_start(samples[0][0])
+    writer.set(bucket_ref(db, device_id, start), {
+        'device_id': device_id,
+        'bucket_start': start,
+        'samples': firestore.ArrayUnion([{'t': t, 'p': p} for t, p in samples]),
+    }, merge=True)
+
+
+def load_samples(
+    db: Any,
+    device_id: str,
+    start_ms: int,
+    end_ms: Optional[int] = None
+) -> List[Tuple[int, float]]:
+    """
+    Load a device's readings in [start_ms, end_ms) from its hour buckets.
+
+    Args:
+        db: Firestore client
+        device_id: Device to load
+        start_ms: Range start, epoch milliseconds (inclusive)
+        end_ms: Range end, epoch milliseconds (exclusive), defaults to now
+
+    Returns:
+        (timestamp ms, percentage) tuples sorted by time
+    """
+    query = (db.collection(SENSOR_HISTORY_COLLECTION).document(device_id)
+             .collection(HOURLY_SUBCOLLECTION)
+             .where(filter=firestore.FieldFilter(
+                 'bucket_start', '>=', bucket_start(start_ms))))
+    if end_ms is not None:
+        query = query.where(filter=firestore.FieldFilter(
+            'bucket_start', '<', end_ms))
+
+    samples: List[Tuple[int, float]] = []
+    with firestore_span("query", HOURLY_SUBCOLLECTION, device_id=device_id):
+        for snapshot in query.stream():
+            for sample in snapshot.to_dict().get('samples', []):
+                t = sample['t']
+                if t >= start_ms and (end_ms is None or t < end_ms):
+                    samples.append((t, sample['p']))
+    samples.sort()
+    return samples
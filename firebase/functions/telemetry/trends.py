@@ -0,0 +1,218 @@
+"""
+Moisture Trend Analytics
+Vectorized statistics over a device's moisture history (telemetry/storage.py):
+rolling means, drying rate against the device's usual rate, day-over-day
+change and the projected time until the soil reaches a dryness threshold.
+
+Only the summary goes to the model, never the raw samples.
+"""
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import (
+    DRYNESS_THRESHOLD_PERCENT,
+    TREND_LOOKBACK_DAYS,
+    TREND_RECENT_HOURS,
+    TREND_ROLLING_WINDOW_MINUTES,
+    WATERING_JUMP_PERCENT,
+)
+from telemetry.storage import load_samples
+
+HOUR_MS = 60 * 60 * 1000
+DAY_MS = 24 * HOUR_MS
+
+
+@dataclass
+class MoistureTrend:
+    """Summary statistics of one device's moisture history"""
+    device_id: str
+    samples: int
+    span_hours: float
+    latest: float
+    rolling_mean: float
+    # Percentage points per hour, negative while drying
+    rate_per_hour: Optional[float]
+    usual_rate_per_hour: Optional[float]
+    last_watered_ms: Optional[int]
+    threshold: float
+    hours_to_threshold: Optional[float]
+    # Mean per 24 h period, oldest first, None for periods without readings
+    daily_means: List[Optional[float]] = field(default_factory=list)
+    day_over_day: List[Optional[float]] = field(default_factory=list)
+
+
+def to_arrays(samples: Sequence[Tuple[int, float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """(timestamp ms, percentage) tuples as int64 times and float64 values"""
+    if not samples:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    data = np.asarray(samples, dtype=np.float64)
+    return data[:, 0].astype(np.int64), data[:, 1]
+
+
+def rolling_mean(t: np.ndarray, p: np.ndarray, window_ms: int) -> np.ndarray:
+    """Mean of the readings in the trailing window (t_i - window, t_i] of each reading"""
+    sums = np.concatenate(([0.0], np.cumsum(p)))
+    end = np.arange(1, len(t) + 1)
+    start = np.searchsorted(t, t - window_ms, side="right")
+    return (sums[end] - sums[start]) / (end - start)
+
+
+def watering_indices(p: np.ndarray, jump: float = WATERING_JUMP_PERCENT) -> np.ndarray:
+    """Indices of readings that rose by more than `jump` over the previous one"""
+    return np.flatnonzero(np.diff(p) > jump) + 1
+
+
+def slope_per_hour(t: np.ndarray, p: np.ndarray) -> Optional[float]:
+    """Least-squares slope in percentage points per hour, None if undefined"""
+    if len(t) < 2:
+        return None
+    x = (t - t[0]) / HOUR_MS
+    x_centered = x - x.mean()
+    variance = np.dot(x_centered, x_centered)
+    if variance == 0:
+        return None
+    return float(np.dot(x_centered, p - p.mean()) / variance)
+
+
+def drying_rate(
+    t: np.ndarray,
+    p: np.ndarray,
+    before_ms: int,
+    jump: float = WATERING_JUMP_PERCENT
+) -> Optional[float]:
+    """
+    Average change per hour over the readings before `before_ms`, leaving
+    out the intervals that contain a watering
+    """
+    dt = np.diff(t)
+    dp = np.diff(p)
+    mask = (dp <= jump) & (t[1:] < before_ms) & (dt > 0)
+    hours = dt[mask].sum() / HOUR_MS
+    if hours == 0:
+        return None
+    return float(dp[mask].sum() / hours)
+
+
+def daily_means(
+    t: np.ndarray,
+    p: np.ndarray,
+    now_ms: int,
+    days: int
+) -> List[Optional[float]]:
+    """Mean per 24 h period ending at now_ms, oldest first"""
+    age = (now_ms - t) // DAY_MS
+    recent = (age >= 0) & (age < days)
+    counts = np.bincount(age[recent], minlength=days)
+    sums = np.bincount(age[recent], weights=p[recent], minlength=days)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (sums / counts)[::-1]
+    return [None if np.isnan(m) else round(float(m), 1) for m in means]
+
+
+def compute_trend(
+    device_id: str,
+    t: np.ndarray,
+    p: np.ndarray,
+    now_ms: int,
+    threshold: float = DRYNESS_THRESHOLD_PERCENT,
+    days: int = TREND_LOOKBACK_DAYS
+) -> Optional[MoistureTrend]:
+    """
+    Trend statistics for one device
+
+    Args:
+        device_id: Device the readings belong to
+        t: Reading times, epoch ms, sorted
+        p: Moisture percentages
+        now_ms: Current time, epoch ms
+        threshold: Dryness threshold for the projection, percent
+        days: Number of 24 h periods for the daily means
+
+    Returns:
+        The trend, None without readings
+    """
+    if len(t) == 0:
+        return None
+
+    smoothed = rolling_mean(t, p, TREND_ROLLING_WINDOW_MINUTES * 60 * 1000)
+    waterings = watering_indices(p)
+    last_watered = int(waterings[-1]) if len(waterings) else None
+
+    # Recent rate: since the last watering, at most TREND_RECENT_HOURS back
+    recent_start_ms = now_ms - TREND_RECENT_HOURS * HOUR_MS
+    first = int(np.searchsorted(t, recent_start_ms))
+    if last_watered is not None:
+        first = max(first, last_watered)
+    rate = slope_per_hour(t[first:], p[first:])
+    usual_rate = drying_rate(t, p, before_ms=recent_start_ms)
+
+    level = float(smoothed[-1])
+    hours_to_threshold = None
+    if level <= threshold:
+        hours_to_threshold = 0.0
+    elif rate is not None and rate < 0:
+        hours_to_threshold = (level - threshold) / -rate
+
+    means = daily_means(t, p, now_ms, days)
+    deltas = [None if a is None or b is None else round(b - a, 1)
+              for a, b in zip(means, means[1:])]
+
+    return MoistureTrend(
+        device_id=device_id,
+        samples=len(t),
+        span_hours=float(t[-1] - t[0]) / HOUR_MS,
+        latest=float(p[-1]),
+        rolling_mean=level,
+        rate_per_hour=rate,
+        usual_rate_per_hour=usual_rate,
+        last_watered_ms=int(t[last_watered]) if last_watered is not None else None,
+        threshold=threshold,
+        hours_to_threshold=hours_to_threshold,
+        daily_means=means,
+        day_over_day=deltas,
+    )
+
+
+def load_trend(db: Any, device_id: str, now_ms: int) -> Optional[MoistureTrend]:
+    """Load a device's history over the lookback and compute its trend"""
+    t, p = to_arrays(load_samples(db, device_id, now_ms - TREND_LOOKBACK_DAYS * DAY_MS))
+    return compute_trend(device_id, t, p, now_ms)
+
+
+def format_trend(trend: Optional[MoistureTrend], device_id: str, now_ms: int) -> str:
+    """Compact, model-readable summary of a trend"""
+    if trend is None:
+        return f"📉 {device_id}: No moisture history in the last {TREND_LOOKBACK_DAYS} days."
+
+    lines = [f"📈 {device_id}: {trend.latest:.1f}% now "
+             f"({TREND_ROLLING_WINDOW_MINUTES} min mean {trend.rolling_mean:.1f}%), "
+             f"{trend.samples} readings over {trend.span_hours:.0f}h"]
+
+    if trend.rate_per_hour is None:
+        lines.append("Recent rate: not enough recent readings")
+    else:
+        rate = f"Recent rate: {trend.rate_per_hour:+.2f}%/h"
+        usual = trend.usual_rate_per_hour
+        if usual is not None:
+            rate += f", usual {usual:+.2f}%/h"
+            if usual < 0 and trend.rate_per_hour < 0:
+                rate += f" (drying {trend.rate_per_hour / usual:.1f}x the usual rate)"
+        lines.append(rate)
+
+    if trend.last_watered_ms is not None:
+        lines.append(f"Last watered {(now_ms - trend.last_watered_ms) / HOUR_MS:.0f}h ago")
+
+    if trend.hours_to_threshold == 0:
+        lines.append(f"At or below the {trend.threshold:.0f}% dryness threshold")
+    elif trend.hours_to_threshold is not None:
+        lines.append(f"Projected to reach {trend.threshold:.0f}% in "
+                     f"{trend.hours_to_threshold:.0f}h")
+
+    def _values(values: List[Optional[float]], sign: str = "") -> str:
+        return ", ".join("-" if v is None else f"{v:{sign}.1f}" for v in values)
+
+    lines.append(f"Daily means, oldest first: {_values(trend.daily_means)}")
+    lines.append(f"Day-over-day: {_values(trend.day_over_day, '+')}")
+    return "\n".join(lines)
@@ -14,6 +14,9 @@ parent_dir = os.path.dirname(os.path.dirname(
     os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(parent_dir)
 
+# Keep conversation state in process so these tests do not need Firestore
+os.environ.setdefault("PLANTPAL_CHECKPOINTER", "memory")
+
 from agent import PlantPalAgent, MaxOutputTokens, reset_agent
 
 
@@ -0,0 +1,142 @@
+"""
+Unit tests for PlantPal agent chat: streaming and async execution
+"""
+
+import asyncio
+import os
+import sys
+import time
+import unittest
+from typing import List
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from langchain.agents import create_agent
+from langchain.tools import tool
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+import agent as agent_module
+from agent import MaxOutputTokens, PlantPalAgent, run_async
+from benchmarks.fakes import ScriptedChatModel
+from utils.response_cache import HashingEmbedder, ResponseCache
+
+# agent.py turns tracing on at import, keep the tests offline
+os.environ["LANGSMITH_TRACING"] = "false"
+
+
+MODEL = "scripted"
+
+
+@tool
+def get_moisture_data(device: str = "") -> str:
+    """Get soil moisture data from the sensor."""
+    return "Soil moisture (esp32): 42.0%"
+
+
+@tool
+async def get_system_status(device: str = "") -> str:
+    """Get the current system status."""
+    await asyncio.sleep(0.3)
+    return "✅ esp32: Device is ONLINE"
+
+
+@tool
+async def slow_moisture(device: str = "") -> str:
+    """Get soil moisture data from the sensor."""
+    await asyncio.sleep(0.3)
+    return "Soil moisture (esp32): 42.0%"
+
+
+def _make_agent(responses: List[AIMessage], tools=(get_moisture_data,)) -> PlantPalAgent:
+    """Agent handle over a graph compiled with the scripted model"""
+    checkpointer = InMemorySaver()
+    agent_module._checkpointer = checkpointer
+    agent_module._response_cache = ResponseCache(HashingEmbedder())
+    agent_module._compiled_agents[(MODEL, MaxOutputTokens.LARGE.value)] = \
+        create_agent(
+            model=ScriptedChatModel(responses=responses),
+            tools=list(tools),
+            checkpointer=checkpointer
+        )
+    return PlantPalAgent(thread_id="thread-1", model=MODEL)
+
+
+class TestStreamChat(unittest.TestCase):
+    """Test PlantPalAgent.stream_chat events"""
+
+    def tearDown(self):
+        agent_module.reset_agent()
+
+    def test_streams_tokens_then_done(self):
+        agent = _make_agent([AIMessage(content="Water it weekly.")])
+
+        events = list(agent.stream_chat("How often should I water?"))
+
+        tokens = [e["text"] for e in events if e["type"] == "token"]
+        self.assertEqual(tokens, ["Water ", "it ", "weekly."])
+        self.assertEqual(events[-1], {"type": "done", "response": "Water it weekly."})
+
+    def test_reports_tool_progress_before_final_reply(self):
+        agent = _make_agent([
+            AIMessage(content="", tool_calls=[
+                {"name": "get_moisture_data", "args": {}, "id": "call-1"}]),
+            AIMessage(content="Your soil is at 42%."),
+        ])
+
+        events = list(agent.stream_chat("Is my plant dry?"))
+        types = [e["type"] for e in events]
+
+        self.assertEqual(events[0], {"type": "tool_start", "tool": "get_moisture_data",
+                                     "status": "Checking sensor…"})
+        self.assertLess(types.index("tool_end"), types.index("token"))
+        self.assertEqual(events[-1]["response"], "Your soil is at 42%.")
+
+    def test_stream_persists_thread_state(self):
+        agent = _make_agent([AIMessage(content="Hello there.")])
+
+        list(agent.stream_chat("Hi"))
+
+        history = agent.get_conversation_history()
+        self.assertEqual([m.type for m in history], ["human", "ai"])
+        self.assertEqual(history[-1].content, "Hello there.")
+
+
+class TestAsyncChat(unittest.TestCase):
+    """Test PlantPalAgent.achat"""
+
+    def tearDown(self):
+        agent_module.reset_agent()
+
+    def test_tool_calls_in_one_step_run_concurrently(self):
+        agent = _make_agent([
+            AIMessage(content="", tool_calls=[
+                {"name": "get_system_status", "args": {}, "id": "call-1"},
+                {"name": "slow_moisture", "args": {}, "id": "call-2"},
+            ]),
+            AIMessage(content="Online and at 42%."),
+        ], tools=(get_system_status, slow_moisture))
+
+        start = time.monotonic()
+        response = run_async(agent.achat("How is my plant?"))
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(response, "Online and at 42%.")
+        # Two 0.3 s tools, sequential would take at least 0.6 s
+        self.assertLess(elapsed, 0.55)
+
+    def test_achat_shares_thread_with_chat(self):
+        agent = _make_agent([AIMessage(content="Hello there.")])
+
+        agent.chat("Hi")
+        run_async(agent.achat("Hi again"))
+
+        history = agent.get_conversation_history()
+        self.assertEqual([m.type for m in history], ["human", "ai", "human", "ai"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+"""
+Unit tests guarding the telemetry handlers' cold start
+"""
+
+import os
+import sys
+import unittest
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from benchmarks.startup import measure
+
+
+class TestColdStart(unittest.TestCase):
+    """Importing main must not pull in the agent stack"""
+
+    def test_main_does_not_load_agent_stack(self):
+        result = measure(["main"])
+        self.assertEqual(result["agent_stack_loaded"], [])
+
+    def test_agent_imports_without_clients(self):
+        # measure() raises if the import fails, e.g. because a Pub/Sub or
+        # LangSmith client was created at import time without credentials
+        result = measure(["agent"])
+        self.assertIn("langchain", result["agent_stack_loaded"])
+
+
+if __name__ == '__main__':
+    unittest.main()
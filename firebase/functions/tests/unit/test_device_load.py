@@ -0,0 +1,68 @@
+"""
+Unit tests for the emulated devices of the load generator
+"""
+
+import json
+import os
+import sys
+import unittest
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from benchmarks.device_load import EmulatedDevice, latency_summary, percentile
+from benchmarks.fakes import FakeClock
+from uart.simulator import FpgaSimulator
+
+
+class TestEmulatedDevice(unittest.TestCase):
+    """Payloads built from UART exchanges, as the firmware does"""
+
+    def setUp(self):
+        self.clock = FakeClock(100.0)
+        self.device = EmulatedDevice(
+            "dev-1", FpgaSimulator(moisture_percent=40, clock=self.clock),
+            clock=self.clock)
+
+    def test_moisture_matches_schema(self):
+        with open(os.path.join(parent_dir, "..", "..", "iot", "schemas",
+                               "moisture-data.json")) as f:
+            fields = {field["name"] for field in json.load(f)["fields"]}
+        payload = json.loads(self.device.moisture("req-1"))
+        self.assertEqual(set(payload), fields)
+        self.assertEqual(payload["percentage"], 40.0)
+        self.assertEqual(payload["request_id"], "req-1")
+        self.assertEqual(payload["device_id"], "dev-1")
+
+    def test_timestamps_are_unique(self):
+        first = json.loads(self.device.moisture())["timestamp"]
+        second = json.loads(self.device.moisture())["timestamp"]
+        self.assertGreater(second, first)
+
+    def test_water_ack_and_redelivery(self):
+        request = {"command_id": "cmd-1", "duration_seconds": 5}
+        self.assertEqual(json.loads(self.device.water(request))["status"], "acked")
+        self.assertEqual(json.loads(self.device.water(request))["status"], "acked")
+        self.assertEqual(self.device.simulator.pump_seconds_total, 5)
+
+    def test_fpga_errors(self):
+        device = EmulatedDevice("dev-2", FpgaSimulator(error_rate=1.0, seed=1))
+        self.assertIsNone(device.moisture())
+        self.assertEqual(json.loads(device.status())["status"], "offline")
+        self.assertEqual(json.loads(device.water({"command_id": "c"}))["status"], "error")
+
+
+class TestLatencySummary(unittest.TestCase):
+
+    def test_percentiles(self):
+        values = [i / 1000 for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 0.05)
+        self.assertEqual(percentile(values, 99), 0.099)
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(latency_summary(values)["p99_ms"], 99.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+"""
+Unit tests for the PlantPal device registry
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+import devices.registry as registry
+from benchmarks.fakes import InMemoryFirestore
+from devices.registry import (
+    DEFAULT_DEVICE_ID,
+    aget_latest,
+    aresolve_devices,
+    device_id_from,
+    get_latest,
+    register_device,
+    resolve_devices,
+)
+
+
+def _snapshot(doc_id, data):
+    snapshot = MagicMock()
+    snapshot.id = doc_id
+    snapshot.exists = data is not None
+    snapshot.to_dict.return_value = data
+    return snapshot
+
+
+def _db_with_index(index):
+    db = MagicMock()
+    db.collection.return_value.document.return_value.get.return_value = (
+        _snapshot("uid", index))
+    return db
+
+
+class TestDeviceRegistry(unittest.TestCase):
+    """Tests for message routing and target resolution"""
+
+    def test_device_id_from_prefers_attribute(self):
+        """Attribute, then payload field, then the default device."""
+        self.assertEqual(device_id_from({"device_id": "a"}, {"device_id": "b"}), "a")
+        self.assertEqual(device_id_from({}, {"device_id": "b"}), "b")
+        self.assertEqual(device_id_from(None, None), DEFAULT_DEVICE_ID)
+
+    def test_resolve_all_group_and_single(self):
+        """Empty target, group names and device IDs resolve from one read."""
+        db = _db_with_index({
+            "device_ids": ["basil", "fern", "cactus"],
+            "groups": {"kitchen": ["basil"], "window": ["fern", "cactus"]},
+        })
+        self.assertEqual(resolve_devices(db, "uid", ""), ["basil", "fern", "cactus"])
+        self.assertEqual(resolve_devices(db, "uid", "window"), ["fern", "cactus"])
+        self.assertEqual(resolve_devices(db, "uid", "basil"), ["basil"])
+        with self.assertRaises(ValueError):
+            resolve_devices(db, "uid", "someone-elses-device")
+
+    @patch.object(registry, "LEGACY_SINGLE_DEVICE", False)
+    def test_resolve_without_registry_is_refused(self):
+        """Without legacy mode, users with no devices cannot address any device."""
+        db = _db_with_index(None)
+        for user_id, target in [("uid", ""), ("uid", DEFAULT_DEVICE_ID),
+                                ("uid", "someone-elses-device"), (None, "all")]:
+            with self.assertRaises(ValueError):
+                resolve_devices(db, user_id, target)
+
+    @patch.object(registry, "LEGACY_SINGLE_DEVICE", True)
+    def test_legacy_single_device_uses_default(self):
+        """Legacy installs reach the default device, and only that one."""
+        db = _db_with_index(None)
+        self.assertEqual(resolve_devices(db, "uid", ""), [DEFAULT_DEVICE_ID])
+        self.assertEqual(resolve_devices(db, None, DEFAULT_DEVICE_ID), [DEFAULT_DEVICE_ID])
+        with self.assertRaises(ValueError):
+            resolve_devices(db, "uid", "someone-elses-device")
+
+    def test_register_device_keeps_owner(self):
+        """A device registered to one user cannot be claimed by another."""
+        db = InMemoryFirestore()
+        register_device(db, "basil", "alice", groups=["kitchen"])
+        register_device(db, "basil", "alice", name="Basil")
+
+        with self.assertRaises(PermissionError):
+            register_device(db, "basil", "mallory")
+
+        self.assertEqual(db.docs["devices/basil"]["owner_uid"], "alice")
+        self.assertEqual(db.docs["devices/basil"]["name"], "Basil")
+        self.assertEqual(resolve_devices(db, "alice", "kitchen"), ["basil"])
+        self.assertNotIn("user_devices/mallory", db.docs)
+
+    def test_register_device_leaves_old_groups(self):
+        """Re-registering moves the device out of the groups it left."""
+        db = InMemoryFirestore()
+        register_device(db, "basil", "alice", groups=["kitchen", "herbs"])
+        register_device(db, "mint", "alice", groups=["herbs"])
+
+        register_device(db, "basil", "alice", groups=["window"])
+
+        self.assertEqual(resolve_devices(db, "alice", "herbs"), ["mint"])
+        self.assertEqual(resolve_devices(db, "alice", "window"), ["basil"])
+        with self.assertRaises(ValueError):
+            resolve_devices(db, "alice", "kitchen")
+        self.assertEqual(resolve_devices(db, "alice", ""), ["basil", "mint"])
+
+    def test_auto_watering_is_opt_in(self):
+        """New devices are not watered by the scheduler unless asked."""
+        db = InMemoryFirestore()
+        register_device(db, "basil", "alice")
+        self.assertIs(db.docs["devices/basil"]["auto_watering"], False)
+
+        register_device(db, "basil", "alice", auto_watering=True)
+        register_device(db, "basil", "alice", name="Basil")
+        self.assertIs(db.docs["devices/basil"]["auto_watering"], True)
+
+    def test_get_latest_is_one_batched_read(self):
+        """Fleet reads go through a single get_all call."""
+        db = MagicMock()
+        db.get_all.return_value = [_snapshot("a", {"status": "online"}),
+                                   _snapshot("b", None)]
+        latest = get_latest(db, "system_status", ["a", "b"])
+
+        db.get_all.assert_called_once()
+        self.assertEqual(latest, {"a": {"status": "online"}, "b": None})
+
+
+    def test_async_variants_match_sync(self):
+        """aresolve_devices and aget_latest read through the async client."""
+        db = MagicMock()
+        db.collection.return_value.document.return_value.get = AsyncMock(
+            return_value=_snapshot("uid", {"device_ids": ["a", "b"]}))
+
+        async def get_all(refs):
+            yield _snapshot("a", {"status": "online"})
+        db.get_all = get_all
+
+        self.assertEqual(asyncio.run(aresolve_devices(db, "uid", "all")), ["a", "b"])
+        self.assertEqual(asyncio.run(aget_latest(db, "system_status", ["a", "b"])),
+                         {"a": {"status": "online"}, "b": None})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
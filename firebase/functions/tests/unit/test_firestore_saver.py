@@ -0,0 +1,137 @@
+"""
+Unit tests for the Firestore checkpointer
+The SQLite saver tests run against the in-memory Firestore fake, plus the
+first-write-wins rule for pending writes
+"""
+
+import operator
+import os
+import sys
+import unittest
+from typing import Annotated, List, TypedDict
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import ERROR
+from langgraph.graph import StateGraph, START, END, MessagesState
+
+from benchmarks.fakes import InMemoryFirestore
+from checkpointers.firestore_saver import FirestoreSaver
+
+
+class _CounterState(TypedDict):
+    log: Annotated[List[str], operator.add]
+    unchanged: str
+
+
+def _build_chat_graph(saver: FirestoreSaver):
+    def reply(state: MessagesState) -> dict:
+        return {"messages": [AIMessage(content=f"reply {len(state['messages'])}")]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("reply", reply)
+    builder.add_edge(START, "reply")
+    builder.add_edge("reply", END)
+    return builder.compile(checkpointer=saver)
+
+
+def _config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+class TestFirestoreSaver(unittest.TestCase):
+    """Tests for durable checkpoint storage in Firestore"""
+
+    def setUp(self):
+        self.db = InMemoryFirestore()
+
+    def test_cold_instance_resumes_thread(self):
+        """A new saver on the same database resumes the conversation."""
+        graph = _build_chat_graph(FirestoreSaver(client=self.db))
+        graph.invoke({"messages": [HumanMessage(content="hi")]}, _config("t1"))
+        graph.invoke({"messages": [HumanMessage(content="again")]}, _config("t1"))
+
+        cold = FirestoreSaver(client=self.db)
+        graph = _build_chat_graph(cold)
+        result = graph.invoke({"messages": [HumanMessage(content="third")]},
+                              _config("t1"))
+
+        contents = [m.content for m in result["messages"]]
+        self.assertEqual(contents, ["hi", "reply 1", "again", "reply 3",
+                                    "third", "reply 5"])
+        self.assertIsNone(cold.get_tuple(_config("other")))
+
+    def test_put_writes_only_changed_channels(self):
+        """Unchanged channels are not re-written on later checkpoints."""
+        saver = FirestoreSaver(client=self.db)
+        builder = StateGraph(_CounterState)
+        builder.add_node("step", lambda state: {"log": ["x"]})
+        builder.add_edge(START, "step")
+        builder.add_edge("step", END)
+        graph = builder.compile(checkpointer=saver)
+
+        graph.invoke({"log": [], "unchanged": "same"}, _config("t1"))
+        graph.invoke({"log": []}, _config("t1"))
+
+        blobs = [path.rsplit("/", 1)[-1].split("|")[1] for path in self.db.docs
+                 if path.startswith("agent_threads/t1/blobs/")]
+        self.assertEqual(blobs.count("unchanged"), 1)
+        self.assertGreater(blobs.count("log"), 1)
+
+    def test_large_values_are_only_stored_as_blobs(self):
+        """The head keeps a large channel's version and reads its blob."""
+        graph = _build_chat_graph(
+            FirestoreSaver(client=self.db, head_inline_max_bytes=1024))
+        head = "agent_threads/t1/heads/ns:"
+        graph.invoke({"messages": [HumanMessage(content="hi")]}, _config("t1"))
+        self.assertIn("value", self.db.docs[head]["channels"]["messages"])
+
+        graph.invoke({"messages": [HumanMessage(content="x" * 2000)]}, _config("t1"))
+        channels = self.db.docs[head]["channels"]
+        self.assertNotIn("value", channels["messages"])
+        self.assertIn("value", channels["branch:to:reply"])
+
+        cold = FirestoreSaver(client=self.db, head_inline_max_bytes=1024)
+        messages = cold.get_tuple(_config("t1")).checkpoint["channel_values"]["messages"]
+        self.assertEqual([m.content for m in messages],
+                         ["hi", "reply 1", "x" * 2000, "reply 3"])
+
+    def test_list_and_delete_thread(self):
+        """History is listed newest first and deleted per thread."""
+        saver = FirestoreSaver(client=self.db)
+        graph = _build_chat_graph(saver)
+        graph.invoke({"messages": [HumanMessage(content="a")]}, _config("t1"))
+        graph.invoke({"messages": [HumanMessage(content="b")]}, _config("t2"))
+
+        history = list(saver.list(_config("t1")))
+        ids = [item.config["configurable"]["checkpoint_id"] for item in history]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(list(saver.list(_config("t1"), limit=1))), 1)
+
+        saver.delete_thread("t1")
+        self.assertIsNone(saver.get_tuple(_config("t1")))
+        self.assertIsNotNone(saver.get_tuple(_config("t2")))
+
+    def test_first_pending_write_wins(self):
+        """A retried task keeps its first writes; special channels are replaced."""
+        saver = FirestoreSaver(client=self.db)
+        graph = _build_chat_graph(saver)
+        graph.invoke({"messages": [HumanMessage(content="hi")]}, _config("t1"))
+        config = saver.get_tuple(_config("t1")).config
+
+        saver.put_writes(config, [("messages", "first"), (ERROR, "boom")], "task")
+        saver.put_writes(config, [("messages", "second"), (ERROR, "again")], "task")
+
+        for checkpoint in (saver.get_tuple(_config("t1")),
+                           saver.get_tuple(config)):
+            writes = {channel: value
+                      for _, channel, value in checkpoint.pending_writes}
+            self.assertEqual(writes, {"messages": "first", ERROR: "again"})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
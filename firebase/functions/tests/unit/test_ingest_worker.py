@@ -0,0 +1,147 @@
+"""
+Unit tests for the streaming-pull bulk ingestion worker
+Pub/Sub messages and the BulkWriter are replaced with simple fakes
+"""
+
+import json
+import os
+import sys
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from benchmarks.fakes import InMemoryFirestore
+from telemetry.ingest_worker import IngestWorker
+
+
+class _FakeMessage:
+    def __init__(self, message_id, payload, publish_ms=1735787045000,
+                 attributes=None):
+        self.message_id = message_id
+        self.attributes = attributes or {}
+        self.data = json.dumps(payload).encode("utf-8")
+        self.publish_time = datetime.fromtimestamp(publish_ms / 1000,
+                                                   tz=timezone.utc)
+        self.acked = False
+        self.nacked = False
+
+    def ack(self):
+        self.acked = True
+
+    def nack(self):
+        self.nacked = True
+
+
+class _FakeBulkWriter:
+    def __init__(self, fail=False):
+        self.sets = []
+        self.fail = fail
+        self.error_callback = None
+
+    def on_write_error(self, callback):
+        self.error_callback = callback
+
+    def set(self, reference, data, merge=False):
+        self.sets.append((reference, data, merge))
+
+    def close(self):
+        if self.fail:
+            raise RuntimeError("commit failed")
+
+
+class TestIngestWorker(unittest.TestCase):
+    """Tests for batching, coalescing, dedupe and ack ordering"""
+
+    def setUp(self):
+        self.writer = _FakeBulkWriter()
+        self.db = InMemoryFirestore()
+        self.db.bulk_writer = lambda: self.writer
+        self.worker = IngestWorker(db=self.db, subscriber=MagicMock())
+
+    def test_batch_is_coalesced_and_acked_after_commit(self):
+        """Many readings become one latest write and one bucket append."""
+        messages = [_FakeMessage(str(i), {"percentage": 40.0 + i,
+                                          "timestamp": i},
+                                 publish_ms=1735787045000 + i)
+                    for i in range(50)]
+        self.worker.process_batch([("data-moisture", m) for m in messages])
+
+        self.assertEqual(len(self.writer.sets), 2)
+        self.assertTrue(all(m.acked for m in messages))
+        self.assertEqual(self.worker.stats["writes"], 2)
+
+    def test_redelivered_messages_are_not_rewritten(self):
+        """A message ID seen in a committed batch is acked without writes."""
+        first = _FakeMessage("m1", {"percentage": 50.0, "timestamp": 1})
+        self.worker.process_batch([("data-moisture", first)])
+
+        self.writer = _FakeBulkWriter()
+        again = _FakeMessage("m1", {"percentage": 50.0, "timestamp": 1})
+        self.worker.process_batch([("data-moisture", again)])
+
+        self.assertTrue(again.acked)
+        self.assertEqual(self.writer.sets, [])
+        self.assertEqual(self.worker.stats["duplicates"], 1)
+
+    def test_failed_commit_nacks_batch(self):
+        """Messages are nacked, not acked, when the commit fails."""
+        self.writer = _FakeBulkWriter(fail=True)
+        message = _FakeMessage("m1", {"status": "online"})
+        self.worker.process_batch([("system-status", message)])
+
+        self.assertTrue(message.nacked)
+        self.assertFalse(message.acked)
+
+        # The message was not remembered, so a redelivery is written
+        self.writer = _FakeBulkWriter()
+        retry = _FakeMessage("m1", {"status": "online"})
+        self.worker.process_batch([("system-status", retry)])
+        # system_status document and presence index shard
+        self.assertEqual(len(self.writer.sets), 2)
+        self.assertTrue(retry.acked)
+
+    def test_undecodable_message_is_dead_lettered(self):
+        """Invalid JSON is dead-lettered and acked instead of blocking the batch."""
+        bad = _FakeMessage("bad", {})
+        bad.data = b"not json"
+        self.worker.process_batch([("data-moisture", bad)])
+
+        self.assertTrue(bad.acked)
+        self.assertEqual(self.worker.stats["invalid"], 1)
+        dead_letter = self.db.docs["telemetry_dead_letter/bad"]
+        self.assertEqual(dead_letter["reason"], "not_json")
+        self.assertEqual(dead_letter["raw"], "not json")
+        self.assertEqual(self.db.docs["telemetry_dead_letter_stats/data-moisture"]["total"], 1)
+
+    def test_redelivered_reject_is_counted_once(self):
+        """A reject redelivered to a new worker does not move the counters."""
+        for worker in (self.worker, IngestWorker(db=self.db, subscriber=MagicMock())):
+            bad = _FakeMessage("bad", {})
+            bad.data = b"not json"
+            worker.process_batch([("data-moisture", bad)])
+            self.assertTrue(bad.acked)
+
+        counters = self.db.docs["telemetry_dead_letter_stats/data-moisture"]
+        self.assertEqual(counters["total"], 1)
+        self.assertEqual(counters["reasons"], {"not_json": 1})
+
+    def test_out_of_range_reading_is_not_stored(self):
+        """A reading that fails the schema never reaches sensor_data."""
+        messages = [_FakeMessage("ok", {"percentage": 40.0, "timestamp": 1}),
+                    _FakeMessage("high", {"percentage": 400.0, "timestamp": 2})]
+        self.worker.process_batch([("data-moisture", m) for m in messages])
+
+        stored = [data for _, data, _ in self.writer.sets]
+        self.assertIn({"percentage": 40.0, "timestamp": 1,
+                       "received_at": 1735787045000}, stored)
+        self.assertEqual(self.db.docs["telemetry_dead_letter/high"]["reason"], "out_of_range")
+        self.assertTrue(all(m.acked for m in messages))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -1,11 +1,16 @@
 """
-Simple unit tests for PlantPal IoT tools
-Tests basic hardcoded return values using LangChain .invoke() method
+Unit tests for PlantPal IoT tools
+Runs the tools through LangChain .invoke() against in-memory Firestore and
+Pub/Sub fakes, with the device answering on the fake publisher
 """
 
-import unittest
-import sys
+import json
 import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
 
 # Add parent directories to path for imports (PlantPal pattern)
@@ -13,46 +18,126 @@ parent_dir = os.path.dirname(os.path.dirname(
     os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(parent_dir)
 
+from benchmarks.fakes import InMemoryFirestore, InMemoryPublisher, offline_backend
+from config import TOPICS
+from devices.irrigation import Dispatch
+from devices.registry import register_device
+from telemetry.ingest import IngestBatch
+import tools.iot_tools as iot_tools
 from tools.iot_tools import (
+    control_irrigation,
     get_moisture_data,
-    get_sensor_id,
-    control_irrigation
+    get_system_status,
 )
 
+# The tools only address devices registered to the chatting user
+USER = {"configurable": {"user_id": "uid"}}
+
 
 class TestIoTTools(unittest.TestCase):
-    """Simple tests for PlantPal IoT tools. TODO: Expand with real tests once IoT infrastructure is set up."""
+    """Tests for the PlantPal IoT tools"""
+
+    def setUp(self):
+        self.db = InMemoryFirestore()
+        self.publisher = InMemoryPublisher()
+        self.enterContext(offline_backend(self.db, self.publisher))
+        iot_tools._presence.clear()
+        register_device(self.db, "esp32", "uid")
+        register_device(self.db, "kitchen", "uid")
+
+    def _answer_soil_requests(self, percentage=42.0, delay=0.0):
+        """Device replies by writing the correlated reading, as the handler does"""
+        def write(request):
+            self.db.collection('sensor_requests').document(request['request_id']).set({
+                'percentage': percentage,
+                'timestamp': request['timestamp'],
+                'received_at': int(time.time() * 1000),
+            })
+
+        def reply(data, attributes):
+            request = json.loads(data)
+            if delay:
+                threading.Timer(delay, write, args=(request,)).start()
+            else:
+                write(request)
+        self.publisher.responders[TOPICS["request-soil"]] = reply
 
     def test_get_moisture_data(self):
-        """Test moisture data returns expected hardcoded structure."""
-        result = get_moisture_data.invoke({"sensor_id": "test_sensor"})
+        """A reading written under the request's correlation ID is returned."""
+        self._answer_soil_requests(percentage=37.5)
+        result = get_moisture_data.invoke({"device": "esp32"}, USER)
+
+        self.assertIn("Soil moisture (esp32): 37.5%", result)
+        topic, payload, attributes = self.publisher.messages[0]
+        self.assertEqual(topic, TOPICS["request-soil"])
+        self.assertEqual(attributes["device_id"], "esp32")
+        self.assertIn("request_id", json.loads(payload))
+        # The listener is removed once the tool returns
+        self.assertFalse(any(self.db._listeners.values()))
+
+    @patch.object(iot_tools, "MOISTURE_WAIT_SECONDS", 0.05)
+    def test_get_moisture_data_timeout(self):
+        """A device that does not answer is reported as a timeout."""
+        result = get_moisture_data.invoke({"device": "esp32"}, USER)
+
+        self.assertIn("Timeout (esp32)", result)
+
+    def test_fresh_reading_skips_device(self):
+        """A reading inside the freshness window is returned without a request."""
+        self.db.collection('sensor_data').document('esp32').set({
+            'percentage': 51.0, 'timestamp': 1234,
+            'received_at': int(time.time() * 1000) - 5000})
+
+        result = get_moisture_data.invoke({"device": "esp32"}, USER)
+
+        self.assertIn("Soil moisture (esp32): 51.0%", result)
+        self.assertEqual(self.publisher.messages, [])
+
+    def test_stale_reading_asks_device(self):
+        self.db.collection('sensor_data').document('esp32').set({
+            'percentage': 51.0, 'timestamp': 1234,
+            'received_at': int(time.time() * 1000) - 3600 * 1000})
+        self._answer_soil_requests(percentage=37.5)
+
+        result = get_moisture_data.invoke({"device": "esp32"}, USER)
+
+        self.assertIn("Soil moisture (esp32): 37.5%", result)
+        self.assertEqual(len(self.publisher.messages), 1)
 
-        # Verify basic structure
-        self.assertIsInstance(result, dict)
-        self.assertIn("sensor_id", result)
-        self.assertIn("moisture_percentage", result)
-        self.assertIn("temperature", result)
+    def test_concurrent_reads_share_one_request(self):
+        """Reads of a device while its request is in flight wait for that request."""
+        self._answer_soil_requests(percentage=37.5, delay=0.2)
 
-        print("✅ Moisture data test passed")
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(
+                lambda _: get_moisture_data.invoke({"device": "esp32"}, USER), range(8)))
 
-    def test_get_sensor_id(self):
-        """Test sensor ID prints expected hardcoded value."""
-        with patch('builtins.print') as mock_print:
-            get_sensor_id.invoke({})
-            # Just verify print was called
-            mock_print.assert_called_once()
+        self.assertTrue(all("Soil moisture (esp32): 37.5%" in r for r in results))
+        self.assertEqual(len(self.publisher.messages), 1)
+        self.assertEqual(len(iot_tools._sensor_flights), 0)
 
-        print("✅ Sensor ID test passed")
+    def test_get_system_status(self):
+        ingest = IngestBatch(self.db)
+        ingest.add_system_status({'status': 'online'}, received_at=int(time.time() * 1000),
+                                 device_id='esp32')
+        batch = self.db.batch()
+        ingest.write_to(batch)
+        batch.commit()
 
-    def test_control_irrigation(self):
-        """Test irrigation control returns expected hardcoded message."""
-        result = control_irrigation.invoke({"action": "start"})
+        self.assertIn("ONLINE", get_system_status.invoke({"device": "esp32"}, USER))
+        self.assertIn("No system status",
+                      get_system_status.invoke({"device": "kitchen"}, USER))
 
-        # Verify basic return type and content
-        self.assertIsInstance(result, str)
-        self.assertIn("irrigation", result.lower())
+    @patch.object(iot_tools, "reserve_command", return_value=Dispatch("sent", "c" * 32))
+    def test_control_irrigation(self, reserve):
+        """Irrigation is published once per device with its command ID."""
+        result = control_irrigation.invoke({"duration_seconds": 5, "device": "esp32"}, USER)
 
-        print("✅ Irrigation control test passed")
+        self.assertIn("irrigation for 5s sent", result)
+        topic, payload, _ = self.publisher.messages[0]
+        self.assertEqual(topic, TOPICS["request-water"])
+        self.assertEqual(json.loads(payload), {
+            "duration_seconds": 5, "device_id": "esp32", "command_id": "c" * 32})
 
 
 if __name__ == '__main__':
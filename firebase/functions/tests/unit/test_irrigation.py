@@ -0,0 +1,206 @@
+"""
+Unit tests for the irrigation command ledger and dispatch
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from concurrent.futures import Future
+from unittest.mock import MagicMock, patch
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from benchmarks.fakes import InMemoryFirestore, InMemoryPublisher, offline_backend, pubsub_event
+from devices.irrigation import (
+    Dispatch,
+    describe_last_command,
+    idempotency_key,
+    mark_publish_failed,
+    plan_command,
+    record_ack,
+    reserve_command,
+)
+import tools.iot_tools as iot_tools
+
+NOW = 1_700_000_000_000
+LIMITS = dict(bucket_capacity=30, refill_per_second=30 / 3600,
+              dedupe_window_seconds=120)
+
+
+class TestPlanCommand(unittest.TestCase):
+    """Tests for coalescing and the per-device token bucket"""
+
+    def test_repeat_within_window_is_coalesced(self):
+        """The same command twice in one turn waters once."""
+        key = idempotency_key("esp32", 10, "thread-1")
+        first, state = plan_command({}, key, 10, NOW, **LIMITS)
+        second, _ = plan_command(state, key, 10, NOW + 5_000, **LIMITS)
+
+        self.assertEqual(first.status, "sent")
+        self.assertEqual(second, Dispatch("duplicate", first.command_id))
+
+    def test_repeat_after_window_is_sent(self):
+        """Coalescing only applies inside the window."""
+        key = idempotency_key("esp32", 5, "thread-1")
+        first, state = plan_command({}, key, 5, NOW, **LIMITS)
+        later, _ = plan_command(state, key, 5, NOW + 121_000, **LIMITS)
+
+        self.assertEqual(later.status, "sent")
+        self.assertNotEqual(later.command_id, first.command_id)
+
+    def test_bucket_caps_pump_time(self):
+        """Different commands draw from the same pump-time budget."""
+        state = {}
+        for key in ("thread-1", "thread-2", "thread-3"):
+            dispatch, state = plan_command(state, key, 10, NOW, **LIMITS)
+            self.assertEqual(dispatch.status, "sent")
+
+        limited, _ = plan_command(state, "another", 5, NOW, **LIMITS)
+        self.assertEqual(limited.status, "rate_limited")
+        self.assertAlmostEqual(limited.retry_after_seconds, 600)
+
+        # Refilled after ten minutes at 30 s per hour
+        refilled, _ = plan_command(state, "another", 5, NOW + 600_000, **LIMITS)
+        self.assertEqual(refilled.status, "sent")
+
+    def test_duration_over_capacity_is_never_allowed(self):
+        """A request larger than the bucket cannot be retried."""
+        dispatch, _ = plan_command({}, "key", 60, NOW, **LIMITS)
+        self.assertEqual(dispatch.retry_after_seconds, float("inf"))
+
+    def test_bucket_never_exceeds_capacity(self):
+        """A negative duration cannot bank more than the bucket holds."""
+        _, state = plan_command({}, "key", -100, NOW, **LIMITS)
+        self.assertEqual(state["bucket_tokens"], 30)
+
+
+class TestAcknowledgements(unittest.TestCase):
+    """Tests for applying device acknowledgements"""
+
+    def setUp(self):
+        self.db = InMemoryFirestore()
+        self.db.document("irrigation_commands/c1").set(
+            {"device_id": "esp32", "duration_seconds": 5, "status": "sent"})
+
+    def test_record_ack_updates_command_and_device(self):
+        command_id = record_ack(self.db, {"command_id": "c1", "device_id": "esp32",
+                                          "status": "acked"}, received_at=NOW)
+
+        self.assertEqual(command_id, "c1")
+        self.assertEqual(self.db.docs["irrigation_commands/c1"]["status"], "acked")
+        self.assertEqual(self.db.docs["irrigation_state/esp32"]["last_ack"],
+                         {"command_id": "c1", "status": "acked", "acked_at": NOW})
+
+    def test_timeout_is_recorded_as_failed(self):
+        record_ack(self.db, {"command_id": "c1", "device_id": "esp32",
+                             "status": "timeout"}, received_at=NOW)
+        self.assertEqual(self.db.docs["irrigation_commands/c1"]["status"], "failed")
+
+    def test_ack_from_another_device_is_ignored(self):
+        """Only the device a command was sent to can acknowledge it."""
+        for payload in ({"command_id": "c1", "device_id": "kitchen", "status": "acked"},
+                        {"command_id": "c2", "device_id": "esp32", "status": "acked"}):
+            self.assertIsNone(record_ack(self.db, payload, received_at=NOW))
+
+        self.assertEqual(self.db.docs["irrigation_commands/c1"]["status"], "sent")
+        self.assertNotIn("irrigation_commands/c2", self.db.docs)
+        self.assertNotIn("irrigation_state/kitchen", self.db.docs)
+
+    def test_handler_validates_and_dead_letters_acks(self):
+        import main
+        with offline_backend(self.db, InMemoryPublisher()):
+            main.handle_water_ack(pubsub_event(
+                {"command_id": "c1", "status": "exploded"}, {"device_id": "esp32"},
+                topic="water-ack"))
+            self.assertEqual(self.db.docs["irrigation_commands/c1"]["status"], "sent")
+            self.assertEqual(
+                self.db.docs["telemetry_dead_letter_stats/water-ack"]["reasons"],
+                {"out_of_range": 1})
+
+            main.handle_water_ack(pubsub_event(
+                {"command_id": "c1", "status": "acked", "timestamp": 1234},
+                {"device_id": "esp32"}, topic="water-ack"))
+            self.assertEqual(self.db.docs["irrigation_commands/c1"]["status"], "acked")
+
+    def test_describe_last_command(self):
+        state = {"last_command": {"command_id": "c1", "duration_seconds": 5,
+                                  "requested_at": NOW - 30_000}}
+        self.assertIn("awaiting", describe_last_command(state, NOW))
+        state["last_ack"] = {"command_id": "c1", "status": "acked"}
+        self.assertIn("confirmed", describe_last_command(state, NOW))
+        self.assertIsNone(describe_last_command(None, NOW))
+
+
+class TestDispatch(unittest.TestCase):
+    """Tests for fire-and-forget publishing"""
+
+    def setUp(self):
+        self.publisher = MagicMock()
+        self.future = Future()
+        self.publisher.publish.return_value = self.future
+        patcher = patch.object(iot_tools, "_publisher", self.publisher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch.object(iot_tools, "mark_publish_failed")
+    @patch.object(iot_tools, "reserve_command", return_value=Dispatch("sent", "c" * 32))
+    def test_publish_is_not_awaited(self, reserve, mark_failed):
+        """The tool returns before Pub/Sub confirms the publish."""
+        db = MagicMock()
+        result = iot_tools._dispatch_irrigation(db, "esp32", 5, None)
+
+        self.assertIn("awaiting device confirmation", result)
+        self.assertFalse(self.future.done())
+        payload = self.publisher.publish.call_args.args[1]
+        self.assertIn(b'"command_id": "' + b"c" * 32 + b'"', payload)
+
+        # A failed publish is recorded on the command when it completes
+        self.future.set_exception(RuntimeError("unavailable"))
+        mark_failed.assert_called_once()
+        self.assertEqual(mark_failed.call_args.args[1:3], ("esp32", "c" * 32))
+
+    @patch.object(iot_tools, "reserve_command")
+    def test_duration_outside_pump_limit_is_refused(self, reserve):
+        """Zero, negative and over-capacity durations never reach the ledger."""
+        tool = iot_tools.control_irrigation
+        for duration in (-100, 0, iot_tools.IRRIGATION_BUCKET_CAPACITY_SECONDS + 1):
+            args = {"duration_seconds": duration, "device": "esp32"}
+            for result in (tool.invoke(args), asyncio.run(tool.ainvoke(args))):
+                self.assertIn("must be between 1 and", result)
+        reserve.assert_not_called()
+        self.publisher.publish.assert_not_called()
+
+    def test_failed_publish_refunds_and_frees_key(self):
+        """A retry of a command that was never published is sent again."""
+        db = InMemoryFirestore()
+        key = idempotency_key("esp32", 10, "thread-1")
+        first = reserve_command(db, "esp32", 10, key, **LIMITS)
+        self.assertEqual(db.docs["irrigation_state/esp32"]["bucket_tokens"], 20)
+
+        for _ in range(2):
+            mark_publish_failed(db, "esp32", first.command_id, RuntimeError("down"), 30)
+        state = db.docs["irrigation_state/esp32"]
+        self.assertAlmostEqual(state["bucket_tokens"], 30, places=2)
+        self.assertNotIn(key, state["recent"])
+        self.assertEqual(state["last_ack"]["status"], "failed")
+        self.assertEqual(db.docs[f"irrigation_commands/{first.command_id}"]["status"],
+                         "failed")
+
+        retry = reserve_command(db, "esp32", 10, key, **LIMITS)
+        self.assertEqual(retry.status, "sent")
+        self.assertNotEqual(retry.command_id, first.command_id)
+
+    @patch.object(iot_tools, "reserve_command", return_value=Dispatch("duplicate", "d" * 32))
+    def test_duplicate_is_not_published(self, reserve):
+        result = iot_tools._dispatch_irrigation(MagicMock(), "esp32", 5, None)
+
+        self.assertIn("not sending it again", result)
+        self.publisher.publish.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,91 @@
+"""
+Unit tests for the bounded LRU checkpointer
+Uses a tiny LangGraph graph so no LLM or network access is needed
+"""
+
+import operator
+import unittest
+import sys
+import os
+from typing import Annotated, List, TypedDict
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from langgraph.graph import StateGraph, START, END
+
+from benchmarks.fakes import FakeClock
+from checkpointers.lru_saver import LRUSaver
+
+
+class _State(TypedDict):
+    log: Annotated[List[str], operator.add]
+
+
+def _build_graph(saver: LRUSaver):
+    builder = StateGraph(_State)
+    builder.add_node("echo", lambda state: {"log": ["reply"]})
+    builder.add_edge(START, "echo")
+    builder.add_edge("echo", END)
+    return builder.compile(checkpointer=saver)
+
+
+def _config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+class TestLRUSaver(unittest.TestCase):
+    """Tests for per-thread state sharing and eviction"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.saver = LRUSaver(max_threads=2, idle_ttl_seconds=60,
+                              clock=self.clock)
+        self.graph = _build_graph(self.saver)
+
+    def test_threads_share_graph_without_losing_state(self):
+        """Alternating threads keep their own history on one graph."""
+        for turn in range(3):
+            for thread_id in ("alice", "bob"):
+                self.graph.invoke({"log": [f"{thread_id}-{turn}"]},
+                                  _config(thread_id))
+
+        alice = self.graph.get_state(_config("alice")).values["log"]
+        self.assertEqual(len(alice), 6)
+        self.assertTrue(all(not entry.startswith("bob") for entry in alice))
+
+    def test_evicts_least_recently_used_thread(self):
+        """A third thread evicts the least recently used one."""
+        self.graph.invoke({"log": ["a"]}, _config("a"))
+        self.graph.invoke({"log": ["b"]}, _config("b"))
+        self.graph.invoke({"log": ["a2"]}, _config("a"))
+        self.graph.invoke({"log": ["c"]}, _config("c"))
+
+        self.assertIn("a", self.saver)
+        self.assertIn("c", self.saver)
+        self.assertNotIn("b", self.saver)
+        self.assertEqual(self.saver.thread_count, 2)
+        self.assertFalse(any(key[0] == "b" for key in self.saver.blobs))
+        self.assertFalse(any(key[0] == "b" for key in self.saver.writes))
+
+    def test_evicts_idle_threads(self):
+        """Threads idle past the TTL are dropped on the next access."""
+        self.graph.invoke({"log": ["a"]}, _config("a"))
+        self.clock.now = 120
+        self.graph.invoke({"log": ["b"]}, _config("b"))
+
+        self.assertNotIn("a", self.saver)
+        self.assertIsNone(self.saver.get_tuple(_config("a")))
+        self.assertEqual(self.graph.get_state(_config("a")).values, {})
+
+    def test_lookup_of_unknown_thread_allocates_nothing(self):
+        """Reading a thread that was never written leaves no entries."""
+        self.assertIsNone(self.saver.get_tuple(_config("ghost")))
+        self.assertNotIn("ghost", self.saver.storage)
+        self.assertEqual(self.saver.thread_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,194 @@
+"""
+Unit tests for the moisture history query
+Readings are compacted with the rollup job on the in-memory Firestore fake,
+then read back page by page
+"""
+
+import inspect
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from benchmarks.fakes import InMemoryFirestore, InMemoryPublisher, offline_backend
+from devices.registry import register_device
+from telemetry.history import choose_resolution, decode_cursor, query_history
+from telemetry.rollups import DAY_MS, HOUR_MS, MINUTE_MS, compact
+from telemetry.storage import append_samples, bucket_start
+
+# 2025-01-01 00:00 UTC
+DAY_START = 1735689600000
+
+
+def _store(db, device_id, t, p):
+    by_hour = {}
+    for sample in zip(t.tolist(), p.tolist()):
+        by_hour.setdefault(bucket_start(sample[0]), []).append(sample)
+    batch = db.batch()
+    for samples in by_hour.values():
+        append_samples(batch, db, device_id, samples)
+        if len(batch) >= 500:
+            batch.commit()
+    batch.commit()
+
+
+def _pages(db, device_id, start, end, max_points, **kwargs):
+    pages, cursor = [], None
+    while True:
+        page = query_history(db, device_id, start, end, max_points, cursor=cursor, **kwargs)
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+class TestChooseResolution(unittest.TestCase):
+    """Tests for the resolution choice"""
+
+    def test_finest_resolution_within_max_points(self):
+        now = DAY_START + 40 * DAY_MS
+        self.assertEqual(choose_resolution(now - HOUR_MS, now, 500, now).name, "minute")
+        self.assertEqual(choose_resolution(now - 30 * DAY_MS, now, 1000, now).name, "hour")
+        self.assertEqual(choose_resolution(now - 30 * DAY_MS, now, 500, now).name, "day")
+        # Even if the day points exceed max_points
+        self.assertEqual(choose_resolution(now - 30 * DAY_MS, now, 10, now).name, "day")
+
+    def test_expired_minute_points_are_skipped(self):
+        now = DAY_START + 90 * DAY_MS
+        self.assertEqual(choose_resolution(DAY_START, DAY_START + HOUR_MS, 500, now).name,
+                         "hour")
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            decode_cursor("week:123")
+        with self.assertRaises(ValueError):
+            decode_cursor("hour:abc")
+
+
+class TestQueryHistory(unittest.TestCase):
+    """Tests for paginated history reads"""
+
+    def setUp(self):
+        self.db = InMemoryFirestore()
+        # A reading every 5 minutes for 31 days
+        self.t = np.arange(DAY_START, DAY_START + 31 * DAY_MS, 5 * MINUTE_MS)
+        self.p = np.round(50 + 20 * np.sin(self.t / (6 * HOUR_MS)), 1)
+        _store(self.db, "a", self.t, self.p)
+        _store(self.db, "b", self.t, 100 - self.p)
+        self.now = DAY_START + 31 * DAY_MS
+        # Compacted up to 5 minutes before the last hour
+        compact(self.db, now_ms=self.now - HOUR_MS, max_hours=31 * 24, raw_retention_days=0)
+
+    def _expected(self, start, end, step):
+        mask = (self.t >= start) & (self.t < end)
+        t, p = self.t[mask], self.p[mask]
+        buckets = t - t % step
+        starts = np.unique(buckets)
+        return starts.tolist(), [round(p[buckets == b].mean(), 2) for b in starts]
+
+    def test_pages_cover_range_including_recent_readings(self):
+        start, end = self.now - 3 * DAY_MS, self.now
+        pages = _pages(self.db, "a", start, end, 100, page_documents=2, now_ms=self.now)
+
+        self.assertEqual(len(pages), 2)
+        self.assertTrue(all(page["resolution"] == "hour" for page in pages))
+        t = sum((page["t"] for page in pages), [])
+        mean = sum((page["mean"] for page in pages), [])
+        expected_t, expected_mean = self._expected(start, end, HOUR_MS)
+        # The last hour is not compacted yet and comes from the raw readings
+        self.assertEqual(t, expected_t)
+        self.assertEqual(len(t), 72)
+        np.testing.assert_allclose(mean, expected_mean, atol=0.01)
+        self.assertEqual(sum(sum(page["count"]) for page in pages), 72 * 12)
+
+    def test_thirty_day_chart_reads_few_documents(self):
+        start, end = self.now - 30 * DAY_MS, self.now
+        self.db.reads = 0
+        pages = _pages(self.db, "a", start, end, 1000, now_ms=self.now)
+
+        self.assertEqual(sum(len(page["t"]) for page in pages), 30 * 24)
+        self.assertEqual(pages[0]["step_ms"], HOUR_MS)
+        # Day documents of hour points, the watermark and the open hour:
+        # not the 720 raw hour buckets
+        self.assertLess(self.db.reads, 40)
+
+        self.db.reads = 0
+        pages = _pages(self.db, "a", start, end, 100, now_ms=self.now)
+        self.assertEqual(pages[0]["resolution"], "day")
+        self.assertEqual(pages[0]["t"], [DAY_START + d * DAY_MS for d in range(1, 31)])
+        self.assertLess(self.db.reads, 30)
+
+    def test_devices_are_kept_apart(self):
+        start, end = self.now - 2 * HOUR_MS, self.now - HOUR_MS
+        a = query_history(self.db, "a", start, end, 100, now_ms=self.now)
+        b = query_history(self.db, "b", start, end, 100, now_ms=self.now)
+
+        self.assertEqual(a["resolution"], "minute")
+        self.assertEqual(a["t"], b["t"])
+        np.testing.assert_allclose(np.add(a["mean"], b["mean"]), 100)
+        self.assertIsNone(a["next_cursor"])
+
+    def test_history_before_first_compaction_comes_from_raw_readings(self):
+        db = InMemoryFirestore()
+        _store(db, "a", self.t[-24:], self.p[-24:])
+
+        page = query_history(db, "a", self.now - 2 * HOUR_MS, self.now, 500, now_ms=self.now)
+
+        self.assertEqual(page["resolution"], "minute")
+        self.assertEqual(len(page["t"]), 24)
+        self.assertEqual(page["mean"], self.p[-24:].tolist())
+
+    def test_callable_rejects_devices_of_other_users(self):
+        """Only the owner reads a device's history; group names are not devices."""
+        import main
+        from firebase_functions import https_fn
+        register_device(self.db, "a", "alice", groups=["garden"])
+        register_device(self.db, "b", "mallory")
+
+        def call(uid, device_id):
+            # The undecorated callable, without the Flask request handling
+            return inspect.unwrap(main.get_moisture_history)(https_fn.CallableRequest(
+                data={"device_id": device_id, "start": self.now - 2 * HOUR_MS,
+                      "end": self.now - HOUR_MS},
+                raw_request=None, auth=https_fn.AuthData(uid=uid, token={})))
+
+        with offline_backend(self.db, InMemoryPublisher()):
+            self.assertTrue(call("alice", "a")["t"])
+            for uid, device_id in (("mallory", "a"), ("nobody", "a"), ("alice", "garden")):
+                with self.assertRaises(https_fn.HttpsError) as raised:
+                    call(uid, device_id)
+                self.assertEqual(raised.exception.code,
+                                 https_fn.FunctionsErrorCode.INVALID_ARGUMENT)
+
+    def test_callable_takes_start_zero_and_rejects_empty_ranges(self):
+        """start=0 is the epoch, not a missing start; start must be before end."""
+        import main
+        from firebase_functions import https_fn
+        register_device(self.db, "a", "alice")
+
+        def call(**data):
+            return inspect.unwrap(main.get_moisture_history)(https_fn.CallableRequest(
+                data={"device_id": "a", **data}, raw_request=None,
+                auth=https_fn.AuthData(uid="alice", token={})))
+
+        with offline_backend(self.db, InMemoryPublisher()):
+            page = call(start=0, end=self.now, max_points=100)
+            self.assertEqual(page["resolution"], "day")
+            self.assertEqual(page["t"][0], DAY_START)
+            for data in ({"start": self.now, "end": self.now},
+                         {"start": self.now, "end": 0},
+                         {"start": "soon"}):
+                with self.assertRaises(https_fn.HttpsError) as raised:
+                    call(**data)
+                self.assertEqual(raised.exception.code,
+                                 https_fn.FunctionsErrorCode.INVALID_ARGUMENT)
+
+
+if __name__ == '__main__':
+    unittest.main()
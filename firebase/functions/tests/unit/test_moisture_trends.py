@@ -0,0 +1,127 @@
+"""
+Unit tests for moisture trend analytics
+Synthetic histories with known drying rates and waterings, plus the
+get_moisture_trend tool against the in-memory Firestore fake
+"""
+
+import os
+import sys
+import time
+import unittest
+
+import numpy as np
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from benchmarks.fakes import InMemoryFirestore, InMemoryPublisher, offline_backend
+from devices.registry import register_device
+from telemetry.ingest import IngestBatch
+from telemetry.trends import (
+    DAY_MS,
+    HOUR_MS,
+    compute_trend,
+    daily_means,
+    drying_rate,
+    rolling_mean,
+    to_arrays,
+)
+from tools.iot_tools import get_moisture_trend
+
+_NOW = 1735787045000
+
+# The tools only address devices registered to the chatting user
+USER = {"configurable": {"user_id": "uid"}}
+
+
+class TestTrendMath(unittest.TestCase):
+    """Tests for the vectorized statistics"""
+
+    def test_rolling_mean_matches_loop(self):
+        rng = np.random.default_rng(3)
+        t = np.sort(rng.integers(0, 10 * HOUR_MS, 500))
+        p = rng.uniform(0, 100, 500)
+        window = HOUR_MS
+
+        expected = [p[(t > t[i] - window) & (t <= t[i])].mean() for i in range(len(t))]
+        np.testing.assert_allclose(rolling_mean(t, p, window), expected)
+
+    def test_drying_rate_skips_waterings(self):
+        """A watering jump does not count as negative drying."""
+        t = np.arange(0, 48) * HOUR_MS
+        p = 80.0 - 1.5 * (np.arange(48) % 24)  # Refilled to 80% after 24 h
+
+        self.assertAlmostEqual(drying_rate(t, p, before_ms=t[-1] + 1), -1.5)
+
+    def test_daily_means_and_gaps(self):
+        t = np.array([_NOW - 2 * DAY_MS - 1, _NOW - 2 * DAY_MS - 2, _NOW - 1])
+        p = np.array([50.0, 60.0, 40.0])
+
+        self.assertEqual(daily_means(t, p, _NOW, 3), [55.0, None, 40.0])
+
+    def test_trend_projection(self):
+        """Steady drying is projected to the threshold."""
+        t = np.arange(_NOW - 48 * HOUR_MS, _NOW + 1, 10 * 60 * 1000)
+        p = 80.0 - 0.5 * (t - t[0]) / HOUR_MS  # 80% down to 56%
+        trend = compute_trend("esp32", t, p, _NOW, threshold=30.0)
+
+        self.assertAlmostEqual(trend.rate_per_hour, -0.5)
+        self.assertAlmostEqual(trend.usual_rate_per_hour, -0.5)
+        self.assertIsNone(trend.last_watered_ms)
+        # Projected from the 1 h mean, which lags the latest reading by 25 min
+        self.assertAlmostEqual(trend.rolling_mean, 56.0 + 0.5 * 25 / 60)
+        self.assertAlmostEqual(trend.hours_to_threshold, 26 / 0.5 + 25 / 60)
+        self.assertEqual(len(trend.daily_means), 7)
+        self.assertEqual(trend.day_over_day[-1], -12.0)
+
+    def test_recent_rate_starts_at_last_watering(self):
+        """Drying twice as fast after a watering is reported against the usual rate."""
+        t = np.arange(_NOW - 30 * HOUR_MS, _NOW + 1, 10 * 60 * 1000)
+        hours = (t - t[0]) / HOUR_MS
+        watered = _NOW - 3 * HOUR_MS
+        p = np.where(t < watered, 80.0 - 1.0 * hours,
+                     90.0 - 2.0 * (t - watered) / HOUR_MS)
+        trend = compute_trend("esp32", t, p, _NOW)
+
+        self.assertAlmostEqual(trend.rate_per_hour, -2.0)
+        self.assertAlmostEqual(trend.usual_rate_per_hour, -1.0)
+        self.assertEqual(trend.last_watered_ms, watered)
+
+    def test_no_history(self):
+        self.assertIsNone(compute_trend("esp32", *to_arrays([]), _NOW))
+
+
+class TestMoistureTrendTool(unittest.TestCase):
+    """Tests for the get_moisture_trend tool"""
+
+    def setUp(self):
+        self.db = InMemoryFirestore()
+        self.enterContext(offline_backend(self.db, InMemoryPublisher()))
+        register_device(self.db, "esp32", "uid")
+        register_device(self.db, "kitchen", "uid")
+
+    def test_summary_from_stored_history(self):
+        now = int(time.time() * 1000)
+        ingest = IngestBatch(self.db)
+        for minutes in range(0, 24 * 60, 15):
+            received_at = now - minutes * 60 * 1000
+            ingest.add_moisture({"percentage": 40.0 + minutes / 60, "timestamp": 0},
+                                received_at=received_at, device_id="esp32")
+        batch = self.db.batch()
+        ingest.write_to(batch)
+        batch.commit()
+
+        result = get_moisture_trend.invoke({"device": "esp32"}, USER)
+
+        self.assertIn("📈 esp32: 40.0% now", result)
+        self.assertIn("Recent rate: -1.00%/h", result)
+        self.assertIn("Projected to reach 30% in", result)
+        self.assertLess(len(result), 600)  # A summary, not the samples
+        self.assertIn("No moisture history",
+                      get_moisture_trend.invoke({"device": "kitchen"}, USER))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
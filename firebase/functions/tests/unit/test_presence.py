@@ -0,0 +1,156 @@
+"""
+Unit tests for device presence: last-seen index, offline sweep and fleet
+presence
+"""
+
+import inspect
+import os
+import sys
+import time
+import unittest
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from benchmarks.fakes import (
+    FakeClock, InMemoryFirestore, InMemoryPublisher, offline_backend, pubsub_event
+)
+from devices.presence import (
+    PRESENCE_COLLECTION,
+    PRESENCE_EVENTS_COLLECTION,
+    PresenceCache,
+    fleet_presence,
+    presence_shard,
+    sweep,
+)
+from devices.registry import register_device
+from telemetry.ingest import IngestBatch
+
+MINUTE_MS = 60 * 1000
+NOW_MS = 1_760_000_000_000
+
+
+class TestPresence(unittest.TestCase):
+    """Tests for the presence index and sweep"""
+
+    def setUp(self):
+        self.db = InMemoryFirestore()
+
+    def _status(self, device_id: str, received_at: int, status: str = "online"):
+        ingest = IngestBatch(self.db)
+        ingest.add_system_status({"status": status}, received_at=received_at,
+                                 device_id=device_id)
+        batch = self.db.batch()
+        ingest.write_to(batch)
+        batch.commit()
+
+    def _events(self):
+        return sorted(
+            (data["device_id"], data["state"]) for path, data in self.db.docs.items()
+            if path.startswith(PRESENCE_EVENTS_COLLECTION + "/"))
+
+    def test_status_messages_update_last_seen(self):
+        self._status("a", NOW_MS - MINUTE_MS)
+        self._status("b", NOW_MS - 10 * MINUTE_MS, status="offline")
+
+        presence = fleet_presence(self.db, ["a", "b", "never"], now_ms=NOW_MS)
+
+        self.assertTrue(presence["a"].online)
+        self.assertEqual(presence["a"].last_seen, NOW_MS - MINUTE_MS)
+        self.assertFalse(presence["b"].online)
+        self.assertEqual(presence["b"].status, "offline")
+        self.assertFalse(presence["never"].online)
+        self.assertIsNone(presence["never"].last_seen)
+
+    def test_fleet_presence_is_one_query(self):
+        for i in range(200):
+            self._status(f"device-{i}", NOW_MS)
+        self.db.reads = 0
+
+        presence = fleet_presence(self.db, now_ms=NOW_MS)
+
+        self.assertEqual(len(presence), 200)
+        # One document per shard, not per device
+        shards = {presence_shard(f"device-{i}") for i in range(200)}
+        self.assertEqual(self.db.reads, len(shards))
+
+    def test_sweep_records_transitions(self):
+        self._status("a", NOW_MS)
+        self._status("b", NOW_MS)
+        first = sweep(self.db, now_ms=NOW_MS)
+        self.assertEqual(first, {"devices": 2, "online": 2,
+                                 "went_offline": 0, "came_online": 0})
+
+        # b stops reporting
+        self._status("a", NOW_MS + 4 * MINUTE_MS)
+        second = sweep(self.db, now_ms=NOW_MS + 5 * MINUTE_MS)
+        self.assertEqual(second["went_offline"], 1)
+        self.assertEqual(self._events(), [("b", "offline")])
+        entry = self.db.docs[f"{PRESENCE_COLLECTION}/{presence_shard('b')}"]["devices"]["b"]
+        self.assertEqual(entry["state"], "offline")
+        self.assertEqual(entry["since"], NOW_MS + 150 * 1000)
+
+        # b comes back
+        self._status("b", NOW_MS + 6 * MINUTE_MS)
+        third = sweep(self.db, now_ms=NOW_MS + 6 * MINUTE_MS)
+        self.assertEqual(third["came_online"], 1)
+        self.assertEqual(self._events(), [("b", "offline"), ("b", "online")])
+
+        # Nothing changed, nothing written
+        writes = self.db.writes
+        sweep(self.db, now_ms=NOW_MS + 6 * MINUTE_MS)
+        self.assertEqual(self.db.writes, writes)
+
+    def test_cache_reloads_after_ttl(self):
+        clock = FakeClock()
+        cache = PresenceCache(ttl_seconds=10, clock=clock)
+        self._status("a", NOW_MS)
+
+        self.assertTrue(cache.lookup(self.db, ["a"], now_ms=NOW_MS)["a"].online)
+        reads = self.db.reads
+        cache.lookup(self.db, ["a"], now_ms=NOW_MS)
+        self.assertEqual(self.db.reads, reads)
+
+        self._status("b", NOW_MS)
+        self.assertIsNone(cache.lookup(self.db, ["b"], now_ms=NOW_MS)["b"].last_seen)
+        clock.now = 11
+        self.assertTrue(cache.lookup(self.db, ["b"], now_ms=NOW_MS)["b"].online)
+
+    def test_handler_maintains_index(self):
+        import main
+        main._presence.clear()
+        with offline_backend(self.db, InMemoryPublisher()):
+            main.handle_system_status(pubsub_event(
+                {"status": "online", "device_id": "kitchen"}, topic="system-status"))
+
+        presence = fleet_presence(self.db, ["kitchen"], now_ms=int(time.time() * 1000))
+        self.assertTrue(presence["kitchen"].online)
+
+    def test_callable_only_reports_own_devices(self):
+        """Another user's device is refused, also for users without devices."""
+        import main
+        from firebase_functions import https_fn
+        main._presence.clear()
+        register_device(self.db, "kitchen", "alice")
+        self._status("kitchen", int(time.time() * 1000))
+
+        def call(uid, data):
+            # The undecorated callable, without the Flask request handling
+            return inspect.unwrap(main.get_device_presence)(https_fn.CallableRequest(
+                data=data, raw_request=None, auth=https_fn.AuthData(uid=uid, token={})))
+
+        with offline_backend(self.db, InMemoryPublisher()):
+            self.assertTrue(call("alice", {})["devices"]["kitchen"]["online"])
+            register_device(self.db, "porch", "mallory")
+            for uid in ("mallory", "nobody"):
+                with self.assertRaises(https_fn.HttpsError) as raised:
+                    call(uid, {"device": "kitchen"})
+                self.assertEqual(raised.exception.code,
+                                 https_fn.FunctionsErrorCode.INVALID_ARGUMENT)
+            self.assertEqual(list(call("mallory", {})["devices"]), ["porch"])
+
+
+if __name__ == '__main__':
+    unittest.main()
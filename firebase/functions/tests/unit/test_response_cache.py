@@ -0,0 +1,184 @@
+"""
+Unit tests for the semantic response cache
+"""
+
+import os
+import sys
+import unittest
+from typing import List, Optional
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from langchain.agents import create_agent
+from langchain.tools import tool
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+import agent as agent_module
+from agent import MaxOutputTokens, PlantPalAgent, run_async
+from benchmarks.fakes import FakeClock, ScriptedChatModel
+from utils.response_cache import HashingEmbedder, ResponseCache, is_cacheable_message
+
+# agent.py turns tracing on at import, keep the tests offline
+os.environ["LANGSMITH_TRACING"] = "false"
+
+
+MODEL = "scripted"
+
+
+class ThreadContextModel(ScriptedChatModel):
+    """Answers every turn with the thread's first message, to show its context"""
+
+    def _next(self, messages):
+        first = next(m for m in messages if isinstance(m, HumanMessage))
+        return AIMessage(content=f"About: {first.content}")
+
+
+class BrokenEmbedder:
+    def embed(self, text: str):
+        raise RuntimeError("embedding service unavailable")
+
+
+@tool
+def get_moisture_data(device: str = "") -> str:
+    """Get soil moisture data from the sensor."""
+    return "Soil moisture (esp32): 42.0%"
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test ResponseCache lookups, expiry and eviction"""
+
+    def setUp(self):
+        self.clock = FakeClock(1000.0)
+        self.cache = ResponseCache(HashingEmbedder(), threshold=0.8,
+                                   ttl_seconds=60, max_entries=2, clock=self.clock)
+
+    def _put(self, message: str, answer: str):
+        self.cache.put(self.cache.embed(message), answer)
+
+    def _get(self, message: str):
+        return self.cache.get(self.cache.embed(message))
+
+    def test_hit_on_reworded_question(self):
+        self._put("How much light does a snake plant need?", "Low to bright indirect.")
+
+        self.assertEqual(self._get("how much light does a Snake Plant need"),
+                         "Low to bright indirect.")
+        self.assertIsNone(self._get("How often should I repot a fern?"))
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_answers_expire(self):
+        self._put("How much light does a snake plant need?", "Low to bright indirect.")
+
+        self.clock.now += 61
+
+        self.assertIsNone(self._get("How much light does a snake plant need?"))
+
+    def test_oldest_answer_is_evicted_when_full(self):
+        self._put("How much light does a snake plant need?", "Light")
+        self.clock.now += 1
+        self._put("How often should I repot a fern?", "Repot")
+        self.clock.now += 1
+        self._put("Is a pothos toxic to cats?", "Toxic")
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self._get("How much light does a snake plant need?"))
+        self.assertEqual(self._get("Is a pothos toxic to cats?"), "Toxic")
+
+    def test_near_duplicate_replaces_entry(self):
+        self._put("How much light does a snake plant need?", "Old")
+        self._put("How much light does a snake plant need", "New")
+
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self._get("How much light does a snake plant need?"), "New")
+
+    def test_live_data_questions_bypass_cache(self):
+        self.assertFalse(is_cacheable_message("What is my sensor reading?"))
+        self.assertFalse(is_cacheable_message("Is my soil dry right now?"))
+        self.assertTrue(is_cacheable_message("How often should I water basil?"))
+        self.assertIsNone(self.cache.embed("What's the status of my plants?"))
+        self.assertEqual(self.cache.stats()["skipped"], 1)
+
+    def test_embedding_failure_skips_cache(self):
+        cache = ResponseCache(BrokenEmbedder())
+
+        self.assertIsNone(cache.embed("How much light does a snake plant need?"))
+        self.assertEqual(cache.stats()["errors"], 1)
+
+
+class TestAgentResponseCache(unittest.TestCase):
+    """Test the response cache in front of PlantPalAgent"""
+
+    def tearDown(self):
+        agent_module.reset_agent()
+
+    def _make_agent(self, responses: List[AIMessage],
+                    model: Optional[ScriptedChatModel] = None) -> PlantPalAgent:
+        self.model = model or ScriptedChatModel(responses=responses)
+        checkpointer = InMemorySaver()
+        agent_module._checkpointer = checkpointer
+        agent_module._response_cache = ResponseCache(HashingEmbedder(), threshold=0.8)
+        agent_module._compiled_agents[(MODEL, MaxOutputTokens.LARGE.value)] = \
+            create_agent(model=self.model, tools=[get_moisture_data],
+                         checkpointer=checkpointer)
+        return PlantPalAgent(thread_id="thread-1", model=MODEL)
+
+    def test_repeated_question_is_answered_from_cache(self):
+        agent = self._make_agent([AIMessage(content="Bright indirect light."),
+                                  AIMessage(content="Second model answer.")])
+        other = PlantPalAgent(thread_id="thread-2", model=MODEL)
+
+        agent.chat("How much light does a snake plant need?")
+        response = run_async(other.achat("how much light does a snake plant need"))
+
+        self.assertEqual(response, "Bright indirect light.")
+        self.assertEqual(agent_module._response_cache.stats()["hits"], 1)
+        # The cached turn is still part of the thread
+        history = other.get_conversation_history()
+        self.assertEqual([m.type for m in history], ["human", "ai"])
+        self.assertEqual(history[-1].content, "Bright indirect light.")
+
+    def test_stream_hit_yields_cached_answer(self):
+        agent = self._make_agent([AIMessage(content="Bright indirect light.")])
+
+        agent.chat("How much light does a snake plant need?")
+        other = PlantPalAgent(thread_id="thread-2", model=MODEL)
+        events = list(other.stream_chat("How much light does a snake plant need?"))
+
+        self.assertEqual(events, [
+            {"type": "token", "text": "Bright indirect light."},
+            {"type": "done", "response": "Bright indirect light."},
+        ])
+
+    def test_threads_with_history_do_not_share_answers(self):
+        """Follow-up questions depend on the thread, so they are not cached."""
+        cactus = self._make_agent([], model=ThreadContextModel(responses=[]))
+        fern = PlantPalAgent(thread_id="thread-2", model=MODEL)
+
+        cactus.chat("I just bought a cactus for my desk.")
+        fern.chat("My new fern lives in the bathroom.")
+        cactus.chat("How often should I water it?")
+
+        self.assertEqual(fern.chat("How often should I water it?"),
+                         "About: My new fern lives in the bathroom.")
+        self.assertEqual(agent_module._response_cache.stats()["hits"], 0)
+        self.assertEqual(len(agent_module._response_cache), 2)  # First turns only
+
+    def test_turns_with_iot_tools_are_not_cached(self):
+        agent = self._make_agent([
+            AIMessage(content="", tool_calls=[
+                {"name": "get_moisture_data", "args": {}, "id": "call-1"}]),
+            AIMessage(content="Your basil is at 42%."),
+        ])
+
+        agent.chat("How is my basil doing?")
+
+        self.assertEqual(len(agent_module._response_cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
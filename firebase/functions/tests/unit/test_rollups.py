@@ -0,0 +1,207 @@
+"""
+Unit tests for the moisture rollups and the compaction job
+The vectorized fold is checked against a per-bucket loop; compaction runs
+against the in-memory Firestore fake
+"""
+
+import copy
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from benchmarks.fakes import InMemoryFirestore
+from telemetry.rollups import (
+    DAY,
+    DAY_MS,
+    HOUR,
+    HOUR_MS,
+    MINUTE,
+    MINUTE_MS,
+    ROLLUP_STATE_COLLECTION,
+    ROLLUP_STATE_DOCUMENT,
+    ROLLUPS_COLLECTION,
+    Rollup,
+    compact,
+    fold,
+)
+from telemetry.storage import HOURLY_SUBCOLLECTION, append_samples, bucket_start
+
+# 2025-01-01 00:00 UTC
+DAY_START = 1735689600000
+
+
+def _store(db, device_id, readings):
+    """Append (t, p) readings to the raw hour buckets"""
+    by_hour = {}
+    for t, p in readings:
+        by_hour.setdefault(bucket_start(t), []).append((t, p))
+    batch = db.batch()
+    for samples in by_hour.values():
+        append_samples(batch, db, device_id, samples)
+    batch.commit()
+
+
+def _readings(start_ms, end_ms, every_ms, seed):
+    rng = np.random.default_rng(seed)
+    t = np.arange(start_ms, end_ms, every_ms)
+    return list(zip(t.tolist(), np.round(rng.uniform(20, 80, len(t)), 1).tolist()))
+
+
+def _rollups(db):
+    return {path.split("/", 1)[1]: data for path, data in db.docs.items()
+            if path.startswith(ROLLUPS_COLLECTION + "/")}
+
+
+def _raw_buckets(db):
+    return sorted(data['bucket_start'] for path, data in db.docs.items()
+                  if f"/{HOURLY_SUBCOLLECTION}/" in path)
+
+
+class TestFold(unittest.TestCase):
+    """Tests for the vectorized fold"""
+
+    def test_matches_per_bucket_loop(self):
+        rng = np.random.default_rng(3)
+        index = rng.integers(0, 4, 500)
+        t = DAY_START + rng.integers(0, 3 * HOUR_MS, 500)
+        p = rng.uniform(0, 100, 500)
+
+        minutes = fold(Rollup.of_readings(index, t, p), MINUTE_MS)
+
+        for i, start, low, high, mean, count in zip(
+                minutes.device_index, minutes.t, minutes.minimum, minutes.maximum,
+                minutes.mean, minutes.count):
+            values = p[(index == i) & (t - t % MINUTE_MS == start)]
+            self.assertEqual(count, len(values))
+            self.assertEqual(low, values.min())
+            self.assertEqual(high, values.max())
+            self.assertAlmostEqual(mean, values.mean())
+        self.assertEqual(minutes.count.sum(), 500)
+
+    def test_folding_rollups_equals_folding_readings(self):
+        rng = np.random.default_rng(5)
+        index = rng.integers(0, 3, 2000)
+        t = DAY_START + rng.integers(0, 2 * DAY_MS, 2000)
+        readings = Rollup.of_readings(index, t, rng.uniform(0, 100, 2000))
+
+        direct = fold(readings, DAY_MS)
+        cascaded = fold(fold(fold(readings, MINUTE_MS), HOUR_MS), DAY_MS)
+
+        np.testing.assert_array_equal(direct.t, cascaded.t)
+        np.testing.assert_array_equal(direct.count, cascaded.count)
+        np.testing.assert_array_equal(direct.minimum, cascaded.minimum)
+        np.testing.assert_allclose(direct.mean, cascaded.mean)
+
+
+class TestCompaction(unittest.TestCase):
+    """Tests for the scheduled compaction job"""
+
+    def setUp(self):
+        self.db = InMemoryFirestore()
+        # Two devices reporting every 20 s for 26 hours, across midnight
+        self.readings = {
+            "a": _readings(DAY_START - 2 * HOUR_MS, DAY_START + DAY_MS, 20 * 1000, seed=1),
+            "b": _readings(DAY_START - 2 * HOUR_MS, DAY_START + DAY_MS, 20 * 1000, seed=2),
+        }
+        for device_id, readings in self.readings.items():
+            _store(self.db, device_id, readings)
+
+    def _watermark(self, db=None):
+        db = db or self.db
+        return db.docs[f"{ROLLUP_STATE_COLLECTION}/{ROLLUP_STATE_DOCUMENT}"]["watermark"]
+
+    def test_rollups_hold_min_max_mean_count(self):
+        now = DAY_START + DAY_MS + 10 * MINUTE_MS
+        compact(self.db, now_ms=now, max_hours=48, raw_retention_days=0)
+        rollups = _rollups(self.db)
+
+        values = np.array([p for t, p in self.readings["a"]
+                           if DAY_START + HOUR_MS <= t < DAY_START + 2 * HOUR_MS])
+        hour = rollups[HOUR.document_id("a", DAY_START)]["points"]["01"]
+        self.assertEqual(hour["count"], len(values))
+        self.assertEqual(hour["min"], values.min())
+        self.assertEqual(hour["max"], values.max())
+        self.assertAlmostEqual(hour["mean"], values.mean())
+
+        minute = rollups[MINUTE.document_id("a", DAY_START + HOUR_MS)]
+        self.assertEqual(len(minute["points"]), 60)
+        self.assertEqual(minute["points"]["00"]["count"], 3)
+        self.assertIn("expire_at", minute)
+
+        # The day closed at midnight, from all 24 hours
+        values = np.array([p for t, p in self.readings["b"]
+                           if DAY_START <= t < DAY_START + DAY_MS])
+        day = rollups[DAY.document_id("b", DAY_START)]
+        self.assertEqual(day["span_start"], DAY_START)
+        self.assertEqual(day["points"]["00"]["count"], len(values))
+        self.assertAlmostEqual(day["points"]["00"]["mean"], values.mean())
+        self.assertNotIn("expire_at", day)
+        # Dec 31 closed too, with the two hours it has readings for
+        previous = rollups[DAY.document_id("b", DAY_START - DAY_MS)]["points"]["30"]
+        self.assertEqual(previous["count"], 2 * 180)
+
+    def test_only_closed_buckets_are_written(self):
+        now = DAY_START + 30 * MINUTE_MS + 20 * 1000
+        summary = compact(self.db, now_ms=now, max_hours=48, raw_retention_days=0)
+
+        # Minutes up to 5 minutes (grace) ago, no hour for 00:00-01:00 yet
+        self.assertEqual(summary["watermark"], DAY_START + 25 * MINUTE_MS)
+        minutes = _rollups(self.db)[MINUTE.document_id("a", DAY_START)]["points"]
+        self.assertEqual(sorted(minutes), [f"{m:02d}" for m in range(25)])
+        hours = _rollups(self.db)[HOUR.document_id("a", DAY_START - DAY_MS)]["points"]
+        self.assertEqual(sorted(hours), ["22", "23"])
+        self.assertNotIn(HOUR.document_id("a", DAY_START), _rollups(self.db))
+        self.assertEqual(summary["day"], 2)
+
+    def test_incremental_runs_match_one_run(self):
+        end = DAY_START + DAY_MS + 10 * MINUTE_MS
+        once = copy.deepcopy(self.db)
+        compact(once, now_ms=end, max_hours=48, raw_retention_days=0)
+
+        # Every 15 minutes, then runs that catch up max_hours at a time
+        for now in range(DAY_START - HOUR_MS, end + 1, 15 * MINUTE_MS):
+            compact(self.db, now_ms=now, max_hours=1, raw_retention_days=0)
+        while self._watermark() < self._watermark(once):
+            compact(self.db, now_ms=end, max_hours=1, raw_retention_days=0)
+
+        self.assertEqual(_rollups(self.db), _rollups(once))
+        # Nothing left to do, nothing written
+        writes = self.db.writes
+        compact(self.db, now_ms=end, max_hours=1, raw_retention_days=0)
+        self.assertEqual(self.db.writes, writes)
+
+    def test_restart_from_watermark_is_idempotent(self):
+        now = DAY_START + 12 * HOUR_MS
+        compact(self.db, now_ms=now, raw_retention_days=0)
+        first = _rollups(self.db)
+
+        # A run that failed after writing rollups, before moving the watermark
+        state = self.db.collection(ROLLUP_STATE_COLLECTION).document(ROLLUP_STATE_DOCUMENT)
+        state.set({"watermark": DAY_START - 2 * HOUR_MS})
+        compact(self.db, now_ms=now, raw_retention_days=0)
+
+        self.assertEqual(_rollups(self.db), first)
+
+    def test_purges_only_compacted_raw_buckets(self):
+        now = DAY_START + DAY_MS + 10 * MINUTE_MS
+        summary = compact(self.db, now_ms=now, max_hours=12, raw_retention_days=0.5)
+
+        # Watermark at 10:00, retention cutoff at 12:00: 12 buckets compacted
+        self.assertEqual(summary["watermark"], DAY_START + 10 * HOUR_MS)
+        self.assertEqual(summary["purged"], 2 * 12)
+        self.assertEqual(_raw_buckets(self.db)[0], DAY_START + 10 * HOUR_MS)
+
+        summary = compact(self.db, now_ms=now, max_hours=48, raw_retention_days=0.5)
+        self.assertEqual(_raw_buckets(self.db)[0], DAY_START + 12 * HOUR_MS)
+        self.assertEqual(len(_raw_buckets(self.db)), 2 * 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
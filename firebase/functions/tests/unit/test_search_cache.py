@@ -0,0 +1,136 @@
+"""
+Unit tests for the PlantPal web search cache
+"""
+
+import asyncio
+import json
+import os
+import sys
+import unittest
+from typing import Any
+from unittest.mock import MagicMock
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from langchain_core.tools import BaseTool
+
+from benchmarks.fakes import FakeClock
+from tools.search_cache import (
+    CachedSearchTool,
+    SearchCache,
+    cache_key,
+    normalize_query,
+)
+
+
+class FakeSearch(BaseTool):
+    """Counts calls and returns a Tavily-shaped result"""
+
+    name: str = "tavily_search"
+    description: str = "Search the web"
+    calls: int = 0
+
+    def _run(self, query: str, topic: str = None) -> Any:
+        self.calls += 1
+        if query == "fail":
+            return {"error": "rate limited"}
+        return {"query": query, "results": [{"content": f"About {query}"}]}
+
+
+class TestSearchCache(unittest.TestCase):
+    """Tests for SearchCache and CachedSearchTool"""
+
+    def setUp(self):
+        self.clock = FakeClock(1_700_000_000.0)
+        self.cache = SearchCache(max_entries=2, ttl_seconds=60, clock=self.clock)
+        self.search = FakeSearch()
+        self.tool = CachedSearchTool(self.search, self.cache)
+
+    def test_normalized_queries_share_an_entry(self):
+        """Case, punctuation and spacing do not change the key."""
+        self.assertEqual(normalize_query("  How often to water a Pothos?? "),
+                         "how often to water a pothos")
+        self.tool.invoke({"query": "How often to water a pothos?"})
+        self.tool.invoke({"query": "how often to water a  POTHOS"})
+
+        self.assertEqual(self.search.calls, 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_other_arguments_are_part_of_the_key(self):
+        """Same query with a different topic is a different search."""
+        self.assertNotEqual(cache_key({"query": "basil"}),
+                            cache_key({"query": "basil", "topic": "news"}))
+        self.assertEqual(cache_key({"query": "basil", "topic": None}),
+                         cache_key({"query": "basil"}))
+
+    def test_ttl_expires_entries(self):
+        """Results older than the TTL are fetched again."""
+        self.tool.invoke({"query": "fern"})
+        self.clock.now += 61
+        self.tool.invoke({"query": "fern"})
+
+        self.assertEqual(self.search.calls, 2)
+
+    def test_lru_evicts_least_recently_used(self):
+        """The cache stays within max_entries."""
+        for query in ["a", "b", "a", "c"]:
+            self.tool.invoke({"query": query})
+        self.tool.invoke({"query": "a"})
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.search.calls, 3)  # "b" was evicted, "a" kept
+
+    def test_errors_are_not_cached(self):
+        """Failed searches are retried on the next call."""
+        self.tool.invoke({"query": "fail"})
+        self.tool.invoke({"query": "fail"})
+
+        self.assertEqual(self.search.calls, 2)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_async_path_uses_the_cache(self):
+        """ainvoke reads and fills the same cache."""
+        asyncio.run(self.tool.ainvoke({"query": "cactus"}))
+        asyncio.run(self.tool.ainvoke({"query": "cactus"}))
+
+        self.assertEqual(self.search.calls, 1)
+
+    def test_shared_tier_fills_local_cache(self):
+        """A local miss is answered from a fresh shared document."""
+        key = cache_key({"query": "orchid"})
+        result = {"query": "orchid", "results": [{"content": "shared"}]}
+        snapshot = MagicMock(exists=True)
+        snapshot.to_dict.return_value = {
+            "key": key,
+            "result": json.dumps(result),
+            "created_at": int((self.clock.now - 10) * 1000),
+        }
+        db = MagicMock()
+        db.collection.return_value.document.return_value.get.return_value = snapshot
+        cache = SearchCache(ttl_seconds=60, db=db, clock=self.clock)
+        tool = CachedSearchTool(self.search, cache)
+
+        self.assertEqual(tool.invoke({"query": "Orchid"}), result)
+        tool.invoke({"query": "orchid"})
+
+        self.assertEqual(self.search.calls, 0)
+        stats = cache.stats()
+        self.assertEqual((stats["shared_hits"], stats["hits"]), (1, 1))
+
+    def test_stats_estimate_savings(self):
+        """Saved time is hits times the average fetch time."""
+        self.cache.put("x", {"results": [1]}, fetch_seconds=0.8)
+        self.cache._counters["misses"] = 1
+        self.cache.get("x")
+        self.cache.get("x")
+
+        stats = self.cache.stats()
+        self.assertAlmostEqual(stats["hit_rate"], 2 / 3)
+        self.assertAlmostEqual(stats["estimated_seconds_saved"], 1.6)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
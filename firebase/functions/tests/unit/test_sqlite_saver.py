@@ -0,0 +1,109 @@
+"""
+Unit tests for the durable SQLite checkpointer
+Covers cold-start resume and delta-only channel writes without Firestore
+"""
+
+import operator
+import os
+import sys
+import tempfile
+import unittest
+from typing import Annotated, List, TypedDict
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import StateGraph, START, END, MessagesState
+
+from checkpointers.sqlite_saver import SQLiteSaver
+
+
+class _CounterState(TypedDict):
+    log: Annotated[List[str], operator.add]
+    unchanged: str
+
+
+def _build_chat_graph(saver: SQLiteSaver):
+    def reply(state: MessagesState) -> dict:
+        return {"messages": [AIMessage(content=f"reply {len(state['messages'])}")]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("reply", reply)
+    builder.add_edge(START, "reply")
+    builder.add_edge("reply", END)
+    return builder.compile(checkpointer=saver)
+
+
+def _config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+class TestSQLiteSaver(unittest.TestCase):
+    """Tests for durable checkpoint storage"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "checkpoints.sqlite")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_cold_instance_resumes_thread(self):
+        """A new saver on the same database resumes the conversation."""
+        warm = SQLiteSaver(self.path)
+        graph = _build_chat_graph(warm)
+        graph.invoke({"messages": [HumanMessage(content="hi")]}, _config("t1"))
+        graph.invoke({"messages": [HumanMessage(content="again")]}, _config("t1"))
+        warm.close()
+
+        cold = SQLiteSaver(self.path)
+        graph = _build_chat_graph(cold)
+        result = graph.invoke({"messages": [HumanMessage(content="third")]},
+                              _config("t1"))
+
+        contents = [m.content for m in result["messages"]]
+        self.assertEqual(contents, ["hi", "reply 1", "again", "reply 3",
+                                    "third", "reply 5"])
+        self.assertIsNone(cold.get_tuple(_config("other")))
+
+    def test_put_writes_only_changed_channels(self):
+        """Unchanged channels are not re-written on later checkpoints."""
+        saver = SQLiteSaver()
+        builder = StateGraph(_CounterState)
+        builder.add_node("step", lambda state: {"log": ["x"]})
+        builder.add_edge(START, "step")
+        builder.add_edge("step", END)
+        graph = builder.compile(checkpointer=saver)
+
+        graph.invoke({"log": [], "unchanged": "same"}, _config("t1"))
+        graph.invoke({"log": []}, _config("t1"))
+
+        rows = saver._conn.execute(
+            "SELECT channel, COUNT(*) FROM blobs GROUP BY channel"
+        ).fetchall()
+        counts = dict(rows)
+        self.assertEqual(counts["unchanged"], 1)
+        self.assertGreater(counts["log"], 1)
+
+    def test_list_and_delete_thread(self):
+        """History is listed newest first and deleted per thread."""
+        saver = SQLiteSaver()
+        graph = _build_chat_graph(saver)
+        graph.invoke({"messages": [HumanMessage(content="a")]}, _config("t1"))
+        graph.invoke({"messages": [HumanMessage(content="b")]}, _config("t2"))
+
+        history = list(saver.list(_config("t1")))
+        ids = [item.config["configurable"]["checkpoint_id"] for item in history]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(list(saver.list(_config("t1"), limit=1))), 1)
+
+        saver.delete_thread("t1")
+        self.assertIsNone(saver.get_tuple(_config("t1")))
+        self.assertIsNotNone(saver.get_tuple(_config("t2")))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,152 @@
+"""
+Unit tests for PlantPal telemetry decoding
+Covers schema validation of moisture messages and the dead-letter path of
+the Pub/Sub handlers, against the in-memory Firestore fake
+"""
+
+import copy
+import json
+import os
+import sys
+import time
+import unittest
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from benchmarks.fakes import (
+    InMemoryFirestore, InMemoryPublisher, offline_backend, pubsub_event
+)
+from telemetry.decode import (
+    RecordDecoder, TelemetryDecodeError, decode_base64, moisture_decoder
+)
+
+
+class TestMoistureDecoder(unittest.TestCase):
+    """Tests for schema validation"""
+
+    def _reason(self, raw):
+        with self.assertRaises(TelemetryDecodeError) as ctx:
+            moisture_decoder.decode(raw)
+        return ctx.exception.reason
+
+    def test_schema_fields(self):
+        """The decoder is compiled from iot/schemas/moisture-data.json."""
+        with open(os.path.join(parent_dir, "..", "..", "iot", "schemas",
+                               "moisture-data.json")) as f:
+            schema = json.load(f)
+        self.assertEqual([field.name for field in moisture_decoder.fields],
+                         [field["name"] for field in schema["fields"]])
+
+    def test_valid_reading_is_normalized(self):
+        """Defaults are filled in, unknown fields dropped, ints become floats."""
+        record = moisture_decoder.decode(
+            b'{"percentage": 42, "timestamp": 1000, "extra": true}')
+
+        self.assertEqual(record, {"percentage": 42.0, "timestamp": 1000,
+                                  "request_id": "", "device_id": "",
+                                  "traceparent": ""})
+        self.assertIsInstance(record["percentage"], float)
+
+    def test_rejects(self):
+        cases = {
+            b"not json": "not_json",
+            b"[42]": "not_object",
+            b'{"timestamp": 1}': "missing_field",
+            b'{"percentage": null, "timestamp": 1}': "wrong_type",
+            b'{"percentage": "42", "timestamp": 1}': "wrong_type",
+            b'{"percentage": true, "timestamp": 1}': "wrong_type",
+            b'{"percentage": 42, "timestamp": 1.5}': "wrong_type",
+            b'{"percentage": 100.5, "timestamp": 1}': "out_of_range",
+            b'{"percentage": 42, "timestamp": -1}': "out_of_range",
+            b'{"percentage": 42, "timestamp": 1, "request_id": "' + b"x" * 200 + b'"}':
+                "out_of_range",
+        }
+        for raw, reason in cases.items():
+            with self.subTest(raw=raw[:40]):
+                self.assertEqual(self._reason(raw), reason)
+
+    def test_union_types(self):
+        """Nullable unions accept null."""
+        decoder = RecordDecoder({"name": "Test", "fields": [
+            {"name": "note", "type": ["null", "string"], "default": None}]})
+        self.assertEqual(decoder.validate({"note": None}), {"note": None})
+        self.assertEqual(decoder.validate({}), {"note": None})
+
+    def test_invalid_base64(self):
+        with self.assertRaises(TelemetryDecodeError) as ctx:
+            decode_base64("not base64!")
+        self.assertEqual(ctx.exception.reason, "not_base64")
+
+
+class TestDeadLetter(unittest.TestCase):
+    """Tests for the handlers' storage and dead-letter paths"""
+
+    def setUp(self):
+        import main
+        self.main = main
+        self.db = InMemoryFirestore()
+        self.enterContext(offline_backend(self.db, InMemoryPublisher()))
+
+    def test_invalid_reading_is_dead_lettered(self):
+        """An out-of-range reading is stored in the dead-letter collection only."""
+        self.main.handle_moisture_data(pubsub_event(
+            {"percentage": 250, "timestamp": 1}, {"device_id": "esp32"}))
+        self.main.handle_moisture_data(pubsub_event(
+            {"percentage": "wet"}, {"device_id": "esp32"}))
+
+        self.assertNotIn("sensor_data/esp32", self.db.docs)
+        dead_letters = [doc for path, doc in self.db.docs.items()
+                        if path.startswith("telemetry_dead_letter/")]
+        self.assertEqual(sorted(doc["reason"] for doc in dead_letters),
+                         ["out_of_range", "wrong_type"])
+        self.assertEqual(dead_letters[0]["attributes"], {"device_id": "esp32"})
+        self.assertIn("expire_at", dead_letters[0])
+
+        counters = self.db.docs["telemetry_dead_letter_stats/data-moisture"]
+        self.assertEqual(counters["total"], 2)
+        self.assertEqual(counters["reasons"],
+                         {"out_of_range": 1, "wrong_type": 1})
+
+    def test_redelivered_reject_is_counted_once(self):
+        event = pubsub_event({"percentage": 250, "timestamp": 1}, {"device_id": "esp32"})
+        self.main.handle_moisture_data(copy.deepcopy(event))
+        self.main.handle_moisture_data(copy.deepcopy(event))
+
+        counters = self.db.docs["telemetry_dead_letter_stats/data-moisture"]
+        self.assertEqual(counters["total"], 1)
+        self.assertEqual(counters["reasons"], {"out_of_range": 1})
+
+    def test_valid_reading_is_stored(self):
+        self.main.handle_moisture_data(pubsub_event(
+            {"percentage": 35.5, "timestamp": 1}, {"device_id": "esp32"}))
+
+        self.assertEqual(self.db.docs["sensor_data/esp32"]["percentage"], 35.5)
+        self.assertNotIn("telemetry_dead_letter_stats/data-moisture", self.db.docs)
+
+    def test_redelivered_reading_is_stored_once(self):
+        """A redelivery keeps its publish time, so the sample is not appended twice."""
+        event = pubsub_event({"percentage": 35.5, "timestamp": 1}, {"device_id": "esp32"})
+        self.main.handle_moisture_data(copy.deepcopy(event))
+        time.sleep(0.01)
+        self.main.handle_moisture_data(copy.deepcopy(event))
+
+        buckets = [doc for path, doc in self.db.docs.items()
+                   if path.startswith("sensor_history/esp32/")]
+        self.assertEqual(len(buckets), 1)
+        self.assertEqual(len(buckets[0]["samples"]), 1)
+        self.assertEqual(buckets[0]["samples"][0]["p"], 35.5)
+
+    def test_status_that_is_not_an_object_is_dead_lettered(self):
+        self.main.handle_system_status(pubsub_event(["online"], {"device_id": "esp32"}))
+
+        self.assertNotIn("system_status/esp32", self.db.docs)
+        self.assertEqual(
+            self.db.docs["telemetry_dead_letter_stats/system-status"]["reasons"],
+            {"not_object": 1})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
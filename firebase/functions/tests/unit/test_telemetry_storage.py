@@ -0,0 +1,73 @@
+"""
+Unit tests for hour-bucketed moisture telemetry storage
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from firebase_admin import firestore
+
+from telemetry.storage import (
+    BUCKET_MS,
+    append_samples,
+    bucket_id,
+    bucket_start,
+    load_samples,
+)
+
+# 2025-01-02 03:04:05 UTC
+_TS = 1735787045000
+
+
+class TestTelemetryStorage(unittest.TestCase):
+    """Tests for bucket addressing, appends and range loads"""
+
+    def test_bucket_addressing(self):
+        """Readings in the same UTC hour share one bucket."""
+        self.assertEqual(bucket_id(_TS), "2025010203")
+        self.assertEqual(bucket_start(_TS) % BUCKET_MS, 0)
+        self.assertEqual(bucket_id(bucket_start(_TS) + BUCKET_MS - 1),
+                         "2025010203")
+        self.assertEqual(bucket_id(bucket_start(_TS) + BUCKET_MS),
+                         "2025010204")
+
+    def test_append_uses_array_union_merge(self):
+        """Appends merge into the bucket instead of overwriting it."""
+        batch = MagicMock()
+        db = MagicMock()
+        append_samples(batch, db, "esp32", [(_TS, 42.5), (_TS + 1000, 41.0)])
+
+        (ref, data), kwargs = batch.set.call_args
+        self.assertTrue(kwargs["merge"])
+        self.assertEqual(data["bucket_start"], bucket_start(_TS))
+        self.assertIsInstance(data["samples"], firestore.ArrayUnion)
+        self.assertEqual(data["samples"].values, [{"t": _TS, "p": 42.5},
+                                                  {"t": _TS + 1000, "p": 41.0}])
+
+    def test_load_samples_filters_and_sorts(self):
+        """Samples outside the range are dropped and the rest sorted."""
+        start = bucket_start(_TS)
+        snapshot = MagicMock()
+        snapshot.to_dict.return_value = {"samples": [
+            {"t": start + 30, "p": 3.0},
+            {"t": start + 10, "p": 1.0},
+            {"t": start - 1, "p": 0.0},
+        ]}
+        db = MagicMock()
+        query = (db.collection.return_value.document.return_value
+                 .collection.return_value.where.return_value)
+        query.where.return_value.stream.return_value = [snapshot]
+
+        samples = load_samples(db, "esp32", start, start + 20)
+        self.assertEqual(samples, [(start + 10, 1.0)])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,188 @@
+"""
+Unit tests for per-thread locking of concurrent chat turns
+"""
+
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from langchain.agents import create_agent
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+import agent as agent_module
+from agent import MaxOutputTokens, PlantPalAgent, create_checkpointer, run_async
+from utils.thread_locks import ThreadLocks
+
+# agent.py turns tracing on at import, keep the tests offline
+os.environ["LANGSMITH_TRACING"] = "false"
+
+
+MODEL = "echo"
+
+
+class EchoChatModel(BaseChatModel):
+    """Answers each message with its text, after a short random delay"""
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _reply(self, messages) -> str:
+        time.sleep(random.uniform(0, 0.003))
+        question = [m for m in messages if isinstance(m, HumanMessage)][-1]
+        return f"echo: {question.content}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(
+            message=AIMessage(content=self._reply(messages)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        yield ChatGenerationChunk(message=AIMessageChunk(content=self._reply(messages)))
+
+
+class TestThreadLocks(unittest.TestCase):
+    """Test the ThreadLocks registry"""
+
+    def test_same_thread_is_serialized(self):
+        locks = ThreadLocks()
+        active = {"a": 0}
+        overlaps = []
+
+        def turn():
+            with locks.hold("a"):
+                active["a"] += 1
+                overlaps.append(active["a"])
+                time.sleep(0.001)
+                active["a"] -= 1
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for _ in range(50):
+                pool.submit(turn)
+
+        self.assertEqual(max(overlaps), 1)
+        self.assertEqual(len(locks), 0)
+
+    def test_other_threads_do_not_wait(self):
+        locks = ThreadLocks()
+        with locks.hold("a"):
+            with locks.hold("b"):
+                self.assertTrue(locks.locked("a"))
+                self.assertTrue(locks.locked("b"))
+        self.assertEqual(len(locks), 0)
+
+    def test_sync_and_async_holders_exclude_each_other(self):
+        locks = ThreadLocks()
+        order = []
+
+        async def async_turn():
+            async with locks.ahold("a"):
+                order.append("async")
+
+        with locks.hold("a"):
+            done = threading.Event()
+            worker = threading.Thread(
+                target=lambda: (asyncio.run(async_turn()), done.set()))
+            worker.start()
+            self.assertFalse(done.wait(0.05))
+            order.append("sync")
+        worker.join(timeout=1)
+
+        self.assertEqual(order, ["sync", "async"])
+        self.assertEqual(len(locks), 0)
+
+    def test_cancelled_waiter_does_not_keep_lock(self):
+        locks = ThreadLocks()
+
+        async def scenario():
+            async with locks.ahold("a"):
+                waiter = asyncio.create_task(self._hold(locks))
+                await asyncio.sleep(0.01)
+                waiter.cancel()
+                await asyncio.sleep(0.01)
+            # Free again
+            await asyncio.wait_for(self._hold(locks), timeout=1)
+
+        asyncio.run(scenario())
+        self.assertEqual(len(locks), 0)
+
+    @staticmethod
+    async def _hold(locks: ThreadLocks):
+        async with locks.ahold("a"):
+            pass
+
+
+class TestConcurrentChat(unittest.TestCase):
+    """Stress test: interleaved turns on many threads keep transcripts apart"""
+
+    THREADS = 8
+    TURNS = 40
+
+    def setUp(self):
+        checkpointer = create_checkpointer("memory")
+        agent_module._checkpointer = checkpointer
+        agent_module._compiled_agents[(MODEL, MaxOutputTokens.LARGE.value)] = \
+            create_agent(model=EchoChatModel(), tools=[], checkpointer=checkpointer)
+        self._cache = patch.object(agent_module, "RESPONSE_CACHE_ENABLED", False)
+        self._cache.start()
+
+    def tearDown(self):
+        self._cache.stop()
+        agent_module.reset_agent()
+
+    def _turn(self, thread: int, turn: int):
+        """One request: new handle, like each function invocation"""
+        handle = PlantPalAgent(thread_id=f"thread-{thread}", model=MODEL)
+        message = f"thread-{thread} turn-{turn}"
+        mode = turn % 3
+        if mode == 0:
+            return handle.chat(message)
+        if mode == 1:
+            return run_async(handle.achat(message))
+        return list(handle.stream_chat(message))[-1]["response"]
+
+    def test_interleaved_turns_keep_transcripts_apart(self):
+        requests = [(thread, turn) for thread in range(self.THREADS)
+                    for turn in range(self.TURNS)]
+        random.Random(7).shuffle(requests)
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            replies = list(pool.map(lambda request: self._turn(*request), requests))
+
+        for (thread, turn), reply in zip(requests, replies):
+            self.assertEqual(reply, f"echo: thread-{thread} turn-{turn}")
+
+        for thread in range(self.THREADS):
+            history = PlantPalAgent(
+                thread_id=f"thread-{thread}", model=MODEL).get_conversation_history()
+            # Every turn kept, in question/answer pairs, none from another thread
+            self.assertEqual(len(history), 2 * self.TURNS)
+            questions = history[0::2]
+            answers = history[1::2]
+            self.assertTrue(all(m.type == "human" for m in questions))
+            self.assertEqual(sorted(m.content for m in questions),
+                             sorted(f"thread-{thread} turn-{turn}"
+                                    for turn in range(self.TURNS)))
+            for question, answer in zip(questions, answers):
+                self.assertEqual(answer.content, f"echo: {question.content}")
+
+        self.assertEqual(len(agent_module._thread_locks), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
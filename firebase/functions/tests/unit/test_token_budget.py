@@ -0,0 +1,128 @@
+"""
+Unit tests for token-budget history selection and summarization
+"""
+
+import os
+import sys
+import unittest
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from utils.token_budget import (
+    TOKEN_COUNT_KEY,
+    MessageTokenCounter,
+    TokenBudgetSummarizationMiddleware,
+)
+
+
+class WordCounter:
+    """One token per word, recording how many texts were tokenized"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return len(text.split())
+
+
+def _turns(*words_per_message):
+    """Alternating human/AI messages with the given word counts"""
+    messages = []
+    for index, words in enumerate(words_per_message):
+        cls = HumanMessage if index % 2 == 0 else AIMessage
+        messages.append(cls(content=" ".join(["word"] * words), id=str(index)))
+    return messages
+
+
+class TestMessageTokenCounter(unittest.TestCase):
+    """Tests for cached per-message token counts"""
+
+    def setUp(self):
+        self.words = WordCounter()
+        self.counter = MessageTokenCounter(count_text=self.words, name="words")
+
+    def test_counts_are_cached_on_the_message(self):
+        """Recounting a thread only tokenizes the new messages."""
+        messages = _turns(10, 20)
+        first = self.counter(messages)
+        messages += _turns(5)
+        second = self.counter(messages)
+
+        self.assertEqual(self.words.calls, 3)
+        self.assertEqual(second - first, 5 + 4)  # words plus message overhead
+        self.assertEqual(messages[0].response_metadata[TOKEN_COUNT_KEY], {"words": 14})
+
+    def test_cached_count_survives_checkpoint_serialization(self):
+        """The count is stored with the message in the checkpoint."""
+        serde = JsonPlusSerializer()
+        message = _turns(10)[0]
+        self.counter.message_tokens(message)
+
+        restored = serde.loads_typed(serde.dumps_typed(message))
+        self.counter.message_tokens(restored)
+        self.assertEqual(self.words.calls, 1)
+
+    def test_tool_calls_are_counted(self):
+        """Tool call arguments take room in the prompt too."""
+        plain = AIMessage(content="")
+        with_call = AIMessage(content="", tool_calls=[
+            {"name": "control_irrigation", "args": {"duration_seconds": 5}, "id": "1"}])
+        self.assertGreater(self.counter.message_tokens(with_call),
+                           self.counter.message_tokens(plain))
+
+    def test_select_recent_fits_budget_and_starts_on_human(self):
+        """Short messages fill the budget, a long one is left out."""
+        messages = _turns(500, 10, 10, 10, 10)
+        recent = self.counter.select_recent(messages, budget=60)
+
+        self.assertEqual([m.id for m in recent], ["2", "3", "4"])
+        self.assertEqual(recent[0].type, "human")
+
+    def test_select_recent_keeps_newest_message(self):
+        """An oversized newest message is still kept."""
+        recent = self.counter.select_recent(_turns(10, 10, 900), budget=50)
+        self.assertEqual([m.id for m in recent], ["2"])
+
+
+class TestTokenBudgetSummarization(unittest.TestCase):
+    """Tests for the token-budget summarization cutoff"""
+
+    def setUp(self):
+        self.middleware = TokenBudgetSummarizationMiddleware(
+            model=GenericFakeChatModel(messages=iter([])),
+            max_tokens_before_summary=100,
+            tokens_to_keep=40,
+            token_counter=MessageTokenCounter(count_text=WordCounter(), name="words"),
+        )
+
+    def test_cutoff_keeps_recent_tokens(self):
+        """Messages fitting in tokens_to_keep are preserved."""
+        messages = _turns(30, 30, 10, 10, 10)
+        # Each message costs words + 4, the last two 28 tokens fit in 40
+        self.assertEqual(self.middleware._find_safe_cutoff(messages), 3)
+
+    def test_cutoff_keeps_tool_results_with_their_call(self):
+        """The cut moves earlier instead of splitting a tool call."""
+        messages = _turns(30, 30) + [
+            AIMessage(content="", id="call", tool_calls=[
+                {"name": "get_moisture_data", "args": {}, "id": "t1"}]),
+            ToolMessage(content="word " * 5, tool_call_id="t1", id="result"),
+            AIMessage(content="word " * 10, id="reply"),
+        ]
+        # Only the reply and the tool result fit, cutting there would
+        # orphan the result from its call
+        self.middleware.tokens_to_keep = 25
+        cutoff = self.middleware._find_safe_cutoff(messages)
+        self.assertEqual(messages[cutoff].id, "call")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,125 @@
+"""
+Unit tests for PlantPal tracing
+Checks that a request-soil publish and the handle_moisture_data run for the
+device's reading end up in one trace, and the file exporter output
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import SpanKind
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from benchmarks.fakes import (
+    InMemoryFirestore, InMemoryPublisher, offline_backend, pubsub_event
+)
+from config import TOPICS
+from devices.registry import register_device
+from tools.iot_tools import get_moisture_data
+from utils.tracing import FileSpanExporter, configure_tracing
+
+
+class TestTracing(unittest.TestCase):
+    """Tests for trace propagation and exporters"""
+
+    @classmethod
+    def setUpClass(cls):
+        # The global tracer provider can only be set once per process
+        cls.exporter = InMemorySpanExporter()
+        configure_tracing(cls.exporter, batch=False)
+
+    def setUp(self):
+        self.exporter.clear()
+        self.db = InMemoryFirestore()
+        self.publisher = InMemoryPublisher()
+        self.enterContext(offline_backend(self.db, self.publisher))
+        register_device(self.db, "esp32", "uid")
+
+    def _answer_soil_requests(self):
+        """Device echoes the request, its reading arrives in a fresh context"""
+        import main
+
+        def reply(data, attributes):
+            request = json.loads(data)
+            event = pubsub_event({
+                "percentage": 42.0,
+                "timestamp": request["timestamp"],
+                "request_id": request["request_id"],
+                "device_id": request["device_id"],
+                "traceparent": request.get("traceparent", ""),
+            }, {"device_id": attributes["device_id"]})
+            # New threads start without the publisher's trace context
+            handler = threading.Thread(target=main.handle_moisture_data, args=(event,))
+            handler.start()
+            handler.join()
+
+        self.publisher.responders[TOPICS["request-soil"]] = reply
+
+    def _span(self, name):
+        return next(s for s in self.exporter.get_finished_spans() if s.name == name)
+
+    def test_reading_joins_request_trace(self):
+        """handle_moisture_data is parented to the request-soil publish."""
+        self._answer_soil_requests()
+        result = get_moisture_data.invoke(
+            {"device": "esp32"}, {"configurable": {"user_id": "uid"}})
+        self.assertIn("42.0%", result)
+
+        tool = self._span("tool get_moisture_data")
+        publish = self._span("request-soil publish")
+        handler = self._span("handle_moisture_data")
+        commit = self._span("firestore.commit telemetry")
+
+        self.assertEqual(publish.kind, SpanKind.PRODUCER)
+        self.assertEqual(publish.parent.span_id, tool.context.span_id)
+        self.assertEqual(handler.kind, SpanKind.CONSUMER)
+        self.assertEqual(handler.context.trace_id, tool.context.trace_id)
+        self.assertEqual(handler.parent.span_id, publish.context.span_id)
+        self.assertEqual(commit.parent.span_id, handler.context.span_id)
+        self.assertEqual(handler.attributes["plantpal.device_id"], "esp32")
+        self.assertEqual(commit.attributes["plantpal.writes"], 3)
+
+        # The traceparent also travels as a Pub/Sub attribute
+        _, _, attributes = self.publisher.messages[0]
+        self.assertIn("traceparent", attributes)
+
+    def test_unsolicited_reading_starts_trace(self):
+        """A reading without a traceparent gets a root span."""
+        import main
+        main.handle_moisture_data(pubsub_event(
+            {"percentage": 40.0, "timestamp": 1, "request_id": "", "traceparent": ""},
+            {"device_id": "esp32"}))
+
+        self.assertIsNone(self._span("handle_moisture_data").parent)
+        self.assertEqual(self.db.docs["sensor_data/esp32"]["percentage"], 40.0)
+
+    def test_file_exporter(self):
+        """Finished spans are appended to the file as JSON lines."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "traces.jsonl")
+            provider = TracerProvider()
+            provider.add_span_processor(SimpleSpanProcessor(FileSpanExporter(path)))
+            tracer = provider.get_tracer("test")
+            with tracer.start_as_current_span("outer"):
+                with tracer.start_as_current_span("inner"):
+                    pass
+
+            with open(path) as f:
+                spans = [json.loads(line) for line in f]
+        self.assertEqual([span["name"] for span in spans], ["inner", "outer"])
+        self.assertEqual(spans[0]["parent_id"], spans[1]["context"]["span_id"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,135 @@
+"""
+Unit tests for the UART protocol, streaming decoder and FPGA simulator
+"""
+
+import os
+import re
+import socket
+import sys
+import threading
+import unittest
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from benchmarks.fakes import FakeClock
+from uart import protocol
+from uart.client import UartClient
+from uart.protocol import FrameDecoder
+from uart.simulator import FpgaSimulator
+
+HEADER_PATH = os.path.join(parent_dir, "..", "..", "common",
+                           "plant_pal_uart_protocol.h")
+
+
+class TestProtocol(unittest.TestCase):
+    """Encoder and constants"""
+
+    def test_constants_match_c_header(self):
+        with open(HEADER_PATH) as f:
+            defines = dict(re.findall(r"#define\s+(\w+)\s+(0x[0-9A-Fa-f]+|\d+)", f.read()))
+        for name in ("UART_BAUD_RATE", "UART_MAX_PAYLOAD_SIZE",
+                     "CMD_READ_MOISTURE", "CMD_WATER_ON", "CMD_STATUS_REQUEST",
+                     "RESP_MOISTURE_DATA", "RESP_WATER_ACK", "RESP_STATUS_OK",
+                     "RESP_ERROR"):
+            self.assertEqual(getattr(protocol, name), int(defines[name], 0), name)
+
+    def test_encode_frames(self):
+        self.assertEqual(protocol.read_moisture(), b"\x10\x00")
+        self.assertEqual(protocol.water_on(300), b"\x20\x02\x2c\x01")
+        self.assertEqual(protocol.moisture_data(42), b"\x11\x01\x2a")
+        with self.assertRaises(ValueError):
+            protocol.error(bytes(protocol.UART_MAX_PAYLOAD_SIZE + 1))
+
+
+class TestFrameDecoder(unittest.TestCase):
+    """Streaming decoder"""
+
+    def test_round_trip(self):
+        stream = (protocol.read_moisture() + protocol.water_on(15)
+                  + protocol.moisture_data(63) + protocol.error(b"bad"))
+        frames = [(f.command, bytes(f.payload)) for f in FrameDecoder().feed(stream)]
+        self.assertEqual(frames, [
+            (protocol.CMD_READ_MOISTURE, b""),
+            (protocol.CMD_WATER_ON, b"\x0f\x00"),
+            (protocol.RESP_MOISTURE_DATA, b"\x3f"),
+            (protocol.RESP_ERROR, b"bad"),
+        ])
+
+    def test_frame_split_across_reads(self):
+        decoder = FrameDecoder()
+        frame = protocol.water_on(120)
+        decoded = []
+        for i in range(len(frame)):
+            decoded += [protocol.water_duration(f.payload)
+                        for f in decoder.feed(frame[i:i + 1])]
+        self.assertEqual(decoded, [120])
+        self.assertEqual(decoder.pending, 0)
+
+    def test_resyncs_after_noise(self):
+        decoder = FrameDecoder()
+        # Unknown code, then a known code with the wrong length
+        stream = b"\xAA\x55" + b"\x10\x05" + protocol.status_request()
+        frames = list(decoder.feed(stream))
+        self.assertEqual([f.command for f in frames], [protocol.CMD_STATUS_REQUEST])
+        self.assertEqual(decoder.bytes_discarded, 4)
+
+    def test_payload_is_a_view_into_buffer(self):
+        decoder = FrameDecoder(buffer_size=64)
+        stream = protocol.moisture_data(10) * 100  # Wraps the buffer many times
+        values = [f.payload[0] for f in decoder.feed(stream)]
+        self.assertEqual(values, [10] * 100)
+
+        space = decoder.writable()
+        space[:3] = protocol.moisture_data(77)
+        frame = next(decoder.commit(3))
+        self.assertIsInstance(frame.payload, memoryview)
+        self.assertEqual(frame.payload.obj, decoder._buffer)
+
+
+class TestFpgaSimulator(unittest.TestCase):
+    """Simulator state machine and link"""
+
+    def _respond(self, simulator, frame_bytes):
+        frame = next(FrameDecoder().feed(frame_bytes))
+        return next(FrameDecoder().feed(simulator.handle(frame)))
+
+    def test_watering_raises_moisture(self):
+        clock = FakeClock()
+        simulator = FpgaSimulator(moisture_percent=30, clock=clock)
+        self.assertEqual(self._respond(simulator, protocol.read_moisture()).payload[0], 30)
+
+        ack = self._respond(simulator, protocol.water_on(10))
+        self.assertEqual(ack.command, protocol.RESP_WATER_ACK)
+        self.assertEqual(simulator.pump_seconds_total, 10)
+        self.assertEqual(self._respond(simulator, protocol.read_moisture()).payload[0], 50)
+
+        clock.now += 10000  # Soil dries out
+        self.assertEqual(self._respond(simulator, protocol.read_moisture()).payload[0], 40)
+
+    def test_error_injection(self):
+        simulator = FpgaSimulator(error_rate=1.0, seed=1)
+        self.assertEqual(self._respond(simulator, protocol.status_request()).command,
+                         protocol.RESP_ERROR)
+
+    def test_client_round_trip(self):
+        ours, theirs = socket.socketpair()
+        simulator = FpgaSimulator(moisture_percent=55)
+        thread = threading.Thread(target=simulator.serve_connection, args=(theirs,))
+        thread.start()
+        client = UartClient(ours, timeout=1.0)
+        try:
+            self.assertEqual(client.read_moisture(), 55)
+            self.assertTrue(client.status())
+            self.assertTrue(client.water_on(5))
+            self.assertEqual(client.read_moisture(), 65)
+        finally:
+            client.close()
+            thread.join(timeout=1.0)
+        self.assertEqual(simulator.commands_handled, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
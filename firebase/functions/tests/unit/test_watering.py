@@ -0,0 +1,186 @@
+"""
+Unit tests for the predictive watering scheduler
+The vectorized plan is checked against per-device expectations; a full run
+uses the in-memory Firestore and Pub/Sub fakes with the ledger patched
+"""
+
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+# Add parent directories to path for imports (PlantPal pattern)
+parent_dir = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent_dir)
+
+from benchmarks.fakes import InMemoryFirestore, InMemoryPublisher
+from config import TOPICS
+import devices.watering as watering
+from devices.irrigation import Dispatch, idempotency_key
+from devices.registry import register_device
+from devices.watering import FleetHistory, load_fleet_history, plan_durations, run_schedule
+from telemetry.ingest import IngestBatch
+from telemetry.storage import bucket_start
+
+_NOW = 1735787045000
+_HOUR = 60 * 60 * 1000
+
+
+def _readings(level_now, rate_per_hour, hours=4, every_minutes=10):
+    """Readings ending at _NOW with a constant drying rate"""
+    t = np.arange(_NOW - hours * _HOUR, _NOW + 1, every_minutes * 60 * 1000)
+    return t, level_now + rate_per_hour * (t - _NOW) / _HOUR
+
+
+def _fleet(devices):
+    """FleetHistory from {device_id: (t, p)}"""
+    index, times, values = [], [], []
+    for i, (t, p) in enumerate(devices.values()):
+        index.append(np.full(len(t), i))
+        times.append(t)
+        values.append(p)
+    return FleetHistory(list(devices), np.concatenate(index),
+                        np.concatenate(times), np.concatenate(values))
+
+
+class TestPlanDurations(unittest.TestCase):
+    """Tests for the vectorized watering plan"""
+
+    def test_only_devices_drying_past_threshold_are_watered(self):
+        history = _fleet({
+            "wet": _readings(70.0, -1.0),
+            "drying": _readings(32.0, -6.0),   # ~27% by the next run
+            "dry": _readings(20.0, -1.0),
+            "stable": _readings(31.0, 0.0),
+        })
+        durations = plan_durations(history, _NOW, horizon_minutes=30, threshold=30.0,
+                                   target=60.0, percent_per_second=3.0, max_seconds=10)
+
+        self.assertEqual(durations[0], 0)
+        # (60 - projected) / 3 %/s, capped at 10 s
+        self.assertEqual(durations[1], 10)
+        self.assertEqual(durations[2], 10)
+        self.assertEqual(durations[3], 0)
+
+    def test_duration_from_projected_level(self):
+        t, p = _readings(50.0, -50.0, hours=1, every_minutes=1)
+        durations = plan_durations(_fleet({"a": (t, p)}), _NOW, horizon_minutes=30,
+                                   threshold=30.0, target=60.0,
+                                   percent_per_second=10.0, max_seconds=10)
+
+        # 50% now, 25% in 30 min: 35 points at 10 %/s
+        self.assertEqual(durations[0], 4)
+
+    def test_rate_restarts_after_watering(self):
+        """Drying before the last watering does not count."""
+        t = np.arange(_NOW - 4 * _HOUR, _NOW + 1, 10 * 60 * 1000)
+        p = np.where(t < _NOW - _HOUR, 30.0, 45.0)  # Watered an hour ago, flat since
+        p = p - 10.0 * (t - t[0]) / _HOUR * (t < _NOW - _HOUR)
+
+        durations = plan_durations(_fleet({"a": (t, p)}), _NOW)
+        self.assertEqual(durations[0], 0)
+
+    def test_stale_and_missing_devices_are_skipped(self):
+        t, p = _readings(10.0, -1.0)
+        history = _fleet({"offline": (t - 3 * _HOUR, p)})
+        history.device_ids.append("no-readings")
+
+        np.testing.assert_array_equal(plan_durations(history, _NOW), [0, 0])
+
+
+class TestRunSchedule(unittest.TestCase):
+    """Tests for a full scheduler run"""
+
+    def setUp(self):
+        self.db = InMemoryFirestore()
+        self.publisher = InMemoryPublisher()
+        for device_id, auto in (("basil", True), ("fern", True), ("cactus", False)):
+            register_device(self.db, device_id, "u1", auto_watering=auto)
+        # Registered before the setting existed: not watered
+        self.db.collection("devices").document("ivy").set(
+            {"device_id": "ivy", "owner_uid": "u1"})
+
+        ingest = IngestBatch(self.db)
+        for device_id, level in (("basil", 20.0), ("fern", 70.0), ("cactus", 5.0),
+                                 ("ivy", 5.0)):
+            t, p = _readings(level, -1.0)
+            for ti, pi in zip(t, p):
+                ingest.add_moisture({"percentage": float(pi), "timestamp": 0},
+                                    received_at=int(ti), device_id=device_id)
+        batch = self.db.batch()
+        ingest.write_to(batch)
+        batch.commit()
+
+    @patch.object(watering, "reserve_command",
+                  return_value=Dispatch("sent", "c" * 32))
+    def test_run_publishes_one_command_per_dry_device(self, reserve):
+        summary = run_schedule(self.db, self.publisher, now_ms=_NOW)
+
+        self.assertEqual(summary["devices"], 2)  # cactus and ivy did not opt in
+        self.assertEqual(summary["planned"], 1)
+        self.assertEqual(summary["sent"], 1)
+        topic, payload, attributes = self.publisher.messages[0]
+        self.assertEqual(topic, TOPICS["request-water"])
+        self.assertEqual(json.loads(payload)["device_id"], "basil")
+        self.assertEqual(attributes["device_id"], "basil")
+        # Ledger key is scoped to the scheduler, not a chat thread
+        device_id, duration = reserve.call_args.args[1:3]
+        self.assertEqual(device_id, "basil")
+        self.assertEqual(reserve.call_args.kwargs["key"],
+                         idempotency_key("basil", duration, watering.SCHEDULER_SCOPE))
+
+    @patch.object(watering, "reserve_command",
+                  return_value=Dispatch("rate_limited", None, 600.0))
+    def test_ledger_can_hold_back_commands(self, reserve):
+        summary = run_schedule(self.db, self.publisher, now_ms=_NOW)
+
+        self.assertEqual(summary["rate_limited"], 1)
+        self.assertEqual(summary["sent"], 0)
+        self.assertEqual(self.publisher.messages, [])
+
+    def test_history_reads_only_requested_devices(self):
+        """Buckets are queried per 30 devices; other devices are not read."""
+        ingest = IngestBatch(self.db)
+        for i in range(70):
+            t, p = _readings(50.0, -1.0, hours=1, every_minutes=30)
+            for ti, pi in zip(t, p):
+                ingest.add_moisture({"percentage": float(pi), "timestamp": 0},
+                                    received_at=int(ti), device_id=f"d{i}")
+        batch = self.db.batch()
+        ingest.write_to(batch)
+        batch.commit()
+        device_ids = ["basil"] + [f"d{i}" for i in range(64)]
+        start = _NOW - 4 * _HOUR
+
+        reads = self.db.reads
+        history = load_fleet_history(self.db, device_ids, start)
+
+        buckets = [data for path, data in self.db.docs.items()
+                   if "/hourly/" in path and data["device_id"] in device_ids
+                   and data["bucket_start"] >= bucket_start(start)]
+        self.assertEqual(self.db.reads - reads, len(buckets))
+        self.assertEqual(sorted(np.unique(history.device_index)), list(range(65)))
+        self.assertEqual(len(history.t), sum(len(b["samples"]) for b in buckets))
+
+    def test_failed_publish_is_refunded(self):
+        """A scheduled command that was never published frees its pump time."""
+        def unavailable(data, attributes):
+            raise RuntimeError("unavailable")
+        self.publisher.responders[TOPICS["request-water"]] = unavailable
+
+        summary = run_schedule(self.db, self.publisher, now_ms=_NOW)
+
+        self.assertEqual(summary["failed"], 1)
+        state = self.db.docs["irrigation_state/basil"]
+        self.assertAlmostEqual(state["bucket_tokens"],
+                               watering.IRRIGATION_BUCKET_CAPACITY_SECONDS, places=2)
+        self.assertEqual(state["recent"], {})
+        self.assertEqual(state["last_ack"]["status"], "failed")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -1,119 +1,417 @@
 from langchain.tools import tool
-from typing import Dict, Any, Optional
+from langchain_core.runnables import RunnableConfig
+from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from google.cloud import pubsub_v1
-from firebase_admin import firestore
+from firebase_admin import firestore, firestore_async
+import asyncio
+import contextlib
 import json
+import threading
 import time
-from config import TOPICS
+import uuid
+from config import (
+    TOPICS,
+    IRRIGATION_BUCKET_CAPACITY_SECONDS,
+    IRRIGATION_DEDUPE_WINDOW_SECONDS,
+    IRRIGATION_REFILL_SECONDS_PER_HOUR,
+)
+from devices.irrigation import (
+    IRRIGATION_STATE_COLLECTION,
+    describe_last_command,
+    idempotency_key,
+    irrigation_request,
+    mark_publish_failed,
+    reserve_command,
+)
+from devices.presence import Presence, PresenceCache
+from devices.registry import (
+    aget_latest, aresolve_devices, get_latest, resolve_devices
+)
+from devices.sensor_reads import SENSOR_DATA_COLLECTION, SingleFlight, fresh_readings
+from telemetry.trends import format_trend, load_trend
+from utils.tracing import TRACEPARENT, firestore_span, publish_span, traced
+
+# How long get_moisture_data waits for the devices to answer
+MOISTURE_WAIT_SECONDS = 10
+
+# Pub/Sub publisher, created on first use so importing the tools does not
+# open a client or resolve credentials
+_publisher: Optional[pubsub_v1.PublisherClient] = None
+_publisher_lock = threading.Lock()
+
+# In-flight device round trips, shared by every chat on this instance
+_sensor_flights = SingleFlight()
+
+# Fleet presence index, reloaded at most every PRESENCE_CACHE_SECONDS
+_presence = PresenceCache()
+
+
+def get_publisher() -> pubsub_v1.PublisherClient:
+    """Get or create the shared Pub/Sub publisher"""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = pubsub_v1.PublisherClient()
+        return _publisher
+
+
+class _DocumentWaiter:
+    """
+    Resolves a future once a Firestore document exists, using a snapshot
+    listener instead of polling. Create it before triggering the write so a
+    fast response cannot be missed.
+    """
+
+    def __init__(self, doc_ref, result: Future):
+        self._result = result
+        self._watch = doc_ref.on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, snapshots, changes, read_time):
+        for snapshot in snapshots:
+            if snapshot.exists and not self._result.done():
+                _sensor_flights.resolve(self._result, snapshot.to_dict())
+
+    def close(self):
+        """Stop listening"""
+        self._watch.unsubscribe()
+
+
+def _wait_reading(flight: Future, timeout: float) -> Optional[Dict[str, Any]]:
+    """The reading of a round trip, None if it did not land in time"""
+    try:
+        return flight.result(timeout=max(0, timeout))
+    except FutureTimeoutError:
+        return None
+
+
+async def _await_reading(flight: Future, timeout: float) -> Optional[Dict[str, Any]]:
+    """Like _wait_reading, without blocking the event loop"""
+    try:
+        # Shielded: a timeout here must not cancel a round trip others share
+        return await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(flight)), max(0, timeout))
+    except asyncio.TimeoutError:
+        return None
+
+
+@contextlib.contextmanager
+def _moisture_round_trips(db: Any, device_ids: List[str]):
+    """
+    Join or start a device round trip per device. For the round trips this
+    call leads it listens for the correlated reading, then publishes the
+    request; the others are already in flight.
+
+    Yields:
+        (future of the reading per device, publish futures to wait for)
+    """
+    flights: Dict[str, Future] = {}
+    waiters: Dict[str, _DocumentWaiter] = {}
+    led: List[Future] = []
+    publishes = []
+    try:
+        for device_id in device_ids:
+            flight, leader = _sensor_flights.join(device_id)
+            flights[device_id] = flight
+            if not leader:
+                continue
+            led.append(flight)
+            # Each request gets its own correlation ID; the device echoes it
+            # back and handle_moisture_data stores the reading under that ID.
+            # Listen before publishing so a fast response cannot be missed.
+            with publish_span(TOPICS["request-soil"], device_id=device_id) as carrier:
+                request_id, request_payload = _moisture_request(
+                    device_id, carrier.get(TRACEPARENT, ""))
+                waiters[device_id] = _DocumentWaiter(
+                    db.collection('sensor_requests').document(request_id), result=flight)
+                publishes.append(get_publisher().publish(
+                    TOPICS["request-soil"],
+                    request_payload,
+                    device_id=device_id,
+                    **carrier
+                ))
+        yield flights, publishes
+    finally:
+        for waiter in waiters.values():
+            waiter.close()
+        # Release the callers that joined, a reading that did not land by now
+        # is a timeout for them too
+        for flight in led:
+            _sensor_flights.resolve(flight)
+
+
+def _user_id(config: Optional[RunnableConfig]) -> Optional[str]:
+    """UID of the chatting user, passed by the agent through RunnableConfig"""
+    return ((config or {}).get("configurable") or {}).get("user_id")
+
+
+def _thread_id(config: Optional[RunnableConfig]) -> str:
+    """Conversation thread of the tool call, scopes irrigation idempotency"""
+    return ((config or {}).get("configurable") or {}).get("thread_id") or ""
+
+
+def _moisture_request(device_id: str, traceparent: str = "") -> Tuple[str, bytes]:
+    """
+    New correlation ID and request-soil payload for one device. The device
+    echoes request_id and traceparent in its reading, so handle_moisture_data
+    joins the trace of this request.
+    """
+    request_id = uuid.uuid4().hex
+    request = {
+        'timestamp': int(time.time() * 1000),
+        'request_id': request_id,
+        'device_id': device_id
+    }
+    if traceparent:
+        request[TRACEPARENT] = traceparent
+    return request_id, json.dumps(request).encode('utf-8')
+
+
+def _dispatch_irrigation(
+    db: Any,
+    device_id: str,
+    duration_seconds: int,
+    config: Optional[RunnableConfig]
+) -> str:
+    """
+    Record a watering command in the ledger and publish it without waiting.
+    Repeats within the dedupe window and requests over the device's pump
+    budget are answered without publishing. The device confirms delivery
+    on the water-ack topic (see handle_water_ack).
+    """
+    dispatch = reserve_command(
+        db, device_id, duration_seconds,
+        key=idempotency_key(device_id, duration_seconds, _thread_id(config)),
+        bucket_capacity=IRRIGATION_BUCKET_CAPACITY_SECONDS,
+        refill_per_second=IRRIGATION_REFILL_SECONDS_PER_HOUR / 3600,
+        dedupe_window_seconds=IRRIGATION_DEDUPE_WINDOW_SECONDS,
+        user_id=_user_id(config)
+    )
+
+    if dispatch.status == "duplicate":
+        return (f"ℹ️ {device_id}: the same {duration_seconds}s watering was just "
+                f"requested (command {dispatch.command_id[:8]}), not sending it again")
+    if dispatch.status == "rate_limited":
+        if dispatch.retry_after_seconds == float("inf"):
+            return (f"❌ {device_id}: {duration_seconds}s is more than the "
+                    f"{IRRIGATION_BUCKET_CAPACITY_SECONDS}s pump limit")
+        return (f"⏳ {device_id}: pump time limit reached, try again in "
+                f"{dispatch.retry_after_seconds / 60:.0f} min")
+
+    # Fire and forget: a failed publish is recorded on the command
+    command_id = dispatch.command_id
+    with publish_span(TOPICS["request-water"], device_id=device_id) as carrier:
+        future = get_publisher().publish(
+            TOPICS["request-water"],
+            irrigation_request(device_id, duration_seconds, command_id),
+            device_id=device_id,
+            **carrier
+        )
+
+    def _on_published(published):
+        error = published.exception()
+        if error is not None:
+            print(f"❌ Irrigation command {command_id} was not published: {error}")
+            mark_publish_failed(db, device_id, command_id, error,
+                                IRRIGATION_BUCKET_CAPACITY_SECONDS)
+
+    future.add_done_callback(_on_published)
+    return (f"✅ {device_id}: irrigation for {duration_seconds}s sent "
+            f"(command {command_id[:8]}), awaiting device confirmation")
+
+
+def _invalid_duration(duration_seconds: int) -> Optional[str]:
+    """Error for a pump time outside 1 s to the bucket capacity, None if valid"""
+    if 1 <= duration_seconds <= IRRIGATION_BUCKET_CAPACITY_SECONDS:
+        return None
+    return (f"❌ Error: duration_seconds must be between 1 and "
+            f"{IRRIGATION_BUCKET_CAPACITY_SECONDS} seconds, got {duration_seconds}")
+
+
+def _format_moisture_results(results: Dict[str, Optional[Dict[str, Any]]]) -> str:
+    """Format the readings of every addressed device, None meaning timeout"""
+    lines: List[str] = []
+    for device_id, data in results.items():
+        if data is None:
+            # Timeout - no response received
+            lines.append(f"⏱️ Timeout ({device_id}): No response from sensor after "
+                         f"{MOISTURE_WAIT_SECONDS}s. The sensor may be offline or out of range.")
+        else:
+            lines.append(_format_moisture(device_id, data))
+    return "\n".join(lines)
+
+
+def _format_moisture(device_id: str, data: Dict[str, Any]) -> str:
+    """Format one moisture reading for the model"""
+    percentage = data.get('percentage')
+    timestamp = data.get('timestamp')
+    if not isinstance(percentage, (int, float)):
+        # Stored before telemetry was validated
+        return f"Soil moisture ({device_id}): No valid reading available."
+
+    # Convert timestamp to readable format
+    if timestamp:
+        timestamp_readable = time.strftime(
+            '%Y-%m-%d %H:%M:%S',
+            time.localtime(timestamp / 1000)
+        )
+        return (f"Soil moisture ({device_id}): "
+               f"{percentage:.1f}% (measured at {timestamp_readable})")
+    return (f"Soil moisture ({device_id}): "
+           f"{percentage:.1f}% (timestamp unavailable)")
+
+
+def _format_status(
+    presence: Presence,
+    irrigation: Optional[Dict[str, Any]] = None
+) -> str:
+    """Format one device's presence and last irrigation for the model"""
+    now_ms = int(time.time() * 1000)
+    status_info = _format_presence(presence, now_ms)
+    last_command = describe_last_command(irrigation, now_ms)
+    if last_command:
+        status_info += f"\n{last_command}"
+    return status_info
+
+
+def _format_presence(presence: Presence, now_ms: int) -> str:
+    """Format one device's presence index entry"""
+    device_id = presence.device_id
+    if presence.last_seen is None:
+        return f"❌ {device_id}: No system status available. Device has not reported status yet."
+
+    seconds_ago = (now_ms - presence.last_seen) / 1000
+    if presence.online:
+        status_info = f"✅ {device_id}: Device is ONLINE (last update {seconds_ago:.0f}s ago)"
+    else:
+        offline_minutes = (now_ms - (presence.since or presence.last_seen)) / 60000
+        status_info = (f"⚠️ {device_id}: Device is OFFLINE for {offline_minutes:.0f} min "
+                       f"(last update {seconds_ago:.0f}s ago)")
+
+    # The firmware reports "offline" when the FPGA does not answer
+    if presence.status and presence.status != "online":
+        status_info += f"\nDevice reports: {presence.status}"
+    return status_info
 
-# Initialize Pub/Sub publisher
-publisher = pubsub_v1.PublisherClient()
 
 @tool
-def get_moisture_data() -> str:
+@traced("tool get_moisture_data")
+def get_moisture_data(device: str = "", config: RunnableConfig = None) -> str:
     """
     Get soil moisture data from the sensor. This tool requests fresh data from
     the IoT device and waits for the response.
 
+    Args:
+        device: Device ID or device group name. Leave empty for all of the
+                user's devices.
+
     Returns:
-        A string containing the moisture percentage and timestamp
+        A string containing the moisture percentage and timestamp per device
     """
-    print(f"📊 Getting moisture data from sensor")
+    print(f"📊 Getting moisture data from sensor {device or '(all)'}")
 
     try:
-        # Get Firestore client
         db = firestore.client()
-        doc_ref = db.collection('sensor_data').document('esp32')
-
-        # Delete any existing data for fresh request
-        doc_ref.delete()
-
-        # Publish request to request-soil topic
-        topic_path = TOPICS["request-soil"]
-        request_payload = json.dumps({
-            'timestamp': int(time.time() * 1000)
-        }).encode('utf-8')
-
-        # Publish request
-        future = publisher.publish(
-            topic_path,
-            request_payload
-        )
-        future.result()  # Wait for publish to complete
-        print(f"✅ Published request for moisture data")
-
-        # Wait for response (poll Firestore with timeout)
-        max_wait_seconds = 10
-        poll_interval = 0.5
-        elapsed = 0
-
-        while elapsed < max_wait_seconds:
-            # Check if data exists in Firestore
-            doc = doc_ref.get()
-
-            if doc.exists:
-                data = doc.to_dict()
-                if data:
-                    percentage = data.get('percentage')
-                    timestamp = data.get('timestamp')
-
-                    # Convert timestamp to readable format
-                    if timestamp:
-                        timestamp_readable = time.strftime(
-                            '%Y-%m-%d %H:%M:%S',
-                            time.localtime(timestamp / 1000)
-                        )
-                        return (f"Soil moisture: "
-                               f"{percentage:.1f}% (measured at {timestamp_readable})")
-                    else:
-                        return (f"Soil moisture: "
-                               f"{percentage:.1f}% (timestamp unavailable)")
-
-            time.sleep(poll_interval)
-            elapsed += poll_interval
-
-        # Timeout - no response received
-        return (f"⏱️ Timeout: No response from sensor after {max_wait_seconds}s. "
-               f"The sensor may be offline or out of range.")
+        device_ids = resolve_devices(db, _user_id(config), device)
+
+        # Recent enough readings are answered without waking the device
+        results = fresh_readings(get_latest(db, SENSOR_DATA_COLLECTION, device_ids),
+                                 int(time.time() * 1000))
+        stale = [device_id for device_id in device_ids if device_id not in results]
+        if stale:
+            with _moisture_round_trips(db, stale) as (flights, publishes):
+                for future in publishes:
+                    future.result()  # Wait for publish to complete
+                print(f"✅ Published moisture requests for {len(publishes)} device(s), "
+                      f"{len(flights) - len(publishes)} already in flight")
+
+                # All devices share one deadline; each result returns as soon
+                # as its reading lands
+                deadline = time.monotonic() + MOISTURE_WAIT_SECONDS
+                with firestore_span("listen", "sensor_requests", documents=len(flights)):
+                    for device_id, flight in flights.items():
+                        results[device_id] = _wait_reading(
+                            flight, deadline - time.monotonic())
+
+        return _format_moisture_results({device_id: results.get(device_id)
+                                         for device_id in device_ids})
 
     except Exception as e:
         print(f"❌ Error getting moisture data: {e}")
         return f"❌ Error: Unable to retrieve moisture data - {str(e)}"
 
 
+def _device_trend(db: Any, device_id: str, now_ms: int) -> str:
+    """Trend summary of one device"""
+    return format_trend(load_trend(db, device_id, now_ms), device_id, now_ms)
 
 
 @tool
-def control_irrigation(duration_seconds: int = 5) -> str:
+@traced("tool get_moisture_trend")
+def get_moisture_trend(device: str = "", config: RunnableConfig = None) -> str:
+    """
+    Get the soil moisture trend from the stored sensor history of the last
+    days. Use it for questions about change over time, e.g. whether a plant
+    is drying out faster than usual or when it will need water. It does not
+    take a new reading, use get_moisture_data for the current value.
+
+    Args:
+        device: Device ID or device group name. Leave empty for all of the
+                user's devices.
+
+    Returns:
+        Per device: current and hourly mean moisture, recent and usual drying
+        rate (percentage points per hour), last watering, projected time
+        until the soil is dry, and daily means with day-over-day change
+    """
+    print(f"📈 Getting moisture trend for {device or '(all)'}")
+
+    try:
+        db = firestore.client()
+        device_ids = resolve_devices(db, _user_id(config), device)
+        now_ms = int(time.time() * 1000)
+        return "\n".join(_device_trend(db, device_id, now_ms) for device_id in device_ids)
+
+    except Exception as e:
+        print(f"❌ Error getting moisture trend: {e}")
+        return f"❌ Error: Unable to retrieve moisture trend - {str(e)}"
+
+
+@tool
+@traced("tool control_irrigation")
+def control_irrigation(
+    duration_seconds: int = 5,
+    device: str = "",
+    config: RunnableConfig = None
+) -> str:
     """
     Control the irrigation system. Should be used when user requests you
     to water their plants. The duration default is 5 seconds. Depending on how dry the plant is
-    water for 1, 5, or 10 seconds.
+    water for 1, 5, or 10 seconds. Call it once per watering: repeats are
+    ignored and pump time per device is limited.
 
     Args:
-        duration_seconds: How long to run irrigation in seconds
+        duration_seconds: How long to run irrigation in seconds, at least 1
+                          and at most the per-device pump limit
+        device: Device ID or device group name. Leave empty for all of the
+                user's devices.
 
     Returns:
-        Status message
+        Status message per device. The device confirms delivery afterwards,
+        get_system_status reports whether it did.
     """
-    print(f"💧 Irrigating for {duration_seconds} seconds")
+    print(f"💧 Irrigating {device or '(all)'} for {duration_seconds} seconds")
+    if error := _invalid_duration(duration_seconds):
+        return error
 
     try:
-        # Publish request to request-water topic
-        topic_path = TOPICS["request-water"]
-        request_payload = json.dumps({
-            'duration_seconds': duration_seconds
-        }).encode('utf-8')
-
-        # Publish request
-        future = publisher.publish(
-            topic_path,
-            request_payload
-        )
-        future.result()  # Wait for publish to complete
-        print(f"✅ Published irrigation request for {duration_seconds} seconds")
+        db = firestore.client()
+        device_ids = resolve_devices(db, _user_id(config), device)
 
-        return f"✅ Started irrigation for {duration_seconds} seconds"
+        results = [_dispatch_irrigation(db, device_id, duration_seconds, config)
+                   for device_id in device_ids]
+        print(f"✅ Dispatched irrigation for {duration_seconds} seconds")
+        return "\n".join(results)
 
     except Exception as e:
         print(f"❌ Error controlling irrigation: {e}")
@@ -121,51 +419,154 @@ def control_irrigation(duration_seconds: int = 5) -> str:
 
 
 @tool
-def get_system_status() -> str:
+@traced("tool get_system_status")
+def get_system_status(device: str = "", config: RunnableConfig = None) -> str:
     """
     Get the current system status to check if the IoT device is online and operational.
     Use this tool when you need to verify device connectivity before requesting data or actions.
 
+    Args:
+        device: Device ID or device group name. Leave empty for all of the
+                user's devices.
+
     Returns:
-        A string containing the system status information
+        A string containing the system status information per device
     """
-    print(f"🔧 Getting system status")
+    print(f"🔧 Getting system status for {device or '(all)'}")
+
+    try:
+        db = firestore.client()
+        device_ids = resolve_devices(db, _user_id(config), device)
+
+        # Presence from the cached index, one batched read for irrigation
+        presence = _presence.lookup(db, device_ids)
+        irrigation = get_latest(db, IRRIGATION_STATE_COLLECTION, device_ids)
+        return "\n".join(_format_status(presence[device_id], irrigation[device_id])
+                         for device_id in device_ids)
+
+    except Exception as e:
+        print(f"❌ Error getting system status: {e}")
+        return f"❌ Error: Unable to retrieve system status - {str(e)}"
+
+
+# Async implementations, used when the agent runs with ainvoke. They read
+# Firestore through the async client and await Pub/Sub publishes and sensor
+# responses instead of blocking, so tool calls from one model step overlap
+# and a turn takes as long as its slowest tool.
+# The async Firestore client is bound to the event loop that first uses it.
+
+@traced("tool get_moisture_data")
+async def _aget_moisture_data(device: str = "", config: RunnableConfig = None) -> str:
+    """Async implementation of get_moisture_data"""
+    print(f"📊 Getting moisture data from sensor {device or '(all)'}")
+
+    try:
+        async_db = firestore_async.client()
+        device_ids = await aresolve_devices(async_db, _user_id(config), device)
+
+        results = fresh_readings(
+            await aget_latest(async_db, SENSOR_DATA_COLLECTION, device_ids),
+            int(time.time() * 1000))
+        stale = [device_id for device_id in device_ids if device_id not in results]
+        if stale:
+            # Snapshot listeners are only available on the sync client
+            db = firestore.client()
+            with _moisture_round_trips(db, stale) as (flights, publishes):
+                await asyncio.gather(*(asyncio.wrap_future(future) for future in publishes))
+                print(f"✅ Published moisture requests for {len(publishes)} device(s), "
+                      f"{len(flights) - len(publishes)} already in flight")
+
+                with firestore_span("listen", "sensor_requests", documents=len(flights)):
+                    readings = await asyncio.gather(*(
+                        _await_reading(flight, MOISTURE_WAIT_SECONDS)
+                        for flight in flights.values()
+                    ))
+                results.update(zip(flights, readings))
+
+        return _format_moisture_results({device_id: results.get(device_id)
+                                         for device_id in device_ids})
+
+    except Exception as e:
+        print(f"❌ Error getting moisture data: {e}")
+        return f"❌ Error: Unable to retrieve moisture data - {str(e)}"
+
+
+@traced("tool get_moisture_trend")
+async def _aget_moisture_trend(device: str = "", config: RunnableConfig = None) -> str:
+    """Async implementation of get_moisture_trend"""
+    print(f"📈 Getting moisture trend for {device or '(all)'}")
 
     try:
-        # Get Firestore client
+        device_ids = await aresolve_devices(
+            firestore_async.client(), _user_id(config), device)
+
+        # History queries use the sync client, one thread per device
         db = firestore.client()
-        doc_ref = db.collection('system_status').document('esp32')
+        now_ms = int(time.time() * 1000)
+        results = await asyncio.gather(*(
+            asyncio.to_thread(_device_trend, db, device_id, now_ms)
+            for device_id in device_ids
+        ))
+        return "\n".join(results)
+
+    except Exception as e:
+        print(f"❌ Error getting moisture trend: {e}")
+        return f"❌ Error: Unable to retrieve moisture trend - {str(e)}"
+
 
-        # Check if status exists
-        doc = doc_ref.get()
+@traced("tool control_irrigation")
+async def _acontrol_irrigation(
+    duration_seconds: int = 5,
+    device: str = "",
+    config: RunnableConfig = None
+) -> str:
+    """Async implementation of control_irrigation"""
+    print(f"💧 Irrigating {device or '(all)'} for {duration_seconds} seconds")
+    if error := _invalid_duration(duration_seconds):
+        return error
 
-        if doc.exists:
-            data = doc.to_dict()
-            if data:
-                received_at = data.get('received_at')
+    try:
+        device_ids = await aresolve_devices(
+            firestore_async.client(), _user_id(config), device)
+
+        # The ledger transaction uses the sync client
+        db = firestore.client()
+        results = await asyncio.gather(*(
+            asyncio.to_thread(_dispatch_irrigation, db, device_id,
+                              duration_seconds, config)
+            for device_id in device_ids
+        ))
+        print(f"✅ Dispatched irrigation for {duration_seconds} seconds")
+        return "\n".join(results)
 
-                # Calculate how long ago the status was received
-                if received_at:
-                    time_diff = int(time.time() * 1000) - received_at
-                    seconds_ago = time_diff / 1000
+    except Exception as e:
+        print(f"❌ Error controlling irrigation: {e}")
+        return f"❌ Error: Unable to start irrigation - {str(e)}"
 
-                    # Consider device online if status was received within last 60 seconds
-                    if seconds_ago < 60:
-                        status_info = f"✅ Device is ONLINE (last update {seconds_ago:.0f}s ago)"
-                    else:
-                        status_info = f"⚠️ Device may be OFFLINE (last update {seconds_ago:.0f}s ago)"
 
-                    # Include any additional status fields
-                    other_fields = {k: v for k, v in data.items() if k != 'received_at'}
-                    if other_fields:
-                        status_info += f"\nStatus details: {json.dumps(other_fields, indent=2)}"
+@traced("tool get_system_status")
+async def _aget_system_status(device: str = "", config: RunnableConfig = None) -> str:
+    """Async implementation of get_system_status"""
+    print(f"🔧 Getting system status for {device or '(all)'}")
 
-                    return status_info
-                else:
-                    return "⚠️ Device status unknown (no timestamp available)"
+    try:
+        db = firestore_async.client()
+        device_ids = await aresolve_devices(db, _user_id(config), device)
 
-        return "❌ No system status available. Device has not reported status yet."
+        # The presence index is loaded with the sync client when it is stale
+        presence, irrigation = await asyncio.gather(
+            asyncio.to_thread(_presence.lookup, firestore.client(), device_ids),
+            aget_latest(db, IRRIGATION_STATE_COLLECTION, device_ids)
+        )
+        return "\n".join(_format_status(presence[device_id], irrigation[device_id])
+                         for device_id in device_ids)
 
     except Exception as e:
         print(f"❌ Error getting system status: {e}")
         return f"❌ Error: Unable to retrieve system status - {str(e)}"
+
+
+get_moisture_data.coroutine = _aget_moisture_data
+get_moisture_trend.coroutine = _aget_moisture_trend
+control_irrigation.coroutine = _acontrol_irrigation
+get_system_status.coroutine = _aget_system_status
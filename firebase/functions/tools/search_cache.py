@@ -0,0 +1,251 @@
+"""
+Web Search Cache
+Keeps search results in a bounded in-process LRU with a TTL, optionally
+backed by a Firestore collection shared by every function instance, so
+repeated plant questions do not hit the search API again
+
+Shared tier layout:
+    search_cache/{sha256(key)}      key, result (JSON), created_at, expire_at
+"""
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from langchain_core.tools import BaseTool
+
+from utils.tracing import firestore_span
+
+SEARCH_CACHE_COLLECTION = "search_cache"
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case, punctuation and spacing insensitive form of a search query"""
+    query = _PUNCTUATION.sub(" ", (query or "").lower())
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+def cache_key(tool_input: Dict[str, Any]) -> str:
+    """
+    Cache key for a search call: the normalized query plus any other
+    arguments the model set (domains, topic, time range...)
+    """
+    options = {name: value for name, value in tool_input.items()
+               if name != "query" and value is not None}
+    key = normalize_query(tool_input.get("query", ""))
+    if options:
+        key += " " + json.dumps(options, sort_keys=True, default=str)
+    return key
+
+
+class SearchCache:
+    """
+    LRU of search results with a time-to-live, plus an optional shared
+    Firestore tier that is read on a local miss and written on a fetch.
+    """
+
+    def __init__(
+            self,
+            max_entries: int = 512,
+            ttl_seconds: float = 24 * 60 * 60,
+            db: Any = None,
+            collection: str = SEARCH_CACHE_COLLECTION,
+            clock: Callable[[], float] = time.time,
+            ):
+        """Initialize an empty cache
+
+        Args:
+            max_entries: Maximum number of results kept in memory
+            ttl_seconds: Results older than this are fetched again
+            db: Firestore client for the shared tier, None for local only
+            collection: Firestore collection of the shared tier
+            clock: Wall-clock time source (overridable for tests)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db = db
+        self.collection = collection
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (stored_at, result), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._counters = {"hits": 0, "shared_hits": 0, "misses": 0,
+                          "errors": 0, "fetch_seconds": 0.0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached result for key, or None on a miss"""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+
+        shared = self._get_shared(key, now)
+        if shared is not None:
+            stored_at, result = shared
+            with self._lock:
+                self._counters["shared_hits"] += 1
+            self._store(key, result, stored_at)
+            return result
+
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def put(self, key: str, result: Any, fetch_seconds: float = 0.0) -> None:
+        """
+        Cache a freshly fetched result
+
+        Args:
+            key: Cache key from cache_key
+            result: Search tool output (JSON serializable)
+            fetch_seconds: How long the fetch took, for the savings estimate
+        """
+        now = self._clock()
+        with self._lock:
+            self._counters["fetch_seconds"] += fetch_seconds
+        self._store(key, result, now)
+        self._put_shared(key, result, now)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and the search time the cache saved"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats["entries"] = len(self._entries)
+        hits = stats["hits"] + stats["shared_hits"]
+        lookups = hits + stats["misses"]
+        avg_fetch = stats["fetch_seconds"] / stats["misses"] if stats["misses"] else 0.0
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        stats["avg_fetch_seconds"] = avg_fetch
+        # Searches not sent to the API, each worth one average fetch
+        stats["searches_saved"] = hits
+        stats["estimated_seconds_saved"] = hits * avg_fetch
+        return stats
+
+    def clear(self) -> None:
+        """Drop all local entries (the shared tier expires on its own)"""
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key: str, result: Any, stored_at: float) -> None:
+        """Add to the local LRU and evict over budget"""
+        with self._lock:
+            self._entries[key] = (stored_at, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _doc(self, key: str):
+        doc_id = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.db.collection(self.collection).document(doc_id)
+
+    def _get_shared(self, key: str, now: float) -> Optional[Tuple[float, Any]]:
+        """Fresh (stored_at, result) from the shared tier, if any"""
+        if self.db is None:
+            return None
+        try:
+            with firestore_span("get", self.collection):
+                snapshot = self._doc(key).get()
+            if not snapshot.exists:
+                return None
+            data = snapshot.to_dict() or {}
+            # Firestore TTL deletes lazily, so check freshness here
+            stored_at = data.get("created_at", 0) / 1000
+            if data.get("key") != key or now - stored_at >= self.ttl_seconds:
+                return None
+            return stored_at, json.loads(data["result"])
+        except Exception as e:
+            print(f"⚠️ Search cache read failed: {e}")
+            with self._lock:
+                self._counters["errors"] += 1
+            return None
+
+    def _put_shared(self, key: str, result: Any, now: float) -> None:
+        """Write a result to the shared tier, best effort"""
+        if self.db is None:
+            return
+        try:
+            with firestore_span("set", self.collection):
+                self._doc(key).set({
+                    "key": key,
+                    "result": json.dumps(result, default=str),
+                    "created_at": int(now * 1000),
+                    # Firestore TTL policy on expire_at deletes stale results
+                    "expire_at": datetime.fromtimestamp(now + self.ttl_seconds,
+                                                        tz=timezone.utc),
+                })
+        except Exception as e:
+            print(f"⚠️ Search cache write failed: {e}")
+            with self._lock:
+                self._counters["errors"] += 1
+
+
+def _cacheable(result: Any) -> bool:
+    """Only keep successful searches that found something"""
+    if isinstance(result, dict):
+        return "error" not in result and bool(result.get("results", True))
+    return bool(result)
+
+
+class CachedSearchTool(BaseTool):
+    """
+    Search tool wrapper that answers repeated queries from a SearchCache.
+    It keeps the wrapped tool's name, description and arguments, so the
+    model sees no difference.
+    """
+
+    tool: BaseTool
+    cache: SearchCache
+
+    def __init__(self, tool: BaseTool, cache: SearchCache, **kwargs: Any):
+        super().__init__(
+            tool=tool,
+            cache=cache,
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            **kwargs
+        )
+
+    def _run(self, **kwargs: Any) -> Any:
+        key = cache_key(kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            print(f"🔎 Search cache hit: {key}")
+            return cached
+
+        start = time.monotonic()
+        result = self.tool.invoke(kwargs)
+        if _cacheable(result):
+            self.cache.put(key, result, fetch_seconds=time.monotonic() - start)
+        return result
+
+    async def _arun(self, **kwargs: Any) -> Any:
+        key = cache_key(kwargs)
+        # The shared tier uses the sync Firestore client
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            print(f"🔎 Search cache hit: {key}")
+            return cached
+
+        start = time.monotonic()
+        result = await self.tool.ainvoke(kwargs)
+        if _cacheable(result):
+            await asyncio.to_thread(self.cache.put, key, result,
+                                    time.monotonic() - start)
+        return result
@@ -0,0 +1 @@
+"""UART protocol package for the PlantPal ESP32 <-> FPGA link"""
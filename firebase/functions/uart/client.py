@@ -0,0 +1,77 @@
+"""
+UART Client
+ESP32 side of the link in Python: sends a command frame and waits for the
+response, like sendUartCommand/receiveUartResponse in the firmware
+"""
+import socket
+import time
+from typing import List, Optional
+
+from uart import protocol
+from uart.protocol import FrameDecoder, Frame
+
+
+class UartClient:
+    """Request/response client over a connected socket"""
+
+    def __init__(self, sock: socket.socket, baud: Optional[int] = None,
+                 timeout: float = 2.0):
+        """Initialize the client
+
+        Args:
+            sock: Connected socket to the FPGA (or simulator)
+            baud: Pace requests to this line rate, None for no pacing
+            timeout: Seconds to wait for a response, as in the firmware
+        """
+        self.sock = sock
+        self.baud = baud
+        self.sock.settimeout(timeout)
+        self._decoder = FrameDecoder()
+        self._pending: List[Frame] = []
+
+    @classmethod
+    def connect(cls, host: str = "127.0.0.1", port: int = 7000,
+                baud: Optional[int] = None, timeout: float = 2.0) -> "UartClient":
+        sock = socket.create_connection((host, port), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return cls(sock, baud, timeout)
+
+    def request(self, frame: bytes) -> Frame:
+        """
+        Send one command frame and return the response frame (payload copied,
+        so it stays valid)
+
+        Raises:
+            TimeoutError: No complete response within the timeout
+        """
+        if self.baud:
+            time.sleep(len(frame) * 10 / self.baud)
+        self.sock.sendall(frame)
+        while not self._pending:
+            try:
+                count = self.sock.recv_into(self._decoder.writable())
+            except socket.timeout:
+                raise TimeoutError("No response from FPGA (timeout)")
+            if not count:
+                raise ConnectionError("UART link closed")
+            self._pending.extend(Frame(f.command, memoryview(bytes(f.payload)))
+                                 for f in self._decoder.commit(count))
+        return self._pending.pop(0)
+
+    def read_moisture(self) -> int:
+        """Moisture percent, as the firmware's moisture request flow"""
+        response = self.request(protocol.read_moisture())
+        if response.command != protocol.RESP_MOISTURE_DATA:
+            raise ValueError(f"Unexpected response 0x{response.command:02X}")
+        return response.payload[0]
+
+    def water_on(self, duration_seconds: int) -> bool:
+        """True if the FPGA acknowledged the water command"""
+        return self.request(protocol.water_on(duration_seconds)).command == protocol.RESP_WATER_ACK
+
+    def status(self) -> bool:
+        """True if the FPGA reports status OK"""
+        return self.request(protocol.status_request()).command == protocol.RESP_STATUS_OK
+
+    def close(self) -> None:
+        self.sock.close()
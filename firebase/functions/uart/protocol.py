@@ -0,0 +1,192 @@
+"""
+PlantPal UART Protocol
+Python side of common/plant_pal_uart_protocol.h: command/response codes,
+a frame encoder and a streaming decoder
+
+Frame format: [COMMAND] [LENGTH] [PAYLOAD...], LENGTH 0-32
+"""
+import struct
+from typing import Dict, Iterator, NamedTuple, Optional, Union
+
+UART_BAUD_RATE = 115200
+UART_MAX_PAYLOAD_SIZE = 32
+HEADER_SIZE = 2
+
+# Command codes (ESP32 -> FPGA)
+CMD_READ_MOISTURE = 0x10
+CMD_WATER_ON = 0x20
+CMD_STATUS_REQUEST = 0x30
+
+# Response codes (FPGA -> ESP32)
+RESP_MOISTURE_DATA = 0x11
+RESP_WATER_ACK = 0x21
+RESP_STATUS_OK = 0x31
+RESP_ERROR = 0xFF
+
+# Payload length of each code, None where any length up to the maximum is
+# allowed. Unknown codes and wrong lengths mark a byte as out of sync.
+PAYLOAD_SIZES: Dict[int, Optional[int]] = {
+    CMD_READ_MOISTURE: 0,
+    CMD_WATER_ON: 2,             # uint16 duration_seconds, little-endian
+    CMD_STATUS_REQUEST: 0,
+    RESP_MOISTURE_DATA: 1,       # uint8 moisture_percent
+    RESP_WATER_ACK: 0,
+    RESP_STATUS_OK: 0,
+    RESP_ERROR: None,
+}
+
+_WATER_PAYLOAD = struct.Struct("<H")
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class Frame(NamedTuple):
+    """
+    One decoded frame. The payload is a view into the decoder's buffer,
+    valid until the decoder is fed again; copy it (bytes(payload)) to keep it.
+    """
+    command: int
+    payload: memoryview
+
+
+# ============================================
+# Encoder
+# ============================================
+
+def encode_into(buffer: Union[bytearray, memoryview], offset: int,
+                command: int, payload: Buffer = b"") -> int:
+    """
+    Write one frame into a preallocated buffer
+
+    Returns:
+        Number of bytes written
+    """
+    length = len(payload)
+    if length > UART_MAX_PAYLOAD_SIZE:
+        raise ValueError(f"Payload of {length} bytes exceeds {UART_MAX_PAYLOAD_SIZE}")
+    buffer[offset] = command
+    buffer[offset + 1] = length
+    buffer[offset + HEADER_SIZE:offset + HEADER_SIZE + length] = payload
+    return HEADER_SIZE + length
+
+
+def encode_frame(command: int, payload: Buffer = b"") -> bytes:
+    """Encode one frame"""
+    frame = bytearray(HEADER_SIZE + len(payload))
+    encode_into(frame, 0, command, payload)
+    return bytes(frame)
+
+
+def read_moisture() -> bytes:
+    return encode_frame(CMD_READ_MOISTURE)
+
+
+def water_on(duration_seconds: int) -> bytes:
+    return encode_frame(CMD_WATER_ON, _WATER_PAYLOAD.pack(duration_seconds))
+
+
+def status_request() -> bytes:
+    return encode_frame(CMD_STATUS_REQUEST)
+
+
+def moisture_data(moisture_percent: int) -> bytes:
+    return encode_frame(RESP_MOISTURE_DATA, bytes((moisture_percent,)))
+
+
+def water_ack() -> bytes:
+    return encode_frame(RESP_WATER_ACK)
+
+
+def status_ok() -> bytes:
+    return encode_frame(RESP_STATUS_OK)
+
+
+def error(payload: Buffer = b"") -> bytes:
+    return encode_frame(RESP_ERROR, payload)
+
+
+def water_duration(payload: Buffer) -> int:
+    """duration_seconds of a CMD_WATER_ON payload"""
+    return _WATER_PAYLOAD.unpack_from(payload)[0]
+
+
+# ============================================
+# Streaming decoder
+# ============================================
+
+class FrameDecoder:
+    """
+    Incremental frame decoder over one fixed bytearray.
+
+    Bytes are written straight into the buffer (writable() + commit(), e.g.
+    with sock.recv_into or file.readinto) or copied in once with feed().
+    Frames are yielded as memoryview slices of the buffer, so decoding does
+    not allocate per frame. Only the unfinished tail of a chunk (at most one
+    frame) is moved when the buffer is refilled.
+
+    A header with an unknown code or a length that does not fit the code is
+    treated as line noise: one byte is skipped and decoding resumes at the
+    next byte.
+    """
+
+    def __init__(self, buffer_size: int = 4096):
+        if buffer_size < HEADER_SIZE + UART_MAX_PAYLOAD_SIZE:
+            raise ValueError("Buffer must hold at least one maximum-size frame")
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0     # First undecoded byte
+        self._end = 0       # End of received bytes
+        self.frames_decoded = 0
+        self.bytes_discarded = 0
+
+    @property
+    def pending(self) -> int:
+        """Bytes received but not yet decoded"""
+        return self._end - self._start
+
+    def writable(self) -> memoryview:
+        """
+        Free space to receive into. Invalidates frames from earlier calls,
+        because the unfinished tail may be moved to the front.
+        """
+        if self._start:
+            pending = self._end - self._start
+            self._buffer[:pending] = self._view[self._start:self._end]
+            self._start, self._end = 0, pending
+        return self._view[self._end:]
+
+    def commit(self, count: int) -> Iterator[Frame]:
+        """Mark `count` bytes written into writable() as received and decode"""
+        self._end += count
+        return self._decode()
+
+    def feed(self, data: Buffer) -> Iterator[Frame]:
+        """Copy data into the buffer and yield every complete frame"""
+        data = memoryview(data)
+        while data:
+            space = self.writable()
+            count = min(len(space), len(data))
+            space[:count] = data[:count]
+            data = data[count:]
+            yield from self.commit(count)
+
+    def _decode(self) -> Iterator[Frame]:
+        buffer = self._buffer
+        while self._end - self._start >= HEADER_SIZE:
+            start = self._start
+            command = buffer[start]
+            length = buffer[start + 1]
+            expected = PAYLOAD_SIZES.get(command, -1)
+            if (expected == -1 or length > UART_MAX_PAYLOAD_SIZE
+                    or (expected is not None and length != expected)):
+                # Out of sync, resume at the next byte
+                self._start += 1
+                self.bytes_discarded += 1
+                continue
+
+            end = start + HEADER_SIZE + length
+            if end > self._end:
+                return  # Wait for the rest of the payload
+            self._start = end
+            self.frames_decoded += 1
+            yield Frame(command, self._view[start + HEADER_SIZE:end])
@@ -0,0 +1,200 @@
+"""
+FPGA Simulator
+Software stand-in for the FPGA side of the UART link. It answers moisture,
+water and status commands like the hardware, over a pseudo-terminal (for
+the ESP32 bridge or pyserial) or a TCP socket, optionally paced to a baud
+rate
+
+Run (from firebase/functions):
+    python -m uart.simulator --pty                # prints the /dev/pts path
+    python -m uart.simulator --port 7000 --baud 115200
+"""
+import argparse
+import os
+import random
+import socket
+import threading
+import time
+from typing import Callable, Optional
+
+from uart import protocol
+from uart.protocol import FrameDecoder, Frame
+
+# Moisture gained per second of watering, and lost per second of drying
+_WATER_GAIN_PER_SECOND = 2.0
+_DRY_RATE_PER_SECOND = 0.001
+
+
+class FpgaSimulator:
+    """
+    Protocol state machine of the FPGA: a soil moisture level that dries
+    slowly and rises when the pump runs.
+    """
+
+    def __init__(
+            self,
+            moisture_percent: float = 50.0,
+            error_rate: float = 0.0,
+            clock: Callable[[], float] = time.monotonic,
+            seed: Optional[int] = None,
+            ):
+        """Initialize the simulated sensor
+
+        Args:
+            moisture_percent: Starting soil moisture
+            error_rate: Fraction of commands answered with RESP_ERROR
+            clock: Time source for drying (overridable for tests)
+            seed: Random seed for reproducible error injection
+        """
+        self.moisture_percent = moisture_percent
+        self.error_rate = error_rate
+        self.pump_seconds_total = 0
+        self.commands_handled = 0
+        self._clock = clock
+        self._last_update = clock()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def handle(self, frame: Frame) -> Optional[bytes]:
+        """Response frame for a command frame, None for non-commands"""
+        with self._lock:
+            self.commands_handled += 1
+            self._dry()
+            if frame.command not in (protocol.CMD_READ_MOISTURE,
+                                     protocol.CMD_WATER_ON,
+                                     protocol.CMD_STATUS_REQUEST):
+                return None
+            if self.error_rate and self._random.random() < self.error_rate:
+                return protocol.error()
+
+            if frame.command == protocol.CMD_READ_MOISTURE:
+                return protocol.moisture_data(round(self.moisture_percent))
+            if frame.command == protocol.CMD_WATER_ON:
+                duration = protocol.water_duration(frame.payload)
+                self.pump_seconds_total += duration
+                self.moisture_percent = min(
+                    100.0, self.moisture_percent + duration * _WATER_GAIN_PER_SECOND)
+                return protocol.water_ack()
+            return protocol.status_ok()
+
+    def _dry(self) -> None:
+        now = self._clock()
+        self.moisture_percent = max(
+            0.0, self.moisture_percent - (now - self._last_update) * _DRY_RATE_PER_SECOND)
+        self._last_update = now
+
+    def serve_fd(self, read_fd: int, write_fd: int,
+                 baud: Optional[int] = None,
+                 stop: Optional[threading.Event] = None) -> None:
+        """
+        Answer commands read from a file descriptor until EOF or `stop`.
+
+        Args:
+            read_fd: Descriptor to read commands from
+            write_fd: Descriptor to write responses to
+            baud: Pace responses to this line rate (10 bits per byte),
+                  None to write as fast as possible
+            stop: Event that ends the loop
+        """
+        decoder = FrameDecoder()
+        with os.fdopen(read_fd, "rb", buffering=0, closefd=False) as reader:
+            while stop is None or not stop.is_set():
+                count = reader.readinto(decoder.writable())
+                if not count:
+                    return
+                for frame in decoder.commit(count):
+                    self._respond(frame, lambda data: os.write(write_fd, data), baud)
+
+    def serve_connection(self, conn: socket.socket,
+                         baud: Optional[int] = None) -> None:
+        """Answer commands on a connected socket until it closes"""
+        decoder = FrameDecoder()
+        with conn:
+            while True:
+                try:
+                    count = conn.recv_into(decoder.writable())
+                except OSError:
+                    return
+                if not count:
+                    return
+                for frame in decoder.commit(count):
+                    self._respond(frame, conn.sendall, baud)
+
+    def _respond(self, frame: Frame, write: Callable[[bytes], object],
+                 baud: Optional[int]) -> None:
+        response = self.handle(frame)
+        if response is None:
+            return
+        if baud:
+            time.sleep(len(response) * 10 / baud)
+        write(response)
+
+
+def open_pty(simulator: FpgaSimulator, baud: Optional[int] = None) -> str:
+    """
+    Serve the simulator on a new pseudo-terminal in a background thread
+
+    Returns:
+        Path of the terminal to open as the serial port (e.g. /dev/pts/3)
+    """
+    import tty
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    threading.Thread(target=simulator.serve_fd, args=(master, master, baud),
+                     daemon=True, name="fpga-simulator-pty").start()
+    return os.ttyname(slave)
+
+
+def serve_tcp(simulator: FpgaSimulator, host: str = "127.0.0.1", port: int = 7000,
+              baud: Optional[int] = None) -> socket.socket:
+    """
+    Serve the simulator on a TCP port, one thread per connection
+
+    Returns:
+        The listening socket, close it to stop accepting connections
+    """
+    server = socket.create_server((host, port))
+
+    def _accept():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=simulator.serve_connection, args=(conn, baud),
+                             daemon=True).start()
+
+    threading.Thread(target=_accept, daemon=True, name="fpga-simulator-tcp").start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PlantPal FPGA simulator")
+    parser.add_argument("--pty", action="store_true",
+                        help="Serve on a pseudo-terminal instead of TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7000)
+    parser.add_argument("--baud", type=int, default=None,
+                        help="Pace responses to this baud rate")
+    parser.add_argument("--moisture", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    simulator = FpgaSimulator(moisture_percent=args.moisture,
+                              error_rate=args.error_rate)
+    if args.pty:
+        print(f"🔌 FPGA simulator on {open_pty(simulator, args.baud)}")
+    else:
+        serve_tcp(simulator, args.host, args.port, args.baud)
+        print(f"🔌 FPGA simulator on {args.host}:{args.port}")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"Handled {simulator.commands_handled} commands")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Model Call Tracing
+LangChain callback handler that opens an OpenTelemetry span for every chat
+model call the agent makes, with the model name and token usage, under the
+span that is current when the call starts (the chat turn).
+"""
+from typing import Any, Dict
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from opentelemetry.trace import Span, Status, StatusCode
+
+from utils.tracing import tracer
+
+
+class ModelTracingCallbackHandler(BaseCallbackHandler):
+    """Spans for chat model runs, keyed by LangChain run ID"""
+
+    def __init__(self):
+        self._spans: Dict[UUID, Span] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None,
+                            invocation_params=None, **kwargs) -> None:
+        params = invocation_params or {}
+        model = params.get("model") or params.get("model_name") or "unknown"
+        self._spans[run_id] = tracer.start_span(f"chat {model}", attributes={
+            "gen_ai.operation.name": "chat",
+            "gen_ai.request.model": model,
+            "plantpal.input_messages": sum(len(batch) for batch in messages),
+        })
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        usage: Dict[str, Any] = {}
+        try:
+            usage = response.generations[0][0].message.usage_metadata or {}
+        except (AttributeError, IndexError):
+            pass
+        if usage:
+            span.set_attributes({
+                "gen_ai.usage.input_tokens": usage.get("input_tokens", 0),
+                "gen_ai.usage.output_tokens": usage.get("output_tokens", 0),
+            })
+        span.end()
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        span.record_exception(error)
+        span.set_status(Status(StatusCode.ERROR, str(error)))
+        span.end()
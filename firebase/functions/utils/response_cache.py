@@ -0,0 +1,199 @@
+"""
+Semantic Response Cache
+Reuses the agent's answer to a generic plant-care question when a later
+message asks nearly the same thing. Messages are embedded and matched by
+cosine similarity against a local NumPy index, with a similarity threshold
+and a TTL. Turns that used an IoT tool are never stored, since their
+answers depend on live sensor state, and the agent only consults the cache
+on a thread's first turn, since later answers depend on the conversation.
+
+The embedder is pluggable: OpenAI embeddings in production, a deterministic
+hashing embedder offline and in tests.
+"""
+import hashlib
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Protocol
+
+import numpy as np
+
+from tools.search_cache import normalize_query
+
+# Messages about the user's own devices or readings always go to the agent
+_LIVE_DATA = re.compile(
+    r"\b(sensors?|devices?|readings?|status|irrigat\w*|right now|my soil)\b",
+    re.IGNORECASE)
+
+
+class Embedder(Protocol):
+    """Turns a message into a vector, any scale (the cache normalizes)"""
+
+    def embed(self, text: str) -> np.ndarray:
+        ...
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag of words and word pairs, hashed into a fixed number of
+    dimensions. Needs no model or network; matches reworded questions that
+    share most of their words.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def embed(self, text: str) -> np.ndarray:
+        words = normalize_query(text).split()
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in features:
+            digest = int.from_bytes(
+                hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        return vector
+
+
+class LangChainEmbedder:
+    """Adapter for a LangChain Embeddings model"""
+
+    def __init__(self, embeddings: Any):
+        self.embeddings = embeddings
+
+    def embed(self, text: str) -> np.ndarray:
+        return np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+
+
+def create_embedder(name: str, model: str = "text-embedding-3-small") -> Embedder:
+    """
+    Build the embedder for a PLANTPAL_RESPONSE_CACHE_EMBEDDER value
+
+    Args:
+        name: "openai" or "hashing"
+        model: OpenAI embedding model
+    """
+    if name == "hashing":
+        return HashingEmbedder()
+    if name == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return LangChainEmbedder(OpenAIEmbeddings(model=model))
+    raise ValueError(f"Unknown response cache embedder: {name}")
+
+
+def is_cacheable_message(message: str) -> bool:
+    """False for messages that ask about the user's devices or live readings"""
+    return bool(message and message.strip()) and not _LIVE_DATA.search(message)
+
+
+class ResponseCache:
+    """
+    Fixed-size index of (message embedding, answer) pairs. A lookup is one
+    matrix-vector product over the whole index. When full, the oldest entry
+    (or an expired one) is replaced.
+    """
+
+    def __init__(
+            self,
+            embedder: Embedder,
+            threshold: float = 0.92,
+            ttl_seconds: float = 24 * 60 * 60,
+            max_entries: int = 2048,
+            clock: Callable[[], float] = time.time,
+            ):
+        """Initialize an empty cache
+
+        Args:
+            embedder: Message embedder
+            threshold: Minimum cosine similarity for a hit
+            ttl_seconds: Answers older than this are not reused
+            max_entries: Maximum number of answers kept
+            clock: Wall-clock time source (overridable for tests)
+        """
+        self.embedder = embedder
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Allocated on the first put, once the embedding size is known
+        self._vectors: Optional[np.ndarray] = None
+        self._stored_at = np.full(max_entries, -np.inf)
+        self._answers: List[Optional[str]] = [None] * max_entries
+        self._counters = {"hits": 0, "misses": 0, "skipped": 0, "errors": 0}
+
+    def __len__(self) -> int:
+        return int(np.isfinite(self._stored_at).sum())
+
+    def embed(self, message: str) -> Optional[np.ndarray]:
+        """
+        Unit-length embedding of a message, None if the message must not be
+        answered from the cache or the embedder failed
+        """
+        if not is_cacheable_message(message):
+            with self._lock:
+                self._counters["skipped"] += 1
+            return None
+        try:
+            vector = np.asarray(self.embedder.embed(message), dtype=np.float32)
+        except Exception as e:
+            print(f"⚠️ Response cache embedding failed: {e}")
+            with self._lock:
+                self._counters["errors"] += 1
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def get(self, vector: Optional[np.ndarray]) -> Optional[str]:
+        """Cached answer for the nearest fresh message, or None on a miss"""
+        if vector is None:
+            return None
+        with self._lock:
+            index = self._nearest(vector, self._clock())
+            if index is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            return self._answers[index]
+
+    def put(self, vector: Optional[np.ndarray], answer: str) -> None:
+        """
+        Store an answer. A near-duplicate entry is replaced rather than
+        stored twice.
+        """
+        if vector is None or not answer:
+            return
+        now = self._clock()
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            index = self._nearest(vector, now)
+            if index is None:
+                # Empty and expired slots hold the smallest stored_at
+                index = int(np.argmin(np.where(
+                    now - self._stored_at < self.ttl_seconds, self._stored_at, -np.inf)))
+            self._vectors[index] = vector
+            self._stored_at[index] = now
+            self._answers[index] = answer
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+        stats["entries"] = len(self)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stored_at[:] = -np.inf
+            self._answers = [None] * self.max_entries
+
+    def _nearest(self, vector: np.ndarray, now: float) -> Optional[int]:
+        """Index of the most similar fresh entry at or over the threshold"""
+        if self._vectors is None:
+            return None
+        similarity = self._vectors @ vector
+        similarity[now - self._stored_at >= self.ttl_seconds] = -np.inf
+        index = int(np.argmax(similarity))
+        return index if similarity[index] >= self.threshold else None
@@ -0,0 +1,102 @@
+"""
+Per-Thread Locks
+Serializes chat turns on the same conversation thread while turns on other
+threads run in parallel. Two overlapping turns on one thread would both
+start from the same checkpoint, and the second write would drop the first
+turn from the history.
+
+A lock exists only while a turn holds or waits for it, so memory follows
+concurrency rather than the number of threads ever seen. The same lock
+serves synchronous callers (streaming requests on server threads) and
+coroutines on the agent's event loop. Coroutines wait on a future, not on
+an executor thread, so waiting turns cannot starve the executor that the
+running turn needs. Waiters are served first come, first served.
+"""
+import asyncio
+import contextlib
+import threading
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Iterator, Union
+
+_Waiter = Union[threading.Event, asyncio.Future]
+
+
+def _wake(waiter: _Waiter) -> None:
+    """Hand the lock to a waiter"""
+    if isinstance(waiter, threading.Event):
+        waiter.set()
+    else:
+        waiter.get_loop().call_soon_threadsafe(
+            lambda: waiter.cancelled() or waiter.set_result(None))
+
+
+class ThreadLocks:
+    """Registry of locks keyed by conversation thread ID"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # thread ID -> turns waiting; present while the thread is locked
+        self._waiters: Dict[str, Deque[_Waiter]] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._waiters)
+
+    def locked(self, thread_id: str) -> bool:
+        with self._lock:
+            return thread_id in self._waiters
+
+    def _release(self, thread_id: str) -> None:
+        """Pass the lock to the next waiter, or unlock the thread"""
+        with self._lock:
+            waiters = self._waiters[thread_id]
+            if not waiters:
+                del self._waiters[thread_id]
+                return
+            waiter = waiters.popleft()
+        _wake(waiter)
+
+    @contextlib.contextmanager
+    def hold(self, thread_id: str) -> Iterator[None]:
+        """Hold the thread's lock, blocking the calling thread until it is free"""
+        with self._lock:
+            waiters = self._waiters.get(thread_id)
+            if waiters is None:
+                self._waiters[thread_id] = deque()
+                event = None
+            else:
+                event = threading.Event()
+                waiters.append(event)
+        if event is not None:
+            event.wait()
+        try:
+            yield
+        finally:
+            self._release(thread_id)
+
+    @contextlib.asynccontextmanager
+    async def ahold(self, thread_id: str) -> AsyncIterator[None]:
+        """Hold the thread's lock, awaiting it without blocking the event loop"""
+        with self._lock:
+            waiters = self._waiters.get(thread_id)
+            if waiters is None:
+                self._waiters[thread_id] = deque()
+                future = None
+            else:
+                future = asyncio.get_running_loop().create_future()
+                waiters.append(future)
+        if future is not None:
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._lock:
+                    handed_over = future not in waiters
+                    if not handed_over:
+                        waiters.remove(future)
+                if handed_over:
+                    self._release(thread_id)
+                raise
+        try:
+            yield
+        finally:
+            self._release(thread_id)
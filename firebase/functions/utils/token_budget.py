@@ -0,0 +1,163 @@
+"""
+Token Budget Helpers
+Counts message tokens with tiktoken, caching each count on the message so a
+thread is tokenized once, and selects or summarizes history by token budget
+instead of message count
+"""
+import json
+from typing import Any, Callable, Iterable, List, Optional
+
+from langchain.agents.middleware import SummarizationMiddleware
+from langchain.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, convert_to_messages
+
+# response_metadata key holding {counter name: token count}. It is saved
+# with the message in the checkpoint but never sent to the model.
+TOKEN_COUNT_KEY = "token_count"
+
+# OpenAI chat format overhead: role and separators per message, and the
+# tokens priming the reply
+_MESSAGE_OVERHEAD = 4
+_REPLY_OVERHEAD = 3
+
+
+def _approximate_tokens(text: str) -> int:
+    """About four characters per token for English text"""
+    return (len(text) + 3) // 4
+
+
+class MessageTokenCounter:
+    """
+    Token counter for chat messages. Each message's count is stored in its
+    response_metadata the first time it is counted, so counting a thread
+    on every turn only tokenizes the messages added since the last turn.
+    """
+
+    def __init__(
+            self,
+            model: str = "gpt-4o",
+            count_text: Optional[Callable[[str], int]] = None,
+            name: Optional[str] = None,
+            ):
+        """Initialize the counter
+
+        Args:
+            model: Model whose tiktoken encoding is used
+            count_text: Text token counter overriding tiktoken (for tests)
+            name: Cache key for the counts, defaults to the encoding name
+        """
+        self.model = model
+        self.name = name
+        self._count_text = count_text
+
+    def _counter(self) -> Callable[[str], int]:
+        """Load the tiktoken encoding on first use"""
+        if self._count_text is None:
+            try:
+                import tiktoken
+                encoding = tiktoken.encoding_for_model(self.model)
+                self.name = self.name or encoding.name
+                self._count_text = lambda text: len(
+                    encoding.encode(text, disallowed_special=()))
+            except Exception as e:
+                # Encodings are downloaded on first use. Without them, count
+                # approximately under a separate cache key
+                print(f"⚠️ tiktoken unavailable for {self.model}, approximating: {e}")
+                self.name = "approximate"
+                self._count_text = _approximate_tokens
+        self.name = self.name or self.model
+        return self._count_text
+
+    def message_tokens(self, message: BaseMessage) -> int:
+        """Token count of one message, cached on the message"""
+        count_text = self._counter()
+        cached = message.response_metadata.get(TOKEN_COUNT_KEY) or {}
+        if self.name in cached:
+            return cached[self.name]
+
+        tokens = _MESSAGE_OVERHEAD + count_text(message.text)
+        if message.name:
+            tokens += count_text(message.name)
+        if isinstance(message, AIMessage) and message.tool_calls:
+            tokens += count_text(json.dumps(
+                [{"name": call["name"], "args": call["args"]}
+                 for call in message.tool_calls]))
+
+        message.response_metadata[TOKEN_COUNT_KEY] = {**cached, self.name: tokens}
+        return tokens
+
+    def __call__(self, messages: Iterable[Any]) -> int:
+        """Token count of a prompt, usable as a LangChain token_counter"""
+        messages = [m if isinstance(m, BaseMessage) else convert_to_messages([m])[0]
+                    for m in messages]
+        return _REPLY_OVERHEAD + sum(self.message_tokens(m) for m in messages)
+
+    def select_recent(
+            self,
+            messages: List[BaseMessage],
+            budget: int
+            ) -> List[BaseMessage]:
+        """
+        Most recent messages that fit in a token budget, starting with a
+        human message so the history never opens with a dangling reply.
+        The newest message is always kept.
+        """
+        start = len(messages)
+        used = _REPLY_OVERHEAD
+        for index in range(len(messages) - 1, -1, -1):
+            used += self.message_tokens(messages[index])
+            if used > budget and index < len(messages) - 1:
+                break
+            start = index
+
+        while start < len(messages) - 1 and messages[start].type != "human":
+            start += 1
+        return messages[start:]
+
+
+class TokenBudgetSummarizationMiddleware(SummarizationMiddleware):
+    """
+    SummarizationMiddleware that keeps the most recent `tokens_to_keep`
+    tokens of conversation verbatim, instead of a fixed number of messages,
+    and counts with a cached MessageTokenCounter.
+    """
+
+    def __init__(
+            self,
+            model: "str | BaseChatModel",
+            max_tokens_before_summary: int,
+            tokens_to_keep: int,
+            token_counter: MessageTokenCounter,
+            **kwargs: Any
+            ):
+        """Initialize the middleware
+
+        Args:
+            model: Model used to write summaries
+            max_tokens_before_summary: Conversation size that triggers a summary
+            tokens_to_keep: Recent tokens preserved unsummarized
+            token_counter: Counter that caches per-message counts
+        """
+        super().__init__(
+            model=model,
+            max_tokens_before_summary=max_tokens_before_summary,
+            token_counter=token_counter,
+            **kwargs
+        )
+        self.tokens_to_keep = tokens_to_keep
+
+    def _find_safe_cutoff(self, messages: List[BaseMessage]) -> int:
+        """Cut before the newest messages that fit in tokens_to_keep,
+        moving earlier so tool calls stay with their results"""
+        target_cutoff = len(messages) - 1  # Always keep the newest message
+        kept = 0
+        for index in range(len(messages) - 1, -1, -1):
+            kept += self.token_counter.message_tokens(messages[index])
+            if kept > self.tokens_to_keep:
+                break
+            target_cutoff = index
+
+        for index in range(target_cutoff, -1, -1):
+            if self._is_safe_cutoff_point(messages, index):
+                return index
+        return 0
@@ -0,0 +1,231 @@
+"""
+PlantPal Tracing
+OpenTelemetry spans for chat requests, tools, Firestore reads/writes and
+Pub/Sub publishes, plus W3C trace context carried on device commands so a
+reading's handler joins the trace of the request that asked for it.
+Model calls are traced by utils/model_tracing.py on the agent side.
+
+Only the OpenTelemetry API is imported here, so the telemetry handlers'
+cold start stays small. The SDK and an exporter are set up by
+configure_tracing() when PLANTPAL_TRACE_EXPORTER is not "none"; until then
+every span is a no-op.
+"""
+import functools
+import inspect
+import json
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional
+
+from opentelemetry import propagate, trace
+from opentelemetry.trace import Span, SpanKind
+
+from config import TRACE_EXPORTER, TRACE_FILE
+
+# Message attribute / payload field carrying the W3C trace context
+TRACEPARENT = "traceparent"
+
+tracer = trace.get_tracer("plantpal")
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+class FileSpanExporter:
+    """
+    Appends finished spans to a file as JSON lines, for local runs and tests.
+    Implements the opentelemetry.sdk SpanExporter interface.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> Any:
+        from opentelemetry.sdk.trace.export import SpanExportResult
+        lines = [json.dumps(json.loads(span.to_json())) + "\n" for span in spans]
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def create_exporter(name: str, path: str = TRACE_FILE) -> Optional[Any]:
+    """
+    Build the span exporter for a PLANTPAL_TRACE_EXPORTER value.
+
+    Args:
+        name: "none", "console", "file", "otlp" or "gcp"
+        path: Output file for the "file" exporter
+
+    Returns:
+        The exporter, None for "none" or when the exporter's package is
+        not installed
+    """
+    if name == "none":
+        return None
+    if name == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        return ConsoleSpanExporter()
+    if name == "file":
+        return FileSpanExporter(path)
+    try:
+        if name == "otlp":
+            # Endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* variables
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            return OTLPSpanExporter()
+        if name == "gcp":
+            from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+            return CloudTraceSpanExporter()
+    except ImportError as e:
+        print(f"⚠️ Trace exporter '{name}' is not installed ({e}), tracing disabled")
+        return None
+    raise ValueError(f"Unknown trace exporter: {name}")
+
+
+def configure_tracing(exporter: Optional[Any] = None, batch: bool = True) -> bool:
+    """
+    Install the SDK tracer provider once per process.
+
+    Args:
+        exporter: Span exporter to use, defaults to the configured one
+        batch: Export in a background thread (False exports each span as it
+               ends, e.g. for tests)
+
+    Returns:
+        True if spans are being exported
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return True
+        exporter = exporter or create_exporter(TRACE_EXPORTER)
+        if exporter is None:
+            return False
+
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+
+        provider = TracerProvider(resource=Resource.create({"service.name": "plantpal"}))
+        processor = BatchSpanProcessor(exporter) if batch else SimpleSpanProcessor(exporter)
+        provider.add_span_processor(processor)
+        trace.set_tracer_provider(provider)
+        _configured = True
+        return True
+
+
+def flush_tracing() -> None:
+    """Export buffered spans, call before a function invocation returns"""
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "force_flush"):
+        provider.force_flush()
+
+
+# ============================================
+# Firestore and Pub/Sub spans
+# ============================================
+
+@contextmanager
+def firestore_span(operation: str, collection: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Span around one Firestore call
+
+    Args:
+        operation: e.g. "get", "get_all", "commit", "transaction", "listen"
+        collection: Collection (or collection group) the call touches
+        **attributes: Extra span attributes, e.g. documents=12
+    """
+    with tracer.start_as_current_span(
+        f"firestore.{operation} {collection}",
+        kind=SpanKind.CLIENT,
+        attributes={
+            "db.system": "firestore",
+            "db.operation.name": operation,
+            "db.collection.name": collection,
+            **{f"plantpal.{key}": value for key, value in attributes.items()},
+        },
+    ) as span:
+        yield span
+
+
+@contextmanager
+def publish_span(topic: str, **attributes: Any) -> Iterator[Dict[str, str]]:
+    """
+    Producer span around one Pub/Sub publish.
+
+    Yields:
+        Carrier holding the span's trace context ({"traceparent": ...}).
+        Add it to the message so the consumer's span joins this trace.
+    """
+    with tracer.start_as_current_span(
+        f"{topic.rsplit('/', 1)[-1]} publish",
+        kind=SpanKind.PRODUCER,
+        attributes={
+            "messaging.system": "gcp_pubsub",
+            "messaging.operation.type": "send",
+            "messaging.destination.name": topic,
+            **{f"plantpal.{key}": value for key, value in attributes.items()},
+        },
+    ):
+        carrier: Dict[str, str] = {}
+        propagate.inject(carrier)
+        yield carrier
+
+
+@contextmanager
+def consumer_span(
+    name: str,
+    attributes: Optional[Mapping[str, str]] = None,
+    payload: Optional[Mapping[str, Any]] = None
+) -> Iterator[Span]:
+    """
+    Consumer span for a Pub/Sub handler, parented to the producer's trace
+    context from the message attributes or, for device messages that echo
+    it, the payload.
+    """
+    carrier: Dict[str, str] = {}
+    for source in (payload, attributes):
+        if isinstance(source, Mapping) and source.get(TRACEPARENT):
+            carrier[TRACEPARENT] = str(source[TRACEPARENT])
+            break
+    with tracer.start_as_current_span(
+        name,
+        context=propagate.extract(carrier),
+        kind=SpanKind.CONSUMER,
+        attributes={"messaging.system": "gcp_pubsub",
+                    "messaging.operation.type": "process"},
+    ) as span:
+        yield span
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """
+    Run a function (sync or async) in a span. String and number keyword
+    arguments are recorded as plantpal.<name> attributes. Keeps the
+    signature, so it can sit under @tool.
+    """
+    def decorator(func: Callable) -> Callable:
+        def _attributes(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+            return {f"plantpal.{key}": value for key, value in kwargs.items()
+                    if isinstance(value, (str, int, float, bool))}
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.start_as_current_span(name, attributes=_attributes(kwargs)):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(name, attributes=_attributes(kwargs)):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
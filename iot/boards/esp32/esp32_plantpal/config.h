@@ -21,6 +21,10 @@
 // MQTT Client ID (should be unique per device)
 #define MQTT_CLIENT_ID      "PlantPalESP32"
 
+// Device ID used by the backend device registry (unique per device).
+// Sent with every reading; commands addressed to other devices are ignored.
+#define DEVICE_ID           "esp32"
+
 // ============================================
 // MQTT Topics
 // IMPORTANT: Update to these topics will need to be updated in
@@ -30,6 +34,7 @@
 #define SUB_WATER_TOPIC         "plantpal/request_water"
 #define PUB_TELEMETRY_TOPIC     "plantpal/data/moisture"
 #define PUB_STATUS_TOPIC        "plantpal/status"
+#define PUB_WATER_ACK_TOPIC     "plantpal/ack/water"
 
 // ============================================
 // Hardware Pin Definitions
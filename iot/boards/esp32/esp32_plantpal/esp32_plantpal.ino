@@ -106,14 +106,14 @@ void loop() {
           DEBUG_LOG(TAG, "FPGA status: OK");
 
           // Publish status to MQTT
-          String statusPayload = "{\"status\":\"online\",\"timestamp\":" + String(millis()) + "}";
+          String statusPayload = "{\"status\":\"online\",\"device_id\":\"" DEVICE_ID "\",\"timestamp\":" + String(millis()) + "}";
           client.publish(PUB_STATUS_TOPIC, statusPayload.c_str());
         } else {
           DEBUG_LOG(TAG, "FPGA status: Unexpected response");
         }
       } else {
         DEBUG_LOG(TAG, "FPGA status: No response (timeout)");
-        String statusPayload = "{\"status\":\"offline\",\"timestamp\":" + String(millis()) + "}";
+        String statusPayload = "{\"status\":\"offline\",\"device_id\":\"" DEVICE_ID "\",\"timestamp\":" + String(millis()) + "}";
         client.publish(PUB_STATUS_TOPIC, statusPayload.c_str());
       }
     }
@@ -4,10 +4,38 @@
 
 const String TAG = "MQTT_SERVICE";
 
+/**
+ * @brief Commands are broadcast on shared topics; a command that names a
+ * different device_id is meant for another device.
+ */
+static bool isForThisDevice(String &payload) {
+    DynamicJsonDocument doc(384);
+    if (deserializeJson(doc, payload)) {
+        return true;  // Not JSON, treat as a broadcast
+    }
+    const char* target = doc["device_id"] | "";
+    return strlen(target) == 0 || String(target) == DEVICE_ID;
+}
+
 void messageReceived(String &topic, String &payload, Stream &uart, MQTTClient &mqttClient) {
+    if (!isForThisDevice(payload)) {
+        DEBUG_LOG(TAG, "Ignoring command addressed to another device");
+        return;
+    }
+
     if (topic == SUB_MOISTURE_TOPIC) {
         DEBUG_LOG(TAG, "Received moisture sensor reading request");
 
+        // Echo the request's correlation ID so the backend can match the
+        // reading, and its trace context so the reading joins the request's trace
+        String requestId = "";
+        String traceparent = "";
+        DynamicJsonDocument request(384);
+        if (!deserializeJson(request, payload)) {
+            requestId = request["request_id"] | "";
+            traceparent = request["traceparent"] | "";
+        }
+
         // Send moisture read command to FPGA
         sendUartCommand(uart, CMD_READ_MOISTURE, nullptr, 0);
 
@@ -24,7 +52,7 @@ void messageReceived(String &topic, String &payload, Stream &uart, MQTTClient &m
                 DEBUG_LOG(TAG, String("Moisture reading: ") + String(moisturePercent) + "%");
 
                 // Publish to MQTT
-                String mqttPayload = formatMoistureTopicPayload(moisturePercent, millis());
+                String mqttPayload = formatMoistureTopicPayload(moisturePercent, millis(), requestId, traceparent);
                 mqttClient.publish(PUB_TELEMETRY_TOPIC, mqttPayload.c_str());
                 DEBUG_LOG(TAG, String("Published: ") + mqttPayload);
             } else {
@@ -39,7 +67,7 @@ void messageReceived(String &topic, String &payload, Stream &uart, MQTTClient &m
         DEBUG_LOG(TAG, String("Payload: ") + payload);
 
         // Parse duration from JSON payload
-        DynamicJsonDocument doc(128);
+        DynamicJsonDocument doc(192);
         DeserializationError error = deserializeJson(doc, payload);
 
         if (error) {
@@ -47,9 +75,20 @@ void messageReceived(String &topic, String &payload, Stream &uart, MQTTClient &m
             return;
         }
 
-        uint16_t duration = doc["duration"] | 10;  // Default 10 seconds if not specified
+        // "duration" is the pre-ledger field name, kept for older backends
+        uint16_t duration = doc["duration_seconds"] | (doc["duration"] | 10);  // Default 10 seconds if not specified
         DEBUG_LOG(TAG, String("Water duration: ") + String(duration) + "s");
 
+        // Pub/Sub delivers at least once, so a redelivered command is
+        // acknowledged again without running the pump a second time
+        static String lastAckedCommandId = "";
+        String commandId = doc["command_id"] | "";
+        if (commandId.length() > 0 && commandId == lastAckedCommandId) {
+            DEBUG_LOG(TAG, String("Duplicate water command ") + commandId + ", not watering again");
+            mqttClient.publish(PUB_WATER_ACK_TOPIC, formatWaterAckPayload(commandId, "acked").c_str());
+            return;
+        }
+
         // Build water command payload
         WaterCommandPayload waterPayload;
         waterPayload.duration_seconds = duration;
@@ -62,15 +101,29 @@ void messageReceived(String &topic, String &payload, Stream &uart, MQTTClient &m
         uint8_t responsePayload[UART_MAX_PAYLOAD_SIZE];
         uint8_t responseLen;
 
+        const char* ackStatus = "timeout";
         if (receiveUartResponse(uart, responseCmd, responsePayload, responseLen, 2000)) {
             if (responseCmd == RESP_WATER_ACK) {
                 DEBUG_LOG(TAG, "Water command acknowledged by FPGA");
+                ackStatus = "acked";
+                lastAckedCommandId = commandId;
+            } else if (responseCmd == RESP_ERROR) {
+                DEBUG_LOG(TAG, "FPGA reported an error for the water command");
+                ackStatus = "error";
             } else {
                 DEBUG_LOG(TAG, "Unexpected response from FPGA");
+                ackStatus = "unexpected";
             }
         } else {
             DEBUG_LOG(TAG, "No acknowledgment from FPGA (timeout)");
         }
+
+        // Confirm the outcome to the backend's command ledger
+        if (commandId.length() > 0) {
+            String ackPayload = formatWaterAckPayload(commandId, ackStatus);
+            mqttClient.publish(PUB_WATER_ACK_TOPIC, ackPayload.c_str());
+            DEBUG_LOG(TAG, String("Published: ") + ackPayload);
+        }
     }
     else {
         DEBUG_LOG(TAG, String("Received message on unknown topic: ") + topic);
@@ -85,12 +138,37 @@ void messageReceived(String &topic, String &payload, Stream &uart, MQTTClient &m
  *
  * @param moisturePercent
  * @param timestamp
+ * @param requestId Correlation ID from the request, empty if unsolicited
+ * @param traceparent W3C trace context from the request, empty if unsolicited
  * @return Serialized JSON String
  */
-String formatMoistureTopicPayload(double moisturePercent, unsigned long timestamp) {
-    DynamicJsonDocument doc(128);
+String formatMoistureTopicPayload(double moisturePercent, unsigned long timestamp, const String &requestId,
+                                  const String &traceparent) {
+    DynamicJsonDocument doc(384);
     doc["percentage"] = moisturePercent;
     doc["timestamp"] = timestamp;
+    doc["request_id"] = requestId;
+    doc["traceparent"] = traceparent;
+    doc["device_id"] = DEVICE_ID;
+    String output;
+    serializeJson(doc, output);
+    return output;
+}
+
+/**
+ * @brief Water ack payload for the backend's irrigation command ledger,
+ * published on PUB_WATER_ACK_TOPIC after the FPGA answers a water command.
+ *
+ * @param commandId Command ID from the request_water message
+ * @param status "acked" (RESP_WATER_ACK), "error", "unexpected" or "timeout"
+ * @return Serialized JSON String
+ */
+String formatWaterAckPayload(const String &commandId, const char* status) {
+    DynamicJsonDocument doc(192);
+    doc["command_id"] = commandId;
+    doc["device_id"] = DEVICE_ID;
+    doc["status"] = status;
+    doc["timestamp"] = millis();
     String output;
     serializeJson(doc, output);
     return output;
@@ -7,7 +7,9 @@
 #include "../../../../common/plant_pal_uart_protocol.h"
 
 void messageReceived(String &topic, String &payload, Stream &uart, MQTTClient &mqttClient);
-String formatMoistureTopicPayload(double moisturePercent, unsigned long timestamp);
+String formatMoistureTopicPayload(double moisturePercent, unsigned long timestamp, const String &requestId,
+                                  const String &traceparent);
+String formatWaterAckPayload(const String &commandId, const char* status);
 
 // UART helper functions
 bool sendUartCommand(Stream &uart, uint8_t command, const uint8_t* payload, uint8_t length);